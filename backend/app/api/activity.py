@@ -1,15 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from app.models import AuditLog
 from app.schemas import AuditLogCreate, AuditLogRead
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-import os
 from typing import List
 
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///ocr.db')
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from app.utils.db_config import SessionLocal
 
 def get_db():
     db = SessionLocal()
@@ -1,24 +1,17 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
-from app.models import BlockCategory, BlockTemplate, Workflow, WorkflowBlock, User, BlockExecution, SidebarMenu, SidebarMenuCategory
+from app.models import BlockCategory, BlockTemplate, SidebarMenu, SidebarMenuCategory
 from app.schemas import (
     BlockCategoryCreate, BlockCategoryRead,
     BlockTemplateCreate, BlockTemplateRead,
-    WorkflowCreate, WorkflowRead,
-    WorkflowBlockCreate, WorkflowBlockRead,
-    BlockExecutionCreate, BlockExecutionRead,
     SidebarMenuRead, SidebarMenuCreate,
     SidebarMenuCategoryRead, SidebarMenuCategoryCreate
 )
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 import os
 from typing import List
 import re
 
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///ocr.db')
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from app.utils.db_config import SessionLocal
 
 def get_db():
     db = SessionLocal()
@@ -9,6 +9,7 @@ from typing import Dict, Union, Optional
 import logging
 
 from app.utils.cache_utils import clear_cache, get_cache_stats
+from app.utils.single_flight import get_single_flight_stats
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +22,7 @@ def get_cache_statistics():
     Get detailed statistics about all caches.
     
     Returns:
-        Dict containing cache statistics including size, hits, misses, and TTL information.
+        Dict containing cache statistics including size, bytes in use, hits, misses, and TTL information.
     """
     try:
         stats = get_cache_stats()
@@ -35,6 +36,24 @@ def get_cache_statistics():
         raise HTTPException(status_code=500, detail=f"Error getting cache statistics: {str(e)}")
 
 
+@router.get("/coalescing", summary="Get request coalescing statistics")
+def get_coalescing_statistics():
+    """
+    Get statistics about concurrent duplicate requests collapsed into a single execution.
+    
+    Returns:
+        Dict containing calls, executions and collapsed duplicates per single-flight group.
+    """
+    try:
+        return {
+            "status": "success",
+            "data": get_single_flight_stats()
+        }
+    except Exception as e:
+        logger.error(f"Error getting coalescing statistics: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error getting coalescing statistics: {str(e)}")
+
+
 @router.post("/clear", summary="Clear cache")
 def clear_cache_endpoint(cache_type: Optional[str] = "all"):
     """
@@ -81,14 +100,18 @@ def cache_health_check():
         # Check if any cache is near capacity
         warnings = []
         for cache_name, cache_stats in stats.items():
-            if cache_name == "file_cache":
+            if cache_name in ("file_cache", "memory_budget"):
                 continue
                 
-            size = cache_stats.get("size", 0)
-            maxsize = cache_stats.get("maxsize", 0)
+            used_bytes = cache_stats.get("bytes") or 0
+            max_bytes = cache_stats.get("max_bytes") or 0
             
-            if maxsize > 0 and size / maxsize > 0.8:  # 80% capacity
-                warnings.append(f"{cache_name} is at {(size/maxsize)*100:.1f}% capacity")
+            if max_bytes > 0 and used_bytes / max_bytes > 0.8:  # 80% capacity
+                warnings.append(f"{cache_name} is at {(used_bytes/max_bytes)*100:.1f}% capacity")
+        
+        budget = stats.get("memory_budget", {})
+        if budget.get("limit_bytes") and budget.get("used_bytes", 0) / budget["limit_bytes"] > 0.9:
+            warnings.append(f"In-memory caches are at {(budget['used_bytes']/budget['limit_bytes'])*100:.1f}% of the memory budget")
         
         is_healthy = len(warnings) == 0
         
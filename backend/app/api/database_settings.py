@@ -9,7 +9,7 @@ from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 from sqlalchemy.orm import Session
-from app.utils.db_config import get_db, get_db_type
+from app.utils.db_config import get_db, get_db_type, get_pool_stats
 
 router = APIRouter()
 
@@ -69,7 +69,8 @@ async def get_database_settings():
     return {
         "db_type": db_type,
         "postgres": postgres_settings,
-        "mssql": mssql_settings
+        "mssql": mssql_settings,
+        "pool": get_pool_stats()
     }
 
 @router.post("/database")
@@ -1,11 +1,12 @@
 import logging
 import asyncio
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from fastapi import HTTPException, BackgroundTasks
 from sqlalchemy.orm import Session
 from datetime import datetime
 import time
+from collections import deque
 
 from .models import SharePointItem, PdfOcrRequest
 from .db_utils import get_db_session
@@ -15,6 +16,9 @@ from app.models import OcrResult, BatchProcessingJob
 from app.api.sharepoint import list_files as list_sharepoint_files_in_folder
 from app.api.thumbnails.thumbnail_utils import download_pdf_content_from_sharepoint
 from .task_queue import task_queue
+from .progress import progress_broker
+from .batch_store import SpilledItemList, BATCH_LOG_CAPACITY, BATCH_RECENT_ITEMS
+from .scheduler import NORMAL, BULK, normalize_priority
 
 logger = logging.getLogger(__name__)
 
@@ -25,11 +29,20 @@ logger.info("BATCH_PROCESSING.PY: Module loaded with persistent task queue")
 # Global storage for batch processing status (in-memory cache)
 batch_processing_status = {}
 
+# Share of a deprioritized batch within its priority class, by throttle level
+DEPRIORITIZED_WEIGHTS = {0: 0.5, 1: 0.25, 2: 0.1}
+
 class BatchProcessor:
-    def __init__(self, batch_id: str, files: List[Dict], settings: Dict):
+    def __init__(self, batch_id: str, files: List[Dict], settings: Dict, default_priority: str = NORMAL):
         self.batch_id = batch_id
         self.files = files
         self.settings = settings
+        # OCR scheduler class and fair-share key; batches of the same user share one share
+        self.priority = normalize_priority(settings.get('priority'), default_priority)
+        self.base_priority = self.priority
+        user = settings.get('user') or settings.get('userId')
+        self.tenant = f"user:{user}" if user else f"batch:{batch_id}"
+        self.scheduler_weight = 1.0
         self.total_files = len(files)
         self.processed_count = 0
         self.failed_count = 0
@@ -42,8 +55,9 @@ class BatchProcessor:
         self.should_stop = False
         self.is_deprioritized = False
         self.cpu_throttle_level = 0  # 0=normal, 1=light throttling, 2=heavy throttling
-        self.results = []
-        self.errors = []
+        # Results and errors are spilled to disk; only counts and recent items stay in memory
+        self.results = SpilledItemList(batch_id, "results")
+        self.errors = SpilledItemList(batch_id, "errors")
         self.processing_stats = {
             "total_pages": 0,
             "total_words": 0,
@@ -51,7 +65,7 @@ class BatchProcessor:
             "total_processing_time": 0,
             "average_processing_time": 45.0  # Initial estimate: 45 seconds per file
         }
-        self.logs = []
+        self.logs = deque(maxlen=BATCH_LOG_CAPACITY)
         
         # Load existing statistics from database for already processed files
         self._load_existing_statistics()
@@ -94,6 +108,61 @@ class BatchProcessor:
         }
         self.logs.append(log_entry)
         logger.info(f"Batch {self.batch_id}: {message}")
+        # Every state change is logged, so this is where subscribers are notified
+        self.publish_progress()
+
+    def get_processing_stats_dict(self) -> Dict[str, Any]:
+        """Get page, word and timing totals, with the average time per processed file"""
+        # Calculate average processing time
+        avg_processing_time = 45.0  # Default
+        if self.processed_count > 0 and self.processing_stats.get("total_processing_time", 0) > 0:
+            avg_processing_time = self.processing_stats["total_processing_time"] / self.processed_count
+        elif self.processing_stats.get("average_processing_time", 0) > 0:
+            avg_processing_time = self.processing_stats["average_processing_time"]
+        return {
+            "total_pages": int(self.processing_stats.get("total_pages", 0)),
+            "total_words": int(self.processing_stats.get("total_words", 0)),
+            "total_characters": int(self.processing_stats.get("total_characters", 0)),
+            "total_processing_time": float(self.processing_stats.get("total_processing_time", 0)),
+            "average_processing_time": float(avg_processing_time)
+        }
+
+    def get_progress_dict(self) -> Dict[str, Any]:
+        """Get a compact progress summary for push updates, without results, errors or logs"""
+        if isinstance(self.current_file, dict):
+            current_file_name = self.current_file.get('name')
+        else:
+            current_file_name = self.current_file
+        estimated_time = self.get_estimated_time_remaining()
+        return {
+            "status": self.status,
+            "is_paused": self.is_paused,
+            "is_deprioritized": self.is_deprioritized,
+            "priority": self.priority,
+            "total_files": self.total_files,
+            "processed_count": self.processed_count,
+            "failed_count": self.failed_count,
+            "skipped_count": self.skipped_count,
+            "remaining_files": self.total_files - self.processed_count - self.failed_count - self.skipped_count,
+            "current_file_index": self.current_file_index,
+            "current_file": current_file_name,
+            "progress_percentage": round(self.get_progress_percentage(), 1),
+            "estimated_time_remaining": round(estimated_time) if estimated_time is not None else 0,
+            "start_time": self.start_time,
+            "processing_stats": self.get_processing_stats_dict(),
+            "results_count": len(self.results),
+            "errors_count": len(self.errors),
+            # The log is a ring buffer, so its length stops changing; the last timestamp does not
+            "logs_count": len(self.logs),
+            "last_log_at": self.logs[-1]["timestamp"] if self.logs else None,
+        }
+
+    def publish_progress(self):
+        """Push the current progress to subscribers of the batch event streams"""
+        try:
+            progress_broker.publish(self.batch_id, self.get_progress_dict())
+        except Exception as e:
+            logger.warning(f"[{self.batch_id}] Could not publish progress: {e}")
 
     def _load_existing_statistics(self):
         """Load existing statistics from database for already processed files"""
@@ -190,7 +259,7 @@ class BatchProcessor:
     def get_estimated_time_remaining(self) -> Optional[float]:
         """Calculate estimated time remaining in seconds"""
         if not self.start_time:
-            logger.warning(f"[{self.batch_id}] get_estimated_time_remaining: No start_time")
+            logger.debug(f"[{self.batch_id}] get_estimated_time_remaining: No start_time")
             return 0.0  # Return 0 instead of None
         
         elapsed_time = time.time() - self.start_time
@@ -198,11 +267,11 @@ class BatchProcessor:
         completed_files = self.processed_count + self.failed_count
         remaining_files = self.total_files - self.processed_count - self.failed_count - self.skipped_count
         
-        logger.info(f"[{self.batch_id}] get_estimated_time_remaining: elapsed={elapsed_time:.1f}s, completed={completed_files}, remaining={remaining_files}")
+        logger.debug(f"[{self.batch_id}] get_estimated_time_remaining: elapsed={elapsed_time:.1f}s, completed={completed_files}, remaining={remaining_files}")
         
         # If no files remaining, return 0
         if remaining_files <= 0:
-            logger.info(f"[{self.batch_id}] get_estimated_time_remaining: No remaining files, returning 0")
+            logger.debug(f"[{self.batch_id}] get_estimated_time_remaining: No remaining files, returning 0")
             return 0.0
         
         # If no files completed yet, provide initial estimates
@@ -210,7 +279,7 @@ class BatchProcessor:
             # If we have stored average processing time from previous runs, use it
             if self.processing_stats.get("average_processing_time", 0) > 0:
                 result = remaining_files * self.processing_stats["average_processing_time"]
-                logger.info(f"[{self.batch_id}] get_estimated_time_remaining: Using stored avg_time={self.processing_stats['average_processing_time']:.1f}s, result={result:.1f}s")
+                logger.debug(f"[{self.batch_id}] get_estimated_time_remaining: Using stored avg_time={self.processing_stats['average_processing_time']:.1f}s, result={result:.1f}s")
                 return float(result)
             
             # Provide a reasonable initial estimate based on file type and size
@@ -223,22 +292,22 @@ class BatchProcessor:
                 # Assume current file will take the elapsed time, others take baseline
                 if remaining_files > 1:
                     result = elapsed_time + (remaining_files - 1) * estimated_time_per_file
-                    logger.info(f"[{self.batch_id}] get_estimated_time_remaining: Long processing, result={result:.1f}s")
+                    logger.debug(f"[{self.batch_id}] get_estimated_time_remaining: Long processing, result={result:.1f}s")
                     return float(result)
                 else:
                     result = elapsed_time * 0.5  # Assume we're halfway through current file
-                    logger.info(f"[{self.batch_id}] get_estimated_time_remaining: Single file halfway, result={result:.1f}s")
+                    logger.debug(f"[{self.batch_id}] get_estimated_time_remaining: Single file halfway, result={result:.1f}s")
                     return float(result)
             
             result = remaining_files * estimated_time_per_file
-            logger.info(f"[{self.batch_id}] get_estimated_time_remaining: Initial estimate, result={result:.1f}s")
+            logger.debug(f"[{self.batch_id}] get_estimated_time_remaining: Initial estimate, result={result:.1f}s")
             return float(result)
             
         # Calculate based on actual performance
         if completed_files > 0:
             average_time_per_file = elapsed_time / completed_files
             result = remaining_files * average_time_per_file
-            logger.info(f"[{self.batch_id}] get_estimated_time_remaining: Calculated avg_time={average_time_per_file:.1f}s, result={result:.1f}s")
+            logger.debug(f"[{self.batch_id}] get_estimated_time_remaining: Calculated avg_time={average_time_per_file:.1f}s, result={result:.1f}s")
             return float(result)
         
         # Fallback
@@ -251,21 +320,13 @@ class BatchProcessor:
         
         estimated_time = self.get_estimated_time_remaining()
         
-        # Ensure logs is always a list
-        logs_list = self.logs if isinstance(self.logs, list) else []
-        
-        # Calculate average processing time
-        avg_processing_time = 45.0  # Default
-        if self.processed_count > 0 and self.processing_stats.get("total_processing_time", 0) > 0:
-            avg_processing_time = self.processing_stats["total_processing_time"] / self.processed_count
-        elif self.processing_stats.get("average_processing_time", 0) > 0:
-            avg_processing_time = self.processing_stats["average_processing_time"]
+        logs_list = list(self.logs)
         
         # When reprocessing files, we want to keep the original total_files count
         # to avoid showing more files than are actually being processed
         total_processed = self.processed_count + self.failed_count + self.skipped_count
         if total_processed > self.total_files:
-            logger.info(f"[{self.batch_id}] get_status_dict: Processed count ({total_processed}) exceeds total_files ({self.total_files}), but keeping original count to avoid double-counting")
+            logger.debug(f"[{self.batch_id}] get_status_dict: Processed count ({total_processed}) exceeds total_files ({self.total_files}), but keeping original count to avoid double-counting")
             
         status_dict = {
             "batch_id": self.batch_id,
@@ -273,6 +334,7 @@ class BatchProcessor:
             "is_paused": self.is_paused,
             "is_deprioritized": self.is_deprioritized,
             "cpu_throttle_level": self.cpu_throttle_level,
+            "priority": self.priority,
             "total_files": self.total_files,
             "processed_count": self.processed_count,
             "failed_count": self.failed_count,
@@ -283,16 +345,14 @@ class BatchProcessor:
             "progress_percentage": self.get_progress_percentage(),
             "estimated_time_remaining": float(estimated_time) if estimated_time is not None else 0.0,
             "start_time": self.start_time,
-            "processing_stats": {
-                "total_pages": int(self.processing_stats.get("total_pages", 0)),
-                "total_words": int(self.processing_stats.get("total_words", 0)),
-                "total_characters": int(self.processing_stats.get("total_characters", 0)),
-                "total_processing_time": float(self.processing_stats.get("total_processing_time", 0)),
-                "average_processing_time": float(avg_processing_time)
-            },
-            "results": self.results if isinstance(self.results, list) else [],
-            "errors": self.errors if isinstance(self.errors, list) else [],
-            "logs": logs_list[-50] if len(logs_list) > 50 else logs_list  # Last 50 logs
+            "processing_stats": self.get_processing_stats_dict(),
+            # Only the most recent items, so the payload size does not grow with the batch;
+            # full lists are available from /batch/items
+            "results": self.results.recent(),
+            "errors": self.errors.recent(),
+            "results_count": len(self.results),
+            "errors_count": len(self.errors),
+            "logs": logs_list[-BATCH_RECENT_ITEMS:]  # Last 50 logs
         }
         
         # Enhanced debug logging
@@ -307,15 +367,15 @@ class BatchProcessor:
             current_file_name = 'None'
             
         # Debug the current_file type and content
-        logger.info(f"[{self.batch_id}] DEBUG current_file type: {type(self.current_file)}, content: {self.current_file}")
+        logger.debug(f"[{self.batch_id}] DEBUG current_file type: {type(self.current_file)}, content: {self.current_file}")
             
-        logger.info(f"[{self.batch_id}] get_status_dict: status={self.status}, processed={self.processed_count}/{self.total_files}, "
-                   f"estimated_time={estimated_time}, avg_time={avg_processing_time:.1f}, "
+        logger.debug(f"[{self.batch_id}] get_status_dict: status={self.status}, processed={self.processed_count}/{self.total_files}, "
+                   f"estimated_time={estimated_time}, avg_time={status_dict['processing_stats']['average_processing_time']:.1f}, "
                    f"logs_count={len(logs_list)}, current_file={current_file_name}")
-        logger.info(f"[{self.batch_id}] TRACKING DEBUG: total_files={self.total_files}, processed_count={self.processed_count}, "
+        logger.debug(f"[{self.batch_id}] TRACKING DEBUG: total_files={self.total_files}, processed_count={self.processed_count}, "
                    f"failed_count={self.failed_count}, skipped_count={self.skipped_count}, "
                    f"total={self.processed_count + self.failed_count + self.skipped_count}")
-        logger.info(f"[{self.batch_id}] get_status_dict: stats - pages={self.processing_stats.get('total_pages', 0)}, "
+        logger.debug(f"[{self.batch_id}] get_status_dict: stats - pages={self.processing_stats.get('total_pages', 0)}, "
                    f"words={self.processing_stats.get('total_words', 0)}, chars={self.processing_stats.get('total_characters', 0)}")
         
         return status_dict
@@ -335,9 +395,6 @@ class BatchProcessor:
                     "status": "cancelled"
                 }
             
-            # Yield control before starting file processing
-            await asyncio.sleep(0.1)
-            
             # Log memory usage before processing file
             try:
                 import psutil
@@ -407,9 +464,6 @@ class BatchProcessor:
             
             # Download file from SharePoint if needed
             if 'drive_id' in file_info and 'item_id' in file_info:
-                # Yield control before downloading
-                await asyncio.sleep(0.01)
-                
                 # This is a SharePoint file - download directly using SharePoint API
                 file_content = await self.download_sharepoint_file_direct(
                     file_info['drive_id'],
@@ -419,9 +473,6 @@ class BatchProcessor:
                 if file_content is None:
                     raise Exception(f"Failed to download file from SharePoint: {file_info['name']}")
                 
-                # Yield control after download, before processing
-                await asyncio.sleep(0.01)
-                
                 # Convert to base64
                 import base64
                 file_data_base64 = base64.b64encode(file_content).decode('utf-8')
@@ -433,11 +484,9 @@ class BatchProcessor:
                     settings=self.settings
                 )
                 
-                # Yield control before OCR processing (most CPU intensive part)
-                await asyncio.sleep(0.01)
-                
                 # Process with OCR
-                result = await pdf_ocr_process(request, file_info.get('item_id'))
+                result = await pdf_ocr_process(request, file_info.get('item_id'), self.priority, self.tenant, self.scheduler_weight,
+                                               scheduling=self.scheduling)
                 
             else:
                 # This is an uploaded file (base64 data should be in file_info)
@@ -447,10 +496,8 @@ class BatchProcessor:
                     settings=self.settings
                 )
                 
-                # Yield control before OCR processing
-                await asyncio.sleep(0.01)
-                
-                result = await pdf_ocr_process(request, file_info.get('file_id'))
+                result = await pdf_ocr_process(request, file_info.get('file_id'), self.priority, self.tenant, self.scheduler_weight,
+                                               scheduling=self.scheduling)
             
             processing_time = time.time() - file_start_time
             
@@ -562,9 +609,6 @@ class BatchProcessor:
         
         # Download file from SharePoint if needed
         if 'drive_id' in file_info and 'item_id' in file_info:
-            # Yield control before downloading
-            await asyncio.sleep(0.1)
-            
             # This is a SharePoint file - download directly using SharePoint API
             file_content = await self.download_sharepoint_file_direct(
                 file_info['drive_id'],
@@ -574,9 +618,6 @@ class BatchProcessor:
             if file_content is None:
                 raise Exception(f"Failed to download file from SharePoint: {file_info['name']}")
             
-            # Yield control after download, before processing
-            await asyncio.sleep(0.1)
-            
             # Convert to base64
             import base64
             file_data_base64 = base64.b64encode(file_content).decode('utf-8')
@@ -588,11 +629,9 @@ class BatchProcessor:
                 settings=self.settings
             )
             
-            # Yield control before OCR processing (most CPU intensive part)
-            await asyncio.sleep(0.1)
-            
             # Process with OCR
-            result = await pdf_ocr_process(request, file_info.get('item_id'))
+            result = await pdf_ocr_process(request, file_info.get('item_id'), self.priority, self.tenant, self.scheduler_weight,
+                                           scheduling=self.scheduling)
             
         else:
             # This is an uploaded file (base64 data should be in file_info)
@@ -602,10 +641,8 @@ class BatchProcessor:
                 settings=self.settings
             )
             
-            # Yield control before OCR processing
-            await asyncio.sleep(0.1)
-            
-            result = await pdf_ocr_process(request, file_info.get('file_id'))
+            result = await pdf_ocr_process(request, file_info.get('file_id'), self.priority, self.tenant, self.scheduler_weight,
+                                           scheduling=self.scheduling)
         
         processing_time = time.time() - file_start_time
         
@@ -695,38 +732,6 @@ class BatchProcessor:
                         self.add_log("Processing stopped by user", "warning")
                         break
                     
-                    # Apply CPU throttling if deprioritized
-                    if self.is_deprioritized:
-                        # Apply process priority reduction
-                        try:
-                            import psutil
-                            process = psutil.Process()
-                            
-                            # Set process priority to below normal
-                            if hasattr(psutil, 'BELOW_NORMAL_PRIORITY_CLASS'):
-                                process.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
-                            else:
-                                # On Unix systems
-                                process.nice(10)  # Higher nice value = lower priority
-                                
-                            # Apply CPU affinity if throttle level is high
-                            if self.cpu_throttle_level >= 2 and hasattr(process, 'cpu_affinity'):
-                                # Get available CPUs
-                                all_cpus = process.cpu_affinity()
-                                if len(all_cpus) > 1:
-                                    # Use only half of available CPUs (or at least 1)
-                                    limited_cpus = all_cpus[:max(1, len(all_cpus) // 2)]
-                                    process.cpu_affinity(limited_cpus)
-                                    self.add_log(f"Limited CPU affinity to {len(limited_cpus)} cores", "info")
-                                    
-                            self.add_log("Applied CPU deprioritization", "info")
-                        except Exception as e:
-                            logger.warning(f"Failed to set process priority: {e}")
-                            
-                        # Add additional sleep based on throttle level
-                        throttle_sleep = 0.5 * (self.cpu_throttle_level + 1)
-                        await asyncio.sleep(throttle_sleep)
-                    
                     # Update current file tracking BEFORE processing
                     self.current_file_index = i
                     self.current_file = file_info
@@ -737,28 +742,9 @@ class BatchProcessor:
                     # Keep current file info until next file starts
                     # Don't clear current_file here to maintain tracking
                     
-                    # Yield control to allow other requests to be processed
-                    # This prevents the backend from becoming non-responsive
-                    base_sleep = 0.5  # Base sleep time
-                    
-                    # Adjust sleep time based on throttle level
-                    if self.is_deprioritized:
-                        sleep_time = base_sleep * (self.cpu_throttle_level + 1)
-                    else:
-                        sleep_time = base_sleep
-                        
-                    await asyncio.sleep(sleep_time)
-                    
-                    # Every 3 files, yield for a longer period to ensure responsiveness
+                    # No sleeps between files: pages are paced by the OCR scheduler,
+                    # whose batch limit the resource governor adjusts to the load
                     if (i + 1) % 3 == 0:
-                        logger.info(f"[{self.batch_id}] Processed {i + 1} files, yielding control for responsiveness")
-                        
-                        # Longer yield every 3 files, adjusted for throttle level
-                        if self.is_deprioritized:
-                            await asyncio.sleep(1.0 * (self.cpu_throttle_level + 1))
-                        else:
-                            await asyncio.sleep(1.0)
-                        
                         # Add memory usage logging
                         try:
                             import psutil
@@ -782,6 +768,9 @@ class BatchProcessor:
         finally:
             # Only clear current_file when batch is completely finished
             self.current_file = None
+            self.results.close()
+            self.errors.close()
+            self.publish_progress()
 
     def pause(self):
         """Pause the processing"""
@@ -794,60 +783,38 @@ class BatchProcessor:
         self.add_log("Processing resumed", "info")
 
     def deprioritize(self, level=1):
-        """Deprioritize the processing to reduce CPU usage"""
+        """
+        Deprioritize the processing so other work gets the OCR slots first.
+
+        The batch moves to the bulk class and its share within that class drops
+        with the level. It yields at the next page boundary, including in the file
+        being processed; the process priority is left alone so interactive
+        requests in the same process are not slowed.
+        """
         self.is_deprioritized = True
         self.cpu_throttle_level = min(2, max(0, level))  # Ensure level is between 0-2
+        self.priority = BULK
+        self.scheduler_weight = DEPRIORITIZED_WEIGHTS[self.cpu_throttle_level]
         
         level_names = {0: "light", 1: "medium", 2: "heavy"}
         level_name = level_names.get(self.cpu_throttle_level, "custom")
         
         self.add_log(f"Processing deprioritized ({level_name} throttling)", "info")
-        
-        # Try to immediately reduce process priority
-        try:
-            import psutil
-            process = psutil.Process()
-            
-            # Set process priority to below normal
-            if hasattr(psutil, 'BELOW_NORMAL_PRIORITY_CLASS'):
-                process.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
-            else:
-                # On Unix systems
-                process.nice(10)  # Higher nice value = lower priority
-                
-            logger.info(f"[{self.batch_id}] Process priority reduced")
-        except Exception as e:
-            logger.warning(f"Failed to set process priority: {e}")
-            
+        logger.info(f"[{self.batch_id}] Scheduler priority set to {self.priority} with weight {self.scheduler_weight}")
         return self.get_status_dict()
     
+    def scheduling(self) -> Tuple[str, float]:
+        """Current scheduler priority class and weight, read by the OCR before every page."""
+        return self.priority, self.scheduler_weight
+
     def restore_priority(self):
         """Restore normal processing priority"""
         self.is_deprioritized = False
         self.cpu_throttle_level = 0
+        self.priority = self.base_priority
+        self.scheduler_weight = 1.0
         
-        # Try to restore process priority
-        try:
-            import psutil
-            process = psutil.Process()
-            
-            # Set process priority back to normal
-            if hasattr(psutil, 'NORMAL_PRIORITY_CLASS'):
-                process.nice(psutil.NORMAL_PRIORITY_CLASS)
-            else:
-                # On Unix systems
-                process.nice(0)  # Normal priority
-                
-            # Restore CPU affinity if it was limited
-            if hasattr(process, 'cpu_affinity'):
-                # Reset to all CPUs
-                all_cpus = list(range(psutil.cpu_count()))
-                process.cpu_affinity(all_cpus)
-                
-            logger.info(f"[{self.batch_id}] Process priority restored")
-        except Exception as e:
-            logger.warning(f"Failed to restore process priority: {e}")
-            
+        logger.info(f"[{self.batch_id}] Scheduler priority restored to {self.priority}")
         self.add_log("Processing priority restored to normal", "info")
         return self.get_status_dict()
     
@@ -933,7 +900,8 @@ async def start_folder_batch_processing(
             raise HTTPException(status_code=404, detail="No PDF files found in the specified folder")
         
         # Create batch processor
-        processor = BatchProcessor(batch_id, pdf_files, settings)
+        # Whole-folder runs are backfills; they yield to per-file batches
+        processor = BatchProcessor(batch_id, pdf_files, settings, default_priority=BULK)
         batch_processing_status[batch_id] = processor
         
         # Start processing in persistent task queue instead of background tasks
@@ -960,7 +928,7 @@ def get_batch_status(batch_id: str) -> Dict[str, Any]:
         status_dict = processor.get_status_dict()
         
         # Add diagnostic logging
-        print(f"DIAGNOSTIC: get_batch_status for {batch_id} returning status: {status_dict['status']}")
+        logger.debug(f"DIAGNOSTIC: get_batch_status for {batch_id} returning status: {status_dict['status']}")
         
         return status_dict
     except HTTPException:
@@ -971,6 +939,56 @@ def get_batch_status(batch_id: str) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"Error getting batch status: {str(e)}")
 
 
+# Lists that can be fetched page by page instead of through the full status
+BATCH_ITEM_KINDS = ("results", "errors", "logs")
+
+
+def get_batch_items(batch_id: str, kind: str = "results", offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+    """
+    Get one page of a batch's results, errors or logs.
+    
+    Args:
+        batch_id: The batch ID
+        kind: "results", "errors" or "logs"
+        offset: Index of the first item to return
+        limit: Maximum number of items to return
+    """
+    if kind not in BATCH_ITEM_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(BATCH_ITEM_KINDS)}")
+    if batch_id not in batch_processing_status:
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+    
+    items = getattr(batch_processing_status[batch_id], kind)
+    if kind == "logs":
+        # Logs are a ring buffer; only the retained entries can be paged
+        retained = list(items)
+        page = retained[offset:offset + limit]
+    else:
+        page = items.page(offset, limit)
+    return {
+        "batch_id": batch_id,
+        "kind": kind,
+        "total": len(items),
+        "offset": offset,
+        "limit": limit,
+        "items": page
+    }
+
+
+def publish_batch_progress(batch_id: Optional[str] = None):
+    """
+    Publish the current progress of one batch, or of all batches, so that a
+    new event stream subscriber starts from an up-to-date snapshot.
+    """
+    if batch_id is not None:
+        if batch_id not in batch_processing_status:
+            raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+        batch_processing_status[batch_id].publish_progress()
+        return
+    for processor in list(batch_processing_status.values()):
+        processor.publish_progress()
+
+
 def pause_batch_processing(batch_id: str) -> Dict[str, Any]:
     """Pause a batch processing job"""
     if batch_id not in batch_processing_status:
@@ -1040,16 +1058,13 @@ def list_batch_jobs() -> Dict[str, Any]:
     """List all batch processing jobs"""
     try:
         # DIAGNOSTIC: Log the current state of batch_processing_status
-        logger.info(f"DIAGNOSTIC: list_batch_jobs called. batch_processing_status has {len(batch_processing_status)} items")
+        logger.debug(f"DIAGNOSTIC: list_batch_jobs called. batch_processing_status has {len(batch_processing_status)} items")
         for batch_id, processor in batch_processing_status.items():
-            logger.info(f"DIAGNOSTIC: Batch {batch_id} - Status: {processor.status}, Current file: {processor.current_file}")
+            logger.debug(f"DIAGNOSTIC: Batch {batch_id} - Status: {processor.status}, Current file: {processor.current_file}")
         
         jobs = {}
         for batch_id, processor in batch_processing_status.items():
             try:
-                # Get the full status dict which includes current_file and other missing fields
-                full_status = processor.get_status_dict()
-                
                 jobs[batch_id] = {
                     "batch_id": batch_id,
                     "status": processor.status,
@@ -1063,11 +1078,11 @@ def list_batch_jobs() -> Dict[str, Any]:
                     "current_file": processor.current_file,
                     "current_file_index": processor.current_file_index,
                     "is_paused": processor.is_paused,
-                    "remaining_files": full_status.get("remaining_files", 0)
+                    "remaining_files": processor.total_files - processor.processed_count - processor.failed_count - processor.skipped_count
                 }
                 
                 # DIAGNOSTIC: Log what we're returning for each job
-                logger.info(f"DIAGNOSTIC: Returning job {batch_id} with current_file: {jobs[batch_id]['current_file']}")
+                logger.debug(f"DIAGNOSTIC: Returning job {batch_id} with current_file: {jobs[batch_id]['current_file']}")
             except Exception as e:
                 logger.error(f"Error processing batch {batch_id} in list_batch_jobs: {e}")
                 # Include basic info even if full status fails
@@ -1086,7 +1101,7 @@ def list_batch_jobs() -> Dict[str, Any]:
                     "remaining_files": 0
                 }
         
-        logger.info(f"DIAGNOSTIC: Returning {len(jobs)} jobs to frontend")
+        logger.debug(f"DIAGNOSTIC: Returning {len(jobs)} jobs to frontend")
         return {"jobs": jobs}
     except Exception as e:
         logger.error(f"Error in list_batch_jobs: {e}")
@@ -1103,5 +1118,8 @@ def cleanup_completed_jobs():
                 completed_jobs.append(batch_id)
     
     for batch_id in completed_jobs:
-        del batch_processing_status[batch_id]
+        processor = batch_processing_status.pop(batch_id)
+        processor.results.delete()
+        processor.errors.delete()
+        progress_broker.remove(batch_id)
         logger.info(f"Cleaned up completed batch job: {batch_id}")
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+Durable, bounded-memory storage for batch results and errors.
+
+A batch may process hundreds of thousands of files. Keeping one result dict per
+file in memory, and serializing all of them into every status response, makes
+memory and payload size grow with the batch. Items are appended to a JSON Lines
+file per batch instead; only a count and the most recent items stay in memory.
+Full lists are read back page by page.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import deque
+from itertools import islice
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Where batch results and errors are spilled
+BATCH_SPILL_DIR = os.getenv('BATCH_SPILL_DIR', os.path.join(tempfile.gettempdir(), 'ocr_batches'))
+# Most recent items kept in memory per list, and returned in status payloads
+BATCH_RECENT_ITEMS = int(os.getenv('BATCH_RECENT_ITEMS', '50'))
+# Log entries kept in memory per batch
+BATCH_LOG_CAPACITY = int(os.getenv('BATCH_LOG_CAPACITY', '500'))
+
+
+class SpilledItemList:
+    """
+    Append-only list of JSON-serializable items backed by a JSON Lines file.
+
+    len() is the total number of items appended; recent() returns the newest
+    items from memory and page() reads any range back from the file. If the
+    file cannot be written, items are kept only in the recent window.
+    """
+
+    def __init__(self, batch_id: str, kind: str, spill_dir: str = BATCH_SPILL_DIR,
+                 recent_items: int = BATCH_RECENT_ITEMS):
+        safe_batch_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in batch_id)
+        self.path = os.path.join(spill_dir, f"{safe_batch_id}.{kind}.jsonl")
+        self._recent = deque(maxlen=max(1, recent_items))
+        self._lock = threading.Lock()
+        self._count = 0
+        # False once any item could not be written; page() then serves only recent items
+        self._spill_ok = False
+        self._file = None
+        try:
+            os.makedirs(spill_dir, exist_ok=True)
+            # A batch ID is reused when a batch is restarted; start from an empty list
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._spill_ok = True
+        except OSError as e:
+            logger.warning(f"Could not open batch spill file {self.path}, keeping only recent items: {e}")
+
+    def append(self, item: Dict[str, Any]):
+        """Append an item, writing it to the spill file."""
+        with self._lock:
+            self._recent.append(item)
+            self._count += 1
+            if not self._spill_ok:
+                return
+            try:
+                if self._file is None:
+                    self._file = open(self.path, 'a', encoding='utf-8')
+                self._file.write(json.dumps(item, default=str) + '\n')
+                self._file.flush()
+            except (OSError, TypeError, ValueError) as e:
+                self._spill_ok = False
+                logger.warning(f"Could not spill batch item to {self.path}, keeping only recent items: {e}")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self):
+        # Iterating yields the in-memory window; use page() for the full list
+        return iter(self.recent())
+
+    def recent(self, limit: int = None) -> List[Dict[str, Any]]:
+        """The newest items, oldest first."""
+        with self._lock:
+            items = list(self._recent)
+        return items[-limit:] if limit else items
+
+    def page(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        Read items [offset, offset + limit) in append order.
+
+        Args:
+            offset: Index of the first item
+            limit: Maximum number of items
+        """
+        with self._lock:
+            spill_ok = self._spill_ok
+            count = self._count
+            recent = list(self._recent)
+        if not spill_ok:
+            # Only the recent window is available
+            first = count - len(recent)
+            start = max(0, offset - first)
+            return recent[start:max(start, offset + limit - first)]
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in islice(f, offset, min(offset + limit, count))]
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading batch spill file {self.path}: {e}")
+            return []
+
+    def close(self):
+        """Close the spill file; the items stay readable."""
+        with self._lock:
+            if self._file is not None:
+                try:
+                    self._file.close()
+                except OSError:
+                    pass
+                self._file = None
+
+    def delete(self):
+        """Close and remove the spill file."""
+        self.close()
+        with self._lock:
+            self._spill_ok = False
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
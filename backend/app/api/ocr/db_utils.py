@@ -1,42 +1,27 @@
 import os
 import logging
-import datetime
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy import create_engine
-from app.models import OcrResult, Base, Setting
+from app.utils.db_config import DATABASE_URL, SessionLocal
+from app.utils.settings_cache import settings_snapshot
 
 logger = logging.getLogger(__name__)
 
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///ocr.db')
-
 if DATABASE_URL.startswith('sqlite:///'):
     db_path = DATABASE_URL.replace('sqlite:///', '')
     abs_db_path = os.path.abspath(db_path)
     print(f'Using SQLite database at: {abs_db_path}')
     logger.warning(f'Using SQLite database at: {abs_db_path}')
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
 def get_db_session():
     """Get a database session."""
     return SessionLocal()
 
 def get_setting_value(key: str, default_value: str = None, category: str = None) -> str:
     """
-    Get a setting value from the database.
+    Get a setting value from the in-memory settings snapshot.
+    The snapshot is refreshed when settings are written through /api/settings.
     """
     try:
-        db = SessionLocal()
-        query = db.query(Setting).filter(Setting.key == key)
-        if category:
-            query = query.filter(Setting.category == category)
-        setting = query.first()
-        db.close()
-        
-        if setting and setting.value:
-            return setting.value
-        return default_value
+        return settings_snapshot.get(key, default_value, category)
     except Exception as e:
         logger.error(f"Error getting setting {key}: {e}")
         return default_value
\ No newline at end of file
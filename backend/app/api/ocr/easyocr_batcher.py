@@ -0,0 +1,262 @@
+"""
+Micro-batched EasyOCR inference with warm readers.
+
+Loading an EasyOCR reader takes seconds and one readtext() call per page leaves
+the GPU idle while pages are rendered and post-processed. Pages from all
+concurrent documents are submitted here instead. A worker per language and
+device preference collects them for up to EASYOCR_MAX_BATCH_WAIT_MS or
+EASYOCR_MAX_BATCH_IMAGES images and recognizes them with one
+readtext_batched() call on a cached reader. On GPU the batch is capped by the
+free memory reported by get_gpu_info(); on CPU the same batching amortizes the
+per-call overhead. With automatic GPU selection a queue has one worker per
+usable device, so batches run on every GPU at once; the device scheduler
+places each batch on the least-loaded one.
+
+Interactive pages are taken before normal and bulk pages waiting in the same
+queue.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.gpu_utils import configure_easyocr_gpu_with_selection, device_scheduler, get_gpu_info, release_gpu
+from .scheduler import INTERACTIVE, NORMAL, BULK
+
+logger = logging.getLogger(__name__)
+
+# Largest number of pages recognized in one call
+EASYOCR_MAX_BATCH_IMAGES = int(os.getenv('EASYOCR_MAX_BATCH_IMAGES', '8'))
+# How long the first page of a batch waits for others to join
+EASYOCR_MAX_BATCH_WAIT_MS = float(os.getenv('EASYOCR_MAX_BATCH_WAIT_MS', '25'))
+# Text crops per recognizer forward pass
+EASYOCR_RECOGNIZER_BATCH_SIZE = int(os.getenv('EASYOCR_RECOGNIZER_BATCH_SIZE', '16'))
+# Rough GPU memory the detector needs per megapixel of page, used to size batches
+EASYOCR_MB_PER_MEGAPIXEL = float(os.getenv('EASYOCR_MB_PER_MEGAPIXEL', '350'))
+# Pages of one document that may wait for OCR while its next pages are rendered
+EASYOCR_MAX_PENDING_PAGES = int(os.getenv('EASYOCR_MAX_PENDING_PAGES', '4'))
+
+# The detector resizes pages so the longer side is at most this (EasyOCR default)
+DETECTOR_CANVAS_SIZE = 2560
+# Share of the free GPU memory a batch may plan to use
+GPU_MEMORY_HEADROOM = 0.8
+
+_PRIORITY_ORDER = {INTERACTIVE: 0, NORMAL: 1, BULK: 2}
+
+
+class _Request:
+    __slots__ = ('image', 'priority', 'future', 'enqueued_at')
+
+    def __init__(self, image, priority: str):
+        self.image = image
+        self.priority = priority
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+def _lines_and_confidence(output, detail: int) -> Tuple[List[str], Optional[float]]:
+    """Lines of one readtext() result and their confidence weighted by length."""
+    if not detail:
+        return list(output), None
+    lines = [text for _, text, _ in output]
+    chars = sum(len(text) for text in lines)
+    if not chars:
+        return lines, None
+    return lines, float(sum(len(text) * confidence for _, text, confidence in output)) / chars
+
+
+class EasyOcrBatcher:
+    """Collects page images from concurrent callers and recognizes them in batches."""
+
+    def __init__(self, max_batch_images: int = EASYOCR_MAX_BATCH_IMAGES,
+                 max_wait_ms: float = EASYOCR_MAX_BATCH_WAIT_MS):
+        self.max_batch_images = max(1, max_batch_images)
+        self.max_wait = max_wait_ms / 1000
+        self._cond = threading.Condition()
+        # (language, use_gpu, preferred_gpu, paragraph) -> waiting requests
+        self._queues: Dict[Tuple, List[_Request]] = {}
+        # Worker threads per queue; automatic GPU selection gets one per usable device
+        self._workers: Dict[Tuple, List[threading.Thread]] = {}
+        # (language, device) -> (reader, lock)
+        self._readers: Dict[Tuple[str, str], Tuple[object, threading.Lock]] = {}
+        self._readers_lock = threading.Lock()
+        self.calls = 0
+        self.images = 0
+        self._batch_sizes = deque(maxlen=200)
+
+    def get_reader(self, language: str, gpu_id: Optional[int] = None):
+        """
+        Get a warm EasyOCR reader, loading it on first use.
+
+        Args:
+            language: EasyOCR language code
+            gpu_id: CUDA device, or None for CPU
+
+        Returns:
+            Tuple of (reader, lock); hold the lock while using the reader
+        """
+        device = device_scheduler.backend.torch_device(gpu_id) if gpu_id is not None else "cpu"
+        key = (language, device)
+        with self._readers_lock:
+            entry = self._readers.get(key)
+            if entry is None:
+                # Imported on first use so the application starts without loading the OCR engines
+                import easyocr
+                start = time.time()
+                reader = easyocr.Reader([language], gpu=device if device != "cpu" else False)
+                entry = (reader, threading.Lock())
+                self._readers[key] = entry
+                logger.info(f"Loaded EasyOCR reader for {language} on {device} in {time.time() - start:.1f}s")
+        return entry
+
+    def submit(self, image, language: str, use_gpu: bool = True, preferred_gpu: Optional[int] = None,
+               priority: str = NORMAL, paragraph: bool = False) -> Future:
+        """
+        Queue a page image for recognition.
+
+        Args:
+            image: Page as a numpy array (RGB or grayscale)
+            language: EasyOCR language code
+            use_gpu: Whether GPU acceleration may be used
+            preferred_gpu: Preferred GPU ID, or None for automatic selection
+            priority: Scheduler priority class of the caller
+            paragraph: Whether EasyOCR should merge lines into paragraphs
+
+        Returns:
+            Future resolving to (lines, confidence, gpu_enabled, gpu_id); confidence
+            is the mean over the recognized characters (0-1), or None in paragraph
+            mode or when nothing was recognized
+        """
+        request = _Request(image, priority)
+        key = (language, bool(use_gpu), preferred_gpu if use_gpu else None, bool(paragraph))
+        with self._cond:
+            self._queues.setdefault(key, []).append(request)
+            if key not in self._workers:
+                workers = self._workers[key] = []
+                for index in range(self._worker_count(key)):
+                    worker = threading.Thread(target=self._run_worker, args=(key,), daemon=True,
+                                              name=f"easyocr_batcher_{language}_{index}")
+                    workers.append(worker)
+                    worker.start()
+            self._cond.notify_all()
+        return request.future
+
+    def recognize(self, image, language: str, use_gpu: bool = True, preferred_gpu: Optional[int] = None,
+                  priority: str = NORMAL, paragraph: bool = False) -> Tuple[List[str], Optional[float], bool, Optional[int]]:
+        """Recognize one page image and wait for the result. See submit()."""
+        return self.submit(image, language, use_gpu, preferred_gpu, priority, paragraph).result()
+
+    @staticmethod
+    def _worker_count(key) -> int:
+        """Batches of a queue recognized at once: one per device the scheduler may place them on."""
+        _, use_gpu, preferred_gpu, _ = key
+        if not use_gpu or preferred_gpu is not None:
+            return 1
+        return max(1, len(device_scheduler.device_ids()))
+
+    @staticmethod
+    def _page_mb(shape) -> float:
+        """Estimated GPU memory for detecting text on one page."""
+        height, width = shape[:2]
+        scale = min(1.0, DETECTOR_CANVAS_SIZE / max(height, width, 1))
+        return max(1.0, height * width * scale * scale / 1e6 * EASYOCR_MB_PER_MEGAPIXEL)
+
+    def _max_images(self, use_gpu: bool, preferred_gpu: Optional[int], shape) -> int:
+        """Pages per call that fit into free GPU memory, or the configured maximum on CPU."""
+        if not use_gpu:
+            return self.max_batch_images
+        gpu_info = get_gpu_info()
+        devices = gpu_info.get("devices", [])
+        if not gpu_info.get("is_available") or not devices:
+            return self.max_batch_images
+        if preferred_gpu is not None and preferred_gpu < len(devices):
+            free_mb = devices[preferred_gpu]["memory"]["free"]
+        else:
+            free_mb = max(device["memory"]["free"] for device in devices)
+        return max(1, min(self.max_batch_images, int(free_mb * GPU_MEMORY_HEADROOM / self._page_mb(shape))))
+
+    def _take_batch(self, key) -> List[_Request]:
+        """Wait for a batch to fill or time out, then take it. Caller holds the lock."""
+        while True:
+            queue = self._queues.get(key)
+            if not queue:
+                self._cond.wait()
+                continue
+            oldest = min(request.enqueued_at for request in queue)
+            remaining = oldest + self.max_wait - time.monotonic()
+            if len(queue) >= self.max_batch_images or remaining <= 0:
+                break
+            self._cond.wait(remaining)
+
+        queue.sort(key=lambda request: (_PRIORITY_ORDER.get(request.priority, 1), request.enqueued_at))
+        limit = self._max_images(key[1], key[2], queue[0].image.shape)
+        batch, self._queues[key] = queue[:limit], queue[limit:]
+        return batch
+
+    def _run_worker(self, key):
+        while True:
+            with self._cond:
+                batch = self._take_batch(key)
+            try:
+                self._recognize_batch(key, batch)
+            except Exception as e:
+                logger.error(f"EasyOCR batch of {len(batch)} pages failed: {e}", exc_info=True)
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _recognize_batch(self, key, batch: List[_Request]):
+        language, use_gpu, preferred_gpu, paragraph = key
+        vram_mb = sum(self._page_mb(request.image.shape) for request in batch)
+        gpu_enabled, gpu_id = configure_easyocr_gpu_with_selection(use_gpu, preferred_gpu, vram_mb)
+        try:
+            reader, reader_lock = self.get_reader(language, gpu_id if gpu_enabled else None)
+            # readtext_batched needs pages of one size; pages of a document usually share it
+            groups: Dict[Tuple, List[_Request]] = {}
+            for request in batch:
+                groups.setdefault(request.image.shape, []).append(request)
+
+            # Paragraph mode merges lines and drops their confidences
+            detail = 0 if paragraph else 1
+            for requests in groups.values():
+                with reader_lock:
+                    if len(requests) == 1:
+                        outputs = [reader.readtext(requests[0].image, detail=detail, paragraph=paragraph,
+                                                   batch_size=EASYOCR_RECOGNIZER_BATCH_SIZE)]
+                    else:
+                        outputs = reader.readtext_batched([request.image for request in requests], detail=detail,
+                                                          paragraph=paragraph, batch_size=EASYOCR_RECOGNIZER_BATCH_SIZE)
+                for request, output in zip(requests, outputs):
+                    request.future.set_result((*_lines_and_confidence(output, detail), gpu_enabled, gpu_id))
+                with self._cond:
+                    self.calls += 1
+                    self.images += len(requests)
+                    self._batch_sizes.append(len(requests))
+        finally:
+            # Always release the GPU when done
+            if gpu_enabled and gpu_id is not None:
+                release_gpu(gpu_id, vram_mb)
+
+    def get_stats(self) -> dict:
+        """Get batching statistics."""
+        with self._readers_lock:
+            readers = sorted(f"{language}@{device}" for language, device in self._readers)
+        with self._cond:
+            sizes = list(self._batch_sizes)
+            return {
+                'calls': self.calls,
+                'images': self.images,
+                'average_batch_size': round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+                'max_batch_images': self.max_batch_images,
+                'max_wait_ms': self.max_wait * 1000,
+                'queued': sum(len(queue) for queue in self._queues.values()),
+                'workers': sum(len(workers) for workers in self._workers.values()),
+                'readers': readers,
+            }
+
+
+# Global EasyOCR batcher
+easyocr_batcher = EasyOcrBatcher()
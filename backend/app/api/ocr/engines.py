@@ -0,0 +1,532 @@
+"""
+OCR engine interface and registry.
+
+Every OCR engine is wrapped in an OcrEngine that maps the application's
+language codes to its own, reports whether it is installed, warms up, and
+recognizes pages asynchronously. The registry measures each engine per device
+(observed latency from live traffic and optional synthetic benchmarks), and
+select() routes a document to the requested engine or, for "auto" or when the
+requested engine cannot handle the language, to the fastest available engine
+that meets the quality target.
+"""
+import importlib.util
+import logging
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from app.utils.gpu_utils import get_gpu_info
+from .easyocr_batcher import easyocr_batcher, EASYOCR_MAX_PENDING_PAGES
+from .models import LANGUAGE_CODE_MAPPING
+from .scheduler import NORMAL
+from .tesseract_engine import tesseract_engine, RawImage, TESSERACT_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Engine name that lets the registry choose
+AUTO_ENGINE = 'auto'
+
+# Quality targets, lowest first
+QUALITY_LEVELS = {'draft': 0, 'standard': 1, 'high': 2}
+
+# Weight of the newest page in the moving average latency
+LATENCY_SMOOTHING = 0.2
+# Completed pages older than this do not count towards pages_last_minute
+THROUGHPUT_WINDOW_SECONDS = 60
+
+# EasyOCR codes for the application's languages
+EASYOCR_LANGUAGES = {
+    'es': 'es', 'en': 'en', 'fr': 'fr', 'de': 'de', 'it': 'it', 'pt': 'pt',
+    'ru': 'ru', 'zh': 'ch_sim', 'ja': 'ja', 'ko': 'ko', 'ar': 'ar',
+}
+# Tesseract codes accepted wherever an application language is expected
+_TESSERACT_TO_LANGUAGE = {code: language for language, code in LANGUAGE_CODE_MAPPING.items()}
+
+BENCHMARK_TEXT = "The quick brown fox jumps over the lazy dog 0123456789"
+
+
+class OcrOutput:
+    """
+    Text recognized on one page.
+
+    Args:
+        text: Recognized text, one line per line
+        engine: Name of the engine that recognized it
+        device: Device it ran on, e.g. "cpu" or "cuda:0"
+        gpu_id: GPU index, or None on CPU
+        confidence: Engine confidence in the text (0-1), or None when unknown
+    """
+    __slots__ = ('text', 'engine', 'device', 'gpu_id', 'confidence')
+
+    def __init__(self, text: str, engine: str, device: str = 'cpu', gpu_id: Optional[int] = None,
+                 confidence: Optional[float] = None):
+        self.text = text
+        self.engine = engine
+        self.device = device
+        self.gpu_id = gpu_id
+        self.confidence = confidence
+
+    @property
+    def gpu_used(self) -> bool:
+        return self.device != 'cpu'
+
+
+def _chain(source: Future, convert: Callable) -> Future:
+    """Future resolving to convert(result of source)."""
+    future = Future()
+
+    def done(completed: Future):
+        try:
+            future.set_result(convert(completed.result()))
+        except Exception as e:
+            future.set_exception(e)
+
+    source.add_done_callback(done)
+    return future
+
+
+class _DeviceStats:
+    __slots__ = ('pages', 'total_ms', 'ewma_ms', 'completed_at')
+
+    def __init__(self):
+        self.pages = 0
+        self.total_ms = 0.0
+        self.ewma_ms = None
+        self.completed_at = deque()
+
+    def record(self, duration_ms: float):
+        now = time.monotonic()
+        self.pages += 1
+        self.total_ms += duration_ms
+        self.ewma_ms = duration_ms if self.ewma_ms is None else (
+            LATENCY_SMOOTHING * duration_ms + (1 - LATENCY_SMOOTHING) * self.ewma_ms
+        )
+        self.completed_at.append(now)
+        while self.completed_at and self.completed_at[0] < now - THROUGHPUT_WINDOW_SECONDS:
+            self.completed_at.popleft()
+
+    def to_dict(self) -> dict:
+        cutoff = time.monotonic() - THROUGHPUT_WINDOW_SECONDS
+        return {
+            'pages': self.pages,
+            'average_ms': round(self.total_ms / self.pages, 1) if self.pages else 0.0,
+            'recent_ms': round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            'pages_last_minute': sum(1 for at in self.completed_at if at >= cutoff),
+        }
+
+
+def _device_class(device: str) -> str:
+    """"cuda:1" -> "cuda"."""
+    return device.split(':', 1)[0]
+
+
+class OcrEngine:
+    """
+    Base class for OCR engines.
+
+    Subclasses set the metadata attributes and implement available(),
+    language_code() and _submit().
+    """
+    name = ''
+    # Quality level from QUALITY_LEVELS
+    quality = 'standard'
+    uses_gpu = False
+    # Expected milliseconds per page by device class, until measured
+    default_ms_per_page: Dict[str, float] = {'cpu': 2000.0}
+    # Pages of one document worth keeping in flight
+    max_pending_pages = 1
+    # Confidence below which a page recognized at low resolution is retried at full resolution.
+    # Engines calibrate their confidences differently
+    retry_confidence = 0.7
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._devices: Dict[str, _DeviceStats] = {}
+        self._benchmarks: Dict[str, dict] = {}
+        self.failures = 0
+
+    def available(self) -> bool:
+        """Whether the engine is installed and can be used."""
+        raise NotImplementedError
+
+    def language_code(self, language: str) -> Optional[str]:
+        """The engine's code for an application language, or None if it is not supported."""
+        raise NotImplementedError
+
+    def supported_languages(self) -> Optional[List[str]]:
+        """Application languages the engine supports, or None if unknown."""
+        return sorted(language for language in LANGUAGE_CODE_MAPPING if self.language_code(language))
+
+    def supports_language(self, language: str) -> bool:
+        return self.language_code(language) is not None
+
+    def warm_up(self, language: str):
+        """Load everything needed to recognize the language, so the first page is not slow."""
+
+    def _submit(self, image, code: str, use_gpu: bool, preferred_gpu: Optional[int],
+                priority: str, paragraph: bool) -> Future:
+        """Queue a page; the future resolves to an OcrOutput."""
+        raise NotImplementedError
+
+    def submit(self, image, language: str, use_gpu: bool = True, preferred_gpu: Optional[int] = None,
+               priority: str = NORMAL, paragraph: bool = False) -> Future:
+        """
+        Queue a page for recognition.
+
+        Args:
+            image: RawImage or PIL image
+            language: Application language code (e.g. "es") or the engine's own code
+            use_gpu: Whether GPU acceleration may be used
+            preferred_gpu: Preferred GPU ID, or None for automatic selection
+            priority: Scheduler priority class of the caller
+            paragraph: Whether lines should be merged into paragraphs
+
+        Returns:
+            Future resolving to an OcrOutput
+        """
+        code = self.language_code(language)
+        if code is None:
+            raise ValueError(f"OCR engine {self.name} does not support language {language}")
+        start = time.perf_counter()
+        future = self._submit(image, code, use_gpu, preferred_gpu, priority, paragraph)
+        future.add_done_callback(lambda completed: self._record(completed, start))
+        return future
+
+    def recognize_batch(self, images: List, language: str, **options) -> List[OcrOutput]:
+        """Recognize several pages concurrently and wait for all of them. See submit()."""
+        futures = [self.submit(image, language, **options) for image in images]
+        return [future.result() for future in futures]
+
+    def _record(self, completed: Future, start: float):
+        duration_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            if completed.exception() is not None:
+                self.failures += 1
+                return
+            output = completed.result()
+            self._devices.setdefault(output.device, _DeviceStats()).record(duration_ms)
+
+    def record_benchmark(self, device: str, ms_per_page: float, pages: int):
+        with self._stats_lock:
+            self._benchmarks[device] = {
+                'ms_per_page': round(ms_per_page, 1),
+                'pages': pages,
+                'measured_at': time.time(),
+            }
+
+    def _expected_device_class(self, use_gpu: bool) -> str:
+        if self.uses_gpu and use_gpu and get_gpu_info().get('is_available'):
+            return 'cuda'
+        return 'cpu'
+
+    def estimated_ms_per_page(self, use_gpu: bool = True) -> float:
+        """
+        Expected milliseconds per page on the device the engine would use.
+
+        Prefers the recent latency of live pages, which also reflects queueing,
+        then the last benchmark, then the engine's default estimate.
+        """
+        device_class = self._expected_device_class(use_gpu)
+        with self._stats_lock:
+            live = [stats.ewma_ms for device, stats in self._devices.items()
+                    if _device_class(device) == device_class and stats.ewma_ms is not None]
+            if live:
+                return min(live)
+            benchmarks = [result['ms_per_page'] for device, result in self._benchmarks.items()
+                          if _device_class(device) == device_class]
+            if benchmarks:
+                return min(benchmarks)
+        return self.default_ms_per_page.get(device_class, self.default_ms_per_page['cpu'])
+
+    def get_engine_stats(self) -> dict:
+        """Statistics of the underlying engine implementation."""
+        return {}
+
+    def describe(self) -> dict:
+        """Capabilities and measured throughput."""
+        available = self.available()
+        with self._stats_lock:
+            devices = {device: stats.to_dict() for device, stats in self._devices.items()}
+            benchmarks = {device: dict(result) for device, result in self._benchmarks.items()}
+            failures = self.failures
+        return {
+            'name': self.name,
+            'available': available,
+            'quality': self.quality,
+            'uses_gpu': self.uses_gpu,
+            'retry_confidence': self.retry_confidence,
+            'languages': self.supported_languages() if available else [],
+            'estimated_ms_per_page': round(self.estimated_ms_per_page(), 1),
+            'devices': devices,
+            'benchmarks': benchmarks,
+            'failures': failures,
+            'engine': self.get_engine_stats(),
+        }
+
+
+class EasyOcrEngine(OcrEngine):
+    """EasyOCR through the shared micro-batcher."""
+    name = 'easyocr'
+    quality = 'high'
+    uses_gpu = True
+    default_ms_per_page = {'cpu': 6000.0, 'cuda': 500.0}
+    max_pending_pages = EASYOCR_MAX_PENDING_PAGES
+    retry_confidence = 0.6
+
+    def __init__(self):
+        super().__init__()
+        self._available = None
+
+    def available(self) -> bool:
+        if self._available is None:
+            self._available = importlib.util.find_spec('easyocr') is not None
+        return self._available
+
+    def language_code(self, language: str) -> Optional[str]:
+        language = _TESSERACT_TO_LANGUAGE.get(language, language)
+        if language in EASYOCR_LANGUAGES.values():
+            return language
+        return EASYOCR_LANGUAGES.get(language)
+
+    def warm_up(self, language: str):
+        code = self.language_code(language)
+        if code is None:
+            return
+        gpu_info = get_gpu_info()
+        easyocr_batcher.get_reader(code, 0 if gpu_info.get('is_available') else None)
+
+    @staticmethod
+    def _to_array(image):
+        import numpy as np
+        if isinstance(image, RawImage):
+            array = np.frombuffer(image.data, dtype=np.uint8).reshape(image.height, image.width, image.channels)
+            return array[:, :, 0] if image.channels == 1 else array
+        return np.array(image.convert('RGB'))
+
+    def _submit(self, image, code, use_gpu, preferred_gpu, priority, paragraph) -> Future:
+        def to_output(result):
+            lines, confidence, gpu_enabled, gpu_id = result
+            if gpu_enabled and gpu_id is not None:
+                return OcrOutput('\n'.join(lines), self.name, f"cuda:{gpu_id}", gpu_id, confidence)
+            return OcrOutput('\n'.join(lines), self.name, confidence=confidence)
+
+        # Recognized in a batch with pages of other documents
+        return _chain(
+            easyocr_batcher.submit(self._to_array(image), code, use_gpu, preferred_gpu, priority, paragraph),
+            to_output,
+        )
+
+    def get_engine_stats(self) -> dict:
+        return easyocr_batcher.get_stats()
+
+
+class TesseractOcrEngine(OcrEngine):
+    """Tesseract on the parallel worker pool."""
+    name = 'tesseract'
+    quality = 'standard'
+    default_ms_per_page = {'cpu': 1500.0}
+    max_pending_pages = TESSERACT_WORKERS
+    retry_confidence = 0.8
+
+    def __init__(self):
+        super().__init__()
+        self._available = None
+        self._languages = None
+        self._languages_lock = threading.Lock()
+
+    def available(self) -> bool:
+        if self._available is None:
+            if tesseract_engine.backend == 'tesserocr':
+                self._available = True
+            else:
+                try:
+                    import pytesseract
+                    self._available = shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+                except ImportError:
+                    self._available = False
+        return self._available
+
+    def _installed_languages(self) -> Optional[set]:
+        """Installed traineddata, or None if it cannot be listed."""
+        with self._languages_lock:
+            if self._languages is None:
+                try:
+                    if tesseract_engine.backend == 'tesserocr':
+                        import tesserocr
+                        _, languages = tesserocr.get_languages()
+                    else:
+                        import pytesseract
+                        languages = pytesseract.get_languages()
+                    self._languages = set(languages)
+                except Exception as e:
+                    # Not retried for every page; any language is attempted
+                    logger.warning(f"Could not list Tesseract languages: {e}")
+                    self._languages = False
+            return self._languages or None
+
+    def language_code(self, language: str) -> Optional[str]:
+        code = LANGUAGE_CODE_MAPPING.get(language, language)
+        installed = self._installed_languages()
+        if installed and not all(part in installed for part in code.split('+')):
+            return None
+        return code
+
+    def supported_languages(self) -> Optional[List[str]]:
+        if self._installed_languages() is None:
+            return None
+        return super().supported_languages()
+
+    def _submit(self, image, code, use_gpu, preferred_gpu, priority, paragraph) -> Future:
+        return _chain(tesseract_engine.submit(image, code, priority),
+                      lambda result: OcrOutput(result[0], self.name, confidence=result[1]))
+
+    def get_engine_stats(self) -> dict:
+        return tesseract_engine.get_stats()
+
+
+def _benchmark_page() -> RawImage:
+    """A4 page at 150 DPI with lines of printed text."""
+    from PIL import Image, ImageDraw, ImageFont
+    try:
+        font = ImageFont.load_default(size=24)
+    except TypeError:
+        # Pillow before 10.1 only has the small bitmap font
+        font = ImageFont.load_default()
+    image = Image.new('L', (1240, 1754), 255)
+    draw = ImageDraw.Draw(image)
+    for row in range(40):
+        draw.text((100, 100 + row * 38), BENCHMARK_TEXT, fill=0, font=font)
+    return RawImage(image.tobytes(), image.width, image.height, 1)
+
+
+class OcrEngineRegistry:
+    """Registered OCR engines and the routing between them."""
+
+    def __init__(self):
+        self._engines: Dict[str, OcrEngine] = {}
+
+    def register(self, engine: OcrEngine):
+        self._engines[engine.name] = engine
+
+    def names(self) -> List[str]:
+        return list(self._engines)
+
+    def get(self, name: Optional[str]) -> Optional[OcrEngine]:
+        """
+        Get an engine by name.
+
+        Names are matched by prefix as well, so "tesseract5" finds "tesseract".
+        """
+        name = (name or '').lower()
+        engine = self._engines.get(name)
+        if engine is None:
+            engine = next((e for n, e in self._engines.items() if name.startswith(n)), None)
+        return engine
+
+    def _candidates(self, language: str, quality: Optional[str], exclude=()) -> List[OcrEngine]:
+        engines = [engine for engine in self._engines.values()
+                   if engine not in exclude and engine.available() and engine.supports_language(language)]
+        minimum = QUALITY_LEVELS.get(quality, 0)
+        good_enough = [engine for engine in engines if QUALITY_LEVELS.get(engine.quality, 0) >= minimum]
+        # Better a lower quality than no text at all
+        return good_enough or engines
+
+    def fastest(self, language: str, quality: Optional[str] = None, use_gpu: bool = True,
+                exclude=()) -> Optional[OcrEngine]:
+        """The available engine with the lowest expected time per page, or None."""
+        candidates = self._candidates(language, quality, exclude)
+        if not candidates:
+            return None
+        return min(candidates, key=lambda engine: engine.estimated_ms_per_page(use_gpu))
+
+    def select(self, requested: Optional[str], language: str, quality: Optional[str] = None,
+               use_gpu: bool = True) -> OcrEngine:
+        """
+        Choose the engine for a document.
+
+        Args:
+            requested: Engine name from the settings, or "auto"
+            language: Application language code
+            quality: Minimum quality level, e.g. "high"; None accepts any
+            use_gpu: Whether GPU acceleration may be used
+
+        Returns:
+            The requested engine if it is available for the language, otherwise
+            the fastest one that is
+
+        Raises:
+            ValueError: If no engine supports the language
+        """
+        if requested and requested.lower() != AUTO_ENGINE:
+            engine = self.get(requested)
+            if engine is not None and engine.available() and engine.supports_language(language):
+                return engine
+            logger.info(f"OCR engine '{requested}' is not available for language {language}, choosing automatically")
+
+        engine = self.fastest(language, quality, use_gpu)
+        if engine is None:
+            raise ValueError(f"No OCR engine available for language {language}")
+        return engine
+
+    def fallback(self, failed: OcrEngine, language: str, quality: Optional[str] = None,
+                 use_gpu: bool = True) -> Optional[OcrEngine]:
+        """The engine to retry a page on after failed could not recognize it, or None."""
+        return self.fastest(language, quality, use_gpu, exclude=(failed,))
+
+    def warm_up(self, language: str):
+        """Warm up every available engine that supports the language."""
+        for engine in self._engines.values():
+            if engine.available() and engine.supports_language(language):
+                start = time.time()
+                engine.warm_up(language)
+                logger.info(f"Warmed up OCR engine {engine.name} for {language} in {time.time() - start:.1f}s")
+
+    def benchmark(self, language: str, pages: int = 4, use_gpu: bool = True) -> Dict[str, dict]:
+        """
+        Measure every available engine on synthetic pages.
+
+        One page is recognized first to warm up, then the timed pages are
+        submitted together so engines that recognize pages in parallel or in
+        batches are measured at their throughput.
+
+        Args:
+            language: Application language code
+            pages: Number of timed pages
+            use_gpu: Whether GPU acceleration may be used
+
+        Returns:
+            Engine name -> {"device", "ms_per_page"} or {"error"}
+        """
+        page = _benchmark_page()
+        results = {}
+        for engine in self._engines.values():
+            if not engine.available() or not engine.supports_language(language):
+                continue
+            try:
+                device = engine.recognize_batch([page], language, use_gpu=use_gpu)[0].device
+                start = time.perf_counter()
+                engine.recognize_batch([page] * max(1, pages), language, use_gpu=use_gpu)
+                ms_per_page = (time.perf_counter() - start) * 1000 / max(1, pages)
+                engine.record_benchmark(device, ms_per_page, pages)
+                results[engine.name] = {'device': device, 'ms_per_page': round(ms_per_page, 1)}
+                logger.info(f"Benchmarked OCR engine {engine.name} on {device}: {ms_per_page:.0f} ms/page")
+            except Exception as e:
+                logger.error(f"Error benchmarking OCR engine {engine.name}: {e}")
+                results[engine.name] = {'error': str(e)}
+        return results
+
+    def describe(self) -> dict:
+        """Capabilities and live throughput of all engines."""
+        return {
+            'engines': self.names(),
+            'details': [engine.describe() for engine in self._engines.values()],
+        }
+
+
+# Global OCR engine registry
+engine_registry = OcrEngineRegistry()
+engine_registry.register(EasyOcrEngine())
+engine_registry.register(TesseractOcrEngine())
@@ -49,6 +49,19 @@ class SharePointItem(BaseModel):
     item_id: str
     item_type: str  # "file" or "folder"
 
+class ImagePreprocessingOptions(BaseModel):
+    """Cleanup applied to page images before OCR; every step is off by default"""
+    deskew: bool = False
+    binarization: str = "none"  # "none", "otsu" or "sauvola"
+    denoise: bool = False
+    crop_borders: bool = False
+    target_x_height: int = 0  # Downscale until lowercase letters are this many pixels high; 0 keeps the size
+
+    @property
+    def enabled(self) -> bool:
+        return (self.deskew or self.binarization != "none" or self.denoise
+                or self.crop_borders or self.target_x_height > 0)
+
 class PreprocessRequest(BaseModel):
     file_id: str
     directory_id: str
@@ -61,10 +74,12 @@ class PreprocessRequest(BaseModel):
     colorspace: str = "rgb"
     alpha: bool = False
     rotation: int = 0
+    auto_rotate: Optional[bool] = None  # Detect the orientation of pages when rotation is 0; None uses ORIENTATION_DETECTION
     image_format: str = "png"
     page_range: str = ""
     grayscale: bool = False
     transparent: bool = False
+    image_preprocessing: Optional[ImagePreprocessingOptions] = None
     
     class Config:
         json_schema_extra = {
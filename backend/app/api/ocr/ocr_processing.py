@@ -1,18 +1,25 @@
 import logging
 from PIL import Image
 from fastapi import HTTPException
-import easyocr
-import pytesseract
 from app.schemas import OcrImagesRequest
 from app.utils.cache_utils import cache_ocr_result
-from app.utils.gpu_utils import configure_easyocr_gpu_with_selection, get_gpu_info, release_gpu, get_gpu_usage_stats
+from app.utils.gpu_utils import get_gpu_info, get_gpu_usage_stats
+from .engines import engine_registry, AUTO_ENGINE
+from .scheduler import INTERACTIVE, ocr_scheduler
 
 logger = logging.getLogger(__name__)
 
 @cache_ocr_result
-def ocr_images(req: OcrImagesRequest):
+def ocr_images(req: OcrImagesRequest, priority: str = INTERACTIVE, tenant: str = 'default'):
     """
     Perform OCR on a list of images.
+
+    Every image takes a slot from the OCR scheduler and keeps it until it is recognized.
+
+    Args:
+        req: Images, language and engine
+        priority: Scheduler priority class: "interactive", "normal" or "bulk"
+        tenant: Key images are shared fairly between
     """
     logger.info(f"Received request to OCR images: {req.image_paths}")
     ocr_engine = req.engine
@@ -28,10 +35,21 @@ def ocr_images(req: OcrImagesRequest):
     except ImportError:
         pass
 
-    if ocr_engine not in ["easyocr", "tesseract"]:
+    if ocr_engine != AUTO_ENGINE and engine_registry.get(ocr_engine) is None:
         raise HTTPException(status_code=400, detail=f"Unsupported OCR engine: {ocr_engine}")
 
+    # Get preferred GPU from request parameters or default to auto-selection
+    preferred_gpu = getattr(req, 'preferred_gpu', None)
+    if preferred_gpu is not None and preferred_gpu != "auto":
+        try:
+            preferred_gpu = int(preferred_gpu)
+        except (ValueError, TypeError):
+            preferred_gpu = None
+    else:
+        preferred_gpu = None
+
     try:
+        engine = engine_registry.select(ocr_engine, ocr_lang)
         extracted_texts = []
         
         # Process images in batches of 5 to prevent memory buildup
@@ -40,40 +58,25 @@ def ocr_images(req: OcrImagesRequest):
             batch_paths = req.image_paths[i:i+batch_size]
             logger.info(f"Processing batch {i//batch_size + 1} of {(len(req.image_paths) + batch_size - 1)//batch_size}")
             
+            # Submit the whole batch so the images are recognized together
+            futures = []
             for image_path in batch_paths:
-                logger.info(f"Processing image: {image_path} with {ocr_engine}")
-            if ocr_engine == 'easyocr':
-                # Get preferred GPU from request parameters or default to auto-selection
-                preferred_gpu = getattr(req, 'preferred_gpu', None)
-                if preferred_gpu is not None and preferred_gpu != "auto":
-                    try:
-                        preferred_gpu = int(preferred_gpu)
-                    except (ValueError, TypeError):
-                        preferred_gpu = None
-                else:
-                    preferred_gpu = None
-                
-                # Configure GPU with selection
-                gpu_enabled, gpu_id = configure_easyocr_gpu_with_selection(True, preferred_gpu)
-                
+                logger.info(f"Processing image: {image_path} with {engine.name}")
+                ticket = ocr_scheduler.acquire(priority, tenant)
+                future = None
                 try:
-                    reader = easyocr.Reader([ocr_lang], gpu=gpu_enabled)
-                    result = reader.readtext(image_path, detail=0, paragraph=paragraph_mode)
-                    text = '\n'.join(result)
+                    img = Image.open(image_path)
+                    # Read the pixels now; load() also closes the file
+                    img.load()
+                    future = engine.submit(img, ocr_lang, True, preferred_gpu, priority, paragraph_mode)
                 finally:
-                    # Always release the GPU when done
-                    if gpu_enabled and gpu_id is not None:
-                        release_gpu(gpu_id)
-            elif ocr_engine == 'tesseract':
-                img = Image.open(image_path)
-                text = pytesseract.image_to_string(img, lang=ocr_lang)
-            else:
-                raise ValueError(f"Unsupported OCR engine: {ocr_engine}")
-                extracted_texts.append(text)
-                
-                # Force garbage collection after each image
-                import gc
-                gc.collect()
+                    ocr_scheduler.release_after(ticket, future)
+                futures.append(future)
+            extracted_texts.extend(future.result().text for future in futures)
+            
+            # Force garbage collection after each batch
+            import gc
+            gc.collect()
             
             # Log memory usage after each batch
             try:
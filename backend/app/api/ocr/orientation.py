@@ -0,0 +1,260 @@
+"""
+Page orientation detection before OCR.
+
+A page is rendered in grayscale at ORIENTATION_DPI and checked with projection
+profiles: text lines make the ink profile across them alternate between
+lines and gaps, which tells horizontal from vertical text, and Latin script
+has more ink in ascenders and capitals above the line core than in
+descenders below it, which tells upright from upside down text. When the
+profiles are inconclusive, Tesseract OSD gets the final say if it is
+installed.
+
+The detected rotation is applied through the render matrix, so the page is
+recognized upright without a failed OCR pass and a manual retry.
+"""
+import logging
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+
+from .image_preprocessing import MIN_SKEW_DEGREES, estimate_skew, rotate
+from .page_filter import INK_CONTRAST
+
+logger = logging.getLogger(__name__)
+
+# Detect and correct the orientation of scanned pages unless the request settings say otherwise
+ORIENTATION_DETECTION = os.getenv('ORIENTATION_DETECTION', 'true').lower() == 'true'
+# Resolution of the detection render
+ORIENTATION_DPI = int(os.getenv('ORIENTATION_DPI', '100'))
+# "auto": projection profiles, with Tesseract OSD for inconclusive pages;
+# "projection": profiles only; "osd": Tesseract OSD, with profiles when it fails
+ORIENTATION_METHOD = os.getenv('ORIENTATION_METHOD', 'auto').lower()
+# Profile confidence (0-1) needed to rotate a page
+ORIENTATION_MIN_CONFIDENCE = float(os.getenv('ORIENTATION_MIN_CONFIDENCE', '0.2'))
+# Tesseract OSD confidence needed to rotate a page
+ORIENTATION_MIN_OSD_CONFIDENCE = float(os.getenv('ORIENTATION_MIN_OSD_CONFIDENCE', '2.0'))
+
+# Text lines needed for the profile checks
+MIN_TEXT_LINES = 3
+# Width of the strips profiles are taken over, so skewed lines stay apart, in pixels at ORIENTATION_DPI
+STRIP_SIZE = 128
+# Profile rows with fewer ink pixels are empty (scanner noise, dust)
+MIN_ROW_INK = 2
+# Rows of a text line with at least this share of its densest row form the line core
+LINE_CORE_RATIO = 0.5
+
+
+class Orientation:
+    """
+    Detected orientation of a page.
+
+    Args:
+        rotation: Clockwise rotation in degrees (0, 90, 180 or 270) that makes the page upright
+        confidence: Confidence of the method that decided it
+        method: "projection", "osd", or "none" when nothing could be detected
+    """
+    __slots__ = ('rotation', 'confidence', 'method')
+
+    def __init__(self, rotation: int, confidence: float, method: str):
+        self.rotation = rotation
+        self.confidence = confidence
+        self.method = method
+
+    def to_dict(self) -> dict:
+        return {'rotation': self.rotation, 'confidence': round(self.confidence, 3), 'method': self.method}
+
+
+def cropped_ink(gray: np.ndarray) -> np.ndarray:
+    """Pixels clearly darker than the paper, cropped to the inked area."""
+    ink = gray < np.median(gray) - INK_CONTRAST
+    rows = np.flatnonzero(ink.sum(axis=1) >= MIN_ROW_INK)
+    cols = np.flatnonzero(ink.sum(axis=0) >= MIN_ROW_INK)
+    if not rows.size or not cols.size:
+        return ink[:0, :0]
+    return ink[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+
+def _strip_profiles(ink: np.ndarray):
+    """Row profiles of vertical strips of the page; short strips keep skewed lines apart."""
+    strips = max(1, ink.shape[1] // STRIP_SIZE)
+    return [strip.sum(axis=1) for strip in np.array_split(ink, strips, axis=1)]
+
+
+def _line_contrast(profile: np.ndarray) -> float:
+    """
+    Squared coefficient of variation of an ink profile.
+
+    Across text lines the profile drops to zero between the lines; along them
+    it only dips between characters, even where monospaced characters align.
+    """
+    mean = profile.mean() if profile.size else 0.0
+    if not mean:
+        return 0.0
+    return float(profile.astype(np.float64).var() / mean ** 2)
+
+
+def line_contrast(ink: np.ndarray) -> float:
+    """Ink-weighted line contrast of the row profiles of the page's strips."""
+    profiles = _strip_profiles(ink)
+    total = sum(int(profile.sum()) for profile in profiles)
+    if not total:
+        return 0.0
+    return sum(_line_contrast(profile) * int(profile.sum()) for profile in profiles) / total
+
+
+def _text_lines(profile: np.ndarray):
+    """(start, end) of the runs of inked rows."""
+    inked = np.concatenate(([False], profile >= MIN_ROW_INK, [False]))
+    edges = np.flatnonzero(np.diff(inked.astype(np.int8)))
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def upright_score(ink: np.ndarray) -> Optional[float]:
+    """
+    Ink above the text line cores minus ink below them, relative to both, for horizontal lines.
+
+    Positive for upright Latin text and negative for upside down text; None
+    with fewer than MIN_TEXT_LINES lines.
+    """
+    above = below = 0
+    lines = 0
+    for profile in _strip_profiles(ink):
+        for start, end in _text_lines(profile):
+            line = profile[start:end]
+            if end - start < 3:
+                continue
+            core = np.flatnonzero(line >= line.max() * LINE_CORE_RATIO)
+            above += int(line[:core[0]].sum())
+            below += int(line[core[-1] + 1:].sum())
+            lines += 1
+    if lines < MIN_TEXT_LINES or not above + below:
+        return None
+    return (above - below) / (above + below)
+
+
+def projection_orientation(gray: np.ndarray) -> Orientation:
+    """
+    Detect the orientation of a grayscale page from its ink projection profiles.
+
+    Args:
+        gray: Page as a 2D uint8 array
+
+    Returns:
+        Orientation with a confidence between 0 and 1
+    """
+    ink = cropped_ink(gray)
+    if ink.size == 0:
+        return Orientation(0, 0.0, 'none')
+    horizontal = line_contrast(ink)
+    vertical = line_contrast(ink.T)
+    if horizontal >= vertical:
+        candidates = (0, 180)
+    else:
+        # Turn the lines horizontal; np.rot90 turns counter-clockwise, i.e. 270 clockwise
+        gray = np.ascontiguousarray(np.rot90(gray))
+        candidates = (270, 90)
+    # Ascenders and descenders blur into the line core unless the lines are level
+    angle = estimate_skew(gray)
+    if abs(angle) >= MIN_SKEW_DEGREES:
+        gray = rotate(gray, angle)
+    score = upright_score(cropped_ink(gray))
+    if score is None:
+        return Orientation(0, 0.0, 'none')
+    # Both checks must agree clearly
+    axis_confidence = abs(horizontal - vertical) / (horizontal + vertical)
+    confidence = float(min(axis_confidence, abs(score)))
+    return Orientation(candidates[0] if score > 0 else candidates[1], confidence, 'projection')
+
+
+class OrientationDetector:
+    """Detects page orientation and counts rotated pages."""
+
+    def __init__(self, method: str = ORIENTATION_METHOD):
+        self.method = method
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.rotated = {90: 0, 180: 0, 270: 0}
+        self.osd_pages = 0
+        self.osd_failures = 0
+
+    def _osd(self, gray: np.ndarray) -> Optional[Orientation]:
+        """Tesseract OSD, or None when it is unavailable or fails."""
+        from .engines import engine_registry
+        from .tesseract_engine import RawImage, tesseract_engine
+        engine = engine_registry.get('tesseract')
+        if engine is None or not engine.available():
+            return None
+        with self._lock:
+            self.osd_pages += 1
+        try:
+            image = RawImage(np.ascontiguousarray(gray).tobytes(), gray.shape[1], gray.shape[0], 1)
+            rotation, confidence = tesseract_engine.detect_orientation(image)
+        except Exception as e:
+            logger.debug(f"Tesseract OSD failed: {e}")
+            with self._lock:
+                self.osd_failures += 1
+            return None
+        return Orientation(rotation, confidence, 'osd')
+
+    def detect(self, gray: np.ndarray) -> Orientation:
+        """
+        Detect the orientation of a grayscale page.
+
+        Args:
+            gray: Page as a 2D uint8 array
+
+        Returns:
+            Orientation; its rotation is 0 unless a method is confident enough
+        """
+        result = None
+        if self.method == 'osd':
+            result = self._osd(gray)
+        if result is None:
+            result = projection_orientation(gray)
+            # Pages without enough text lines for the profiles have too little text for OSD as well
+            if self.method == 'auto' and result.method == 'projection' and result.confidence < ORIENTATION_MIN_CONFIDENCE:
+                result = self._osd(gray) or result
+
+        threshold = ORIENTATION_MIN_OSD_CONFIDENCE if result.method == 'osd' else ORIENTATION_MIN_CONFIDENCE
+        if result.confidence < threshold:
+            result.rotation = 0
+        with self._lock:
+            self.pages += 1
+            if result.rotation:
+                self.rotated[result.rotation] += 1
+        return result
+
+    def detect_page(self, page, dpi: int = ORIENTATION_DPI) -> Orientation:
+        """
+        Render a PyMuPDF page in grayscale at low resolution and detect its orientation.
+
+        Args:
+            page: PyMuPDF page
+            dpi: Resolution of the detection render
+
+        Returns:
+            Orientation relative to the page as rendered without extra rotation
+        """
+        import fitz  # PyMuPDF
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+        gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+        return self.detect(gray)
+
+    def get_stats(self) -> dict:
+        """Get the number of checked and rotated pages."""
+        with self._lock:
+            return {
+                'method': self.method,
+                'pages': self.pages,
+                'rotated': {str(angle): count for angle, count in self.rotated.items()},
+                'rotated_ratio': round(sum(self.rotated.values()) / self.pages, 3) if self.pages else 0.0,
+                'osd_pages': self.osd_pages,
+                'osd_failures': self.osd_failures,
+                'min_confidence': ORIENTATION_MIN_CONFIDENCE,
+            }
+
+
+# Global orientation detector
+orientation_detector = OrientationDetector()
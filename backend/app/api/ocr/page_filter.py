@@ -0,0 +1,168 @@
+"""
+Blank and duplicate page detection before OCR.
+
+Each page that needs OCR is first rendered at PAGE_FILTER_DPI, which takes a
+few milliseconds. A page whose low-resolution render has almost no ink is
+blank: it is not recognized.
+
+Otherwise the page may reuse the OCR result of an identical page recognized
+recently with the same engine, language and image settings, or wait for it
+while it is still queued. Only exact copies count: pages are looked up by the
+SHA-256 digest of the pixels sent to the engine, since near-identical pages
+such as two invoices from one template differ only in a few fields. Pages are
+only matched within one document unless PAGE_DEDUPE_CROSS_DOCUMENT is set.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Skip OCR for blank pages unless the request settings say otherwise
+PAGE_SKIP_BLANK = os.getenv('PAGE_SKIP_BLANK', 'true').lower() == 'true'
+# Reuse OCR results for duplicate pages unless the request settings say otherwise
+PAGE_DEDUPE = os.getenv('PAGE_DEDUPE', 'true').lower() == 'true'
+# Also reuse OCR results of identical pages in other documents
+PAGE_DEDUPE_CROSS_DOCUMENT = os.getenv('PAGE_DEDUPE_CROSS_DOCUMENT', 'false').lower() == 'true'
+# Resolution of the render used for blank detection
+PAGE_FILTER_DPI = int(os.getenv('PAGE_FILTER_DPI', '30'))
+# Pages with a smaller share of ink pixels are blank
+PAGE_BLANK_MAX_INK_RATIO = float(os.getenv('PAGE_BLANK_MAX_INK_RATIO', '0.0005'))
+# How long a duplicate waits for the page it copies before it is recognized itself
+PAGE_DEDUPE_WAIT_SECONDS = float(os.getenv('PAGE_DEDUPE_WAIT_SECONDS', '120'))
+# Recognized pages remembered for deduplication
+PAGE_DEDUPE_MAX_ENTRIES = int(os.getenv('PAGE_DEDUPE_MAX_ENTRIES', '5000'))
+
+# A pixel is ink when it is this much darker than the paper
+INK_CONTRAST = 48
+# Share of the page at each edge ignored for blank detection (scanner edges, punch holes)
+EDGE_MARGIN = 0.05
+
+
+class PageCheck:
+    """
+    Result of inspecting a page before OCR.
+
+    Args:
+        pixmap: The low-resolution render
+        blank: Whether the page has no ink
+        ink_ratio: Share of ink pixels
+    """
+    __slots__ = ('pixmap', 'blank', 'ink_ratio')
+
+    def __init__(self, pixmap, blank: bool, ink_ratio: float):
+        self.pixmap = pixmap
+        self.blank = blank
+        self.ink_ratio = ink_ratio
+
+
+def ink_ratio(gray: np.ndarray) -> float:
+    """Share of pixels clearly darker than the paper, ignoring the page edges."""
+    height, width = gray.shape
+    dy, dx = int(height * EDGE_MARGIN), int(width * EDGE_MARGIN)
+    inner = gray[dy:height - dy, dx:width - dx]
+    if not inner.size:
+        return 0.0
+    paper = np.median(inner)
+    return float(np.count_nonzero(inner < paper - INK_CONTRAST)) / inner.size
+
+
+def page_digest(pix) -> str:
+    """SHA-256 of a pixmap's size, channels and pixels: equal only for identical renders."""
+    digest = hashlib.sha256(f"{pix.width}x{pix.height}x{pix.n}:".encode())
+    digest.update(pix.samples)
+    return digest.hexdigest()
+
+
+class PageFilter:
+    """Blank page detection and an index of recently recognized pages."""
+
+    def __init__(self, max_entries: int = PAGE_DEDUPE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (scope, digest) -> (future of the OCR output, page label), oldest first
+        self._index: "OrderedDict[Tuple, Tuple[Future, str]]" = OrderedDict()
+        self.inspected = 0
+        self.blank_pages = 0
+        self.duplicate_pages = 0
+
+    def inspect(self, page, dpi: int = PAGE_FILTER_DPI) -> PageCheck:
+        """
+        Render a PyMuPDF page at low resolution and check it.
+
+        Args:
+            page: PyMuPDF page
+            dpi: Resolution of the check render
+
+        Returns:
+            PageCheck with the render and blank flag
+        """
+        import fitz  # PyMuPDF
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+        gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+        ratio = ink_ratio(gray)
+        blank = ratio < PAGE_BLANK_MAX_INK_RATIO
+        with self._lock:
+            self.inspected += 1
+            if blank:
+                self.blank_pages += 1
+        return PageCheck(pix, blank, ratio)
+
+    def find_duplicate(self, scope: Tuple, digest: str) -> Optional[Tuple[Future, str]]:
+        """
+        Find a recognized or queued page identical to this one.
+
+        Args:
+            scope: Engine, language and image settings the OCR result depends on,
+                plus the document unless pages are matched across documents
+            digest: page_digest() of the pixels sent to the engine
+
+        Returns:
+            (future of the OcrOutput, label of the page), or None
+        """
+        with self._lock:
+            match = self._index.get((scope, digest))
+            if match is not None:
+                self.duplicate_pages += 1
+            return match
+
+    def add(self, scope: Tuple, digest: str, future: Future, label: str):
+        """Remember a queued page; it is forgotten again if its OCR fails."""
+        key = (scope, digest)
+        with self._lock:
+            self._index[key] = (future, label)
+            self._index.move_to_end(key)
+            while len(self._index) > self.max_entries:
+                self._index.popitem(last=False)
+
+        def forget_on_failure(completed: Future):
+            if completed.exception() is None:
+                return
+            with self._lock:
+                if self._index.get(key, (None,))[0] is completed:
+                    del self._index[key]
+
+        future.add_done_callback(forget_on_failure)
+
+    def get_stats(self) -> dict:
+        """Get the number of inspected, blank and duplicate pages."""
+        with self._lock:
+            return {
+                'inspected': self.inspected,
+                'blank_pages': self.blank_pages,
+                'duplicate_pages': self.duplicate_pages,
+                'skipped_ratio': round((self.blank_pages + self.duplicate_pages) / self.inspected, 3) if self.inspected else 0.0,
+                'indexed_pages': len(self._index),
+                'cross_document': PAGE_DEDUPE_CROSS_DOCUMENT,
+                'blank_max_ink_ratio': PAGE_BLANK_MAX_INK_RATIO,
+            }
+
+
+# Global page filter
+page_filter = PageFilter()
@@ -4,28 +4,53 @@ import base64
 import os
 import tempfile
 import json
+import hashlib
 import datetime
-import fitz  # PyMuPDF
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Optional, Tuple
 from PIL import Image
 from fastapi import HTTPException
-from .models import PdfOcrRequest, get_ocr_language_code
-from .db_utils import get_db_session, get_setting_value, DATABASE_URL
+from .models import PdfOcrRequest, ImagePreprocessingOptions
+from .db_utils import get_db_session, get_setting_value
 from app.models import OcrResult
-from app.utils.preload_utils import is_data_preloaded, preload_manager
-from app.utils.gpu_utils import configure_easyocr_gpu_with_selection, get_gpu_info, release_gpu
+from app.utils.preload_utils import evict_cached_text, is_data_preloaded, preload_manager
+from app.utils.gpu_utils import get_gpu_info
 from app.utils.thumbnail_utils import ThumbnailGenerator
 from app.api.thumbnails.processed_image_utils import store_processed_image
-import easyocr
-import pytesseract
+from app.utils.single_flight import get_single_flight
+from .scheduler import INTERACTIVE, ocr_scheduler, run_ocr_job
+from .engines import engine_registry
+from .tesseract_engine import RawImage
+from .page_filter import (page_filter, page_digest, PAGE_SKIP_BLANK, PAGE_DEDUPE, PAGE_DEDUPE_CROSS_DOCUMENT,
+                          PAGE_DEDUPE_WAIT_SECONDS)
+from .orientation import orientation_detector, ORIENTATION_DETECTION
+from .regions import analyze_page, gather, merge_outputs, REGION_OCR
 
 logger = logging.getLogger(__name__)
 
+# Identical concurrent OCR requests (e.g. the same document opened in several tabs) share one run
+pdf_ocr_flight = get_single_flight("pdf_ocr_with_preload")
+
+# Resolution of the first OCR pass; pages recognized with low confidence are rendered again
+# at the requested DPI and recognized once more. 0 recognizes every page at the requested DPI
+OCR_FAST_DPI = int(os.getenv('OCR_FAST_DPI', '150'))
+
 async def pdf_ocr_with_preload(request: PdfOcrRequest, file_id: str = None):
     """
     Process a PDF file with OCR, utilizing preloaded data when available.
     This endpoint first checks for preloaded data and uses it if found,
     otherwise falls back to normal OCR processing.
+    
+    Concurrent requests for the same file, content and settings are coalesced
+    into a single run.
     """
+    content_hash = hashlib.sha256(request.file_data.encode('utf-8')).hexdigest()
+    settings_key = json.dumps(request.settings or {}, sort_keys=True, default=str)
+    key = (file_id, request.filename, content_hash, settings_key)
+    return await pdf_ocr_flight.do(key, _pdf_ocr_with_preload, request, file_id)
+
+async def _pdf_ocr_with_preload(request: PdfOcrRequest, file_id: str = None):
     start_time = time.time()
     logger.info(f"Starting PDF OCR with preload check for file: {request.filename}")
     
@@ -160,14 +185,206 @@ async def pdf_ocr_with_preload(request: PdfOcrRequest, file_id: str = None):
         logger.info(f"Falling back to normal OCR processing due to error: {e}")
         return await pdf_ocr_process(request, file_id)
 
-async def pdf_ocr_process(request: PdfOcrRequest, file_id: str = None):
+def _gpu_options(settings: dict):
+    """GPU preference and preferred GPU for the request settings."""
+    # Get preferred GPU from settings
+    preferred_gpu = settings.get("preferredGpu", None)
+    if preferred_gpu is not None and preferred_gpu != "auto":
+        try:
+            preferred_gpu = int(preferred_gpu)
+        except (ValueError, TypeError):
+            preferred_gpu = None
+    else:
+        preferred_gpu = None
+    return settings.get("enableGpuAcceleration", True), preferred_gpu
+
+def _render_page(page, dpi: int, grayscale: bool = False, rotation: int = 0, clip=None):
+    """Render a PyMuPDF page, or the clip rect of it, at the given resolution, turned clockwise by rotation degrees."""
+    import fitz  # PyMuPDF
+    zoom = dpi / 72.0
+    matrix = fitz.Matrix(zoom, zoom)
+    if rotation:
+        matrix.prerotate(rotation)
+    if grayscale:
+        return page.get_pixmap(matrix=matrix, alpha=False, colorspace=fitz.csGRAY, clip=clip)
+    return page.get_pixmap(matrix=matrix, alpha=False, clip=clip)
+
+def _pixmap_to_array(pix):
+    """Page pixmap as a numpy array, without a round trip through the saved file."""
+    import numpy as np
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+
+def _ocr_image(pix, cleanup: ImagePreprocessingOptions, page_result: dict) -> RawImage:
+    """Page pixels for the OCR engine, cleaned up if enabled, without a round trip through the saved file."""
+    if not cleanup.enabled:
+        return RawImage.from_pixmap(pix)
+    from .image_preprocessing import preprocess_page
+    page_image, page_result["preprocessing"] = preprocess_page(_pixmap_to_array(pix), cleanup)
+    return RawImage(page_image.tobytes(), page_image.shape[1], page_image.shape[0], 1)
+
+def _chain_regions(future: Future, layout) -> Future:
+    """Future resolving to one OcrOutput merged from the region outputs future resolves to."""
+    merged = Future()
+    
+    def done(completed: Future):
+        try:
+            merged.set_result(merge_outputs(layout, completed.result()))
+        except Exception as e:
+            merged.set_exception(e)
+    
+    future.add_done_callback(done)
+    return merged
+
+def _set_ocr_text(page_result: dict, ocr_text: str, confidence: float = None):
+    """Fill a page result with OCR output."""
+    ocr_word_count = len(ocr_text.split()) if ocr_text.strip() else 0
+    ocr_character_count = len(ocr_text) if ocr_text.strip() else 0
+    
+    if confidence is None:
+        # Simulate confidence score for engines that do not report one
+        confidence = 0.75 + (min(ocr_word_count, 100) / 100) * 0.2
+    
+    page_result.update({
+        "extractedText": ocr_text,
+        "wordCount": ocr_word_count,
+        "characterCount": ocr_character_count,
+        "confidence": confidence,
+        "status": "ocr_processed",
+        "hasEmbeddedText": False
+    })
+
+class _QueuedPage:
+    """
+    A page queued on an OCR engine.
+    
+    Args:
+        page_result: The page's entry in results["pages"]
+        start_time: When the page started rendering
+        engine: The OcrEngine the page was queued on
+        future: The engine's pending result
+        fallback: Called with the failed engine to queue the page on another one;
+            returns (engine, future), or None if there is no other engine
+        retry: Called with the engine to recognize the page again at full resolution;
+            returns a future, or None when the page was already recognized at full resolution
+        final: Future resolved with the page's final OcrOutput for duplicates of the page, or None
+        timeout: Seconds to wait for future before calling fallback, or None to wait until it is done
+    """
+    __slots__ = ('page_result', 'start_time', 'engine', 'future', 'fallback', 'retry', 'final', 'timeout')
+    
+    def __init__(self, page_result: dict, start_time: float, engine, future, fallback, retry=None, final=None,
+                 timeout: float = None):
+        self.page_result = page_result
+        self.start_time = start_time
+        self.engine = engine
+        self.future = future
+        self.fallback = fallback
+        self.retry = retry
+        self.final = final
+        self.timeout = timeout
+
+def _retry_at_full_dpi(queued: _QueuedPage, output, min_confidence: float = None):
+    """
+    Recognize a low-confidence page of the fast first pass again at full resolution.
+    
+    Args:
+        queued: The page
+        output: OcrOutput of the first pass
+        min_confidence: Confidence below which the page is retried; defaults to the engine's
+    
+    Returns:
+        The OcrOutput with the higher confidence
+    """
+    threshold = min_confidence if min_confidence is not None else queued.engine.retry_confidence
+    if queued.retry is None or output.confidence is None or output.confidence >= threshold:
+        return output
+    page_result = queued.page_result
+    page_result["status"] = "retry_dpi"
+    try:
+        retried = queued.retry(queued.engine).result()
+    except Exception as retry_error:
+        logger.warning(f"Full resolution retry failed for page {page_result['pageNumber']}, "
+                       f"keeping the first pass: {retry_error}")
+        return output
+    page_result["firstPassConfidence"] = round(output.confidence, 4)
+    if retried.confidence is not None and retried.confidence < output.confidence:
+        return output
+    page_result["ocrDpi"] = page_result["retriedAtDpi"]
+    return retried
+
+def _finish_queued_page(queued: _QueuedPage, results: dict, min_confidence: float = None):
+    """
+    Wait for a page queued on an OCR engine and fill in its result.
+    
+    Args:
+        queued: The page
+        results: Document results whose totals are updated
+        min_confidence: Confidence below which a first pass page is retried at full resolution
+    """
+    page_result = queued.page_result
+    try:
+        try:
+            output = queued.future.result(timeout=queued.timeout)
+        except Exception as engine_error:
+            retry = queued.fallback(queued.engine)
+            if retry is None:
+                raise
+            logger.warning(f"{queued.engine.name} failed for page {page_result['pageNumber']}, "
+                           f"falling back to {retry[0].name}: {engine_error!r}")
+            queued.engine, queued.future = retry
+            output = queued.future.result()
+        output = _retry_at_full_dpi(queued, output, min_confidence)
+        if queued.final is not None:
+            queued.final.set_result(output)
+        _set_ocr_text(page_result, output.text, output.confidence)
+        if "ocrRegions" in page_result:
+            page_result["hasEmbeddedText"] = True
+        
+        # Store engine and GPU usage in page result
+        page_result["ocrEngine"] = output.engine
+        page_result["gpuUsed"] = output.gpu_used
+        page_result["gpuInfo"] = get_gpu_info()
+        page_result["selectedGpu"] = output.gpu_id
+    except Exception as ocr_error:
+        if queued.final is not None and not queued.final.done():
+            queued.final.set_exception(ocr_error)
+        logger.error(f"OCR failed for page {page_result['pageNumber']}: {ocr_error}")
+        page_result.update({
+            "status": "failed",
+            "extractedText": f"OCR failed: {str(ocr_error)}"
+        })
+    
+    page_result["processingTime"] = int((time.time() - queued.start_time) * 1000)
+    results["totalWords"] += page_result["wordCount"]
+    results["totalCharacters"] += page_result["characterCount"]
+
+async def pdf_ocr_process(request: PdfOcrRequest, file_id: str = None, priority: str = INTERACTIVE,
+                          tenant: str = None, weight: float = 1.0,
+                          scheduling: Optional[Callable[[], Tuple[str, float]]] = None):
     """
     Process a PDF file with OCR:
     1. Convert PDF to images
     2. Try to extract embedded text
     3. Use OCR if no embedded text or low quality
     4. Return results with images and extracted text
+
+    The work runs on an OCR job thread so the event loop stays responsive, and
+    every page waits for a slot from the OCR scheduler.
+
+    Args:
+        request: The PDF OCR request
+        file_id: Optional file ID to store the results under
+        priority: Scheduler priority class: "interactive", "normal" or "bulk"
+        tenant: Key pages are shared fairly between; defaults to the file
+        weight: Relative share of the tenant within its priority class
+        scheduling: Optional callable returning the current (priority, weight); read
+            before every page so a batch that changes priority yields from its next page
     """
+    return await run_ocr_job(priority, _pdf_ocr_process_sync, request, file_id, priority, tenant, weight, scheduling)
+
+def _pdf_ocr_process_sync(request: PdfOcrRequest, file_id: str = None, priority: str = INTERACTIVE,
+                          tenant: str = None, weight: float = 1.0,
+                          scheduling: Optional[Callable[[], Tuple[str, float]]] = None):
+    """Blocking implementation of pdf_ocr_process()."""
     start_time = time.time()
     logger.info(f"Starting PDF OCR processing for file: {request.filename}")
     
@@ -200,6 +417,7 @@ async def pdf_ocr_process(request: PdfOcrRequest, file_id: str = None):
         }
         
         # Convert PDF to images and extract embedded text
+        import fitz  # PyMuPDF
         doc = fitz.open(stream=pdf_bytes, filetype="pdf")
         page_count = len(doc)
         
@@ -211,226 +429,298 @@ async def pdf_ocr_process(request: PdfOcrRequest, file_id: str = None):
         first_page_pixmap = None
         first_page_image_path = None
         
-        for page_num in range(page_count):
-            page_start_time = time.time()
-            page = doc[page_num]
+        # Resolve the OCR engine and language once per document rather than per page
+        default_engine = get_setting_value('ocr_default_engine', 'easyocr', 'ocr')
+        requested_engine = settings.get("ocrEngine", default_engine)
+        language_setting = settings.get("language")
+        
+        # Get language from settings if not provided
+        if not language_setting:
+            language_setting = get_setting_value('ocr_default_lang', 'es', 'ocr')
+        
+        # The requested engine, or the fastest available one for "auto" or when it cannot be used
+        use_gpu, preferred_gpu = _gpu_options(settings)
+        quality = settings.get("ocrQuality")
+        ocr_engine = engine_registry.select(requested_engine, language_setting, quality, use_gpu)
+        
+        logger.info(f"Using OCR engine: {ocr_engine.name} (requested: {requested_engine}), language setting: {language_setting}, "
+                    f"OCR language: {ocr_engine.language_code(language_setting)}")
+        
+        scheduler_key = tenant or file_id or request.filename
+        
+        def queue_in_slot(queue, engine):
+            # queue(engine) submits the page to an engine and returns the future; the page
+            # holds a scheduler slot from rendering until the engine has recognized it
+            ticket = ocr_scheduler.acquire(priority, scheduler_key, weight)
+            future = None
+            try:
+                future = queue(engine)
+                return future
+            finally:
+                ocr_scheduler.release_after(ticket, future)
+        
+        def queue_on_fallback(failed_engine, queue):
+            fallback_engine = engine_registry.fallback(failed_engine, language_setting, quality, use_gpu)
+            if fallback_engine is None:
+                return None
+            return fallback_engine, queue_in_slot(queue, fallback_engine)
+        
+        # Optional cleanup of the page images before OCR
+        cleanup = ImagePreprocessingOptions(**(settings.get("imagePreprocessing") or {}))
+        
+        # Pages are recognized at a lower resolution first, and only those recognized with
+        # low confidence are rendered again at the requested DPI
+        dpi = settings.get("dpi", 300)
+        grayscale = settings.get("colorMode") == "Grayscale"
+        fast_dpi = settings.get("fastDpi", OCR_FAST_DPI) or 0
+        first_pass_dpi = fast_dpi if 0 < fast_dpi < dpi else dpi
+        min_confidence = settings.get("confidenceThreshold")
+        
+        def queue_regions(engine, page, layout, render_dpi, page_result):
+            # Only the regions without a text layer are rendered and recognized
+            futures = []
+            for region in layout.regions:
+                pix = _render_page(page, render_dpi, grayscale, clip=region)
+                futures.append(engine.submit(_ocr_image(pix, cleanup, page_result), language_setting,
+                                             use_gpu, preferred_gpu, priority))
+            return _chain_regions(gather(futures), layout)
+        
+        def render_at_full_dpi(engine, page_num, page_result, layout=None, pix=None):
+            # pix is the page image already rendered at full resolution, if there is one
+            page_result["retriedAtDpi"] = dpi
+            if layout is not None:
+                return queue_regions(engine, doc[page_num], layout, dpi, page_result)
+            if pix is None:
+                pix = _render_page(doc[page_num], dpi, grayscale, page_result.get("rotation", 0))
+            return engine.submit(_ocr_image(pix, cleanup, page_result), language_setting,
+                                 use_gpu, preferred_gpu, priority)
+        
+        def queue_at_full_dpi(engine, page_num, page_result, layout=None, pix=None):
+            # The retry takes its own scheduler slot, held until the page is recognized again
+            return queue_in_slot(lambda engine: render_at_full_dpi(engine, page_num, page_result, layout, pix), engine)
+        
+        # Pages with a partial text layer get OCR only where it is missing
+        region_ocr = settings.get("regionOcr", REGION_OCR)
+        
+        # Scanned pages are turned upright before rendering
+        auto_rotate = settings.get("autoRotate", ORIENTATION_DETECTION)
+        
+        # Blank pages are not recognized, and exact copies of recently recognized pages reuse their text
+        skip_blank = settings.get("skipBlankPages", PAGE_SKIP_BLANK)
+        dedupe = settings.get("dedupePages", PAGE_DEDUPE)
+        dedupe_scope = (ocr_engine.name, ocr_engine.language_code(language_setting), dpi, first_pass_dpi,
+                        settings.get("colorMode"), json.dumps(cleanup.dict(), sort_keys=True))
+        if not settings.get("dedupeAcrossDocuments", PAGE_DEDUPE_CROSS_DOCUMENT):
+            # Only pages of this document, or of an earlier run on the same bytes
+            dedupe_scope += (hashlib.sha256(pdf_bytes).hexdigest(),)
+        results["skippedPages"] = {"blank": 0, "duplicate": 0}
+        results["hybridPages"] = 0
+        
+        # Pages queued on an OCR engine
+        pending_pages = deque()
+        # Engines recognizing pages in parallel or in batches need several of them in flight
+        max_pending_pages = ocr_engine.max_pending_pages
+        
+        try:
+            for page_num in range(page_count):
+                # Take a scheduler slot per page, so batch work yields to interactive
+                # requests and to other tenants at every page boundary. A page queued on
+                # the engine keeps its slot until it is recognized.
+                if scheduling is not None:
+                    priority, weight = scheduling()
+                ticket = ocr_scheduler.acquire(priority, scheduler_key, weight)
+                page_future = None
+                try:
+                    page_start_time = time.time()
+                    page = doc[page_num]
             
-            # Convert page to image
-            dpi = settings.get("dpi", 300)
-            zoom = dpi / 72.0
-            matrix = fitz.Matrix(zoom, zoom)
+                    # Try to extract embedded text first
+                    embedded_text = page.get_text()
+                    word_count = len(embedded_text.split()) if embedded_text.strip() else 0
+                    # Images the text layer does not cover are recognized on their own
+                    layout = analyze_page(page) if region_ocr and embedded_text.strip() else None
+                    if layout is not None and not layout.regions:
+                        layout = None
+                    needs_ocr = layout is None and not (embedded_text.strip() and word_count > 5)  # Minimum threshold for meaningful text
             
-            if settings.get("colorMode") == "Grayscale":
-                pix = page.get_pixmap(matrix=matrix, alpha=False, colorspace=fitz.csGRAY)
-            else:
-                pix = page.get_pixmap(matrix=matrix, alpha=False)
+                    # Cheap low-resolution look at pages headed for OCR
+                    page_check = page_filter.inspect(page) if needs_ocr and (skip_blank or dedupe) else None
+                    blank = bool(page_check and page_check.blank and skip_blank)
+                    rotation = 0
             
-            # Store first page pixmap for thumbnail generation
-            if page_num == 0:
-                first_page_pixmap = pix
+                    # One cheap look at a small render instead of OCR on a sideways page
+                    if needs_ocr and auto_rotate and not blank:
+                        orientation = orientation_detector.detect_page(page)
+                        rotation = orientation.rotation
+                        if rotation:
+                            logger.info(f"Page {page_num + 1} of {request.filename} is turned, rotating it by {rotation} degrees "
+                                        f"({orientation.method}, confidence {orientation.confidence:.2f})")
+                
+                    # Convert page to image at the requested resolution; pages headed for OCR are
+                    # recognized from a separate render at the first pass resolution
+                    pix = _render_page(page, dpi, grayscale, rotation)
+                    ocr_pix = pix
+                    if needs_ocr and not blank and first_pass_dpi < dpi:
+                        ocr_pix = _render_page(page, first_pass_dpi, grayscale, rotation)
             
-            # Save image
-            image_format = settings.get("imageFormat", "PNG").lower()
-            img_filename = f"page_{page_num + 1}.{image_format}"
-            img_path = os.path.join(temp_dir, img_filename)
+                    # Store first page pixmap for thumbnail generation
+                    if page_num == 0:
+                        first_page_pixmap = pix
             
-            # Store first page image path for thumbnail generation
-            if page_num == 0:
-                first_page_image_path = img_path
+                    # Save image
+                    image_format = settings.get("imageFormat", "PNG").lower()
+                    img_filename = f"page_{page_num + 1}.{image_format}"
+                    img_path = os.path.join(temp_dir, img_filename)
             
-            try:
-                if image_format == "png":
-                    pix.save(img_path)
-                else:
-                    # Convert to PIL Image for other formats
-                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                    img.save(img_path, format=image_format.upper())
-                logger.info(f"Successfully saved image: {img_path}")
-            except Exception as save_error:
-                logger.error(f"Error saving image {img_path}: {save_error}")
-                raise save_error
+                    # Store first page image path for thumbnail generation
+                    if page_num == 0:
+                        first_page_image_path = img_path
             
-            # Try to extract embedded text first
-            embedded_text = page.get_text()
-            word_count = len(embedded_text.split()) if embedded_text.strip() else 0
+                    try:
+                        if image_format == "png":
+                            pix.save(img_path)
+                        else:
+                            # Convert to PIL Image for other formats
+                            img = Image.frombytes("L" if pix.n == 1 else "RGB", [pix.width, pix.height], pix.samples)
+                            img.save(img_path, format=image_format.upper())
+                        logger.info(f"Successfully saved image: {img_path}")
+                    except Exception as save_error:
+                        logger.error(f"Error saving image {img_path}: {save_error}")
+                        raise save_error
             
-            page_result = {
-                "id": f"{request.filename}_page_{page_num + 1}",
-                "pageNumber": page_num + 1,
-                "imageUrl": f"/api/ocr/temp_image?path={img_filename}&temp_dir={os.path.basename(temp_dir)}",
-                "width": pix.width,
-                "height": pix.height,
-                "extractedText": "",
-                "wordCount": 0,
-                "characterCount": 0,
-                "confidence": 0.0,
-                "processingTime": 0,
-                "status": "converted",
-                "hasEmbeddedText": False,
-                "fileId": f"{file_id}_page_{page_num + 1}"
-            }
+                    page_result = {
+                        "id": f"{request.filename}_page_{page_num + 1}",
+                        "pageNumber": page_num + 1,
+                        "imageUrl": f"/api/ocr/temp_image?path={img_filename}&temp_dir={os.path.basename(temp_dir)}",
+                        "width": pix.width,
+                        "height": pix.height,
+                        "extractedText": "",
+                        "wordCount": 0,
+                        "characterCount": 0,
+                        "confidence": 0.0,
+                        "processingTime": 0,
+                        "status": "converted",
+                        "hasEmbeddedText": False,
+                        "fileId": f"{file_id}_page_{page_num + 1}"
+                    }
+                    if rotation:
+                        page_result["rotation"] = rotation
             
-            if embedded_text.strip() and word_count > 5:  # Minimum threshold for meaningful text
-                # Use embedded text
-                page_result.update({
-                    "extractedText": embedded_text,
-                    "wordCount": word_count,
-                    "characterCount": len(embedded_text),
-                    "confidence": 0.95,
-                    "status": "text_extracted",
-                    "hasEmbeddedText": True
-                })
-                results["hasEmbeddedText"] = True
-            else:
-                # Use OCR
-                try:
-                    # Get default OCR engine from settings if not provided
-                    default_engine = get_setting_value('ocr_default_engine', 'easyocr', 'ocr')
-                    ocr_engine = settings.get("ocrEngine", default_engine)
-                    language_setting = settings.get("language")
-                    
-                    # Get language from settings database if not provided
-                    if not language_setting:
-                        language_setting = get_setting_value('ocr_default_lang', 'es', 'ocr')
-                    
-                    # Map language code for OCR engines
-                    ocr_language = get_ocr_language_code(language_setting)
-                    
-                    logger.info(f"Using OCR engine: {ocr_engine}, language setting: {language_setting}, OCR language: {ocr_language}")
-                    
-                    if ocr_engine.startswith("tesseract"):
+                    if layout is not None:
+                        # Text layer plus OCR of the regions without one, merged in reading order
+                        page_result.update({
+                            "ocrRegions": [[round(value, 1) for value in region] for region in layout.regions],
+                            "ocrAreaRatio": round(layout.ocr_area_ratio, 4),
+                            "ocrDpi": first_pass_dpi
+                        })
+                        results["hasEmbeddedText"] = True
+                        results["hybridPages"] += 1
                         try:
-                            img = Image.open(img_path)
-                            ocr_text = pytesseract.image_to_string(img, lang=ocr_language)
-                            logger.info(f"Tesseract OCR successful for {request.filename} page {page_num + 1}")
-                        except Exception as tesseract_error:
-                            logger.warning(f"Tesseract failed, falling back to EasyOCR: {tesseract_error}")
-                            # Fallback to EasyOCR if Tesseract fails
-                            easyocr_lang = 'es' if language_setting == 'es' else 'en'
-                            # Get preferred GPU from settings
-                            preferred_gpu = settings.get("preferredGpu", None)
-                            if preferred_gpu is not None and preferred_gpu != "auto":
-                                try:
-                                    preferred_gpu = int(preferred_gpu)
-                                except (ValueError, TypeError):
-                                    preferred_gpu = None
-                            else:
-                                preferred_gpu = None
-                                
-                            # Configure GPU with selection
-                            gpu_enabled, gpu_id = configure_easyocr_gpu_with_selection(
-                                settings.get("enableGpuAcceleration", True),
-                                preferred_gpu
-                            )
-                            
-                            try:
-                                reader = easyocr.Reader([easyocr_lang], gpu=gpu_enabled)
-                                result = reader.readtext(img_path, detail=0, paragraph=False)
-                                ocr_text = '\n'.join(result)
-                            finally:
-                                # Always release the GPU when done
-                                if gpu_enabled and gpu_id is not None:
-                                    release_gpu(gpu_id)
-                            
-                            # Store GPU usage in page result
-                            gpu_info = get_gpu_info()
-                            page_result["gpuUsed"] = gpu_enabled
-                            page_result["gpuInfo"] = gpu_info
-                            page_result["selectedGpu"] = gpu_id
-                    elif ocr_engine == "easyocr":
-                        # EasyOCR uses different language codes
-                        easyocr_lang = 'es' if language_setting == 'es' else 'en'
-                        # Get preferred GPU from settings
-                        preferred_gpu = settings.get("preferredGpu", None)
-                        if preferred_gpu is not None and preferred_gpu != "auto":
-                            try:
-                                preferred_gpu = int(preferred_gpu)
-                            except (ValueError, TypeError):
-                                preferred_gpu = None
-                        else:
-                            preferred_gpu = None
-                            
-                        # Configure GPU with selection
-                        gpu_enabled, gpu_id = configure_easyocr_gpu_with_selection(
-                            settings.get("enableGpuAcceleration", True),
-                            preferred_gpu
-                        )
-                        
-                        try:
-                            reader = easyocr.Reader([easyocr_lang], gpu=gpu_enabled)
-                            result = reader.readtext(img_path, detail=0, paragraph=False)
-                            ocr_text = '\n'.join(result)
-                        finally:
-                            # Always release the GPU when done
-                            if gpu_enabled and gpu_id is not None:
-                                release_gpu(gpu_id)
-                        
-                        # Store GPU usage in page result
-                        gpu_info = get_gpu_info()
-                        page_result["gpuUsed"] = gpu_enabled
-                        page_result["gpuInfo"] = gpu_info
-                        page_result["selectedGpu"] = gpu_id
+                            queue = (lambda engine, page=page, layout=layout, page_result=page_result:
+                                     queue_regions(engine, page, layout, first_pass_dpi, page_result))
+                            retry = None
+                            if first_pass_dpi < dpi:
+                                retry = (lambda engine, page_num=page_num, page_result=page_result, layout=layout:
+                                         queue_at_full_dpi(engine, page_num, page_result, layout))
+                            page_future = queue(ocr_engine)
+                            pending_pages.append(_QueuedPage(
+                                page_result, page_start_time, ocr_engine, page_future,
+                                lambda failed_engine, queue=queue: queue_on_fallback(failed_engine, queue), retry))
+                            page_result["status"] = "ocr_queued"
+                        except Exception as ocr_error:
+                            logger.error(f"Region OCR failed for page {page_num + 1}: {ocr_error}")
+                            page_result.update({
+                                "status": "failed",
+                                "extractedText": f"OCR failed: {str(ocr_error)}"
+                            })
+                    elif not needs_ocr:
+                        # Use embedded text
+                        page_result.update({
+                            "extractedText": embedded_text,
+                            "wordCount": word_count,
+                            "characterCount": len(embedded_text),
+                            "confidence": 0.95,
+                            "status": "text_extracted",
+                            "hasEmbeddedText": True
+                        })
+                        results["hasEmbeddedText"] = True
+                    elif blank:
+                        page_result.update({
+                            "confidence": 1.0,
+                            "status": "blank",
+                            "inkRatio": round(page_check.ink_ratio, 5)
+                        })
+                        results["skippedPages"]["blank"] += 1
                     else:
-                        # Default to EasyOCR
-                        logger.info(f"Unknown OCR engine '{ocr_engine}', using EasyOCR as default")
-                        easyocr_lang = 'es' if language_setting == 'es' else 'en'
-                        # Get preferred GPU from settings
-                        preferred_gpu = settings.get("preferredGpu", None)
-                        if preferred_gpu is not None and preferred_gpu != "auto":
-                            try:
-                                preferred_gpu = int(preferred_gpu)
-                            except (ValueError, TypeError):
-                                preferred_gpu = None
-                        else:
-                            preferred_gpu = None
-                            
-                        # Configure GPU with selection
-                        gpu_enabled, gpu_id = configure_easyocr_gpu_with_selection(
-                            settings.get("enableGpuAcceleration", True),
-                            preferred_gpu
-                        )
-                        
+                        digest = page_digest(ocr_pix) if page_check and dedupe else None
+                        duplicate = page_filter.find_duplicate(dedupe_scope, digest) if digest else None
+                        page_label = f"{request.filename} page {page_num + 1}"
+                        # Use OCR
                         try:
-                            reader = easyocr.Reader([easyocr_lang], gpu=gpu_enabled)
-                            result = reader.readtext(img_path, detail=0, paragraph=False)
-                            ocr_text = '\n'.join(result)
-                        finally:
-                            # Always release the GPU when done
-                            if gpu_enabled and gpu_id is not None:
-                                release_gpu(gpu_id)
+                            page_result["ocrDpi"] = first_pass_dpi
+                            fallback = (lambda failed_engine, pix=ocr_pix, page_result=page_result: queue_on_fallback(
+                                failed_engine, lambda engine: engine.submit(_ocr_image(pix, cleanup, page_result), language_setting,
+                                                                            use_gpu, preferred_gpu, priority)))
+                            if duplicate:
+                                # Same text as a page recognized before, or still being recognized
+                                future, page_result["duplicateOf"] = duplicate
+                                
+                                def recognize_instead(failed_engine, pix=ocr_pix, page_result=page_result):
+                                    # The other page failed or is taking too long; recognize this one itself
+                                    page_result.pop("duplicateOf", None)
+                                    return ocr_engine, queue_in_slot(
+                                        lambda engine: engine.submit(_ocr_image(pix, cleanup, page_result), language_setting,
+                                                                     use_gpu, preferred_gpu, priority), ocr_engine)
+                                
+                                queued = _QueuedPage(page_result, page_start_time, ocr_engine, future, recognize_instead,
+                                                     timeout=PAGE_DEDUPE_WAIT_SECONDS)
+                                results["skippedPages"]["duplicate"] += 1
+                                logger.info(f"{page_label} duplicates {page_result['duplicateOf']}, reusing its OCR result")
+                            else:
+                                future = page_future = ocr_engine.submit(_ocr_image(ocr_pix, cleanup, page_result), language_setting,
+                                                                         use_gpu, preferred_gpu, priority)
+                                retry = None
+                                if first_pass_dpi < dpi:
+                                    # The saved page image is the full resolution render the retry needs
+                                    retry = (lambda engine, page_num=page_num, page_result=page_result, pix=pix:
+                                             queue_at_full_dpi(engine, page_num, page_result, pix=pix))
+                                # Duplicates wait for the final text, after a possible retry
+                                final = Future() if digest else None
+                                queued = _QueuedPage(page_result, page_start_time, ocr_engine, future, fallback, retry, final)
+                                if final is not None:
+                                    page_filter.add(dedupe_scope, digest, final, page_label)
                         
-                        # Store GPU usage in page result
-                        gpu_info = get_gpu_info()
-                        page_result["gpuUsed"] = gpu_enabled
-                        page_result["gpuInfo"] = gpu_info
-                        page_result["selectedGpu"] = gpu_id
-                    
-                    ocr_word_count = len(ocr_text.split()) if ocr_text.strip() else 0
-                    ocr_character_count = len(ocr_text) if ocr_text.strip() else 0
+                            # The next pages are rendered while this one is recognized
+                            pending_pages.append(queued)
+                            page_result["status"] = "ocr_queued"
                     
-                    # Simulate confidence score
-                    confidence = 0.75 + (min(ocr_word_count, 100) / 100) * 0.2
-                    
-                    page_result.update({
-                        "extractedText": ocr_text,
-                        "wordCount": ocr_word_count,
-                        "characterCount": ocr_character_count,
-                        "confidence": confidence,
-                        "status": "ocr_processed",
-                        "hasEmbeddedText": False
-                    })
-                    
-                except Exception as ocr_error:
-                    logger.error(f"OCR failed for page {page_num + 1}: {ocr_error}")
-                    page_result.update({
-                        "status": "failed",
-                        "extractedText": f"OCR failed: {str(ocr_error)}"
-                    })
+                        except Exception as ocr_error:
+                            logger.error(f"OCR failed for page {page_num + 1}: {ocr_error}")
+                            page_result.update({
+                                "status": "failed",
+                                "extractedText": f"OCR failed: {str(ocr_error)}"
+                            })
             
-            page_result["processingTime"] = int((time.time() - page_start_time) * 1000)
-            results["pages"].append(page_result)
-            results["totalWords"] += page_result["wordCount"]
-            results["totalCharacters"] += page_result["characterCount"]
+                    page_result["processingTime"] = int((time.time() - page_start_time) * 1000)
+                    results["pages"].append(page_result)
+                    results["totalWords"] += page_result["wordCount"]
+                    results["totalCharacters"] += page_result["characterCount"]
+                finally:
+                    ocr_scheduler.release_after(ticket, page_future)
+            
+                # Bound the pages of this document waiting for OCR
+                while len(pending_pages) > max_pending_pages:
+                    _finish_queued_page(pending_pages.popleft(), results, min_confidence)
+        
+            while pending_pages:
+                _finish_queued_page(pending_pages.popleft(), results, min_confidence)
+        finally:
+            # A document that fails partway must not leave duplicates of its queued pages
+            # waiting; failing their final result also drops them from the page filter
+            for queued in pending_pages:
+                if queued.final is not None and not queued.final.done():
+                    queued.final.set_exception(RuntimeError(
+                        f"OCR of {request.filename} stopped before page {queued.page_result['pageNumber']} was recognized"))
         
         # Explicitly close and clean up resources
         doc.close()
@@ -518,11 +808,11 @@ async def pdf_ocr_process(request: PdfOcrRequest, file_id: str = None):
                 db.commit()
                 logger.info(f"Stored OCR results in database for file_id: {file_id} with status: {overall_status}")
                 db.close()
+                evict_cached_text(file_id)
                 
                 # Generate thumbnail and store processed images during OCR processing
                 try:
-                    db_path = DATABASE_URL.replace('sqlite:///', '') if DATABASE_URL.startswith('sqlite:///') else 'ocr.db'
-                    thumbnail_generator = ThumbnailGenerator(db_path)
+                    thumbnail_generator = ThumbnailGenerator()
                     thumbnail_success = thumbnail_generator.generate_thumbnail_during_ocr(
                         file_id=file_id,
                         first_page_image_path=first_page_image_path,
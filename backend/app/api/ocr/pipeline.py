@@ -1,23 +1,39 @@
+import asyncio
 import logging
 import base64
 import os
 import tempfile
+from typing import List, Tuple
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from .models import PreprocessRequest
 from .db_utils import get_db_session, get_setting_value
 from .preprocessing import preprocess
 from .ocr_processing import ocr_images
+from .scheduler import NORMAL, BULK, run_ocr_job
 from app.schemas import OcrImagesRequest
 from app.models import OcrResult
 from app.api.sharepoint import get_file_content as get_sharepoint_file_content
 from app.utils.cache_utils import generate_cache_key, save_file_cache, load_file_cache
 from app.utils.llm_utils import get_llm_quality_score
+from app.utils.preload_utils import evict_cached_text
 
 logger = logging.getLogger(__name__)
 
-async def run_ocr_pipeline(drive_id: str, item_id: str, ocr_result_file_id: str):
+# Files of a folder processed at the same time; their OCR also waits for OCR scheduler slots
+PIPELINE_MAX_CONCURRENCY = int(os.getenv('PIPELINE_MAX_CONCURRENCY', '4'))
+
+async def run_ocr_pipeline(drive_id: str, item_id: str, ocr_result_file_id: str,
+                           priority: str = NORMAL, tenant: str = None):
     """
     Runs the OCR pipeline for a given file.
+
+    Args:
+        drive_id: SharePoint drive of the file
+        item_id: SharePoint item of the file
+        ocr_result_file_id: OcrResult row to update
+        priority: Scheduler priority class of the OCR
+        tenant: Key OCR slots are shared fairly between; defaults to the file
     """
     logging.info(f"Starting OCR pipeline for file_id: {item_id}, ocr_result_file_id: {ocr_result_file_id}")
     db = None
@@ -40,7 +56,7 @@ async def run_ocr_pipeline(drive_id: str, item_id: str, ocr_result_file_id: str)
             logging.info(f"Using cached file data for item_id: {item_id}")
             pdf_data = base64.b64encode(cached_file_data).decode('utf-8')
         else:
-            file_content = get_sharepoint_file_content(drive_id=drive_id, item_id=item_id)
+            file_content = await run_in_threadpool(get_sharepoint_file_content, drive_id=drive_id, item_id=item_id)
             if file_content and file_content.body:
                 # Cache the file data
                 save_file_cache(cache_key, file_content.body, "sharepoint_files")
@@ -58,19 +74,21 @@ async def run_ocr_pipeline(drive_id: str, item_id: str, ocr_result_file_id: str)
             directory_id=drive_id,
             pdf_data=pdf_data
         )
-        preprocess_result = preprocess(preprocess_request)
+        # Blocking stages run in the thread pool so that other pipelines and their LLM requests keep going
+        preprocess_result = await run_in_threadpool(preprocess, preprocess_request)
         image_paths = [os.path.join(tempfile.gettempdir(), 'ocr_images', path) for path in preprocess_result["image_ids"]]
 
         # Get language and engine from settings
         default_lang = get_setting_value('ocr_default_lang', 'es', 'ocr')
         default_engine = get_setting_value('ocr_default_engine', 'easyocr', 'ocr')
-        easyocr_lang = 'es' if default_lang == 'es' else 'en'
-        ocr_images_request = OcrImagesRequest(image_paths=image_paths, lang=easyocr_lang, engine=default_engine, paragraph=False)
-        ocr_result_initial = ocr_images(ocr_images_request)
+        ocr_images_request = OcrImagesRequest(image_paths=image_paths, lang=default_lang, engine=default_engine, paragraph=False)
+        # OCR waits for scheduler slots, so it runs on the OCR job threads rather than the shared pool
+        ocr_result_initial = await run_ocr_job(priority, ocr_images, ocr_images_request, priority, tenant or item_id)
         extracted_text = "\\n".join(ocr_result_initial["texts"])
 
         ocr_result.pdf_text = extracted_text
         db.commit()
+        evict_cached_text(ocr_result_file_id)
 
         # 2. LLM Quality Review
         ocr_result.status = "LLM Reviewing"
@@ -93,11 +111,13 @@ async def run_ocr_pipeline(drive_id: str, item_id: str, ocr_result_file_id: str)
             ocr_result.status = "OCR Done"
             ocr_result.ocr_text = extracted_text
             db.commit()
+            evict_cached_text(ocr_result_file_id)
         else:
             logging.info(f"Quality score {quality_score} is above threshold {quality_threshold}. Setting status to 'OCR Done'")
             ocr_result.status = "OCR Done"
             ocr_result.ocr_text = extracted_text
             db.commit()
+            evict_cached_text(ocr_result_file_id)
 
     except Exception as e:
         logging.error(f"Error in OCR pipeline for ocr_result_file_id: {ocr_result_file_id}: {e}", exc_info=True)
@@ -109,4 +129,27 @@ async def run_ocr_pipeline(drive_id: str, item_id: str, ocr_result_file_id: str)
                 db.commit()
     finally:
         if db:
-            db.close()
\ No newline at end of file
+            db.close()
+
+
+async def run_ocr_pipelines(drive_id: str, items: List[Tuple[str, str]], tenant: str = None):
+    """
+    Runs the OCR pipeline for several files concurrently.
+
+    At most PIPELINE_MAX_CONCURRENCY files are processed at a time, so the
+    quality reviews of files finishing together share LLM requests. Their OCR
+    is bulk work, so it yields scheduler slots to interactive and normal OCR.
+
+    Args:
+        drive_id: SharePoint drive of the files
+        items: (item_id, ocr_result_file_id) per file
+        tenant: Key OCR slots are shared fairly between, e.g. the folder; defaults to the drive
+    """
+    semaphore = asyncio.Semaphore(PIPELINE_MAX_CONCURRENCY)
+
+    async def run(item_id: str, ocr_result_file_id: str):
+        async with semaphore:
+            await run_ocr_pipeline(drive_id, item_id, ocr_result_file_id, BULK, tenant or drive_id)
+
+    logging.info(f"Starting OCR pipelines for {len(items)} file(s) in drive {drive_id}")
+    await asyncio.gather(*(run(item_id, ocr_result_file_id) for item_id, ocr_result_file_id in items))
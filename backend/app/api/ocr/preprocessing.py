@@ -4,10 +4,10 @@ import base64
 import os
 import tempfile
 import shutil
-import fitz
 from PIL import Image
 from fastapi import HTTPException
 from .models import PreprocessRequest
+from .orientation import orientation_detector, ORIENTATION_DETECTION
 from app.utils.cache_utils import cache_preprocessing_result
 
 logger = logging.getLogger(__name__)
@@ -16,13 +16,18 @@ logger = logging.getLogger(__name__)
 def preprocess(req: PreprocessRequest):
     """
     Preprocess a PDF file: convert to images and extract embedded text.
-    Supports PyMuPDF and pdf2image engines. All image options are applied here.
+    Supports PyMuPDF and pdf2image engines. All image options are applied here,
+    including the cleanup steps in req.image_preprocessing.
     """
     start_time = time.time()
     pdf_bytes = base64.b64decode(req.pdf_data)
     image_ids = []
     image_urls = []
     page_texts = []
+    page_reports = []
+    detected_rotations = {}
+    auto_rotate = ORIENTATION_DETECTION if req.auto_rotate is None else req.auto_rotate
+    cleanup = req.image_preprocessing if req.image_preprocessing and req.image_preprocessing.enabled else None
     base_temp_dir = os.path.join(tempfile.gettempdir(), 'ocr_images')
     temp_dir = os.path.join(base_temp_dir, req.directory_id, req.file_id)
     if os.path.exists(temp_dir):
@@ -52,6 +57,7 @@ def preprocess(req: PreprocessRequest):
         return [p for p in page_numbers if 1 <= p <= num_pages]
 
     try:
+        import fitz  # PyMuPDF
         doc = fitz.open(stream=pdf_bytes, filetype="pdf")
         num_pages = len(doc)
         selected_pages = parse_page_range(req.page_range, num_pages)
@@ -60,7 +66,12 @@ def preprocess(req: PreprocessRequest):
             page = doc[page_num - 1]  # PyMuPDF uses 0-based indexing
             
             rotate = int(req.rotation)
-            mat = fitz.Matrix(1, 1).preRotate(rotate)
+            if not rotate and auto_rotate:
+                # An explicit rotation wins; otherwise turn scanned pages upright
+                rotate = orientation_detector.detect_page(page).rotation
+                if rotate:
+                    detected_rotations[page_num] = rotate
+            mat = fitz.Matrix(1, 1).prerotate(rotate)
             
             if req.width > 0 and req.height > 0:
                 # Use provided width and height
@@ -84,6 +95,13 @@ def preprocess(req: PreprocessRequest):
             
             image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
             
+            if cleanup:
+                import numpy as np
+                from .image_preprocessing import preprocess_page
+                page_image, report = preprocess_page(np.asarray(image), cleanup)
+                image = Image.fromarray(page_image)
+                page_reports.append(dict(report, page=page_num))
+            
             img_filename = f"page_{page_num}.{req.image_format}"
             img_path = os.path.join(temp_dir, img_filename)
             image.save(img_path, format=req.image_format.upper())
@@ -111,10 +129,12 @@ def preprocess(req: PreprocessRequest):
         "colorspace": req.colorspace,
         "alpha": req.alpha,
         "rotation": req.rotation,
+        "detected_rotations": detected_rotations,
         "image_format": req.image_format,
         "page_range": req.page_range,
         "grayscale": req.grayscale,
-        "transparent": req.transparent
+        "transparent": req.transparent,
+        "image_preprocessing": {"options": cleanup.dict(), "pages": page_reports} if cleanup else None
     }
     
     logger.info(f"PDF preprocessed. Images: {image_ids}, Metrics: {metrics}")
@@ -0,0 +1,191 @@
+"""
+Push channel for batch processing progress.
+
+Batch processors publish a compact progress snapshot (counters, current file,
+ETA) whenever their state changes. Subscribers on the API event loop receive
+the first snapshot in full and afterwards only the fields that changed, at most
+once per BATCH_PROGRESS_MIN_INTERVAL_SECONDS per subscriber. Updates published
+in between are coalesced, so a subscriber always ends on the latest state.
+
+Batches run on the task queue's own thread and event loop, so publish() is
+thread-safe and wakes subscribers through their loop.
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import AsyncIterator, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Minimum time between two messages to the same subscriber
+BATCH_PROGRESS_MIN_INTERVAL_SECONDS = float(os.getenv('BATCH_PROGRESS_MIN_INTERVAL_SECONDS', '0.5'))
+# Keep-alive message when nothing changed, so proxies do not close idle streams
+BATCH_PROGRESS_HEARTBEAT_SECONDS = float(os.getenv('BATCH_PROGRESS_HEARTBEAT_SECONDS', '15'))
+
+TERMINAL_STATUSES = ('completed', 'error', 'cancelled')
+
+# Subscription key for all batches
+ALL_BATCHES = '*'
+
+
+class _Subscription:
+    def __init__(self, key: str, loop: asyncio.AbstractEventLoop):
+        self.key = key
+        self.loop = loop
+        self.changed = asyncio.Event()
+
+    def wake(self):
+        try:
+            self.loop.call_soon_threadsafe(self.changed.set)
+        except RuntimeError:
+            # The subscriber's loop has closed; it will be unsubscribed by its stream
+            pass
+
+
+class ProgressBroker:
+    """Latest progress per batch, fanned out to subscribers as compact deltas."""
+
+    def __init__(self, min_interval: float = BATCH_PROGRESS_MIN_INTERVAL_SECONDS,
+                 heartbeat: float = BATCH_PROGRESS_HEARTBEAT_SECONDS):
+        self.min_interval = min_interval
+        self.heartbeat = heartbeat
+        self._lock = threading.Lock()
+        # batch_id -> latest progress dict
+        self._latest: Dict[str, dict] = {}
+        self._versions: Dict[str, int] = {}
+        self._subscriptions: Dict[str, Set[_Subscription]] = {}
+        self.published = 0
+
+    def publish(self, batch_id: str, progress: Optional[dict]):
+        """
+        Record the latest progress of a batch and wake its subscribers.
+
+        Args:
+            batch_id: The batch ID
+            progress: Compact progress dict, or None if the batch was removed
+        """
+        with self._lock:
+            if progress is None:
+                if batch_id not in self._latest:
+                    return
+                del self._latest[batch_id]
+                del self._versions[batch_id]
+            elif self._latest.get(batch_id) == progress:
+                return
+            else:
+                self._latest[batch_id] = progress
+                self._versions[batch_id] = self._versions.get(batch_id, 0) + 1
+            self.published += 1
+            subscriptions = list(self._subscriptions.get(batch_id, ())) + list(self._subscriptions.get(ALL_BATCHES, ()))
+        for subscription in subscriptions:
+            subscription.wake()
+
+    def remove(self, batch_id: str):
+        """Tell subscribers a batch is gone and stop tracking it."""
+        self.publish(batch_id, None)
+
+    def _subscribe(self, key: str) -> _Subscription:
+        subscription = _Subscription(key, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: _Subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.key]
+
+    def _collect(self, key: str, seen: Dict[str, int]) -> Dict[str, Optional[dict]]:
+        """
+        Batches whose progress changed since the versions in seen, updating seen.
+        Batches that were seen before but no longer exist map to None.
+        """
+        with self._lock:
+            batch_ids = set(self._latest) | set(seen) if key == ALL_BATCHES else {key}
+            changed = {}
+            for batch_id in batch_ids:
+                version = self._versions.get(batch_id)
+                if version is None:
+                    if batch_id in seen:
+                        del seen[batch_id]
+                        changed[batch_id] = None
+                elif seen.get(batch_id) != version:
+                    seen[batch_id] = version
+                    changed[batch_id] = self._latest[batch_id]
+            return changed
+
+    async def stream(self, batch_id: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        Yield progress messages for one batch, or for all batches.
+
+        Messages are {"type": "snapshot" | "progress" | "removed" | "heartbeat",
+        "batch_id": ..., "data": {...}}. "snapshot" carries all fields, "progress"
+        only the fields that changed. A single-batch stream ends after the batch
+        reaches a terminal status or is removed.
+
+        Args:
+            batch_id: The batch to follow, or None for all batches
+        """
+        key = batch_id or ALL_BATCHES
+        subscription = self._subscribe(key)
+        seen: Dict[str, int] = {}
+        sent: Dict[str, dict] = {}
+        try:
+            while True:
+                finished = False
+                for changed_id, progress in self._collect(key, seen).items():
+                    if progress is None:
+                        sent.pop(changed_id, None)
+                        yield {"type": "removed", "batch_id": changed_id}
+                        finished = batch_id is not None
+                        continue
+                    previous = sent.get(changed_id)
+                    if previous is None:
+                        yield {"type": "snapshot", "batch_id": changed_id, "data": progress}
+                    else:
+                        delta = {k: v for k, v in progress.items() if previous.get(k) != v}
+                        if delta:
+                            yield {"type": "progress", "batch_id": changed_id, "data": delta}
+                    sent[changed_id] = progress
+                    if batch_id is not None and progress.get("status") in TERMINAL_STATUSES:
+                        finished = True
+                if finished:
+                    return
+
+                subscription.changed.clear()
+                # Changes published while we were sending are picked up on the next pass
+                if seen != self._current_versions(key):
+                    subscription.changed.set()
+                try:
+                    await asyncio.wait_for(subscription.changed.wait(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield {"type": "heartbeat"}
+                    continue
+                # Rate limit: coalesce everything published during this pause
+                await asyncio.sleep(self.min_interval)
+        finally:
+            self._unsubscribe(subscription)
+
+    def _current_versions(self, key: str) -> Dict[str, int]:
+        with self._lock:
+            if key == ALL_BATCHES:
+                return dict(self._versions)
+            return {key: self._versions[key]} if key in self._versions else {}
+
+    def get_stats(self) -> dict:
+        """Get broker statistics."""
+        with self._lock:
+            return {
+                "batches": len(self._latest),
+                "subscribers": sum(len(s) for s in self._subscriptions.values()),
+                "published": self.published,
+                "min_interval_seconds": self.min_interval,
+            }
+
+
+# Global progress broker
+progress_broker = ProgressBroker()
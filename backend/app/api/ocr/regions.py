@@ -0,0 +1,227 @@
+"""
+Region OCR for pages that are partly covered by a text layer.
+
+A typed form with a stamped or handwritten section, or a scan whose text
+layer misses a part of the page, has embedded text for most of the page and
+images for the rest. Instead of either taking the text layer alone or
+recognizing the whole page, the page is laid out on a grid of
+REGION_CELL_SIZE point cells: cells under an image and not under a text
+block are decomposed into rectangles, rectangles without ink are dropped,
+and only the rest is rendered (get_pixmap(clip=...)) and recognized. The
+recognized text is merged with the text blocks in reading order.
+"""
+import logging
+import math
+import os
+import threading
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .engines import OcrOutput
+from .page_filter import ink_ratio
+
+logger = logging.getLogger(__name__)
+
+# Recognize only the parts of pages with a text layer that have none, unless the request settings say otherwise
+REGION_OCR = os.getenv('REGION_OCR', 'true').lower() == 'true'
+# Grid cell size in points; cells partly under a text block count as covered
+REGION_CELL_SIZE = float(os.getenv('REGION_CELL_SIZE', '6'))
+# Regions narrower or lower than this, in points, are ignored
+REGION_MIN_SIZE = float(os.getenv('REGION_MIN_SIZE', '18'))
+# Resolution of the render used to drop regions without ink
+REGION_CHECK_DPI = int(os.getenv('REGION_CHECK_DPI', '50'))
+# Regions with a smaller share of ink pixels are empty
+REGION_MIN_INK_RATIO = float(os.getenv('REGION_MIN_INK_RATIO', '0.002'))
+
+Rect = Tuple[float, float, float, float]
+
+
+class PageLayout:
+    """
+    Text layer blocks of a page and the regions that need OCR.
+
+    Args:
+        text_blocks: (rect, text) of the text layer blocks, in the page's reading order
+        regions: Rects under images and outside the text layer, top to bottom
+        page_area: Area of the page in square points
+    """
+    __slots__ = ('text_blocks', 'regions', 'page_area')
+
+    def __init__(self, text_blocks: List[Tuple[Rect, str]], regions: List[Rect], page_area: float):
+        self.text_blocks = text_blocks
+        self.regions = regions
+        self.page_area = page_area
+
+    @property
+    def ocr_area_ratio(self) -> float:
+        """Share of the page that is recognized."""
+        if not self.page_area:
+            return 0.0
+        return sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in self.regions) / self.page_area
+
+    def merge_text(self, region_texts: List[str]) -> str:
+        """
+        Text blocks and recognized regions in reading order.
+
+        The text blocks keep their order; each region goes before the first
+        block that starts below its top edge.
+        """
+        pending = sorted(zip(self.regions, region_texts), key=lambda item: (item[0][1], item[0][0]))
+        parts = []
+        for rect, text in self.text_blocks:
+            while pending and pending[0][0][1] <= rect[1]:
+                parts.append(pending.pop(0)[1])
+            parts.append(text)
+        parts.extend(text for _, text in pending)
+        return '\n'.join(part.strip() for part in parts if part.strip())
+
+
+def _cells(rect: Rect, origin: Tuple[float, float], cell: float) -> Tuple[int, int, int, int]:
+    """Grid cells touched by a rect: (row0, col0, row1, col1)."""
+    x0, y0, x1, y1 = rect
+    return (max(0, int((y0 - origin[1]) // cell)), max(0, int((x0 - origin[0]) // cell)),
+            max(0, math.ceil((y1 - origin[1]) / cell)), max(0, math.ceil((x1 - origin[0]) / cell)))
+
+
+def _runs(row: np.ndarray) -> List[Tuple[int, int]]:
+    """(start, end) of the runs of True in a row."""
+    padded = np.concatenate(([False], row, [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
+def decompose(mask: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """
+    Cover the True cells of a mask with rectangles.
+
+    Rows are split into runs and runs spanning the same columns in
+    consecutive rows are merged.
+
+    Returns:
+        (row0, col0, row1, col1) rectangles, end exclusive
+    """
+    rects = []
+    open_runs = {}
+    for y in range(mask.shape[0] + 1):
+        runs = set(_runs(mask[y])) if y < mask.shape[0] else set()
+        for run in [run for run in open_runs if run not in runs]:
+            rects.append((open_runs.pop(run), run[0], y, run[1]))
+        for run in runs:
+            open_runs.setdefault(run, y)
+    return rects
+
+
+def find_regions(page_rect: Rect, text_rects: List[Rect], image_rects: List[Rect],
+                 cell: float = REGION_CELL_SIZE, min_size: float = REGION_MIN_SIZE) -> List[Rect]:
+    """
+    Areas under images that no text block covers.
+
+    Args:
+        page_rect: Page bounds in points
+        text_rects: Text layer block bounds
+        image_rects: Image bounds
+        cell: Grid cell size in points
+        min_size: Smallest region width and height in points
+
+    Returns:
+        Region rects in points, clipped to the page, top to bottom
+    """
+    px0, py0, px1, py1 = page_rect
+    origin = (px0, py0)
+    mask = np.zeros((math.ceil((py1 - py0) / cell), math.ceil((px1 - px0) / cell)), dtype=bool)
+    if not mask.size:
+        return []
+    for rect in image_rects:
+        r0, c0, r1, c1 = _cells(rect, origin, cell)
+        mask[r0:r1, c0:c1] = True
+    for rect in text_rects:
+        r0, c0, r1, c1 = _cells(rect, origin, cell)
+        mask[r0:r1, c0:c1] = False
+
+    regions = []
+    for r0, c0, r1, c1 in decompose(mask):
+        rect = (max(px0, px0 + c0 * cell), max(py0, py0 + r0 * cell),
+                min(px1, px0 + c1 * cell), min(py1, py0 + r1 * cell))
+        if rect[2] - rect[0] >= min_size and rect[3] - rect[1] >= min_size:
+            regions.append(rect)
+    return sorted(regions, key=lambda rect: (rect[1], rect[0]))
+
+
+def analyze_page(page) -> PageLayout:
+    """
+    Find the regions of a PyMuPDF page that have ink but no text layer.
+
+    Args:
+        page: PyMuPDF page
+
+    Returns:
+        PageLayout; its regions are empty when the text layer covers every image
+    """
+    page_rect = tuple(page.rect)
+    text_blocks = [(tuple(block[:4]), block[4]) for block in page.get_text("blocks")
+                   if block[6] == 0 and block[4].strip()]
+    image_rects = [tuple(info['bbox']) for info in page.get_image_info()]
+    area = (page_rect[2] - page_rect[0]) * (page_rect[3] - page_rect[1])
+    if not image_rects:
+        return PageLayout(text_blocks, [], area)
+
+    regions = find_regions(page_rect, [rect for rect, _ in text_blocks], image_rects)
+    if regions:
+        import fitz  # PyMuPDF
+        pix = page.get_pixmap(dpi=REGION_CHECK_DPI, colorspace=fitz.csGRAY, alpha=False)
+        gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+        scale = REGION_CHECK_DPI / 72.0
+        inked = []
+        for x0, y0, x1, y1 in regions:
+            patch = gray[int((y0 - page_rect[1]) * scale):math.ceil((y1 - page_rect[1]) * scale),
+                         int((x0 - page_rect[0]) * scale):math.ceil((x1 - page_rect[0]) * scale)]
+            if patch.size and ink_ratio(patch) >= REGION_MIN_INK_RATIO:
+                inked.append((x0, y0, x1, y1))
+        regions = inked
+    return PageLayout(text_blocks, regions, area)
+
+
+def gather(futures: List[Future]) -> Future:
+    """Future resolving to the results of futures in order, or failing with the first failure."""
+    combined = Future()
+    lock = threading.Lock()
+    remaining = [len(futures)]
+
+    def done(_completed: Future):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        try:
+            combined.set_result([future.result() for future in futures])
+        except Exception as e:
+            combined.set_exception(e)
+
+    if not futures:
+        combined.set_result([])
+    for future in futures:
+        future.add_done_callback(done)
+    return combined
+
+
+def merge_outputs(layout: PageLayout, outputs: List[OcrOutput]) -> OcrOutput:
+    """
+    One OcrOutput for a page from the outputs of its regions.
+
+    Args:
+        layout: The page layout the regions came from
+        outputs: OcrOutput per region, in layout.regions order
+
+    Returns:
+        OcrOutput with the merged page text; its confidence covers the recognized regions only
+    """
+    text = layout.merge_text([output.text for output in outputs])
+    weighted = [(len(output.text), output.confidence) for output in outputs if output.confidence is not None]
+    chars = sum(length for length, _ in weighted)
+    confidence: Optional[float] = None
+    if chars:
+        confidence = sum(length * value for length, value in weighted) / chars
+    first = outputs[0]
+    return OcrOutput(text, first.engine, first.device, first.gpu_id, confidence)
@@ -1,5 +1,7 @@
+import json
 import logging
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any
 from .models import SharePointItem, PdfOcrRequest, BatchProcessingRequest
@@ -12,7 +14,7 @@ from .status_utils import get_ocr_status, get_ocr_text, update_ocr_status
 from .image_utils import serve_temp_image, serve_preloaded_image, serve_image
 from .preprocessing import preprocess
 from .ocr_processing import ocr_images
-from app.utils.gpu_utils import get_gpu_info, initialize_gpu_tracking, get_gpu_usage_stats
+from app.utils.gpu_utils import get_gpu_info, get_gpu_usage_stats
 from .batch_processing import (
     start_batch_processing,
     start_folder_batch_processing,
@@ -23,8 +25,19 @@ from .batch_processing import (
     deprioritize_batch_processing,
     restore_batch_priority,
     list_batch_jobs,
-    cleanup_completed_jobs
+    cleanup_completed_jobs,
+    get_batch_items,
+    publish_batch_progress,
+    batch_processing_status
 )
+from .progress import progress_broker
+from .scheduler import INTERACTIVE, ocr_scheduler, run_ocr_job
+from .easyocr_batcher import easyocr_batcher
+from .tesseract_engine import tesseract_engine
+from .engines import engine_registry
+from .page_filter import page_filter
+from .orientation import orientation_detector
+from app.utils.llm_utils import llm_scoring_service
 from app.api.ocr.process_health import (
     get_process_health_status,
     cleanup_stuck_processes
@@ -35,9 +48,6 @@ router = APIRouter(tags=["ocr"])
 
 print("OCR.PY LOADED")
 
-# Initialize GPU tracking on startup
-initialize_gpu_tracking()
-
 @router.get('/preload_check/{file_id}', summary="Check if file data is preloaded")
 async def preload_check_endpoint(file_id: str):
     """
@@ -117,10 +127,22 @@ async def update_status_endpoint(file_id: str, status: str, ocr_text: str = None
     """
     return await update_ocr_status(file_id, status, ocr_text, pdf_text)
 
-@router.get('/engines')
+@router.get('/engines', summary="OCR engines with capabilities and measured throughput")
 def engines_endpoint():
-    logger.warning("ENGINES ENDPOINT CALLED")
-    return {"engines": ["easyocr", "tesseract"]}
+    """
+    List the registered OCR engines with availability, supported languages,
+    quality level and per-device latency measured on live pages and benchmarks.
+    """
+    return engine_registry.describe()
+
+@router.post('/engines/benchmark', summary="Benchmark the available OCR engines")
+def engines_benchmark_endpoint(language: str = Query('es', description="Application language code"),
+                               pages: int = Query(4, ge=1, le=20, description="Number of timed pages")):
+    """
+    Recognize synthetic pages on every available engine and record the time
+    per page, which automatic engine selection uses until live pages are measured.
+    """
+    return {"language": language, "results": engine_registry.benchmark(language, pages)}
 
 @router.get('/test')
 def test_endpoint():
@@ -143,11 +165,11 @@ def image_endpoint(path: str):
     return serve_image(path)
 
 @router.post('/images')
-def images_endpoint(req):
+async def images_endpoint(req):
     """
     Perform OCR on a list of images.
     """
-    return ocr_images(req)
+    return await run_ocr_job(INTERACTIVE, ocr_images, req)
 
 # Batch Processing Endpoints
 
@@ -181,13 +203,94 @@ async def start_folder_batch_endpoint(
     )
 
 @router.get('/batch/status/{batch_id}', summary="Get batch processing status")
-def get_batch_status_endpoint(batch_id: str):
+def get_batch_status_endpoint(batch_id: str, compact: bool = False):
     """
     Get the current status of a batch processing job including progress,
     statistics, logs, and results.
+    
+    Args:
+        batch_id: The batch ID
+        compact: Return only counters, current file and ETA; fetch the lists from /batch/items
     """
+    if compact:
+        if batch_id not in batch_processing_status:
+            raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+        return {"batch_id": batch_id, **batch_processing_status[batch_id].get_progress_dict()}
     return get_batch_status(batch_id)
 
+@router.get('/batch/items/{batch_id}', summary="Get a page of batch results, errors or logs")
+def get_batch_items_endpoint(
+    batch_id: str,
+    kind: str = "results",
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """
+    Get one page of the results, errors or logs of a batch processing job.
+    """
+    return get_batch_items(batch_id, kind, offset, limit)
+
+def _progress_event_stream(batch_id: str = None):
+    """Format progress broker messages as server-sent events."""
+    async def events():
+        async for message in progress_broker.stream(batch_id):
+            yield f"event: {message['type']}\ndata: {json.dumps(message, default=str)}\n\n"
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@router.get('/batch/events', summary="Stream progress of all batch jobs (server-sent events)")
+async def batch_events_endpoint():
+    """
+    Stream progress of all batch jobs as server-sent events.
+    
+    Each job is sent once as a "snapshot" and then as "progress" events that
+    contain only the fields that changed, at most twice per second.
+    """
+    publish_batch_progress()
+    return _progress_event_stream()
+
+@router.get('/batch/events/{batch_id}', summary="Stream progress of a batch job (server-sent events)")
+async def batch_events_for_batch_endpoint(batch_id: str):
+    """
+    Stream progress of a single batch job as server-sent events.
+    The stream ends when the job completes, fails or is cancelled.
+    """
+    publish_batch_progress(batch_id)
+    return _progress_event_stream(batch_id)
+
+async def _send_progress(websocket: WebSocket, batch_id: str = None):
+    await websocket.accept()
+    try:
+        async for message in progress_broker.stream(batch_id):
+            await websocket.send_json(message)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Batch progress WebSocket error: {e}")
+
+@router.websocket('/batch/ws')
+async def batch_progress_websocket(websocket: WebSocket):
+    """
+    WebSocket with the same messages as /batch/events.
+    """
+    publish_batch_progress()
+    await _send_progress(websocket)
+
+@router.websocket('/batch/ws/{batch_id}')
+async def batch_progress_websocket_for_batch(websocket: WebSocket, batch_id: str):
+    """
+    WebSocket with the same messages as /batch/events/{batch_id}.
+    """
+    if batch_id not in batch_processing_status:
+        await websocket.close(code=4404)
+        return
+    publish_batch_progress(batch_id)
+    await _send_progress(websocket, batch_id)
+
 @router.post('/batch/pause/{batch_id}', summary="Pause batch processing")
 def pause_batch_endpoint(batch_id: str):
     """
@@ -212,14 +315,11 @@ def stop_batch_endpoint(batch_id: str):
 @router.post('/batch/deprioritize/{batch_id}', summary="Deprioritize batch processing")
 def deprioritize_batch_endpoint(batch_id: str, level: int = 1):
     """
-    Deprioritize a batch processing job to reduce CPU usage.
-    
-    This endpoint reduces the CPU priority of the batch processing job to prevent
-    system freezing. It applies several CPU throttling techniques:
+    Deprioritize a batch processing job so other work gets OCR slots first.
     
-    1. Reduces process priority at OS level
-    2. Adds sleep intervals between processing steps
-    3. Limits CPU core usage (at higher throttle levels)
+    The batch moves to the bulk priority class of the OCR scheduler and its
+    share within that class is reduced by the throttling level. It yields at
+    the next page boundary; interactive requests are never slowed down.
     
     Args:
         batch_id: The ID of the batch to deprioritize
@@ -237,6 +337,48 @@ def restore_batch_priority_endpoint(batch_id: str):
     """
     return restore_batch_priority(batch_id)
 
+@router.get('/scheduler', summary="OCR scheduler statistics")
+def scheduler_stats_endpoint():
+    """
+    Get queue depth, running pages and wait times per priority class.
+    """
+    return ocr_scheduler.get_stats()
+
+@router.get('/easyocr/batcher', summary="EasyOCR batching statistics")
+def easyocr_batcher_stats_endpoint():
+    """
+    Get the number of batched EasyOCR calls, the average batch size and the loaded readers.
+    """
+    return easyocr_batcher.get_stats()
+
+@router.get('/tesseract/engine', summary="Tesseract engine statistics")
+def tesseract_engine_stats_endpoint():
+    """
+    Get the Tesseract backend in use, its worker count and page throughput.
+    """
+    return tesseract_engine.get_stats()
+
+@router.get('/page_filter', summary="Blank and duplicate page statistics")
+def page_filter_stats_endpoint():
+    """
+    Get the number of pages inspected before OCR and how many were skipped as blank or duplicate.
+    """
+    return page_filter.get_stats()
+
+@router.get('/orientation', summary="Page orientation detection statistics")
+def orientation_stats_endpoint():
+    """
+    Get the number of pages checked for orientation and how many were rotated.
+    """
+    return orientation_detector.get_stats()
+
+@router.get('/llm_scoring', summary="LLM quality scoring statistics")
+def llm_scoring_stats_endpoint():
+    """
+    Get the number of LLM requests, batches, retries and cached scores.
+    """
+    return llm_scoring_service.get_stats()
+
 @router.get('/batch/list', summary="List all batch processing jobs")
 def list_batch_jobs_endpoint():
     """
@@ -0,0 +1,299 @@
+"""
+Priority-aware scheduler for OCR work.
+
+OCR runs page by page, and every page takes a slot from the scheduler before it
+is rendered and keeps it until the OCR engine has recognized it, so the slots
+bound the pages in recognition and not only the rendering. Interactive requests (a user waiting on /pdf_ocr)
+always get the next free slot, and OCR_INTERACTIVE_RESERVED_SLOTS slots are
+never given to batch work, so an interactive request starts immediately even
+while a large backfill is running. Batch pages are preempted at page
+boundaries: a running batch gives up its slot after each page and queues again.
+
+Normal and bulk work share the remaining slots in proportion to their class
+weights. Within a class, slots are shared between tenants (users, or batches
+without a user) by stride scheduling: every grant advances the tenant's pass by
+1/weight and the waiting tenant with the lowest pass goes next.
+
+How many of the batch slots may be in use at once is set by the resource
+governor through set_batch_limit(), based on latency and resource usage.
+
+Waiting for a slot blocks the calling thread, so OCR jobs run through
+run_ocr_job() on threads of their own instead of the event loop's shared
+thread pool, which would otherwise fill up with parked batch pages.
+"""
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+NORMAL = 'normal'
+BULK = 'bulk'
+PRIORITY_CLASSES = (INTERACTIVE, NORMAL, BULK)
+
+# Pages that may be processed at the same time across all requests and batches
+OCR_SCHEDULER_SLOTS = int(os.getenv('OCR_SCHEDULER_SLOTS', str(max(2, min(4, (os.cpu_count() or 2) // 2)))))
+# Slots only interactive requests may use
+OCR_INTERACTIVE_RESERVED_SLOTS = int(os.getenv('OCR_INTERACTIVE_RESERVED_SLOTS', '1'))
+# Share of slots between normal and bulk work when both are waiting
+OCR_NORMAL_WEIGHT = float(os.getenv('OCR_NORMAL_WEIGHT', '4'))
+OCR_BULK_WEIGHT = float(os.getenv('OCR_BULK_WEIGHT', '1'))
+# Threads for OCR jobs waiting for slots, for interactive requests and for batch work
+OCR_INTERACTIVE_JOB_THREADS = int(os.getenv('OCR_INTERACTIVE_JOB_THREADS', '8'))
+OCR_BATCH_JOB_THREADS = int(os.getenv('OCR_BATCH_JOB_THREADS', '16'))
+
+# Recent wait times kept per class for percentiles
+WAIT_SAMPLES = 500
+# Idle tenants are forgotten once more than this many are tracked per class
+MAX_TRACKED_TENANTS = 1000
+# A tenant or class that queues again within this time after its last page is
+# still active and keeps its position; after longer it catches up to the others
+IDLE_AFTER_SECONDS = 1.0
+
+
+def normalize_priority(priority: Optional[str], default: str = NORMAL) -> str:
+    """Map a user-supplied priority name to a priority class."""
+    priority = (priority or '').lower()
+    return priority if priority in PRIORITY_CLASSES else default
+
+
+class _Ticket:
+    __slots__ = ('priority', 'tenant', 'weight', 'enqueued_at', 'granted_at')
+
+    def __init__(self, priority: str, tenant: str, weight: float):
+        self.priority = priority
+        self.tenant = tenant
+        self.weight = weight
+        self.enqueued_at = time.monotonic()
+        self.granted_at = None
+
+
+class OcrScheduler:
+    """Thread-safe slot scheduler with priority classes and weighted fair sharing."""
+
+    def __init__(self, slots: int = OCR_SCHEDULER_SLOTS,
+                 reserved_interactive: int = OCR_INTERACTIVE_RESERVED_SLOTS,
+                 class_weights: Dict[str, float] = None):
+        self.slots = max(1, slots)
+        # At least one slot must remain for batch work
+        self.reserved_interactive = max(0, min(reserved_interactive, self.slots - 1))
+        self.class_weights = class_weights or {NORMAL: OCR_NORMAL_WEIGHT, BULK: OCR_BULK_WEIGHT}
+        # Normal and bulk pages that may run at once; lowered by the resource governor
+        self.batch_limit = self.batch_capacity
+        self._cond = threading.Condition()
+        self._running: Dict[str, int] = {cls: 0 for cls in PRIORITY_CLASSES}
+        # class -> tenant -> queued tickets
+        self._waiting: Dict[str, Dict[str, Deque[_Ticket]]] = {cls: {} for cls in PRIORITY_CLASSES}
+        # Stride scheduling state: pass per (class, tenant) and per batch class
+        self._tenant_pass: Dict[str, Dict[str, float]] = {cls: {} for cls in PRIORITY_CLASSES}
+        self._class_pass: Dict[str, float] = {NORMAL: 0.0, BULK: 0.0}
+        # Last grant or release per tenant and per class, to tell idle from active
+        self._tenant_active_at: Dict[str, Dict[str, float]] = {cls: {} for cls in PRIORITY_CLASSES}
+        self._class_active_at: Dict[str, float] = {cls: 0.0 for cls in PRIORITY_CLASSES}
+        self._wait_ms: Dict[str, Deque[float]] = {cls: deque(maxlen=WAIT_SAMPLES) for cls in PRIORITY_CLASSES}
+        self._granted: Dict[str, int] = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._max_wait_ms: Dict[str, float] = {cls: 0.0 for cls in PRIORITY_CLASSES}
+
+    @property
+    def batch_capacity(self) -> int:
+        """Slots available to normal and bulk work when nothing holds them back."""
+        return self.slots - self.reserved_interactive
+
+    def set_batch_limit(self, limit: int):
+        """
+        Limit how many normal and bulk pages run at once.
+
+        Running pages finish; the new limit applies from the next grant.
+        """
+        with self._cond:
+            self.batch_limit = max(1, min(limit, self.batch_capacity))
+            while self._grant_next():
+                pass
+            self._cond.notify_all()
+
+    def has_batch_work(self) -> bool:
+        """Whether normal or bulk pages are waiting for a slot."""
+        with self._cond:
+            return bool(self._waiting[NORMAL] or self._waiting[BULK])
+
+    def _waiting_count(self, cls: str) -> int:
+        return sum(len(q) for q in self._waiting[cls].values())
+
+    def _pick_class(self) -> Optional[str]:
+        """Class of the next grant, or None. Caller holds the lock."""
+        running = sum(self._running.values())
+        if running >= self.slots:
+            return None
+        if self._waiting_count(INTERACTIVE):
+            return INTERACTIVE
+        if running >= self.slots - self.reserved_interactive:
+            return None
+        if self._running[NORMAL] + self._running[BULK] >= self.batch_limit:
+            return None
+        candidates = [cls for cls in (NORMAL, BULK) if self._waiting_count(cls)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda cls: self._class_pass[cls])
+
+    def _grant_next(self) -> bool:
+        """Grant one slot if possible. Caller holds the lock."""
+        cls = self._pick_class()
+        if cls is None:
+            return False
+        queues = self._waiting[cls]
+        passes = self._tenant_pass[cls]
+        tenant = min(queues, key=lambda t: (passes.get(t, 0.0), queues[t][0].enqueued_at))
+        ticket = queues[tenant].popleft()
+        if not queues[tenant]:
+            del queues[tenant]
+
+        passes[tenant] = passes.get(tenant, 0.0) + 1.0 / max(ticket.weight, 0.01)
+        if cls in self._class_pass:
+            self._class_pass[cls] += 1.0 / max(self.class_weights.get(cls, 1.0), 0.01)
+
+        ticket.granted_at = time.monotonic()
+        self._tenant_active_at[cls][tenant] = ticket.granted_at
+        self._class_active_at[cls] = ticket.granted_at
+        wait_ms = (ticket.granted_at - ticket.enqueued_at) * 1000
+        self._wait_ms[cls].append(wait_ms)
+        self._max_wait_ms[cls] = max(self._max_wait_ms[cls], wait_ms)
+        self._granted[cls] += 1
+        self._running[cls] += 1
+        return True
+
+    def _enqueue(self, ticket: _Ticket):
+        cls = ticket.priority
+        passes = self._tenant_pass[cls]
+        idle_since = ticket.enqueued_at - IDLE_AFTER_SECONDS
+        if ticket.tenant not in self._waiting[cls]:
+            if self._tenant_active_at[cls].get(ticket.tenant, float('-inf')) < idle_since:
+                # A tenant returning from idle starts at the current minimum, so it neither
+                # monopolizes slots with credit saved up while idle nor waits behind it
+                active = [passes[t] for t in self._waiting[cls] if t in passes]
+                floor = min(active) if active else max(passes.values(), default=0.0)
+                passes[ticket.tenant] = max(passes.get(ticket.tenant, 0.0), floor)
+                if len(passes) > MAX_TRACKED_TENANTS:
+                    for idle in [t for t in passes if t not in self._waiting[cls] and t != ticket.tenant]:
+                        del passes[idle]
+                        self._tenant_active_at[cls].pop(idle, None)
+            self._waiting[cls][ticket.tenant] = deque()
+        self._waiting[cls][ticket.tenant].append(ticket)
+        if cls in self._class_pass and self._class_active_at[cls] < idle_since and not self._running[cls]:
+            other = BULK if cls == NORMAL else NORMAL
+            self._class_pass[cls] = max(self._class_pass[cls], self._class_pass[other])
+
+    def acquire(self, priority: str = NORMAL, tenant: str = 'default', weight: float = 1.0) -> _Ticket:
+        """
+        Wait for a slot.
+
+        Args:
+            priority: "interactive", "normal" or "bulk"
+            tenant: Key that slots are shared fairly between, e.g. a user or batch ID
+            weight: Relative share of the tenant within its class
+
+        Returns:
+            The granted ticket, to pass to release()
+        """
+        ticket = _Ticket(normalize_priority(priority), tenant or 'default', weight)
+        with self._cond:
+            self._enqueue(ticket)
+            while self._grant_next():
+                pass
+            if ticket.granted_at is None:
+                self._cond.notify_all()
+            while ticket.granted_at is None:
+                self._cond.wait()
+        return ticket
+
+    def release(self, ticket: _Ticket):
+        """Return a slot and hand it to the next waiting ticket."""
+        with self._cond:
+            self._running[ticket.priority] -= 1
+            now = time.monotonic()
+            self._tenant_active_at[ticket.priority][ticket.tenant] = now
+            self._class_active_at[ticket.priority] = now
+            while self._grant_next():
+                pass
+            self._cond.notify_all()
+
+    def release_after(self, ticket: _Ticket, future=None):
+        """
+        Release a slot once future completes, or at once without a future.
+
+        Lets a page queued on an OCR engine keep its slot while it is recognized.
+        """
+        if future is None:
+            self.release(ticket)
+        else:
+            future.add_done_callback(lambda _: self.release(ticket))
+
+    @contextmanager
+    def slot(self, priority: str = NORMAL, tenant: str = 'default', weight: float = 1.0):
+        """Hold a slot for the duration of the block."""
+        ticket = self.acquire(priority, tenant, weight)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def get_stats(self) -> dict:
+        """Get queue depth, running slots and wait-time statistics per class."""
+        with self._cond:
+            classes = {}
+            for cls in PRIORITY_CLASSES:
+                waits = sorted(self._wait_ms[cls])
+                classes[cls] = {
+                    'running': self._running[cls],
+                    'queued': self._waiting_count(cls),
+                    'queued_tenants': len(self._waiting[cls]),
+                    'granted': self._granted[cls],
+                    'wait_p50_ms': round(waits[len(waits) // 2], 1) if waits else 0.0,
+                    'wait_p95_ms': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 1) if waits else 0.0,
+                    'wait_max_ms': round(self._max_wait_ms[cls], 1),
+                }
+            return {
+                'slots': self.slots,
+                'reserved_interactive': self.reserved_interactive,
+                'batch_limit': self.batch_limit,
+                'running': sum(self._running.values()),
+                'class_weights': dict(self.class_weights),
+                'classes': classes,
+            }
+
+
+# Global OCR scheduler
+ocr_scheduler = OcrScheduler()
+
+# Separate pools so batch jobs parked on the scheduler never hold up an interactive job
+_job_executors = {
+    INTERACTIVE: ThreadPoolExecutor(max_workers=max(1, OCR_INTERACTIVE_JOB_THREADS),
+                                    thread_name_prefix='ocr_job_interactive'),
+    NORMAL: ThreadPoolExecutor(max_workers=max(1, OCR_BATCH_JOB_THREADS), thread_name_prefix='ocr_job_batch'),
+}
+
+
+async def run_ocr_job(priority: str, fn, *args, **kwargs):
+    """
+    Run a blocking OCR job that waits for scheduler slots on the OCR job threads.
+
+    Args:
+        priority: Scheduler priority class of the job; picks the thread pool
+        fn: Function that acquires slots and runs the OCR
+        *args: Positional arguments for fn
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        The return value of fn
+    """
+    cls = normalize_priority(priority)
+    executor = _job_executors[INTERACTIVE if cls == INTERACTIVE else NORMAL]
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
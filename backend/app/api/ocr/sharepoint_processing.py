@@ -5,7 +5,7 @@ from fastapi import HTTPException, BackgroundTasks
 from sqlalchemy.orm import Session
 from .models import SharePointItem
 from .db_utils import get_db_session
-from .pipeline import run_ocr_pipeline
+from .pipeline import run_ocr_pipeline, run_ocr_pipelines
 from app.models import OcrResult
 from app.api.sharepoint import list_files as list_sharepoint_files_in_folder
 
@@ -18,7 +18,8 @@ async def process_sharepoint_item(item: SharePointItem, background_tasks: Backgr
     If the item is a folder, it recursively finds all PDF files within the folder.
     For each PDF file, it downloads the file from SharePoint, creates an initial OcrResult
     entry in the database with status Queued, and adds the file to an asynchronous
-    processing queue (FastAPI background tasks) for OCR.
+    processing queue (FastAPI background tasks) for OCR. The files of a folder share one
+    task that processes them concurrently.
     """
     logger.info(f"Received request to process SharePoint item: {item.dict()}")
     try:
@@ -72,6 +73,7 @@ async def process_sharepoint_folder(drive_id: str, item_id: str, background_task
     """
     logger.info(f"Processing folder: drive_id={drive_id}, item_id={item_id}")
     processed_files_info = []
+    queued_files = []
     try:
         response = list_sharepoint_files_in_folder(drive_id=drive_id, parent_id=item_id)
         folder_files_data = json.loads(response.body)
@@ -115,9 +117,13 @@ async def process_sharepoint_folder(drive_id: str, item_id: str, background_task
                 processed_files_info.append({"file_id": file_item_id, "status": current_status, "message": "Already processed"})
                 continue
 
-            background_tasks.add_task(run_ocr_pipeline, drive_id, file_item_id, ocr_result.file_id)
+            queued_files.append((file_item_id, ocr_result.file_id))
             processed_files_info.append({"file_id": file_item_id, "status": current_status})
 
+        if queued_files:
+            # One task for the folder, so its files are processed concurrently instead of one after another
+            background_tasks.add_task(run_ocr_pipelines, drive_id, queued_files, item_id)
+
         return {"message": f"Folder processing initiated for {len(pdf_files_in_folder)} PDF(s).", "folder_id": item_id, "processed_files": processed_files_info}
 
     except Exception as e:
@@ -3,6 +3,8 @@ import datetime
 from fastapi import HTTPException
 from .db_utils import get_db_session
 from app.models import OcrResult
+from app.utils.access_tracker import access_tracker
+from app.utils.preload_utils import evict_cached_text, get_cached_text
 
 logger = logging.getLogger(__name__)
 
@@ -67,10 +69,27 @@ def get_ocr_text(file_id: str):
     """
     Retrieves the full OCR text for a given file.
     Returns both PDF text and OCR text if available.
+    Text already in the preload cache is served without loading the text columns.
     """
     session = get_db_session()
     try:
-        ocr_result = session.query(OcrResult).filter_by(file_id=file_id).first()
+        cached_text = get_cached_text(file_id, 'pdf')
+        cached_type = "pdf_text"
+        if not cached_text:
+            cached_text = get_cached_text(file_id, 'ocr')
+            cached_type = "ocr_text"
+        
+        if cached_text:
+            ocr_result = session.query(OcrResult).with_entities(
+                OcrResult.directory_id, OcrResult.status, OcrResult.created_at, OcrResult.updated_at,
+                OcrResult.pdf_text.isnot(None).label("has_pdf_text")
+            ).filter_by(file_id=file_id).first()
+            if ocr_result and cached_type == "ocr_text" and ocr_result.has_pdf_text:
+                # Only the OCR text is cached, but PDF text is preferred
+                cached_text = None
+                ocr_result = session.query(OcrResult).filter_by(file_id=file_id).first()
+        else:
+            ocr_result = session.query(OcrResult).filter_by(file_id=file_id).first()
         
         if not ocr_result:
             logger.warning(f"OCR text requested for file_id '{file_id}', but no record found.")
@@ -80,13 +99,20 @@ def get_ocr_text(file_id: str):
         text_content = ""
         text_type = "none"
         
-        if ocr_result.pdf_text:
+        if cached_text:
+            text_content = cached_text
+            text_type = cached_type
+        elif ocr_result.pdf_text:
             text_content = ocr_result.pdf_text
             text_type = "pdf_text"
         elif ocr_result.ocr_text:
             text_content = ocr_result.ocr_text
             text_type = "ocr_text"
         
+        access_tracker.record_access(
+            file_id, "ocr_text", folder_id=ocr_result.directory_id, cache_hit=bool(cached_text)
+        )
+        
         if not text_content:
             raise HTTPException(status_code=404, detail=f"No text content available for file: {file_id}")
         
@@ -140,6 +166,8 @@ async def update_ocr_status(file_id: str, status: str, ocr_text: str = None, pdf
         
         db.commit()
         db.close()
+        if ocr_text or pdf_text:
+            evict_cached_text(file_id)
         
         logger.info(f"Updated OCR status for file_id: {file_id} to status: {status}")
         return {"message": f"Status updated successfully for file {file_id}", "status": status}
@@ -6,12 +6,16 @@ import gc
 from typing import Dict, Any, Optional
 from concurrent.futures import ThreadPoolExecutor
 import json
+import os
 
 logger = logging.getLogger(__name__)
 
 # Configure logging for task queue
 logging.basicConfig(level=logging.INFO)
 
+# Batches that may run at the same time
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '2'))
+
 class PersistentTaskQueue:
     """
     A persistent task queue that survives server restarts and handles long-running batch processing.
@@ -19,19 +23,20 @@ class PersistentTaskQueue:
     """
     
     def __init__(self):
-        # Reduce max_workers to 1 to prevent overwhelming the system
-        # This ensures only one batch processes at a time, reducing system load
-        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch_processor")
+        # Pages are admitted by the OCR scheduler, which bounds system load, so
+        # several batches can run at once and share it fairly by priority
+        self.executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch_processor")
         self.running_tasks = {}
         self.task_results = {}
         self.memory_monitor_active = False
         self.memory_threshold_mb = 2048  # 2GB memory threshold
-        
-        # Start memory monitoring
-        self._start_memory_monitor()
+        self._monitor_lock = threading.Lock()
+        # The memory monitor is started by background warm-up or the first
+        # submitted task, so importing this module does not spawn threads
         
     def submit_batch_task(self, batch_id: str, processor_func, *args, **kwargs):
         """Submit a batch processing task to the persistent queue"""
+        self.start_memory_monitor()
         print(f"TASK_QUEUE: Submitting batch task {batch_id} to persistent queue")
         logger.info(f"Submitting batch task {batch_id} to persistent queue")
         
@@ -154,16 +159,19 @@ class PersistentTaskQueue:
             del self.task_results[batch_id]
             logger.info(f"Cleaned up old task result: {batch_id}")
     
-    def _start_memory_monitor(self):
-        """Start a background thread to monitor memory usage"""
-        if self.memory_monitor_active:
-            return
+    def start_memory_monitor(self):
+        """Start a background thread to monitor memory usage, if not already running"""
+        with self._monitor_lock:
+            if self.memory_monitor_active:
+                return
             
-        try:
-            import psutil
+            try:
+                import psutil
+            except ImportError:
+                logger.warning("psutil not available, memory monitoring disabled")
+                return
             
             def monitor_memory():
-                self.memory_monitor_active = True
                 logger.info("Memory monitor started")
                 
                 while self.memory_monitor_active:
@@ -174,7 +182,9 @@ class PersistentTaskQueue:
                         
                         if memory_mb > self.memory_threshold_mb:
                             logger.warning(f"High memory usage detected: {memory_mb:.2f} MB (threshold: {self.memory_threshold_mb} MB)")
-                            # Force garbage collection
+                            # Release cached data first if the caches grew, then collect what it referenced
+                            from app.utils.cache_utils import memory_budget
+                            memory_budget.check_pressure(memory_info.rss)
                             gc.collect()
                         
                         # Check every 30 seconds
@@ -186,11 +196,9 @@ class PersistentTaskQueue:
                 logger.info("Memory monitor stopped")
             
             # Start monitor in background thread
-            monitor_thread = threading.Thread(target=monitor_memory, daemon=True)
+            self.memory_monitor_active = True
+            monitor_thread = threading.Thread(target=monitor_memory, daemon=True, name="memory_monitor")
             monitor_thread.start()
-            
-        except ImportError:
-            logger.warning("psutil not available, memory monitoring disabled")
     
     def stop_memory_monitor(self):
         """Stop the memory monitoring thread"""
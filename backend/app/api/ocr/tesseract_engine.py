@@ -0,0 +1,270 @@
+"""
+Parallel Tesseract OCR with persistent API handles.
+
+pytesseract.image_to_string() starts a tesseract process and writes the page
+to a temporary file for every call. With the optional tesserocr bindings
+installed, each worker thread instead keeps one initialized Tesseract API
+handle per language and receives pages as raw pixel buffers. Recognition
+releases the GIL, so TESSERACT_WORKERS pages run in parallel across cores.
+
+Tesseract's own OpenMP threading is limited to TESSERACT_THREADS_PER_PAGE
+(OMP_THREAD_LIMIT) so parallel pages do not oversubscribe the CPU. Without
+tesserocr, pages fall back to pytesseract on the same worker pool.
+
+Waiting pages are taken interactive first, then normal, then bulk, and in
+submission order within a priority class, as in the EasyOCR batcher.
+"""
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from .scheduler import INTERACTIVE, NORMAL, BULK
+
+logger = logging.getLogger(__name__)
+
+# Pages recognized in parallel
+TESSERACT_WORKERS = int(os.getenv('TESSERACT_WORKERS', str(os.cpu_count() or 2)))
+# OpenMP threads Tesseract may use for one page
+TESSERACT_THREADS_PER_PAGE = os.getenv('TESSERACT_THREADS_PER_PAGE', '1')
+
+# Must be set before libtesseract initializes OpenMP; inherited by pytesseract subprocesses
+os.environ.setdefault('OMP_THREAD_LIMIT', TESSERACT_THREADS_PER_PAGE)
+
+_PRIORITY_ORDER = {INTERACTIVE: 0, NORMAL: 1, BULK: 2}
+
+
+class RawImage:
+    """
+    Uncompressed 8-bit pixels, e.g. from a PyMuPDF pixmap.
+
+    Args:
+        data: Pixel bytes, row by row
+        width: Width in pixels
+        height: Height in pixels
+        channels: Bytes per pixel (1 gray, 3 RGB, 4 RGBA)
+    """
+    __slots__ = ('data', 'width', 'height', 'channels')
+
+    def __init__(self, data: bytes, width: int, height: int, channels: int):
+        self.data = data
+        self.width = width
+        self.height = height
+        self.channels = channels
+
+    @classmethod
+    def from_pixmap(cls, pix) -> 'RawImage':
+        return cls(pix.samples, pix.width, pix.height, pix.n)
+
+    def to_pil(self):
+        from PIL import Image
+        mode = {1: 'L', 3: 'RGB', 4: 'RGBA'}[self.channels]
+        return Image.frombytes(mode, (self.width, self.height), self.data)
+
+
+def _text_from_data(data: dict) -> Tuple[str, Optional[float]]:
+    """Rebuild the page text from pytesseract.image_to_data() words and average their confidence."""
+    lines = []
+    confidences = []
+    previous = None
+    for index, word in enumerate(data['text']):
+        if not word.strip():
+            continue
+        block = (data['block_num'][index], data['par_num'][index])
+        line = block + (data['line_num'][index],)
+        if line != previous:
+            if previous is not None and block != previous[:2]:
+                # Blank line between paragraphs, as image_to_string() does
+                lines.append('')
+            lines.append(word)
+            previous = line
+        else:
+            lines[-1] += ' ' + word
+        confidence = float(data['conf'][index])
+        if confidence >= 0:
+            confidences.append(confidence)
+    confidence = sum(confidences) / len(confidences) / 100 if confidences else None
+    return '\n'.join(lines), confidence
+
+
+class TesseractEngine:
+    """Worker threads recognizing pages by priority with per-thread Tesseract API handles."""
+
+    def __init__(self, workers: int = TESSERACT_WORKERS):
+        self.workers = max(1, workers)
+        # Heap of (priority order, enqueue time, sequence, function, args, future)
+        self._queue: List[tuple] = []
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._sequence = itertools.count()
+        self._local = threading.local()
+        self._tesserocr = None
+        self._backend = None
+        self._stats_lock = threading.Lock()
+        self.pages = 0
+        self.errors = 0
+        self.total_ms = 0.0
+
+    @property
+    def backend(self) -> str:
+        """Backend in use: tesserocr when the bindings are installed, otherwise pytesseract."""
+        if self._backend is None:
+            try:
+                import tesserocr
+                self._tesserocr = tesserocr
+                self._backend = 'tesserocr'
+                logger.info(f"Tesseract engine using tesserocr with {self.workers} workers")
+            except ImportError:
+                self._backend = 'pytesseract'
+                logger.info(f"tesserocr not installed, Tesseract engine using pytesseract with {self.workers} workers")
+        return self._backend
+
+    def _enqueue(self, priority: str, fn, *args) -> Future:
+        """Queue a call for the worker threads, started on first use."""
+        future = Future()
+        with self._cond:
+            if not self._threads:
+                for index in range(self.workers):
+                    thread = threading.Thread(target=self._run_worker, name=f"tesseract_{index}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+            heapq.heappush(self._queue, (_PRIORITY_ORDER.get(priority, 1), time.monotonic(),
+                                         next(self._sequence), fn, args, future))
+            self._cond.notify()
+        return future
+
+    def _run_worker(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                *_, fn, args, future = heapq.heappop(self._queue)
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def _get_api(self, language: str, psm=None):
+        """This thread's API handle for a language and page segmentation mode, initialized on first use."""
+        handles: Dict[object, object] = getattr(self._local, 'handles', None)
+        if handles is None:
+            handles = self._local.handles = {}
+        key = language if psm is None else (language, psm)
+        api = handles.get(key)
+        if api is None:
+            if psm is None:
+                api = self._tesserocr.PyTessBaseAPI(lang=language)
+            else:
+                api = self._tesserocr.PyTessBaseAPI(lang=language, psm=psm)
+            handles[key] = api
+        return api
+
+    @staticmethod
+    def _set_image(api, image):
+        if isinstance(image, RawImage):
+            api.SetImageBytes(image.data, image.width, image.height, image.channels,
+                              image.width * image.channels)
+        else:
+            api.SetImage(image)
+
+    def _recognize(self, image, language: str) -> Tuple[str, Optional[float]]:
+        start = time.perf_counter()
+        try:
+            if self.backend == 'tesserocr':
+                api = self._get_api(language)
+                self._set_image(api, image)
+                text = api.GetUTF8Text()
+                confidence = api.MeanTextConf() / 100 if text.strip() else None
+                # Drop the page so the handle does not keep it alive until the next one
+                api.Clear()
+            else:
+                import pytesseract
+                pil_image = image.to_pil() if isinstance(image, RawImage) else image
+                data = pytesseract.image_to_data(pil_image, lang=language, output_type=pytesseract.Output.DICT)
+                text, confidence = _text_from_data(data)
+        except Exception:
+            with self._stats_lock:
+                self.errors += 1
+            raise
+        with self._stats_lock:
+            self.pages += 1
+            self.total_ms += (time.perf_counter() - start) * 1000
+        return text, confidence
+
+    def submit(self, image, language: str, priority: str = NORMAL) -> Future:
+        """
+        Queue a page for recognition.
+
+        Args:
+            image: RawImage or PIL image
+            language: Tesseract language code, e.g. "spa" or "eng+spa"
+            priority: Scheduler priority class; interactive pages are taken first
+
+        Returns:
+            Future resolving to (text, confidence); confidence is Tesseract's mean
+            word confidence (0-1), or None when no text was found
+        """
+        return self._enqueue(priority, self._recognize, image, language)
+
+    def recognize(self, image, language: str, priority: str = NORMAL) -> Tuple[str, Optional[float]]:
+        """Recognize a page and wait for the text and confidence. See submit()."""
+        return self.submit(image, language, priority).result()
+
+    def _detect_orientation(self, image) -> Tuple[int, float]:
+        if self.backend == 'tesserocr':
+            api = self._get_api('osd', self._tesserocr.PSM.OSD_ONLY)
+            self._set_image(api, image)
+            try:
+                result = api.DetectOrientationScript()
+            finally:
+                api.Clear()
+            if not result:
+                raise RuntimeError("Tesseract could not detect the page orientation")
+            # orient_deg is how far the page is rotated clockwise
+            return (360 - result['orient_deg']) % 360, float(result['orient_conf'])
+        import pytesseract
+        pil_image = image.to_pil() if isinstance(image, RawImage) else image
+        osd = pytesseract.image_to_osd(pil_image, output_type=pytesseract.Output.DICT)
+        return int(osd['rotate']) % 360, float(osd['orientation_conf'])
+
+    def detect_orientation(self, image, priority: str = NORMAL) -> Tuple[int, float]:
+        """
+        Detect the page orientation with Tesseract OSD on the worker pool.
+
+        Needs the "osd" traineddata. Raises if Tesseract finds too little text.
+
+        Args:
+            image: RawImage or PIL image
+            priority: Scheduler priority class
+
+        Returns:
+            (clockwise rotation in degrees that makes the page upright, OSD confidence)
+        """
+        return self._enqueue(priority, self._detect_orientation, image).result()
+
+    def get_stats(self) -> dict:
+        """Get throughput statistics."""
+        with self._cond:
+            queued = len(self._queue)
+        with self._stats_lock:
+            return {
+                'backend': self._backend,
+                'workers': self.workers,
+                'queued': queued,
+                'threads_per_page': os.environ.get('OMP_THREAD_LIMIT'),
+                'pages': self.pages,
+                'errors': self.errors,
+                'average_ms': round(self.total_ms / self.pages, 1) if self.pages else 0.0,
+            }
+
+
+# Global Tesseract engine
+tesseract_engine = TesseractEngine()
@@ -5,24 +5,21 @@ This module provides API endpoints to manage preloading of processed
 OCR data, improving performance by utilizing cached data.
 """
 
-import os
 import logging
 from typing import List, Optional
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from pydantic import BaseModel
-from sqlalchemy.orm import Session, sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
 
 from app.utils.preload_utils import preload_manager, get_cached_text, get_cached_image_paths, is_data_preloaded
 from app.utils.cache_utils import get_cache_stats, clear_cache
+from app.utils.access_tracker import access_tracker
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["preload"])
 
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///ocr.db')
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from app.utils.db_config import SessionLocal
 
 
 def get_db():
@@ -58,6 +55,7 @@ async def get_preload_status():
         return {
             "preload_stats": stats,
             "cache_stats": cache_stats,
+            "access_stats": access_tracker.get_stats(),
             "status": "active"
         }
     except Exception as e:
@@ -65,6 +63,22 @@ async def get_preload_status():
         raise HTTPException(status_code=500, detail=f"Error getting preload status: {str(e)}")
 
 
+@router.get('/access-stats', summary="Get access frequency and cache hit-rate statistics")
+async def get_access_stats(top: int = 20):
+    """
+    Get the most frequently accessed files and folders used for predictive
+    preloading, and the cache hit rate of tracked accesses.
+    
+    Args:
+        top: Number of top files and folders to return
+    """
+    try:
+        return access_tracker.get_stats(top=top)
+    except Exception as e:
+        logger.error(f"Error getting access stats: {e}")
+        raise HTTPException(status_code=500, detail=f"Error getting access stats: {str(e)}")
+
+
 @router.get('/check/{file_id}', summary="Check preload availability for a file")
 async def check_preload_availability(file_id: str, db: Session = Depends(get_db)):
     """
@@ -151,12 +165,8 @@ async def preload_batch(request: BatchPreloadRequest, background_tasks: Backgrou
     try:
         logger.info(f"Starting batch preload with limit: {request.limit}")
         
-        # Run preload in background for large operations
-        background_tasks.add_task(
-            run_batch_preload_task,
-            limit=request.limit,
-            force_reload=request.force_reload
-        )
+        # Run preload in a background thread for large operations
+        preload_manager.preload_batch_in_background(limit=request.limit)
         
         return {
             "message": "Batch preload started in background",
@@ -168,18 +178,6 @@ async def preload_batch(request: BatchPreloadRequest, background_tasks: Backgrou
         raise HTTPException(status_code=500, detail=f"Error starting batch preload: {str(e)}")
 
 
-async def run_batch_preload_task(limit: Optional[int] = None, force_reload: bool = False):
-    """
-    Background task to run batch preload.
-    """
-    try:
-        logger.info(f"Running batch preload task with limit: {limit}")
-        results = preload_manager.preload_batch(limit=limit)
-        logger.info(f"Batch preload task completed: {results.get('successful', 0)} successful, {results.get('failed', 0)} failed")
-    except Exception as e:
-        logger.error(f"Error in batch preload task: {e}")
-
-
 @router.get('/text/{file_id}', summary="Get cached text for a file")
 async def get_cached_text_endpoint(file_id: str, text_type: str = 'auto'):
     """
@@ -194,6 +192,7 @@ async def get_cached_text_endpoint(file_id: str, text_type: str = 'auto'):
             raise HTTPException(status_code=400, detail="text_type must be 'pdf', 'ocr', or 'auto'")
         
         cached_text = get_cached_text(file_id, text_type)
+        access_tracker.record_access(file_id, "preload_text", cache_hit=cached_text is not None)
         
         if cached_text is None:
             # Try to preload if not in cache
@@ -310,7 +309,7 @@ async def clear_preload_cache(cache_type: str = 'all'):
 @router.post('/auto-preload', summary="Auto-preload system startup")
 async def auto_preload_startup(background_tasks: BackgroundTasks, limit: int = 50):
     """
-    Automatically preload the most recently processed files on system startup.
+    Automatically preload the most frequently accessed and most recently processed files.
     This is useful for warming up the cache when the system starts.
     """
     try:
@@ -335,21 +334,13 @@ async def run_auto_preload_task(limit: int):
     try:
         logger.info(f"Running auto-preload task for {limit} files")
         
-        # Get most recently processed files
-        db = SessionLocal()
-        try:
-            processed_files = preload_manager.get_processed_files(db)
-            # Sort by updated_at descending to get most recent first
-            processed_files.sort(key=lambda x: x['updated_at'], reverse=True)
-            target_files = [f['file_id'] for f in processed_files[:limit]]
-            
-            if target_files:
-                results = preload_manager.preload_batch(file_ids=target_files)
-                logger.info(f"Auto-preload completed: {results.get('successful', 0)} successful, {results.get('failed', 0)} failed")
-            else:
-                logger.info("No processed files found for auto-preload")
-        finally:
-            db.close()
+        # Preload the most frequently accessed files, then the most recently processed
+        results = preload_manager.preload_predicted(limit=limit)
+        
+        if results.get('total_files'):
+            logger.info(f"Auto-preload completed: {results.get('successful', 0)} successful, {results.get('failed', 0)} failed")
+        else:
+            logger.info("No processed files found for auto-preload")
             
     except Exception as e:
         logger.error(f"Error in auto-preload task: {e}")
\ No newline at end of file
@@ -1,24 +1,15 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime
 import re
-import json
 import logging
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
-# Database setup
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///ocr.db')
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from app.utils.access_tracker import access_tracker
 
-def get_db_connection():
-    """Get a raw SQLite connection for direct SQL queries."""
-    db_path = DATABASE_URL.replace('sqlite:///', '')
-    return sqlite3.connect(db_path)
+# Database setup
+# Queries run through fetch_all() so the event loop is never blocked on the database
+from app.utils.db_config import fetch_all
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +38,11 @@ class ImageSearchResult(BaseModel):
     text_content: Optional[str] = None
     relevance_score: Optional[float] = None
 
+class SearchClickRequest(BaseModel):
+    file_id: str = Field(..., min_length=1, description="File ID of the opened search result")
+    folder_id: Optional[str] = Field(default=None, description="Folder (directory_id) of the result")
+    page: Optional[int] = Field(default=None, ge=1, description="Page number opened, if any")
+
 class ImageSearchResponse(BaseModel):
     query: str
     total: int
@@ -171,7 +167,7 @@ def get_date_condition(date_range: str) -> Optional[str]:
         return "created_at >= datetime('now', '-365 days')"
     return None
 
-def get_total_count(search_request: ImageSearchRequest) -> int:
+async def get_total_count(search_request: ImageSearchRequest) -> int:
     """
     Get total count of search results for pagination.
     """
@@ -225,10 +221,8 @@ def get_total_count(search_request: ImageSearchRequest) -> int:
         count_query += " AND " + " AND ".join(conditions)
     
     try:
-        with get_db_connection() as conn:
-            cursor = conn.execute(count_query, params)
-            result = cursor.fetchone()
-            return result[0] if result else 0
+        _, rows = await fetch_all(count_query, params)
+        return rows[0][0] if rows else 0
     except Exception as e:
         logger.error(f"Error getting total count: {e}")
         return 0
@@ -243,35 +237,33 @@ async def search_images(search_request: ImageSearchRequest):
     
     try:
         # Get total count for pagination
-        total_count = get_total_count(search_request)
+        total_count = await get_total_count(search_request)
         
         # Build and execute search query
         query, params = create_search_query(search_request)
         
         results = []
-        with get_db_connection() as conn:
-            cursor = conn.execute(query, params)
-            rows = cursor.fetchall()
+        columns, rows = await fetch_all(query, params)
+        
+        for row in rows:
+            # Convert row to dictionary
+            row_dict = dict(zip(columns, row))
             
-            for row in rows:
-                # Convert row to dictionary
-                row_dict = dict(zip([col[0] for col in cursor.description], row))
-                
-                # Create result object
-                result = ImageSearchResult(
-                    file_id=row_dict['file_id'],
-                    status=row_dict['status'],
-                    pdf_text=row_dict['pdf_text'] if search_request.include_snippets else None,
-                    ocr_text=row_dict['ocr_text'] if search_request.include_snippets else None,
-                    pdf_image_path=row_dict['pdf_image_path'],
-                    ocr_image_path=row_dict['ocr_image_path'],
-                    created_at=row_dict['created_at'],
-                    updated_at=row_dict['updated_at'],
-                    directory_id=row_dict['directory_id'],
-                    text_content=row_dict['text_content'] if search_request.include_snippets else None,
-                    relevance_score=row_dict.get('relevance_score', 0.0)
-                )
-                results.append(result)
+            # Create result object
+            result = ImageSearchResult(
+                file_id=row_dict['file_id'],
+                status=row_dict['status'],
+                pdf_text=row_dict['pdf_text'] if search_request.include_snippets else None,
+                ocr_text=row_dict['ocr_text'] if search_request.include_snippets else None,
+                pdf_image_path=row_dict['pdf_image_path'],
+                ocr_image_path=row_dict['ocr_image_path'],
+                created_at=row_dict['created_at'],
+                updated_at=row_dict['updated_at'],
+                directory_id=row_dict['directory_id'],
+                text_content=row_dict['text_content'] if search_request.include_snippets else None,
+                relevance_score=row_dict.get('relevance_score', 0.0)
+            )
+            results.append(result)
         
         execution_time = (datetime.now() - start_time).total_seconds() * 1000
         
@@ -303,43 +295,33 @@ async def get_search_suggestions(q: str = Query(..., min_length=2, max_length=10
         suggestions = []
         
         # Search for common terms in the database
-        with get_db_connection() as conn:
-            # Get suggestions from PDF text
-            pdf_query = """
-            SELECT DISTINCT 
-                SUBSTR(pdf_text, INSTR(UPPER(pdf_text), UPPER(?)) - 10, 50) as context
-            FROM ocr_results 
-            WHERE pdf_text LIKE ? COLLATE NOCASE 
-            AND pdf_text IS NOT NULL 
-            AND pdf_text != ''
-            LIMIT 10
-            """
-            
-            # Get suggestions from OCR text
-            ocr_query = """
-            SELECT DISTINCT 
-                SUBSTR(ocr_text, INSTR(UPPER(ocr_text), UPPER(?)) - 10, 50) as context
-            FROM ocr_results 
-            WHERE ocr_text LIKE ? COLLATE NOCASE 
-            AND ocr_text IS NOT NULL 
-            AND ocr_text != ''
-            LIMIT 10
-            """
-            
-            for word in query_words[:3]:  # Limit to first 3 words
-                # PDF suggestions
-                cursor = conn.execute(pdf_query, [word, f"%{word}%"])
-                for row in cursor.fetchall():
-                    context = row[0]
-                    if context:
-                        # Extract meaningful phrases
-                        words = re.findall(r'\b\w+\b', context)
-                        if len(words) >= 2:
-                            suggestions.append(' '.join(words[:3]))
-                
-                # OCR suggestions
-                cursor = conn.execute(ocr_query, [word, f"%{word}%"])
-                for row in cursor.fetchall():
+        # Get suggestions from PDF text
+        pdf_query = """
+        SELECT DISTINCT 
+            SUBSTR(pdf_text, INSTR(UPPER(pdf_text), UPPER(?)) - 10, 50) as context
+        FROM ocr_results 
+        WHERE pdf_text LIKE ? COLLATE NOCASE 
+        AND pdf_text IS NOT NULL 
+        AND pdf_text != ''
+        LIMIT 10
+        """
+        
+        # Get suggestions from OCR text
+        ocr_query = """
+        SELECT DISTINCT 
+            SUBSTR(ocr_text, INSTR(UPPER(ocr_text), UPPER(?)) - 10, 50) as context
+        FROM ocr_results 
+        WHERE ocr_text LIKE ? COLLATE NOCASE 
+        AND ocr_text IS NOT NULL 
+        AND ocr_text != ''
+        LIMIT 10
+        """
+        
+        for word in query_words[:3]:  # Limit to first 3 words
+            # PDF and OCR suggestions
+            for text_query in (pdf_query, ocr_query):
+                _, rows = await fetch_all(text_query, [word, f"%{word}%"])
+                for row in rows:
                     context = row[0]
                     if context:
                         # Extract meaningful phrases
@@ -368,4 +350,17 @@ async def advanced_image_search(search_params: Dict[str, Any]):
         return await search_images(search_request)
     except Exception as e:
         logger.error(f"Error in advanced search: {e}")
-        raise HTTPException(status_code=500, detail=f"Advanced search failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Advanced search failed: {str(e)}")
+
+@router.post("/click")
+async def record_search_click(click: SearchClickRequest):
+    """
+    Record that a search result was opened.
+    Clicks feed the access statistics used for predictive preloading.
+    """
+    try:
+        access_tracker.record_access(click.file_id, "search_click", folder_id=click.folder_id, page=click.page)
+        return {"recorded": True}
+    except Exception as e:
+        logger.error(f"Error recording search click for {click.file_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to record click: {str(e)}")
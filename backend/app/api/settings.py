@@ -2,14 +2,10 @@ from fastapi import APIRouter, HTTPException, Depends, Response
 from sqlalchemy.orm import Session
 from app.models import Setting, Localization
 from app.schemas import SettingCreate, SettingRead, LocalizationCreate, LocalizationRead
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-import os
+from app.utils.settings_cache import settings_snapshot
 from typing import List
 
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///ocr.db')
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from app.utils.db_config import SessionLocal
 
 def get_db():
     db = SessionLocal()
@@ -35,6 +31,7 @@ def create_setting(setting: SettingCreate, db: Session = Depends(get_db)):
     db.add(db_setting)
     db.commit()
     db.refresh(db_setting)
+    settings_snapshot.invalidate()
     return db_setting
 
 @router.put('/settings/{setting_id}', response_model=SettingRead)
@@ -49,6 +46,7 @@ def update_setting(setting_id: int, setting: SettingCreate, db: Session = Depend
     
     db.commit()
     db.refresh(db_setting)
+    settings_snapshot.invalidate()
     return db_setting
 
 @router.delete('/settings/{setting_id}')
@@ -59,8 +57,14 @@ def delete_setting(setting_id: int, db: Session = Depends(get_db)):
     
     db.delete(db_setting)
     db.commit()
+    settings_snapshot.invalidate()
     return {"message": "Setting deleted successfully"}
 
+@router.get('/settings/snapshot')
+def get_settings_snapshot_stats():
+    """Version and reload statistics of the in-memory settings snapshot."""
+    return settings_snapshot.get_stats()
+
 # Localization endpoints
 @router.get('/localizations', response_model=List[LocalizationRead])
 def list_localizations(response: Response, db: Session = Depends(get_db)):
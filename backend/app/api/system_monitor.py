@@ -8,10 +8,13 @@ import logging
 import asyncio
 import psutil
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from typing import Dict, List, Any, Optional
 import json
 from datetime import datetime
 
+from app.utils.loop_monitor import loop_monitor
+
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["system_monitor"])
 
@@ -109,6 +112,7 @@ def get_system_resources() -> Dict[str, Any]:
             },
             "gpu": gpu_info,
             "process": process_info,
+            "event_loop": loop_monitor.get_stats(),
             "batch_processing": batch_info
         }
         
@@ -160,7 +164,8 @@ async def get_resources():
     """
     Get current system resource usage.
     """
-    return get_system_resources()
+    # psutil sampling blocks for a fraction of a second, so keep it off the event loop
+    return await run_in_threadpool(get_system_resources)
 
 @router.get("/history")
 async def get_history():
@@ -180,7 +185,7 @@ async def websocket_endpoint(websocket: WebSocket):
     try:
         while True:
             # Send resource data every second
-            resources = get_system_resources()
+            resources = await run_in_threadpool(get_system_resources)
             await websocket.send_json(resources)
             await asyncio.sleep(1)
     except WebSocketDisconnect:
@@ -1,16 +1,12 @@
-import sqlite3
-import os
 import logging
 
-logger = logging.getLogger(__name__)
+from app.utils.db_config import raw_connection
 
-# Database setup
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///./ocr.db')
+logger = logging.getLogger(__name__)
 
 def get_db_connection():
-    """Get a raw SQLite connection for direct SQL queries."""
-    db_path = DATABASE_URL.replace('sqlite:///', '')
-    # Ensure the directory for the database exists if it's a file-based DB
-    if db_path and db_path != ':memory:':
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    return sqlite3.connect(db_path)
\ No newline at end of file
+    """
+    Borrow a pooled connection for direct SQL queries.
+    Use as a context manager: commits on success and returns the connection to the pool.
+    """
+    return raw_connection()
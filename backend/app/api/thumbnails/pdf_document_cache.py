@@ -0,0 +1,238 @@
+"""
+In-process cache of opened PDF documents for on-the-fly page rendering.
+
+Thumbnails and processed images for pages that are not stored in the database
+are rendered straight from the SharePoint PDF. Without a cache every page
+request downloads and parses the whole document again, so opening a document
+viewer triggers one full download per page. This module keeps a small LRU of
+opened fitz.Document handles keyed by (file_id, eTag) and makes sure that
+concurrent requests for the same file share a single download and parse.
+"""
+
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from . import thumbnail_utils
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_DOCUMENTS = int(os.getenv("PDF_DOCUMENT_CACHE_SIZE", "8"))
+DEFAULT_ETAG_TTL_SECONDS = float(os.getenv("PDF_ETAG_TTL_SECONDS", "60"))
+
+
+class _CachedDocument:
+    """An opened PDF together with the bytes it was parsed from."""
+
+    def __init__(self, file_id: str, etag: Optional[str], content: bytes):
+        import fitz  # PyMuPDF
+
+        self.file_id = file_id
+        self.etag = etag
+        self.content = content
+        self.document = fitz.open(stream=io.BytesIO(content), filetype="pdf")
+        self.opened_at = time.time()
+        # fitz documents are not safe for concurrent use, so renders on the
+        # same document are serialized while different documents render in parallel
+        self.render_lock = threading.Lock()
+        self.refcount = 0
+        self.evicted = False
+
+    def close(self):
+        try:
+            self.document.close()
+        except Exception as e:
+            logger.warning(f"Error closing cached PDF document for {self.file_id}: {e}")
+
+
+class PdfDocumentCache:
+    """LRU of opened PDF documents keyed by SharePoint file ID and eTag."""
+
+    def __init__(self, max_documents: int = DEFAULT_MAX_DOCUMENTS,
+                 etag_ttl_seconds: float = DEFAULT_ETAG_TTL_SECONDS):
+        self.max_documents = max(1, max_documents)
+        self.etag_ttl_seconds = etag_ttl_seconds
+        self._documents: "OrderedDict[Tuple[str, Optional[str]], _CachedDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per file ID in use: the first request downloads, the others wait for it.
+        # file_id -> [lock, requests holding or waiting for it]; dropped when the count reaches 0
+        self._file_locks: Dict[str, list] = {}
+        # file_id -> (location, etag, checked_at), kept while the file is cached or in use
+        self._versions: Dict[str, Tuple[Tuple[str, str], Optional[str], float]] = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "downloads": 0,
+            "download_failures": 0,
+            "evictions": 0,
+        }
+
+    @contextmanager
+    def _file_lock(self, file_id: str):
+        """Hold the file's lock; its lock and version entries are dropped once unused."""
+        with self._lock:
+            holder = self._file_locks.get(file_id)
+            if holder is None:
+                holder = self._file_locks[file_id] = [threading.Lock(), 0]
+            holder[1] += 1
+        try:
+            with holder[0]:
+                yield
+        finally:
+            with self._lock:
+                holder[1] -= 1
+                if holder[1] == 0:
+                    del self._file_locks[file_id]
+                    self._forget_version_locked(file_id)
+
+    def _forget_version_locked(self, file_id: str):
+        """Drop the file's version unless it is cached or in use. Caller holds _lock."""
+        if file_id in self._file_locks or any(key[0] == file_id for key in self._documents):
+            return
+        self._versions.pop(file_id, None)
+
+    def _resolve_version(self, file_id: str):
+        """Return (location, etag) for a file, re-checking the eTag at most once per TTL."""
+        now = time.time()
+        cached = self._versions.get(file_id)
+        if cached and now - cached[2] < self.etag_ttl_seconds:
+            return cached[0], cached[1]
+
+        location = cached[0] if cached else thumbnail_utils.resolve_sharepoint_location(file_id)
+        if not location:
+            return None, None
+
+        etag = thumbnail_utils.get_sharepoint_etag(*location)
+        self._versions[file_id] = (location, etag, now)
+        return location, etag
+
+    def _is_fresh(self, entry: _CachedDocument) -> bool:
+        # Without an eTag we cannot tell whether the file changed, so fall back to age
+        if entry.etag is None:
+            return time.time() - entry.opened_at < self.etag_ttl_seconds
+        return True
+
+    def _evict_locked(self, key):
+        entry = self._documents.pop(key, None)
+        if entry is None:
+            return
+        self._stats["evictions"] += 1
+        entry.evicted = True
+        if entry.refcount == 0:
+            entry.close()
+        self._forget_version_locked(key[0])
+
+    def _acquire(self, file_id: str) -> Optional[_CachedDocument]:
+        with self._file_lock(file_id):
+            location, etag = self._resolve_version(file_id)
+            if not location:
+                return None
+            key = (file_id, etag)
+
+            with self._lock:
+                entry = self._documents.get(key)
+                if entry is not None and self._is_fresh(entry):
+                    self._documents.move_to_end(key)
+                    entry.refcount += 1
+                    self._stats["hits"] += 1
+                    return entry
+                self._stats["misses"] += 1
+
+            logger.info(f"PDF document cache miss for {file_id} (eTag: {etag}), downloading")
+            content = thumbnail_utils.download_pdf_content_from_sharepoint(file_id, location)
+            if not content:
+                with self._lock:
+                    self._stats["download_failures"] += 1
+                return None
+
+            entry = _CachedDocument(file_id, etag, content)
+            entry.refcount = 1
+
+            with self._lock:
+                self._stats["downloads"] += 1
+                # Drop older versions of the same file before inserting the new one
+                for stale_key in [k for k in self._documents if k[0] == file_id]:
+                    self._evict_locked(stale_key)
+                self._documents[key] = entry
+                while len(self._documents) > self.max_documents:
+                    oldest_key = next(iter(self._documents))
+                    self._evict_locked(oldest_key)
+            return entry
+
+    def _release(self, entry: _CachedDocument):
+        with self._lock:
+            entry.refcount -= 1
+            if entry.evicted and entry.refcount == 0:
+                entry.close()
+
+    @contextmanager
+    def open_document(self, file_id: str):
+        """
+        Yield an opened fitz.Document for a SharePoint file, or None if it cannot be downloaded.
+
+        The document is locked for the duration of the block, so callers can
+        render pages without coordinating with other requests.
+
+        Args:
+            file_id: The file ID (SharePoint item_id) as stored in ocr_results
+        """
+        entry = self._acquire(file_id)
+        if entry is None:
+            yield None
+            return
+        try:
+            with entry.render_lock:
+                yield entry.document
+        finally:
+            self._release(entry)
+
+    def get_pdf_bytes(self, file_id: str) -> Optional[bytes]:
+        """Return the raw PDF bytes for a SharePoint file, sharing the cached download."""
+        entry = self._acquire(file_id)
+        if entry is None:
+            return None
+        try:
+            return entry.content
+        finally:
+            self._release(entry)
+
+    def is_cached(self, file_id: str) -> bool:
+        """Whether an opened document for the file is currently held, without any network access."""
+        with self._lock:
+            return any(key[0] == file_id for key in self._documents)
+
+    def invalidate(self, file_id: str):
+        """Drop any cached versions of a file."""
+        with self._lock:
+            self._versions.pop(file_id, None)
+            for key in [k for k in self._documents if k[0] == file_id]:
+                self._evict_locked(key)
+
+    def clear(self):
+        """Drop all cached documents."""
+        with self._lock:
+            self._versions.clear()
+            for key in list(self._documents):
+                self._evict_locked(key)
+
+    def get_stats(self) -> dict:
+        """Get cache statistics."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "documents": len(self._documents),
+                "max_documents": self.max_documents,
+                "bytes": sum(len(entry.content) for entry in self._documents.values()),
+                "etag_ttl_seconds": self.etag_ttl_seconds,
+            }
+
+
+# Global cache instance
+pdf_document_cache = PdfDocumentCache()
@@ -10,7 +10,6 @@ from typing import Optional, Tuple
 from PIL import Image
 
 from .db_utils import get_db_connection
-from . import thumbnail_utils
 
 logger = logging.getLogger(__name__)
 
@@ -95,6 +94,48 @@ def get_processed_image(file_id: str) -> Optional[Tuple[bytes, str]]:
         logger.error(f"Error retrieving processed image for {file_id}: {e}")
         return None
 
+def render_page_image(pdf_document, page_num: int, dpi: int = 300) -> Optional[Tuple[bytes, int, int]]:
+    """
+    Render a page of an already opened PDF document to a high-resolution JPEG.
+    
+    Args:
+        pdf_document: An open fitz.Document
+        page_num: Page number (1-based)
+        dpi: Render resolution
+        
+    Returns:
+        Tuple of (image_data, width, height) or None if the page number is out of range
+    """
+    import fitz  # PyMuPDF
+    
+    # Check if page number is valid (convert to 0-based)
+    page_index = page_num - 1
+    if page_index < 0 or page_index >= len(pdf_document):
+        logger.warning(f"Invalid page number {page_num} for PDF with {len(pdf_document)} pages")
+        return None
+        
+    page = pdf_document[page_index]
+    
+    # Render page to high-resolution image
+    zoom_factor = dpi / 72  # 72 is the default PDF DPI
+    mat = fitz.Matrix(zoom_factor, zoom_factor)
+    pix = page.get_pixmap(matrix=mat)
+    
+    # Convert to PIL Image
+    img_data = pix.tobytes("ppm")
+    img = Image.open(io.BytesIO(img_data))
+    
+    # Convert to RGB if necessary
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGB')
+    
+    # Save to bytes with high quality
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=90, optimize=True)
+    
+    width, height = img.size
+    return output.getvalue(), width, height
+
 def store_processed_image_from_pdf(file_id: str, page_num: int = 1) -> bool:
     """
     Store a processed image from a PDF file.
@@ -107,51 +148,23 @@ def store_processed_image_from_pdf(file_id: str, page_num: int = 1) -> bool:
         True if successful, False otherwise
     """
     try:
-        # Get PDF content from SharePoint
-        pdf_content = thumbnail_utils.download_pdf_content_from_sharepoint(file_id)
+        from .pdf_document_cache import pdf_document_cache
         
-        if not pdf_content:
-            logger.warning(f"Could not download PDF content for {file_id}")
-            return False
+        # Get the PDF from SharePoint, sharing the download with concurrent page requests
+        with pdf_document_cache.open_document(file_id) as pdf_document:
+            if pdf_document is None:
+                logger.warning(f"Could not download PDF content for {file_id}")
+                return False
             
-        # Create a high-resolution image from the PDF page
-        import fitz  # PyMuPDF
-        import io
-        
-        pdf_stream = io.BytesIO(pdf_content)
-        pdf_document = fitz.open(stream=pdf_stream, filetype="pdf")
+            rendered = render_page_image(pdf_document, page_num)
         
-        # Check if page number is valid (convert to 0-based)
-        page_index = page_num - 1
-        if page_index < 0 or page_index >= len(pdf_document):
-            pdf_document.close()
-            logger.warning(f"Invalid page number {page_num} for PDF with {len(pdf_document)} pages")
+        if not rendered:
             return False
-            
-        page = pdf_document[page_index]
         
-        # Render page to high-resolution image (300 DPI)
-        zoom_factor = 300 / 72  # 300 DPI / 72 (default PDF DPI)
-        mat = fitz.Matrix(zoom_factor, zoom_factor)
-        pix = page.get_pixmap(matrix=mat)
-        
-        # Convert to PIL Image
-        img_data = pix.tobytes("ppm")
-        img = Image.open(io.BytesIO(img_data))
-        
-        # Convert to RGB if necessary
-        if img.mode in ('RGBA', 'LA', 'P'):
-            img = img.convert('RGB')
-        
-        # Save to bytes with high quality
-        output = io.BytesIO()
-        img.save(output, format='JPEG', quality=90, optimize=True)
-        image_data = output.getvalue()
-        
-        width, height = img.size
+        image_data, width, height = rendered
         
         # Store the processed image
-        result = store_processed_image(
+        return store_processed_image(
             f"{file_id}_page_{page_num}",
             image_data,
             'JPEG',
@@ -161,9 +174,6 @@ def store_processed_image_from_pdf(file_id: str, page_num: int = 1) -> bool:
             None
         )
         
-        pdf_document.close()
-        return result
-        
     except Exception as e:
         logger.error(f"Error storing processed image from PDF for {file_id} page {page_num}: {e}")
-        return False
\ No newline at end of file
+        return False
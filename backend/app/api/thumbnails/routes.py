@@ -1,24 +1,147 @@
-from fastapi import APIRouter, HTTPException, Response, File, UploadFile
+from fastapi import APIRouter, HTTPException, Response, File, UploadFile, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
 import json
 import logging
+import os
 from datetime import datetime
-import fitz # PyMuPDF for PDF handling
 
 # Import helper functions and db connection
 from . import thumbnail_utils
 from . import processed_image_utils
+from .pdf_document_cache import pdf_document_cache
+from app.utils.single_flight import get_single_flight
+from app.utils.access_tracker import access_tracker
+from app.utils.db_config import run_db
 from .db_utils import get_db_connection # Use local db_utils
 from improved_thumbnail_system import ThumbnailManager # Fixed import path
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Concurrent requests for the same missing image share one render
+thumbnail_flight = get_single_flight("thumbnails")
+processed_image_flight = get_single_flight("processed_images")
+
+def _render_page_thumbnail_from_sharepoint(file_id: str, page_num: int):
+    """Render a page thumbnail from the cached SharePoint PDF. Returns (pdf_available, thumbnail_data)."""
+    with pdf_document_cache.open_document(file_id) as pdf_document:
+        if pdf_document is None:
+            return False, None
+        return True, thumbnail_utils.render_page_thumbnail(pdf_document, page_num)
+
+# Pages after the requested one to pre-render while the PDF is still cached
+NEIGHBOR_PAGES_TO_WARM = int(os.getenv("THUMBNAIL_NEIGHBOR_PAGES", "2"))
+
+def _warm_neighbor_thumbnails(base_file_id: str, page_num: int):
+    """Render and store thumbnails for the next pages of a document whose PDF is already cached."""
+    if NEIGHBOR_PAGES_TO_WARM <= 0 or not pdf_document_cache.is_cached(base_file_id):
+        return
+    try:
+        with get_db_connection() as conn:
+            for next_page in range(page_num + 1, page_num + 1 + NEIGHBOR_PAGES_TO_WARM):
+                page_file_id = f"{base_file_id}_page_{next_page}"
+                if conn.execute("SELECT 1 FROM thumbnails WHERE file_id = ?", (page_file_id,)).fetchone():
+                    continue
+                pdf_available, thumbnail_data = thumbnail_flight.do_sync(
+                    page_file_id, _render_page_thumbnail_from_sharepoint, base_file_id, next_page
+                )
+                if not pdf_available or not thumbnail_data:
+                    # Past the last page, or the document is gone
+                    break
+                source_type = f'pdf-page-{next_page}'
+                conn.execute("""
+                    INSERT OR REPLACE INTO thumbnails
+                    (file_id, thumbnail_data, thumbnail_format, width, height, file_size, source_type, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (page_file_id, thumbnail_data, 'JPEG', 150, 200, len(thumbnail_data), source_type, datetime.now()))
+                conn.commit()
+                logger.debug(f"Pre-rendered neighbor thumbnail for {page_file_id}")
+    except Exception as e:
+        logger.error(f"Error pre-rendering neighbor thumbnails for {base_file_id} page {page_num}: {e}")
+
+def _render_page_image_from_sharepoint(file_id: str, page_num: int):
+    """Render a full-resolution page image from the cached SharePoint PDF. Returns (data, width, height) or None."""
+    with pdf_document_cache.open_document(file_id) as pdf_document:
+        if pdf_document is None:
+            return None
+        logger.info(f"Got PDF document for {file_id}, generating image for page {page_num}")
+        return processed_image_utils.render_page_image(pdf_document, page_num)
+
+def _fetch_thumbnail(file_id: str):
+    """Return (thumbnail_data, thumbnail_format, source_type) for a stored thumbnail, or None."""
+    with get_db_connection() as conn:
+        cursor = conn.execute("""
+            SELECT thumbnail_data, thumbnail_format, source_type
+            FROM thumbnails
+            WHERE file_id = ?
+        """, (file_id,))
+        return cursor.fetchone()
+
+def _store_page_thumbnail(file_id: str, thumbnail_data: bytes, source_type: str):
+    """Store a generated page thumbnail, logging rather than raising on failure."""
+    try:
+        with get_db_connection() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO thumbnails
+                (file_id, thumbnail_data, thumbnail_format, width, height, file_size, source_type, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (file_id, thumbnail_data, 'JPEG', 150, 200, len(thumbnail_data), source_type, datetime.now()))
+            conn.commit()
+        logger.info(f"Stored page thumbnail for {file_id} ({source_type})")
+    except Exception as e:
+        logger.error(f"Error storing page thumbnail for {file_id}: {e}")
+
+def _create_fallback_page_thumbnail(file_id: str, base_file_id: str, page_num: int):
+    """
+    Create a page thumbnail without SharePoint: from an existing page image, a
+    local PDF, or a placeholder. Stores the result. Returns (thumbnail_data, source_type).
+    """
+    logger.info(f"Trying to create thumbnail from existing page image for {base_file_id} page {page_num}")
+    thumbnail_data = thumbnail_utils.create_thumbnail_from_existing_page_image(base_file_id, page_num)
+    if thumbnail_data:
+        source_type = f'existing-page-{page_num}'
+        logger.info(f"Generated thumbnail from existing page image for {base_file_id} page {page_num}")
+        _store_page_thumbnail(file_id, thumbnail_data, source_type)
+        return thumbnail_data, source_type
+    logger.info(f"No existing page image found for {base_file_id} page {page_num}")
+
+    with get_db_connection() as conn:
+        cursor = conn.execute("""
+            SELECT pdf_image_path, ocr_image_path
+            FROM ocr_results
+            WHERE file_id = ?
+        """, (base_file_id,))
+        doc_result = cursor.fetchone()
+    if doc_result:
+        for path_field in doc_result:
+            if not path_field:
+                continue
+            try:
+                paths = json.loads(path_field) if path_field.startswith('[') else [path_field]
+                if not isinstance(paths, list): paths = [paths]
+                for path_str in paths:
+                    if Path(path_str).exists() and path_str.lower().endswith('.pdf'):
+                        thumbnail_data = thumbnail_utils.create_page_specific_thumbnail_from_pdf(path_str, page_num)
+                        if thumbnail_data:
+                            source_type = f'pdf-page-{page_num}'
+                            _store_page_thumbnail(file_id, thumbnail_data, source_type)
+                            return thumbnail_data, source_type
+            except Exception as e:
+                logger.error(f"Error processing path {path_field}: {e}")
+
+    thumbnail_data = thumbnail_utils.create_page_specific_placeholder_thumbnail(base_file_id, page_num)
+    source_type = f'page-placeholder-{page_num}'
+    if thumbnail_data:
+        _store_page_thumbnail(file_id, thumbnail_data, source_type)
+    return thumbnail_data, source_type
+
 @router.get("/thumbnail/{file_id}")
-async def get_thumbnail_v2(file_id: str):
+async def get_thumbnail_v2(file_id: str, background_tasks: BackgroundTasks):
     """
     Get thumbnail for a specific file ID from the new thumbnails table.
     Supports both document thumbnails and page-specific thumbnails.
+    Database reads and writes run on the database thread pool, off the event loop.
     """
     try:
         # Check if this is a page-specific request (format: file_id_page_N)
@@ -30,92 +153,43 @@ async def get_thumbnail_v2(file_id: str):
                     page_num = int(parts[1])  # Keep 1-based for page display
                     base_file_id = parts[0]
                     # First, try to find a page-specific thumbnail
-                    with get_db_connection() as conn:
-                        cursor = conn.execute("""
-                            SELECT thumbnail_data, thumbnail_format, source_type
-                            FROM thumbnails
-                            WHERE file_id = ?
-                        """, (file_id,))
-                        
-                        result = cursor.fetchone()
-                        
-                        if result:
-                            thumbnail_data, thumbnail_format, source_type = result
-                            media_type = f"image/{thumbnail_format.lower()}"
-                            
-                            return Response(
-                                content=thumbnail_data,
-                                media_type=media_type,
-                                headers={
-                                    'Cache-Control': 'public, max-age=86400',
-                                    'Content-Disposition': f'inline; filename="thumbnail_{file_id}.{thumbnail_format.lower()}"',
-                                    'X-Thumbnail-Source': f'{source_type}-page-{page_num}'
-                                }
-                            )
-                        
-                        # If no page-specific thumbnail found, try to generate one on-the-fly
-                        thumbnail_data = None
-                        source_type = 'page-placeholder'
+                    result = await run_db(_fetch_thumbnail, file_id)
+                    
+                    access_tracker.record_access(base_file_id, "thumbnail", page=page_num, cache_hit=bool(result))
+                    background_tasks.add_task(_warm_neighbor_thumbnails, base_file_id, page_num)
+                    
+                    if result:
+                        thumbnail_data, thumbnail_format, source_type = result
+                        media_type = f"image/{thumbnail_format.lower()}"
                         
-                        try:
-                            logger.info(f"Attempting to download PDF from SharePoint for {base_file_id}")
-                            pdf_content = thumbnail_utils.download_pdf_content_from_sharepoint(base_file_id)
-                            logger.info(f"download_pdf_content_from_sharepoint returned: {pdf_content is not None}")
+                        return Response(
+                            content=thumbnail_data,
+                            media_type=media_type,
+                            headers={
+                                'Cache-Control': 'public, max-age=86400',
+                                'Content-Disposition': f'inline; filename="thumbnail_{file_id}.{thumbnail_format.lower()}"',
+                                'X-Thumbnail-Source': f'{source_type}-page-{page_num}'
+                            }
+                        )
+                    
+                    # If no page-specific thumbnail found, try to generate one on-the-fly
+                    thumbnail_data = None
+                    
+                    try:
+                        logger.info(f"Rendering page thumbnail from SharePoint PDF for {base_file_id}")
+                        # Rendered in a worker thread so concurrent page requests for the
+                        # same PDF can share one download through the document cache
+                        pdf_available, thumbnail_data = await thumbnail_flight.do(
+                            file_id, run_in_threadpool, _render_page_thumbnail_from_sharepoint, base_file_id, page_num
+                        )
 
-                            if pdf_content and len(pdf_content) > 0:
-                                thumbnail_data = thumbnail_utils.create_page_specific_thumbnail_from_pdf_content(pdf_content, page_num)
-                                if thumbnail_data:
-                                    source_type = f'pdf-page-{page_num}'
-                                    logger.info(f"Generated real page thumbnail from SharePoint PDF for {base_file_id} page {page_num}")
-                                    
-                                    # Store the generated thumbnail in the database
-                                    try:
-                                        file_size = len(thumbnail_data)
-                                        conn.execute("""
-                                            INSERT OR REPLACE INTO thumbnails
-                                            (file_id, thumbnail_data, thumbnail_format, width, height, file_size, source_type, updated_at)
-                                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                                        """, (file_id, thumbnail_data, 'JPEG', 150, 200, file_size, source_type, datetime.now()))
-                                        conn.commit()
-                                        logger.info(f"Stored real page thumbnail for {file_id}")
-                                    except Exception as e:
-                                        logger.error(f"Error storing real page thumbnail: {e}")
-                                        
-                                    return Response(
-                                        content=thumbnail_data, media_type="image/jpeg",
-                                        headers={
-                                            'Cache-Control': 'public, max-age=86400',
-                                            'Content-Disposition': f'inline; filename="thumbnail_{file_id}.jpg"',
-                                            'X-Thumbnail-Source': source_type
-                                        }
-                                    )
-                                else:
-                                    logger.warning(f"Failed to generate thumbnail from PDF content for {base_file_id} page {page_num}")
-                            else:
-                                logger.warning(f"No PDF content available from SharePoint for {base_file_id}")
-                                
-                        except Exception as e:
-                            logger.error(f"Error downloading PDF from SharePoint for {base_file_id}: {e}")
-                        
-                        if not thumbnail_data:
-                            logger.info(f"Trying to create thumbnail from existing page image for {base_file_id} page {page_num}")
-                            thumbnail_data = thumbnail_utils.create_thumbnail_from_existing_page_image(base_file_id, page_num)
+                        if pdf_available:
                             if thumbnail_data:
-                                source_type = f'existing-page-{page_num}'
-                                logger.info(f"Generated thumbnail from existing page image for {base_file_id} page {page_num}")
+                                source_type = f'pdf-page-{page_num}'
+                                logger.info(f"Generated real page thumbnail from SharePoint PDF for {base_file_id} page {page_num}")
                                 
                                 # Store the generated thumbnail in the database
-                                try:
-                                    file_size = len(thumbnail_data)
-                                    conn.execute("""
-                                        INSERT OR REPLACE INTO thumbnails
-                                        (file_id, thumbnail_data, thumbnail_format, width, height, file_size, source_type, updated_at)
-                                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                                    """, (file_id, thumbnail_data, 'JPEG', 150, 200, file_size, source_type, datetime.now()))
-                                    conn.commit()
-                                    logger.info(f"Stored existing page thumbnail for {file_id}")
-                                except Exception as e:
-                                    logger.error(f"Error storing existing page thumbnail: {e}")
+                                await run_db(_store_page_thumbnail, file_id, thumbnail_data, source_type)
                                     
                                 return Response(
                                     content=thumbnail_data, media_type="image/jpeg",
@@ -126,77 +200,45 @@ async def get_thumbnail_v2(file_id: str):
                                     }
                                 )
                             else:
-                                logger.info(f"No existing page image found for {base_file_id} page {page_num}")
-                        
-                        if not thumbnail_data:
-                            cursor = conn.execute("""
-                                SELECT pdf_image_path, ocr_image_path
-                                FROM ocr_results
-                                WHERE file_id = ?
-                            """, (base_file_id,))
-                            doc_result = cursor.fetchone()
-                            if doc_result:
-                                pdf_image_path, ocr_image_path = doc_result
-                                for path_field in [pdf_image_path, ocr_image_path]:
-                                    if not path_field:
-                                        continue
-                                    try:
-                                        paths = json.loads(path_field) if path_field.startswith('[') else [path_field]
-                                        if not isinstance(paths, list): paths = [paths]
-                                        for path_str in paths:
-                                            if Path(path_str).exists() and path_str.lower().endswith('.pdf'):
-                                                thumbnail_data = thumbnail_utils.create_page_specific_thumbnail_from_pdf(path_str, page_num)
-                                                source_type = f'pdf-page-{page_num}'
-                                                break
-                                        if thumbnail_data: break
-                                    except Exception as e:
-                                        logger.error(f"Error processing path {path_field}: {e}")
-                        
-                        if not thumbnail_data:
-                            thumbnail_data = thumbnail_utils.create_page_specific_placeholder_thumbnail(base_file_id, page_num)
-                            source_type = f'page-placeholder-{page_num}'
-                            if thumbnail_data:
-                                try:
-                                    file_size = len(thumbnail_data)
-                                    conn.execute("""
-                                        INSERT OR REPLACE INTO thumbnails
-                                        (file_id, thumbnail_data, thumbnail_format, width, height, file_size, source_type, updated_at)
-                                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                                    """, (file_id, thumbnail_data, 'JPEG', 150, 200, file_size, source_type, datetime.now()))
-                                    conn.commit()
-                                except Exception as e:
-                                    logger.error(f"Error storing page thumbnail: {e}")
-                                
-                                return Response(
-                                    content=thumbnail_data, media_type="image/jpeg",
-                                    headers={
-                                        'Cache-Control': 'public, max-age=86400',
-                                        'Content-Disposition': f'inline; filename="thumbnail_{file_id}.jpg"',
-                                        'X-Thumbnail-Source': source_type
-                                    }
-                                )
-                        
-                        raise HTTPException(status_code=404, detail=f"Could not generate thumbnail for page {page_num} of file {base_file_id}")
+                                logger.warning(f"Failed to generate thumbnail from PDF content for {base_file_id} page {page_num}")
+                        else:
+                            logger.warning(f"No PDF content available from SharePoint for {base_file_id}")
+                            
+                    except Exception as e:
+                        logger.error(f"Error downloading PDF from SharePoint for {base_file_id}: {e}")
+                    
+                    thumbnail_data, source_type = await run_in_threadpool(
+                        _create_fallback_page_thumbnail, file_id, base_file_id, page_num
+                    )
+                    if thumbnail_data:
+                        return Response(
+                            content=thumbnail_data, media_type="image/jpeg",
+                            headers={
+                                'Cache-Control': 'public, max-age=86400',
+                                'Content-Disposition': f'inline; filename="thumbnail_{file_id}.jpg"',
+                                'X-Thumbnail-Source': source_type
+                            }
+                        )
+                    
+                    raise HTTPException(status_code=404, detail=f"Could not generate thumbnail for page {page_num} of file {base_file_id}")
                         
                 except ValueError: # If page_num is not an int
                     pass
         
         # Standard file ID lookup
-        with get_db_connection() as conn:
-            cursor = conn.execute("SELECT thumbnail_data, thumbnail_format, source_type FROM thumbnails WHERE file_id = ?", (file_id,))
-            result = cursor.fetchone()
-            if not result:
-                raise HTTPException(status_code=404, detail="Thumbnail not found")
-            thumbnail_data, thumbnail_format, source_type = result
-            media_type = f"image/{thumbnail_format.lower()}"
-            return Response(
-                content=thumbnail_data, media_type=media_type,
-                headers={
-                    'Cache-Control': 'public, max-age=86400',
-                    'Content-Disposition': f'inline; filename="thumbnail_{file_id}.{thumbnail_format.lower()}"',
-                    'X-Thumbnail-Source': source_type
-                }
-            )
+        result = await run_db(_fetch_thumbnail, file_id)
+        if not result:
+            raise HTTPException(status_code=404, detail="Thumbnail not found")
+        thumbnail_data, thumbnail_format, source_type = result
+        media_type = f"image/{thumbnail_format.lower()}"
+        return Response(
+            content=thumbnail_data, media_type=media_type,
+            headers={
+                'Cache-Control': 'public, max-age=86400',
+                'Content-Disposition': f'inline; filename="thumbnail_{file_id}.{thumbnail_format.lower()}"',
+                'X-Thumbnail-Source': source_type
+            }
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -216,7 +258,7 @@ async def test_endpoint():
 async def generate_thumbnails_v2_route(): 
     """Generate thumbnails using the improved thumbnail system."""
     try:
-        manager = ThumbnailManager()
+        manager = ThumbnailManager(db_path=None)
         updated_count = manager.generate_thumbnails_for_existing_records()
         return {"message": f"Generated thumbnails for {updated_count} records", "updated_count": updated_count}
     except Exception as e:
@@ -227,7 +269,7 @@ async def generate_thumbnails_v2_route():
 async def get_thumbnail_stats():
     """Get thumbnail statistics."""
     try:
-        manager = ThumbnailManager()
+        manager = ThumbnailManager(db_path=None)
         stats = manager.get_thumbnail_stats()
         return stats
     except Exception as e:
@@ -238,13 +280,24 @@ async def get_thumbnail_stats():
 async def cleanup_thumbnails():
     """Clean up orphaned thumbnails."""
     try:
-        manager = ThumbnailManager()
+        manager = ThumbnailManager(db_path=None)
         deleted_count = manager.cleanup_orphaned_thumbnails()
         return {"message": f"Deleted {deleted_count} orphaned thumbnails", "deleted_count": deleted_count}
     except Exception as e:
         logger.error(f"Error cleaning up thumbnails: {e}")
         raise HTTPException(status_code=500, detail=f"Error cleaning up thumbnails: {str(e)}")
 
+@router.get("/document-cache")
+async def get_document_cache_stats():
+    """Get statistics for the in-process PDF document cache used for on-the-fly rendering."""
+    return pdf_document_cache.get_stats()
+
+@router.delete("/document-cache")
+async def clear_document_cache():
+    """Close and drop all cached PDF documents."""
+    pdf_document_cache.clear()
+    return {"message": "PDF document cache cleared"}
+
 @router.get("/processed-image/{file_id}")
 async def get_processed_image(file_id: str):
     """
@@ -255,7 +308,14 @@ async def get_processed_image(file_id: str):
         logger.info(f"Processed image requested for file_id: {file_id}")
         
         # First try to get the image from the database
-        result = processed_image_utils.get_processed_image(file_id)
+        result = await run_db(processed_image_utils.get_processed_image, file_id)
+        
+        base_file_id, _, page_part = file_id.partition("_page_")
+        access_tracker.record_access(
+            base_file_id, "processed_image",
+            page=int(page_part) if page_part.isdigit() else None,
+            cache_hit=bool(result)
+        )
         
         if result:
             logger.info(f"Found processed image in database for {file_id}")
@@ -286,12 +346,14 @@ async def get_processed_image(file_id: str):
                     logger.info(f"Generating processed image for {base_file_id} page {page_num}")
                     
                     # Try to generate and store the processed image
-                    success = processed_image_utils.store_processed_image_from_pdf(base_file_id, page_num)
+                    success = await processed_image_flight.do(
+                        file_id, run_in_threadpool, processed_image_utils.store_processed_image_from_pdf, base_file_id, page_num
+                    )
                     
                     if success:
                         logger.info(f"Successfully generated processed image for {file_id}")
                         # Try to get the processed image again
-                        result = processed_image_utils.get_processed_image(file_id)
+                        result = await run_db(processed_image_utils.get_processed_image, file_id)
                         
                         if result:
                             image_data, image_format = result
@@ -312,53 +374,23 @@ async def get_processed_image(file_id: str):
                     # If we still don't have an image, try to get the PDF directly
                     logger.info(f"Attempting to get PDF for {base_file_id} to generate image on-the-fly")
                     try:
-                        pdf_content = thumbnail_utils.download_pdf_content_from_sharepoint(base_file_id)
-                        if pdf_content and len(pdf_content) > 0:
-                            logger.info(f"Got PDF content for {base_file_id}, generating image for page {page_num}")
-                            
-                            # Create a high-resolution image from the PDF page
-                            import fitz  # PyMuPDF
-                            import io
-                            
-                            pdf_stream = io.BytesIO(pdf_content)
-                            pdf_document = fitz.open(stream=pdf_stream, filetype="pdf")
-                            
-                            # Check if page number is valid (convert to 0-based)
-                            page_index = page_num - 1
-                            if page_index < 0 or page_index >= len(pdf_document):
-                                pdf_document.close()
-                                logger.warning(f"Invalid page number {page_num} for PDF with {len(pdf_document)} pages")
-                                raise HTTPException(status_code=404, detail=f"Page {page_num} not found in document")
-                                
-                            page = pdf_document[page_index]
-                            
-                            # Render page to high-resolution image (300 DPI)
-                            zoom_factor = 300 / 72  # 300 DPI / 72 (default PDF DPI)
-                            mat = fitz.Matrix(zoom_factor, zoom_factor)
-                            pix = page.get_pixmap(matrix=mat)
-                            
-                            # Convert to PIL Image
-                            img_data = pix.tobytes("ppm")
-                            img = Image.open(io.BytesIO(img_data))
-                            
-                            # Convert to RGB if necessary
-                            if img.mode in ('RGBA', 'LA', 'P'):
-                                img = img.convert('RGB')
-                            
-                            # Save to bytes with high quality
-                            output = io.BytesIO()
-                            img.save(output, format='JPEG', quality=90, optimize=True)
-                            image_data = output.getvalue()
-                            
-                            pdf_document.close()
+                        rendered = await processed_image_flight.do(
+                            ("on-the-fly", file_id), run_in_threadpool, _render_page_image_from_sharepoint, base_file_id, page_num
+                        )
+                        if rendered:
+                            image_data, width, height = rendered
                             
                             logger.info(f"Successfully generated image on-the-fly for {file_id}")
                             
                             # Store the image for future use
-                            processed_image_utils.store_processed_image(
+                            await run_db(
+                                processed_image_utils.store_processed_image,
                                 file_id,
                                 image_data,
-                                'JPEG'
+                                'JPEG',
+                                width,
+                                height,
+                                f'pdf-page-{page_num}'
                             )
                             
                             return Response(
@@ -401,7 +433,8 @@ async def store_processed_image_endpoint(file_id: str, file: UploadFile = File(.
         image_data = await file.read()
         image_format = file.filename.split('.')[-1].upper()
         
-        success = processed_image_utils.store_processed_image(
+        success = await run_db(
+            processed_image_utils.store_processed_image,
             file_id,
             image_data,
             image_format
@@ -421,7 +454,7 @@ async def generate_processed_image_endpoint(file_id: str, page_num: int = 1):
     Generate and store a processed image from a PDF for a specific file ID and page.
     """
     try:
-        success = processed_image_utils.store_processed_image_from_pdf(file_id, page_num)
+        success = await run_in_threadpool(processed_image_utils.store_processed_image_from_pdf, file_id, page_num)
         
         if success:
             return {"message": f"Processed image generated and stored successfully for {file_id} page {page_num}"}
@@ -431,6 +464,17 @@ async def generate_processed_image_endpoint(file_id: str, page_num: int = 1):
         logger.error(f"Error generating processed image for {file_id} page {page_num}: {e}")
         raise HTTPException(status_code=500, detail=f"Error generating processed image: {str(e)}")
 
+def _fetch_document_paths(file_id: str):
+    """Return (pdf_image_path, ocr_image_path) for a document, or None if it is not in ocr_results."""
+    with get_db_connection() as conn:
+        cursor = conn.execute("SELECT pdf_image_path, ocr_image_path FROM ocr_results WHERE file_id = ?", (file_id,))
+        result = cursor.fetchone()
+        if not result:
+            cursor = conn.execute("SELECT file_id FROM ocr_results LIMIT 10")
+            available_ids = [row[0] for row in cursor.fetchall()]
+            logger.error(f"DEBUG: No records found for file_id: {file_id}. Available file_ids: {available_ids}")
+        return result
+
 @router.get("/pdf/{file_id}")
 async def get_original_pdf(file_id: str):
     """Serve the original PDF file for a specific file ID."""
@@ -443,95 +487,82 @@ async def get_original_pdf(file_id: str):
             base_file_id = file_id.split("_page_")[0]
             logger.info(f"DEBUG: Extracted base_file_id: {base_file_id} from page-specific file_id: {file_id}")
         
-        # Check if this file_id exists in the database
-        with get_db_connection() as conn:
-            cursor = conn.execute("SELECT COUNT(*) FROM ocr_results WHERE file_id = ?", (base_file_id,))
-            count = cursor.fetchone()[0]
-            logger.info(f"DEBUG: Found {count} records in ocr_results for base_file_id: {base_file_id}")
-            
-            if count == 0:
-                logger.error(f"DEBUG: No records found for file_id: {base_file_id}. Available file_ids:")
-                cursor = conn.execute("SELECT file_id FROM ocr_results LIMIT 10")
-                available_ids = [row[0] for row in cursor.fetchall()]
-                logger.error(f"DEBUG: Available file_ids: {available_ids}")
+        # Look up the stored paths without holding a connection during the download below
+        result = await run_db(_fetch_document_paths, base_file_id)
+        if not result:
+            logger.error(f"DEBUG: No record found in ocr_results for file_id: {base_file_id}")
+            raise HTTPException(status_code=404, detail="File not found")
+        pdf_image_path, ocr_image_path = result
         
-        with get_db_connection() as conn:
-            cursor = conn.execute("SELECT pdf_image_path, ocr_image_path FROM ocr_results WHERE file_id = ?", (base_file_id,))
-            result = cursor.fetchone()
-            if not result:
-                logger.error(f"DEBUG: No record found in ocr_results for file_id: {base_file_id}")
-                raise HTTPException(status_code=404, detail="File not found")
-            pdf_image_path, ocr_image_path = result
-            
-            # First, try to find a local PDF file (legacy support)
-            pdf_path_str = None
-            if pdf_image_path:
-                try:
-                    paths = json.loads(pdf_image_path)
-                    if isinstance(paths, list):
-                        for p_str in paths:
-                            if p_str.lower().endswith('.pdf') and Path(p_str).exists():
-                                pdf_path_str = p_str
-                                break
-                    elif pdf_image_path.lower().endswith('.pdf') and Path(pdf_image_path).exists():
-                        pdf_path_str = pdf_image_path
-                except:
-                    if pdf_image_path.lower().endswith('.pdf') and Path(pdf_image_path).exists():
-                        pdf_path_str = pdf_image_path
-            
-            if not pdf_path_str and ocr_image_path:
-                try:
-                    paths = json.loads(ocr_image_path)
-                    if isinstance(paths, list):
-                        for p_str in paths:
-                            if p_str.lower().endswith('.pdf') and Path(p_str).exists():
-                                pdf_path_str = p_str
-                                break
-                    elif ocr_image_path.lower().endswith('.pdf') and Path(ocr_image_path).exists():
-                        pdf_path_str = ocr_image_path
-                except:
-                    if ocr_image_path.lower().endswith('.pdf') and Path(ocr_image_path).exists():
-                        pdf_path_str = ocr_image_path
+        # First, try to find a local PDF file (legacy support)
+        pdf_path_str = None
+        if pdf_image_path:
+            try:
+                paths = json.loads(pdf_image_path)
+                if isinstance(paths, list):
+                    for p_str in paths:
+                        if p_str.lower().endswith('.pdf') and Path(p_str).exists():
+                            pdf_path_str = p_str
+                            break
+                elif pdf_image_path.lower().endswith('.pdf') and Path(pdf_image_path).exists():
+                    pdf_path_str = pdf_image_path
+            except:
+                if pdf_image_path.lower().endswith('.pdf') and Path(pdf_image_path).exists():
+                    pdf_path_str = pdf_image_path
+        
+        if not pdf_path_str and ocr_image_path:
+            try:
+                paths = json.loads(ocr_image_path)
+                if isinstance(paths, list):
+                    for p_str in paths:
+                        if p_str.lower().endswith('.pdf') and Path(p_str).exists():
+                            pdf_path_str = p_str
+                            break
+                elif ocr_image_path.lower().endswith('.pdf') and Path(ocr_image_path).exists():
+                    pdf_path_str = ocr_image_path
+            except:
+                if ocr_image_path.lower().endswith('.pdf') and Path(ocr_image_path).exists():
+                    pdf_path_str = ocr_image_path
 
-            # If local PDF found, serve it
-            if pdf_path_str:
-                logger.info(f"Found local PDF file at: {pdf_path_str}")
-                try:
-                    with open(pdf_path_str, 'rb') as pdf_file:
-                        pdf_content = pdf_file.read()
-                    logger.info(f"Successfully read local PDF file, size: {len(pdf_content)}")
-                    return Response(
-                        content=pdf_content,
-                        media_type="application/pdf",
-                        headers={
-                            'Content-Disposition': f'inline; filename="{Path(pdf_path_str).name}"',
-                            'Cache-Control': 'public, max-age=3600'
-                        }
-                    )
-                except Exception as e:
-                    logger.error(f"Error reading local PDF file: {e}")
-                    # Continue to try SharePoint download
-            
-            # If no local PDF found, try to download from SharePoint
-            logger.info(f"No local PDF found, attempting to download from SharePoint for file_id: {base_file_id}")
+        # If local PDF found, serve it
+        if pdf_path_str:
+            logger.info(f"Found local PDF file at: {pdf_path_str}")
             try:
-                pdf_content = thumbnail_utils.download_pdf_content_from_sharepoint(base_file_id)
-                if pdf_content and len(pdf_content) > 0:
-                    logger.info(f"Successfully downloaded PDF from SharePoint, size: {len(pdf_content)}")
-                    return Response(
-                        content=pdf_content,
-                        media_type="application/pdf",
-                        headers={
-                            'Content-Disposition': f'inline; filename="document_{base_file_id}.pdf"',
-                            'Cache-Control': 'public, max-age=3600'
-                        }
-                    )
-                else:
-                    logger.error(f"Failed to download PDF from SharePoint for file_id: {base_file_id}")
-                    raise HTTPException(status_code=404, detail="PDF file not available from SharePoint")
+                with open(pdf_path_str, 'rb') as pdf_file:
+                    pdf_content = pdf_file.read()
+                logger.info(f"Successfully read local PDF file, size: {len(pdf_content)}")
+                return Response(
+                    content=pdf_content,
+                    media_type="application/pdf",
+                    headers={
+                        'Content-Disposition': f'inline; filename="{Path(pdf_path_str).name}"',
+                        'Cache-Control': 'public, max-age=3600'
+                    }
+                )
             except Exception as e:
-                logger.error(f"Error downloading PDF from SharePoint for file_id {base_file_id}: {e}")
-                raise HTTPException(status_code=404, detail="PDF file not found or no longer available")
+                logger.error(f"Error reading local PDF file: {e}")
+                # Continue to try SharePoint download
+        
+        # If no local PDF found, try to download from SharePoint
+        logger.info(f"No local PDF found, attempting to download from SharePoint for file_id: {base_file_id}")
+        try:
+            pdf_content = await run_in_threadpool(pdf_document_cache.get_pdf_bytes, base_file_id)
+            if pdf_content and len(pdf_content) > 0:
+                logger.info(f"Successfully downloaded PDF from SharePoint, size: {len(pdf_content)}")
+                return Response(
+                    content=pdf_content,
+                    media_type="application/pdf",
+                    headers={
+                        'Content-Disposition': f'inline; filename="document_{base_file_id}.pdf"',
+                        'Cache-Control': 'public, max-age=3600'
+                    }
+                )
+            else:
+                logger.error(f"Failed to download PDF from SharePoint for file_id: {base_file_id}")
+                raise HTTPException(status_code=404, detail="PDF file not available from SharePoint")
+        except Exception as e:
+            logger.error(f"Error downloading PDF from SharePoint for file_id {base_file_id}: {e}")
+            raise HTTPException(status_code=404, detail="PDF file not found or no longer available")
     except HTTPException: raise
     except Exception as e:
         logger.error(f"Error serving PDF for {file_id}: {e}")
@@ -541,48 +572,47 @@ async def get_original_pdf(file_id: str):
 async def get_pdf_info_endpoint(file_id: str):
     """Get PDF information for a specific file ID."""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.execute("SELECT pdf_image_path, ocr_image_path FROM ocr_results WHERE file_id = ?", (file_id,))
-            result = cursor.fetchone()
-            if not result: raise HTTPException(status_code=404, detail="File not found")
-            pdf_image_path, ocr_image_path = result
+        result = await run_db(_fetch_document_paths, file_id)
+        if not result: raise HTTPException(status_code=404, detail="File not found")
+        pdf_image_path, ocr_image_path = result
 
-            pdf_path_str = None
-            if pdf_image_path:
-                try:
-                    paths = json.loads(pdf_image_path)
-                    if isinstance(paths, list):
-                        for p_str in paths: 
-                            if p_str.lower().endswith('.pdf') and Path(p_str).exists(): pdf_path_str = p_str; break
-                    elif pdf_image_path.lower().endswith('.pdf') and Path(pdf_image_path).exists(): pdf_path_str = pdf_image_path
-                except:
-                    if pdf_image_path.lower().endswith('.pdf') and Path(pdf_image_path).exists(): pdf_path_str = pdf_image_path
+        pdf_path_str = None
+        if pdf_image_path:
+            try:
+                paths = json.loads(pdf_image_path)
+                if isinstance(paths, list):
+                    for p_str in paths: 
+                        if p_str.lower().endswith('.pdf') and Path(p_str).exists(): pdf_path_str = p_str; break
+                elif pdf_image_path.lower().endswith('.pdf') and Path(pdf_image_path).exists(): pdf_path_str = pdf_image_path
+            except:
+                if pdf_image_path.lower().endswith('.pdf') and Path(pdf_image_path).exists(): pdf_path_str = pdf_image_path
 
-            if not pdf_path_str and ocr_image_path:
-                try:
-                    paths = json.loads(ocr_image_path)
-                    if isinstance(paths, list):
-                        for p_str in paths:
-                            if p_str.lower().endswith('.pdf') and Path(p_str).exists(): pdf_path_str = p_str; break
-                    elif ocr_image_path.lower().endswith('.pdf') and Path(ocr_image_path).exists(): pdf_path_str = ocr_image_path
-                except:
-                    if ocr_image_path.lower().endswith('.pdf') and Path(ocr_image_path).exists(): pdf_path_str = ocr_image_path
-            
-            if not pdf_path_str: return {"available": False, "message": "PDF file not found or no longer available"}
-            
+        if not pdf_path_str and ocr_image_path:
             try:
-                pdf_document = fitz.open(pdf_path_str)
-                pdf_info_data = {
-                    "page_count": len(pdf_document), "title": pdf_document.metadata.get("title", ""),
-                    "author": pdf_document.metadata.get("author", ""), "subject": pdf_document.metadata.get("subject", ""),
-                    "creator": pdf_document.metadata.get("creator", ""), "available": True,
-                    "filename": Path(pdf_path_str).name, "file_size": Path(pdf_path_str).stat().st_size
-                }
-                pdf_document.close()
-                return pdf_info_data
-            except Exception as e:
-                logger.error(f"Error reading PDF info: {e}")
-                return {"available": False, "message": "Error reading PDF file"}
+                paths = json.loads(ocr_image_path)
+                if isinstance(paths, list):
+                    for p_str in paths:
+                        if p_str.lower().endswith('.pdf') and Path(p_str).exists(): pdf_path_str = p_str; break
+                elif ocr_image_path.lower().endswith('.pdf') and Path(ocr_image_path).exists(): pdf_path_str = ocr_image_path
+            except:
+                if ocr_image_path.lower().endswith('.pdf') and Path(ocr_image_path).exists(): pdf_path_str = ocr_image_path
+        
+        if not pdf_path_str: return {"available": False, "message": "PDF file not found or no longer available"}
+        
+        try:
+            import fitz  # PyMuPDF
+            pdf_document = fitz.open(pdf_path_str)
+            pdf_info_data = {
+                "page_count": len(pdf_document), "title": pdf_document.metadata.get("title", ""),
+                "author": pdf_document.metadata.get("author", ""), "subject": pdf_document.metadata.get("subject", ""),
+                "creator": pdf_document.metadata.get("creator", ""), "available": True,
+                "filename": Path(pdf_path_str).name, "file_size": Path(pdf_path_str).stat().st_size
+            }
+            pdf_document.close()
+            return pdf_info_data
+        except Exception as e:
+            logger.error(f"Error reading PDF info: {e}")
+            return {"available": False, "message": "Error reading PDF file"}
     except HTTPException: raise
     except Exception as e:
         logger.error(f"Error getting PDF info for {file_id}: {e}")
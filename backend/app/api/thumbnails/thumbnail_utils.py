@@ -2,7 +2,6 @@ from PIL import Image, ImageDraw, ImageFont
 import io
 import logging
 from pathlib import Path
-import fitz  # PyMuPDF for PDF handling
 
 logger = logging.getLogger(__name__)
 
@@ -62,45 +61,74 @@ def get_sharepoint_drive_id_for_directory(directory_name: str = "1-Ingreso Opera
         # Return the hardcoded fallback as last resort
         return "b!NfeqXvRLbkGshWqc_JkL-LRNb-4WdXlKoq1xxo4FOUUzLke2ilRwRp-7JWNvUdoq"
 
-def download_pdf_content_from_sharepoint(file_id: str) -> bytes:
-    """Download PDF content from SharePoint using the same method as OCR system."""
+def resolve_sharepoint_location(file_id: str):
+    """Look up the SharePoint (drive_id, item_id) pair for a processed file."""
+    # Note: file_id in ocr_results is actually the SharePoint item_id
+    # directory_id in ocr_results is actually the SharePoint drive_id
+    from .db_utils import get_db_connection
+    with get_db_connection() as conn:
+        cursor = conn.execute("""
+            SELECT directory_id, file_id, pdf_image_path, ocr_image_path
+            FROM ocr_results
+            WHERE file_id = ?
+        """, (file_id,))
+        
+        result = cursor.fetchone()
+        
+    if not result:
+        logger.error(f"DIAGNOSTIC: No SharePoint metadata found for file_id: {file_id}")
+        return None
+        
+    drive_id, item_id, pdf_image_path, ocr_image_path = result
+    logger.info(f"DIAGNOSTIC: Found record - drive_id: {drive_id}, item_id: {item_id}, pdf_image_path: {pdf_image_path is not None}, ocr_image_path: {ocr_image_path is not None}")
+    
+    if not item_id:
+        logger.error(f"DIAGNOSTIC: Missing item_id for file_id: {file_id}")
+        return None
+        
+    # If drive_id is null or "root", get the correct drive ID dynamically
+    if not drive_id or drive_id == "root":
+        logger.info(f"DIAGNOSTIC: Getting correct drive_id for file_id: {file_id}")
+        drive_id = get_sharepoint_drive_id_for_directory("1-Ingreso Operativo")
+        if not drive_id:
+            logger.error(f"DIAGNOSTIC: Could not determine correct drive_id for file_id: {file_id}")
+            return None
+        logger.info(f"DIAGNOSTIC: Using dynamically determined drive_id: {drive_id} for file_id: {file_id}")
+    else:
+        logger.info(f"DIAGNOSTIC: Using existing drive_id: {drive_id} for file_id: {file_id}")
+    
+    return drive_id, item_id
+
+def get_sharepoint_etag(drive_id: str, item_id: str):
+    """Get the current eTag of a SharePoint item, or None if it cannot be determined."""
+    try:
+        from app.api.sharepoint import get_graph_token, graph_get
+        
+        token = get_graph_token()
+        meta_url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/items/{item_id}?$select=id,eTag"
+        meta = graph_get(meta_url, token)
+        return meta.get("eTag")
+    except Exception as e:
+        logger.warning(f"Could not get eTag for item {item_id}: {e}")
+        return None
+
+def download_pdf_content_from_sharepoint(file_id: str, location: tuple = None) -> bytes:
+    """Download PDF content from SharePoint using the same method as OCR system.
+    
+    Args:
+        file_id: The file ID (SharePoint item_id) as stored in ocr_results
+        location: Optional (drive_id, item_id) pair, as returned by
+            resolve_sharepoint_location, to skip the database lookup
+    """
     try:
         logger.info(f"Starting PDF download for file_id: {file_id}")
         
         # First, get the file metadata from the database to find drive_id and item_id
-        # Note: file_id in ocr_results is actually the SharePoint item_id
-        # directory_id in ocr_results is actually the SharePoint drive_id
-        from .db_utils import get_db_connection
-        with get_db_connection() as conn:
-            cursor = conn.execute("""
-                SELECT directory_id, file_id, pdf_image_path, ocr_image_path
-                FROM ocr_results
-                WHERE file_id = ?
-            """, (file_id,))
-            
-            result = cursor.fetchone()
-            
-            if not result:
-                logger.error(f"DIAGNOSTIC: No SharePoint metadata found for file_id: {file_id}")
-                return None
-                
-            drive_id, item_id, pdf_image_path, ocr_image_path = result
-            logger.info(f"DIAGNOSTIC: Found record - drive_id: {drive_id}, item_id: {item_id}, pdf_image_path: {pdf_image_path is not None}, ocr_image_path: {ocr_image_path is not None}")
-            
-            if not item_id:
-                logger.error(f"DIAGNOSTIC: Missing item_id for file_id: {file_id}")
-                return None
-                
-            # If drive_id is null or "root", get the correct drive ID dynamically
-            if not drive_id or drive_id == "root":
-                logger.info(f"DIAGNOSTIC: Getting correct drive_id for file_id: {file_id}")
-                drive_id = get_sharepoint_drive_id_for_directory("1-Ingreso Operativo")
-                if not drive_id:
-                    logger.error(f"DIAGNOSTIC: Could not determine correct drive_id for file_id: {file_id}")
-                    return None
-                logger.info(f"DIAGNOSTIC: Using dynamically determined drive_id: {drive_id} for file_id: {file_id}")
-            else:
-                logger.info(f"DIAGNOSTIC: Using existing drive_id: {drive_id} for file_id: {file_id}")
+        if location is None:
+            location = resolve_sharepoint_location(file_id)
+        if not location:
+            return None
+        drive_id, item_id = location
         
         # Use direct requests to SharePoint API instead of the FastAPI wrapper
         import sys
@@ -152,43 +180,59 @@ def download_pdf_content_from_sharepoint(file_id: str) -> bytes:
         logger.error(f"Error downloading PDF content from SharePoint for {file_id}: {e}")
         return None
 
+def render_page_thumbnail(pdf_document, page_num: int, size: tuple = (150, 200)) -> bytes:
+    """
+    Render a thumbnail for a specific page of an already opened PDF document.
+    
+    Args:
+        pdf_document: An open fitz.Document
+        page_num: Page number (1-based)
+        size: Maximum thumbnail size (width, height)
+        
+    Returns:
+        JPEG thumbnail bytes, or None if the page number is out of range
+    """
+    # Check if page number is valid (convert to 0-based)
+    page_index = page_num - 1
+    if page_index < 0 or page_index >= len(pdf_document):
+        return None
+        
+    page = pdf_document[page_index]
+    
+    import fitz  # PyMuPDF
+
+    # Render page to image
+    mat = fitz.Matrix(1.0, 1.0)
+    pix = page.get_pixmap(matrix=mat)
+    
+    # Convert to PIL Image
+    img_data = pix.tobytes("ppm")
+    img = Image.open(io.BytesIO(img_data))
+    
+    # Convert to RGB if necessary
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGB')
+    
+    # Create thumbnail maintaining aspect ratio
+    img.thumbnail(size, Image.Resampling.LANCZOS)
+    
+    # Save to bytes
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=80, optimize=True)
+    return output.getvalue()
+
 def create_page_specific_thumbnail_from_pdf(pdf_path: str, page_num: int, size: tuple = (150, 200)) -> bytes:
     """Create thumbnail from a specific page of a PDF file."""
     try:
         if not Path(pdf_path).exists():
             return None
             
+        import fitz  # PyMuPDF
         pdf_document = fitz.open(pdf_path)
-        
-        # Check if page number is valid (convert to 0-based)
-        page_index = page_num - 1
-        if page_index < 0 or page_index >= len(pdf_document):
+        try:
+            return render_page_thumbnail(pdf_document, page_num, size)
+        finally:
             pdf_document.close()
-            return None
-            
-        page = pdf_document[page_index]
-        
-        # Render page to image
-        mat = fitz.Matrix(1.0, 1.0)
-        pix = page.get_pixmap(matrix=mat)
-        
-        # Convert to PIL Image
-        img_data = pix.tobytes("ppm")
-        img = Image.open(io.BytesIO(img_data))
-        
-        # Convert to RGB if necessary
-        if img.mode in ('RGBA', 'LA', 'P'):
-            img = img.convert('RGB')
-        
-        # Create thumbnail maintaining aspect ratio
-        img.thumbnail(size, Image.Resampling.LANCZOS)
-        
-        # Save to bytes
-        output = io.BytesIO()
-        img.save(output, format='JPEG', quality=80, optimize=True)
-        
-        pdf_document.close()
-        return output.getvalue()
         
     except Exception as e:
         logger.error(f"Error creating page-specific PDF thumbnail: {e}")
@@ -200,40 +244,12 @@ def create_page_specific_thumbnail_from_pdf_content(pdf_content: bytes, page_num
         if not pdf_content or len(pdf_content) == 0:
             return None
             
-        # Create a temporary file-like object from the PDF content
-        import io
-        pdf_stream = io.BytesIO(pdf_content)
-        pdf_document = fitz.open(stream=pdf_stream, filetype="pdf")
-        
-        # Check if page number is valid (convert to 0-based)
-        page_index = page_num - 1
-        if page_index < 0 or page_index >= len(pdf_document):
+        import fitz  # PyMuPDF
+        pdf_document = fitz.open(stream=io.BytesIO(pdf_content), filetype="pdf")
+        try:
+            return render_page_thumbnail(pdf_document, page_num, size)
+        finally:
             pdf_document.close()
-            return None
-            
-        page = pdf_document[page_index]
-        
-        # Render page to image
-        mat = fitz.Matrix(1.0, 1.0)
-        pix = page.get_pixmap(matrix=mat)
-        
-        # Convert to PIL Image
-        img_data = pix.tobytes("ppm")
-        img = Image.open(io.BytesIO(img_data))
-        
-        # Convert to RGB if necessary
-        if img.mode in ('RGBA', 'LA', 'P'):
-            img = img.convert('RGB')
-        
-        # Create thumbnail maintaining aspect ratio
-        img.thumbnail(size, Image.Resampling.LANCZOS)
-        
-        # Save to bytes
-        output = io.BytesIO()
-        img.save(output, format='JPEG', quality=80, optimize=True)
-        
-        pdf_document.close()
-        return output.getvalue()
         
     except Exception as e:
         logger.error(f"Error creating page-specific PDF thumbnail from content: {e}")
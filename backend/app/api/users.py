@@ -1,15 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
-from app.models import User, Role, Team, AuditLog, ApiToken
-from app.schemas import UserCreate, UserRead, RoleCreate, RoleRead, TeamCreate, TeamRead, AuditLogCreate, AuditLogRead, ApiTokenCreate, ApiTokenRead
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-import os
+from app.models import User, Role, Team, ApiToken
+from app.schemas import UserCreate, UserRead, RoleCreate, RoleRead, TeamCreate, TeamRead, ApiTokenCreate, ApiTokenRead
 from typing import List
 
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///ocr.db')
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from app.utils.db_config import SessionLocal
 
 def get_db():
     db = SessionLocal()
@@ -2,6 +2,7 @@ import os
 import time
 from datetime import datetime
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from app.api import sharepoint
 from fastapi.middleware.cors import CORSMiddleware
@@ -20,7 +21,9 @@ from app.api import images
 from app.api.thumbnails import routes as thumbnails_router # Updated import
 from app.api import system_monitor
 from app.api import database_settings
-from app.startup import setup_startup_tasks, preload_health_check
+from app.startup import setup_startup_tasks, preload_health_check, startup_state
+from app.utils.loop_monitor import loop_monitor
+from app.utils.resource_governor import resource_governor
 
 load_dotenv()
 
@@ -37,6 +40,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Feed request durations to the resource governor, which backs off batch OCR when they grow."""
+    start = time.perf_counter()
+    response = await call_next(request)
+    resource_governor.record_latency(request.url.path, (time.perf_counter() - start) * 1000)
+    return response
+
 app.include_router(sharepoint.router, prefix="/api/sharepoint", tags=["sharepoint"])
 app.include_router(ocr_router, prefix="/api/ocr")
 app.include_router(users.router, prefix="/api/users", tags=["users"])
@@ -57,8 +68,25 @@ app.include_router(database_settings.router, prefix="/api/settings", tags=["data
 
 @app.get("/health")
 def health_check():
+    """Liveness check: the process is up and serving requests."""
     return {"status": "ok"}
 
+@app.get("/health/ready")
+def readiness_check():
+    """Readiness check: background warm-up has finished. Returns 503 until then."""
+    status = startup_state.get_status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/health/loop")
+def loop_health():
+    """Event loop lag statistics; sustained lag means a handler is blocking the loop."""
+    return loop_monitor.get_stats()
+
+@app.get("/health/governor")
+def governor_health():
+    """Batch OCR concurrency limit and the latency and resource samples behind it."""
+    return resource_governor.get_stats()
+
 @app.get("/api/health")
 def api_health_check():
     """API-prefixed health check endpoint for frontend status monitoring."""
@@ -1,18 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import desc
 from typing import List, Optional
 import datetime
-import json
-import os
 
-from app.models import BlockExecution, WorkflowBlock, BlockTemplate, User
+from app.models import BlockExecution, WorkflowBlock, BlockTemplate
 from app.schemas import BlockExecutionCreate, BlockExecutionUpdate, BlockExecutionResponse, BlockMetricsResponse
 
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///ocr.db')
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from app.utils.db_config import SessionLocal
 
 def get_db():
     db = SessionLocal()
@@ -23,9 +18,6 @@ def get_db():
 
 router = APIRouter(tags=["blocks"])
 
-from app.models import SidebarMenu, SidebarMenuCategory
-from app.schemas import SidebarMenuRead, SidebarMenuCategoryRead
-
 
 @router.post("/executions", response_model=BlockExecutionResponse)
 def create_block_execution(
@@ -2,21 +2,109 @@
 Startup utilities for the OCR backend application.
 
 This module handles initialization tasks that should run when the application starts,
-including auto-preloading of processed OCR data.
+including auto-preloading of processed OCR data. Warm-up runs in a background
+thread by default so the application serves requests (and /health) immediately;
+/health/ready reports when warm-up has finished.
 """
 
 import logging
 import asyncio
 import os
-from typing import Optional
+import threading
+import time
+from typing import Callable, Optional
 
-from app.utils.preload_utils import preload_manager
-from app.utils.cache_utils import get_cache_stats
+from sqlalchemy import text
+
+from app.utils.preload_utils import preload_manager, engine as preload_engine
+from app.utils.cache_utils import get_cache_stats, memory_budget
+from app.utils.access_tracker import access_tracker
+from app.utils.llm_utils import llm_scoring_service
+from app.utils.loop_monitor import loop_monitor
+from app.utils.resource_governor import resource_governor
+from app.api.ocr.scheduler import ocr_scheduler
 
 logger = logging.getLogger(__name__)
 
+# "background": accept traffic immediately and warm up in a background thread
+# "blocking": finish warm-up before the application starts accepting traffic
+STARTUP_MODE = os.getenv('STARTUP_MODE', 'background').lower()
+
+
+class StartupState:
+    """
+    Readiness of the application, tracked separately from process liveness.
+    
+    Warm-up is a sequence of named steps. A failing step is recorded and
+    warm-up continues, unless the step is required for readiness.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phase = 'starting'  # starting, warming_up, ready, failed
+        self.started_at = time.time()
+        self.ready_at = None
+        self.steps = {}
+    
+    def set_phase(self, phase: str):
+        with self._lock:
+            self.phase = phase
+            if phase == 'ready':
+                self.ready_at = time.time()
+    
+    def run_step(self, name: str, fn: Callable, *args, required: bool = False, **kwargs) -> bool:
+        """
+        Run a warm-up step, recording its duration and outcome.
+        
+        Args:
+            name: Step name reported by /health/ready
+            fn: Function performing the step
+            required: Whether the application is not ready if this step fails
+            
+        Returns:
+            bool: True if the step succeeded
+        """
+        with self._lock:
+            self.steps[name] = {'status': 'running', 'required': required}
+        start = time.time()
+        try:
+            fn(*args, **kwargs)
+            status, error = 'done', None
+        except Exception as e:
+            logger.error(f"Startup step '{name}' failed: {e}")
+            status, error = 'failed', str(e)
+        with self._lock:
+            self.steps[name] = {
+                'status': status,
+                'required': required,
+                'seconds': round(time.time() - start, 3),
+            }
+            if error:
+                self.steps[name]['error'] = error
+        return status == 'done'
+    
+    @property
+    def is_ready(self) -> bool:
+        return self.phase == 'ready'
+    
+    def get_status(self) -> dict:
+        """Get readiness status and per-step warm-up results."""
+        with self._lock:
+            return {
+                'ready': self.phase == 'ready',
+                'phase': self.phase,
+                'startup_mode': STARTUP_MODE,
+                'uptime_seconds': round(time.time() - self.started_at, 3),
+                'warmup_seconds': round(self.ready_at - self.started_at, 3) if self.ready_at else None,
+                'steps': {name: dict(step) for name, step in self.steps.items()},
+            }
+
+
+# Global startup state
+startup_state = StartupState()
 
-async def auto_preload_on_startup(limit: int = 20, enable_auto_preload: bool = None):
+
+def auto_preload_on_startup(limit: int = 20, enable_auto_preload: bool = None):
     """
     Automatically preload processed OCR data on application startup.
     
@@ -35,21 +123,14 @@ async def auto_preload_on_startup(limit: int = 20, enable_auto_preload: bool = N
         
         logger.info(f"Starting auto-preload on startup (limit: {limit})")
         
-        # Get processed files
-        processed_files = preload_manager.get_processed_files()
-        if not processed_files:
+        # Preload the files users open most, then the most recently updated ones
+        time_budget = get_preload_config()['preload_time_budget']
+        results = preload_manager.preload_predicted(limit=limit, time_budget=time_budget)
+        
+        if not results.get('total_files'):
             logger.info("No processed files found for auto-preload")
             return
         
-        # Sort by updated_at descending to get most recent first
-        processed_files.sort(key=lambda x: x['updated_at'], reverse=True)
-        target_files = [f['file_id'] for f in processed_files[:limit]]
-        
-        logger.info(f"Auto-preloading {len(target_files)} most recent files")
-        
-        # Run preload
-        results = preload_manager.preload_batch(file_ids=target_files)
-        
         successful = results.get('successful', 0)
         failed = results.get('failed', 0)
         
@@ -63,25 +144,66 @@ async def auto_preload_on_startup(limit: int = 20, enable_auto_preload: bool = N
         logger.error(f"Error in auto-preload on startup: {e}")
 
 
-async def initialize_preload_system():
+def _check_database():
+    with preload_engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+def _start_memory_monitor():
+    # Imported here so the OCR package is not loaded before warm-up needs it
+    from app.api.ocr.task_queue import task_queue
+    task_queue.start_memory_monitor()
+
+
+def _initialize_gpu_tracking():
+    from app.utils.gpu_utils import initialize_gpu_tracking
+    initialize_gpu_tracking()
+
+
+def _import_ocr_engines():
+    # Pay the import cost of the OCR engines now rather than on the first OCR request
+    import fitz  # noqa: F401
+    import pytesseract  # noqa: F401
+    import easyocr  # noqa: F401
+
+
+def _benchmark_ocr_engines():
+    # Measured numbers let automatic engine selection route the first pages correctly
+    from app.api.ocr.db_utils import get_setting_value
+    from app.api.ocr.engines import engine_registry
+    engine_registry.benchmark(get_setting_value('ocr_default_lang', 'es', 'ocr'))
+
+
+def initialize_preload_system():
     """
-    Initialize the preload system and perform startup tasks.
+    Run the warm-up steps and mark the application ready.
+    
+    Only the database check is required for readiness; the remaining steps
+    improve first-request latency and are recorded if they fail.
     """
-    try:
-        logger.info("Initializing preload system...")
-        
-        # Get initial stats
-        stats = preload_manager.get_preload_stats()
-        logger.info(f"Preload system initialized with {stats.get('total_processed_files', 0)} processed files")
-        
-        # Run auto-preload if enabled
-        auto_preload_limit = int(os.getenv('AUTO_PRELOAD_LIMIT', '20'))
-        await auto_preload_on_startup(limit=auto_preload_limit)
-        
-        logger.info("Preload system initialization completed")
-        
-    except Exception as e:
-        logger.error(f"Error initializing preload system: {e}")
+    config = get_preload_config()
+    startup_state.set_phase('warming_up')
+    logger.info("Initializing preload system...")
+    
+    if not startup_state.run_step('database', _check_database, required=True):
+        startup_state.set_phase('failed')
+        return
+    
+    startup_state.run_step('memory_monitor', _start_memory_monitor)
+    if config['preload_on_startup']:
+        startup_state.run_step('auto_preload', auto_preload_on_startup, limit=config['auto_preload_limit'])
+    startup_state.run_step('gpu_tracking', _initialize_gpu_tracking)
+    if config['warmup_ocr_engines']:
+        startup_state.run_step('ocr_engines', _import_ocr_engines)
+    if config['benchmark_ocr_engines']:
+        startup_state.run_step('ocr_benchmark', _benchmark_ocr_engines)
+    
+    # Cache memory pressure is measured against the warmed-up process
+    memory_budget.set_rss_baseline()
+    
+    startup_state.set_phase('ready')
+    status = startup_state.get_status()
+    logger.info(f"Preload system initialization completed in {status['warmup_seconds']}s")
 
 
 def setup_startup_tasks(app):
@@ -95,10 +217,23 @@ def setup_startup_tasks(app):
     @app.on_event("startup")
     async def startup_event():
         """Handle application startup."""
-        logger.info("Application starting up...")
+        logger.info(f"Application starting up (startup mode: {STARTUP_MODE})...")
+        
+        # Sample event loop lag from the start so blocking handlers show up in /health/loop
+        loop_monitor.start()
+        
+        # Let batch OCR use every free slot until latency or resources push back
+        resource_governor.start(
+            max_limit=ocr_scheduler.batch_capacity,
+            on_change=ocr_scheduler.set_batch_limit,
+            has_demand=ocr_scheduler.has_batch_work,
+        )
         
-        # Initialize preload system
-        await initialize_preload_system()
+        if STARTUP_MODE == 'blocking':
+            # Warm up before accepting traffic, without blocking the event loop
+            await asyncio.to_thread(initialize_preload_system)
+        else:
+            threading.Thread(target=initialize_preload_system, daemon=True, name="startup-warmup").start()
         
         logger.info("Application startup completed")
     
@@ -107,6 +242,15 @@ def setup_startup_tasks(app):
         """Handle application shutdown."""
         logger.info("Application shutting down...")
         
+        loop_monitor.stop()
+        resource_governor.stop()
+        
+        # Persist access statistics for the next predictive preload
+        access_tracker.save_snapshot()
+
+        # Close the pooled LLM client
+        await llm_scoring_service.aclose()
+        
         # Log final cache stats
         try:
             cache_stats = get_cache_stats()
@@ -130,6 +274,11 @@ def get_preload_config():
         'auto_preload_limit': int(os.getenv('AUTO_PRELOAD_LIMIT', '20')),
         'preload_on_startup': os.getenv('PRELOAD_ON_STARTUP', 'true').lower() == 'true',
         'cache_warmup_enabled': os.getenv('CACHE_WARMUP_ENABLED', 'true').lower() == 'true',
+        'preload_time_budget': float(os.getenv('PRELOAD_TIME_BUDGET_SECONDS', '30')),
+        'warmup_ocr_engines': os.getenv('WARMUP_OCR_ENGINES', 'true').lower() == 'true',
+        # Loads the OCR models, so off unless engines are chosen automatically
+        'benchmark_ocr_engines': os.getenv('BENCHMARK_OCR_ENGINES', 'false').lower() == 'true',
+        'startup_mode': STARTUP_MODE,
     }
 
 
@@ -146,19 +295,9 @@ async def warmup_cache():
         
         logger.info("Starting cache warmup...")
         
-        # Get most recently accessed files (you could track this in the database)
-        processed_files = preload_manager.get_processed_files()
-        
-        if processed_files:
-            # Preload a small number of most recent files for warmup
-            warmup_limit = min(5, len(processed_files))
-            recent_files = sorted(processed_files, key=lambda x: x['updated_at'], reverse=True)[:warmup_limit]
-            file_ids = [f['file_id'] for f in recent_files]
-            
-            logger.info(f"Warming up cache with {len(file_ids)} recent files")
-            
-            results = preload_manager.preload_batch(file_ids=file_ids)
-            logger.info(f"Cache warmup completed: {results.get('successful', 0)} files preloaded")
+        # Preload a small number of the most frequently accessed files for warmup
+        results = preload_manager.preload_predicted(limit=5, time_budget=config['preload_time_budget'])
+        logger.info(f"Cache warmup completed: {results.get('successful', 0)} files preloaded")
         
     except Exception as e:
         logger.error(f"Error in cache warmup: {e}")
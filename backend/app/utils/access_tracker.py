@@ -0,0 +1,223 @@
+"""
+Access tracking for predictive preloading.
+Keeps exponentially decayed access counts per file and per folder so that
+startup and warm-up can preload the documents users are most likely to open
+next, and reports how often those accesses were served from cache.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Counts halve after this long without new accesses
+ACCESS_HALF_LIFE_SECONDS = float(os.getenv("ACCESS_HALF_LIFE_HOURS", "24")) * 3600
+# Where the tracker state is persisted between restarts; next to the file cache, outside the source tree
+ACCESS_STATS_PATH = os.getenv("ACCESS_STATS_PATH", os.path.join(tempfile.gettempdir(), "ocr_cache", "access_stats.json"))
+ACCESS_STATS_SAVE_INTERVAL_SECONDS = float(os.getenv("ACCESS_STATS_SAVE_INTERVAL_SECONDS", "60"))
+
+MAX_TRACKED_FILES = 10000
+MAX_TRACKED_FOLDERS = 2000
+
+
+class AccessTracker:
+    """
+    Thread-safe tracker of decayed access frequency per file and folder.
+
+    Each access adds its weight to the file's score and to the score of the
+    folder it belongs to; scores decay with ACCESS_HALF_LIFE_SECONDS. Per-kind
+    hit/miss counters record whether the access was served from cache.
+    """
+
+    def __init__(self, half_life_seconds: float = ACCESS_HALF_LIFE_SECONDS,
+                 snapshot_path: Optional[str] = ACCESS_STATS_PATH,
+                 save_interval: float = ACCESS_STATS_SAVE_INTERVAL_SECONDS):
+        self.half_life_seconds = half_life_seconds
+        self.snapshot_path = snapshot_path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        # file_id -> {"score", "at", "folder", "page"}
+        self._files: Dict[str, dict] = {}
+        # folder_id -> [score, at]
+        self._folders: Dict[str, list] = {}
+        # access kind -> {"hits", "misses"}
+        self._kinds: Dict[str, Dict[str, int]] = {}
+        # Files warmed by the predictive preloader, to measure prediction quality
+        self._predicted: set = set()
+        self.predicted_accesses = 0
+        self.tracked_accesses = 0
+        self._last_save = time.time()
+        self._saving = False
+        self._load_snapshot()
+
+    def _decayed(self, score: float, at: float, now: float) -> float:
+        if self.half_life_seconds <= 0:
+            return score
+        return score * 0.5 ** ((now - at) / self.half_life_seconds)
+
+    def record_access(self, file_id: str, kind: str, folder_id: Optional[str] = None,
+                      page: Optional[int] = None, cache_hit: Optional[bool] = None,
+                      weight: float = 1.0):
+        """
+        Record an access to a file.
+
+        Args:
+            file_id: The file ID (without any _page_ suffix)
+            kind: Access kind, e.g. "ocr_text", "thumbnail", "search_click"
+            folder_id: Folder (directory_id) the file belongs to, if known
+            page: Page number accessed, if any
+            cache_hit: Whether the access was served from cache, if applicable
+            weight: Contribution of this access to the scores
+        """
+        if not file_id:
+            return
+        now = time.time()
+        with self._lock:
+            entry = self._files.get(file_id)
+            if entry is None:
+                entry = {"score": 0.0, "at": now, "folder": None, "page": None}
+                self._files[file_id] = entry
+            entry["score"] = self._decayed(entry["score"], entry["at"], now) + weight
+            entry["at"] = now
+            if folder_id:
+                entry["folder"] = folder_id
+            if page is not None:
+                entry["page"] = page
+
+            folder_id = folder_id or entry["folder"]
+            if folder_id:
+                folder = self._folders.get(folder_id)
+                if folder is None:
+                    folder = [0.0, now]
+                    self._folders[folder_id] = folder
+                folder[0] = self._decayed(folder[0], folder[1], now) + weight
+                folder[1] = now
+
+            if cache_hit is not None:
+                counters = self._kinds.setdefault(kind, {"hits": 0, "misses": 0})
+                counters["hits" if cache_hit else "misses"] += 1
+
+            self.tracked_accesses += 1
+            if file_id in self._predicted:
+                self.predicted_accesses += 1
+
+            if len(self._files) > MAX_TRACKED_FILES:
+                self._trim(self._files, MAX_TRACKED_FILES, now, lambda e: (e["score"], e["at"]))
+            if len(self._folders) > MAX_TRACKED_FOLDERS:
+                self._trim(self._folders, MAX_TRACKED_FOLDERS, now, lambda e: (e[0], e[1]))
+
+            save_due = not self._saving and now - self._last_save > self.save_interval
+            if save_due:
+                self._saving = True
+
+        if save_due:
+            threading.Thread(target=self.save_snapshot, daemon=True, name="access-stats-save").start()
+
+    def _trim(self, entries: dict, max_entries: int, now: float, score_of):
+        """Drop the lowest scoring entries down to 90% of max_entries. Caller holds the lock."""
+        ranked = sorted(entries.items(), key=lambda item: self._decayed(*score_of(item[1]), now))
+        for key, _ in ranked[:len(entries) - int(max_entries * 0.9)]:
+            del entries[key]
+
+    def top_files(self, limit: int) -> List[Tuple[str, float]]:
+        """Most frequently accessed files as (file_id, score), highest first."""
+        now = time.time()
+        with self._lock:
+            scored = [(file_id, self._decayed(e["score"], e["at"], now)) for file_id, e in self._files.items()]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def top_folders(self, limit: int) -> List[Tuple[str, float]]:
+        """Most frequently accessed folders as (folder_id, score), highest first."""
+        now = time.time()
+        with self._lock:
+            scored = [(folder_id, self._decayed(score, at, now)) for folder_id, (score, at) in self._folders.items()]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def last_page(self, file_id: str) -> Optional[int]:
+        """Last page accessed for a file, if any."""
+        with self._lock:
+            entry = self._files.get(file_id)
+            return entry["page"] if entry else None
+
+    def mark_predicted(self, file_ids: Iterable[str]):
+        """Remember which files the predictive preloader warmed."""
+        with self._lock:
+            self._predicted = set(file_ids)
+
+    def get_stats(self, top: int = 10) -> dict:
+        """Get access and cache hit-rate statistics."""
+        with self._lock:
+            kinds = {}
+            total_hits = total_misses = 0
+            for kind, counters in self._kinds.items():
+                lookups = counters["hits"] + counters["misses"]
+                total_hits += counters["hits"]
+                total_misses += counters["misses"]
+                kinds[kind] = {
+                    **counters,
+                    "hit_rate": round(counters["hits"] / lookups, 3) if lookups else 0.0,
+                }
+            tracked = self.tracked_accesses
+            predicted_accesses = self.predicted_accesses
+            predicted_files = len(self._predicted)
+            tracked_files = len(self._files)
+            tracked_folders = len(self._folders)
+
+        lookups = total_hits + total_misses
+        return {
+            "tracked_files": tracked_files,
+            "tracked_folders": tracked_folders,
+            "tracked_accesses": tracked,
+            "cache_hit_rate": round(total_hits / lookups, 3) if lookups else 0.0,
+            "by_kind": kinds,
+            "predicted_files": predicted_files,
+            # Share of accesses that went to a file the predictive preloader warmed
+            "predicted_access_rate": round(predicted_accesses / tracked, 3) if tracked else 0.0,
+            "top_files": [{"file_id": f, "score": round(s, 3)} for f, s in self.top_files(top)],
+            "top_folders": [{"folder_id": f, "score": round(s, 3)} for f, s in self.top_folders(top)],
+        }
+
+    def _load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            self._files = snapshot.get("files", {})
+            self._folders = snapshot.get("folders", {})
+            logger.info(f"Loaded access stats for {len(self._files)} files and {len(self._folders)} folders")
+        except Exception as e:
+            logger.warning(f"Could not load access stats from {self.snapshot_path}: {e}")
+
+    def save_snapshot(self):
+        """Persist file and folder scores so predictions survive restarts."""
+        if not self.snapshot_path:
+            return
+        try:
+            with self._lock:
+                snapshot = {
+                    "saved_at": time.time(),
+                    "files": {file_id: dict(entry) for file_id, entry in self._files.items()},
+                    "folders": {folder_id: list(entry) for folder_id, entry in self._folders.items()},
+                }
+            os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            logger.warning(f"Could not save access stats to {self.snapshot_path}: {e}")
+        finally:
+            with self._lock:
+                self._last_save = time.time()
+                self._saving = False
+
+
+# Global access tracker instance
+access_tracker = AccessTracker()
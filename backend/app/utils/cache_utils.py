@@ -5,29 +5,980 @@ This module provides caching functionality using cachetools for in-memory cachin
 and file-based caching for larger objects like images and PDFs.
 """
 
+import asyncio
 import hashlib
 import json
 import os
 import pickle
+import sqlite3
+import sys
 import tempfile
+import threading
 import time
 from functools import wraps
-from typing import Any, Callable, Dict, Optional, Union
+from typing import Any, Callable, Dict, Optional, Tuple, Union
 
 from cachetools import TTLCache, LRUCache
 import logging
 
-logger = logging.getLogger(__name__)
+from app.utils.single_flight import get_single_flight
 
-# In-memory caches with different TTL and size limits
-ocr_results_cache = TTLCache(maxsize=1000, ttl=3600)  # 1 hour TTL, max 1000 items
-sharepoint_files_cache = TTLCache(maxsize=500, ttl=1800)  # 30 minutes TTL, max 500 items
-llm_scores_cache = TTLCache(maxsize=2000, ttl=7200)  # 2 hours TTL, max 2000 items
-preprocessing_cache = LRUCache(maxsize=100)  # LRU cache for preprocessing results
+logger = logging.getLogger(__name__)
 
 # File-based cache directory
 CACHE_DIR = os.path.join(tempfile.gettempdir(), "ocr_cache")
 os.makedirs(CACHE_DIR, exist_ok=True)
+# Subfolder of CACHE_DIR holding the entries of disk-backed CacheStores
+STORES_SUBFOLDER = "stores"
+
+# Backend used by CacheStore instances: "memory", "disk" or "redis".
+# Can be overridden per cache, e.g. LLM_SCORES_CACHE_BACKEND=redis
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+MB = 1024 * 1024
+# Total bytes shared by all in-memory caches
+CACHE_MEMORY_BUDGET_BYTES = int(os.getenv("CACHE_MEMORY_BUDGET_MB", "256")) * MB
+# Process RSS growth above the baseline (RSS of the warmed-up process) at which in-memory
+# caches are shrunk to relieve memory pressure
+CACHE_RSS_HEADROOM_BYTES = int(os.getenv("CACHE_RSS_HEADROOM_MB", "1024")) * MB
+
+# Byte quota and default expiry for the file-based cache
+FILE_CACHE_MAX_BYTES = int(os.getenv("FILE_CACHE_MAX_MB", "2048")) * MB
+FILE_CACHE_TTL_SECONDS = int(os.getenv("FILE_CACHE_TTL_SECONDS", "3600"))
+FILE_CACHE_JANITOR_INTERVAL_SECONDS = int(os.getenv("FILE_CACHE_JANITOR_INTERVAL_SECONDS", "60"))
+
+# Expiry of LLM quality scores; a score only depends on the text, prompt and model, so it is kept for a week
+LLM_SCORE_CACHE_TTL_SECONDS = int(os.getenv("LLM_SCORE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+_MISSING = object()
+
+# Size estimators per value type, see register_sizeof()
+_sizeof_handlers: Dict[type, Callable[[Any], int]] = {
+    bytes: len,
+    bytearray: len,
+    memoryview: lambda value: value.nbytes,
+}
+
+
+def register_sizeof(value_type: type, func: Callable[[Any], int]):
+    """
+    Register a size estimator for cached values of a given type.
+    
+    Args:
+        value_type: Type (including subclasses) the estimator applies to
+        func: Returns the approximate size of a value in bytes
+    """
+    _sizeof_handlers[value_type] = func
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """
+    Estimate the memory footprint of a cached value in bytes.
+    
+    Uses registered per-type estimators, walks containers and object
+    attributes a few levels deep and falls back to sys.getsizeof.
+    
+    Args:
+        value: Value to measure
+        
+    Returns:
+        int: Approximate size in bytes
+    """
+    for value_type in type(value).__mro__:
+        handler = _sizeof_handlers.get(value_type)
+        if handler:
+            return handler(value)
+
+    size = sys.getsizeof(value)
+    if _depth >= 6:
+        return size
+    if isinstance(value, dict):
+        return size + sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(estimate_size(item, _depth + 1) for item in value)
+    if hasattr(value, "__dict__"):
+        return size + estimate_size(vars(value), _depth + 1)
+    return size
+
+
+class _CacheEntry:
+    """A cached value together with the time it was stored and its estimated size."""
+    __slots__ = ("value", "created_at", "size")
+
+    def __init__(self, value: Any, created_at: float = None, size: int = 0):
+        self.value = value
+        self.created_at = created_at if created_at is not None else time.time()
+        self.size = size
+
+    def __getstate__(self):
+        return (self.value, self.created_at, self.size)
+
+    def __setstate__(self, state):
+        self.value, self.created_at, self.size = state
+
+
+class DiskCache:
+    """
+    File-based cache with a SQLite index under CACHE_DIR.
+    
+    The index tracks the size, last access and expiry of every file so that
+    stats are O(1) reads of running totals and reads never touch the
+    filesystem metadata. Writes go to a temporary file that is renamed into
+    place. A background janitor thread removes expired files and evicts the
+    least recently used ones when the cache exceeds its byte quota.
+    """
+
+    INDEX_FILENAME = "index.db"
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = FILE_CACHE_MAX_BYTES,
+                 default_ttl: Optional[float] = FILE_CACHE_TTL_SECONDS,
+                 janitor_interval: float = FILE_CACHE_JANITOR_INTERVAL_SECONDS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.janitor_interval = janitor_interval
+        self._lock = threading.RLock()
+        self._conn = None
+        self._total_bytes = 0
+        self._file_count = 0
+        # Access times are batched and written to the index by the janitor
+        self._pending_access: Dict[str, float] = {}
+        self._janitor = None
+        self._wake = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.root, self.INDEX_FILENAME)
+
+    def _connect(self):
+        os.makedirs(self.root, exist_ok=True)
+        conn = sqlite3.connect(self.index_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                expires_at REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed_at ON entries (accessed_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_expires_at ON entries (expires_at)")
+        self._file_count, self._total_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        self._conn = conn
+
+    def _ensure_started(self):
+        if self._conn is not None and self._janitor is not None:
+            return
+        with self._lock:
+            if self._conn is None:
+                self._connect()
+            if self._janitor is None:
+                self._janitor = threading.Thread(target=self._janitor_loop, daemon=True, name="file-cache-janitor")
+                self._janitor.start()
+
+    @staticmethod
+    def _key(cache_key: str, subfolder: str) -> str:
+        return f"{subfolder}/{cache_key}"
+
+    def _path(self, cache_key: str, subfolder: str) -> str:
+        return os.path.join(self.root, subfolder, f"{cache_key}.cache")
+
+    def save(self, cache_key: str, data: bytes, subfolder: str = "files", ttl: Optional[float] = None) -> str:
+        """Atomically write data to the cache and index it. Returns the file path."""
+        self._ensure_started()
+        path = self._path(cache_key, subfolder)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        now = time.time()
+        ttl = ttl if ttl is not None else self.default_ttl
+        key = self._key(cache_key, subfolder)
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, path, size, created_at, accessed_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, path, len(data), now, now, now + ttl if ttl else None)
+            )
+            self._pending_access.pop(key, None)
+            if row:
+                self._total_bytes += len(data) - row[0]
+            else:
+                self._total_bytes += len(data)
+                self._file_count += 1
+            over_quota = self._total_bytes > self.max_bytes
+
+        if over_quota:
+            self._wake.set()
+        return path
+
+    def load(self, cache_key: str, subfolder: str = "files") -> Optional[bytes]:
+        """Read data from the cache, or None if missing or expired."""
+        self._ensure_started()
+        key = self._key(cache_key, subfolder)
+        with self._lock:
+            row = self._conn.execute("SELECT path, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        # Expired entries are left for the janitor so reads stay cheap
+        if not row or (row[1] is not None and row[1] < time.time()):
+            self.misses += 1
+            return None
+
+        try:
+            with open(row[0], "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.delete(cache_key, subfolder)
+            self.misses += 1
+            return None
+
+        with self._lock:
+            self._pending_access[key] = time.time()
+            self.hits += 1
+        return data
+
+    def delete(self, cache_key: str, subfolder: str = "files") -> bool:
+        """Remove an entry. Returns True if it existed."""
+        self._ensure_started()
+        key = self._key(cache_key, subfolder)
+        with self._lock:
+            row = self._conn.execute("SELECT key, path, size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._remove_entries([row])
+        return row is not None
+
+    def count(self, subfolder: str) -> int:
+        """Number of indexed entries in a subfolder."""
+        self._ensure_started()
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM entries WHERE key >= ? AND key < ?", (f"{subfolder}/", f"{subfolder}0")
+            ).fetchone()[0]
+
+    def keys(self, subfolder: str) -> list:
+        """Cache keys of the indexed entries in a subfolder."""
+        self._ensure_started()
+        prefix = f"{subfolder}/"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM entries WHERE key >= ? AND key < ?", (prefix, f"{subfolder}0")
+            ).fetchall()
+        return [row[0][len(prefix):] for row in rows]
+
+    def _remove_entries(self, rows) -> int:
+        """Delete files and index rows for (key, path, size) rows. Caller holds the lock."""
+        removed = 0
+        for key, path, size in rows:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove cache file {path}: {e}")
+                continue
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._pending_access.pop(key, None)
+            self._total_bytes -= size
+            self._file_count -= 1
+            removed += 1
+        return removed
+
+    def run_janitor_once(self):
+        """Flush access times, remove expired entries and enforce the byte quota."""
+        self._ensure_started()
+        with self._lock:
+            if self._pending_access:
+                self._conn.executemany(
+                    "UPDATE entries SET accessed_at = ? WHERE key = ?",
+                    [(accessed_at, key) for key, accessed_at in self._pending_access.items()]
+                )
+                self._pending_access.clear()
+
+            expired = self._conn.execute(
+                "SELECT key, path, size FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+            ).fetchall()
+            self.expirations += self._remove_entries(expired)
+
+        # Evict least recently used files down to 90% of the quota
+        with self._lock:
+            self._wake.clear()
+            if self._total_bytes <= self.max_bytes:
+                return
+            target = int(self.max_bytes * 0.9)
+            while self._total_bytes > target:
+                oldest = self._conn.execute(
+                    "SELECT key, path, size FROM entries ORDER BY accessed_at LIMIT 200"
+                ).fetchall()
+                if not oldest:
+                    break
+                evicted = 0
+                for row in oldest:
+                    if self._total_bytes <= target:
+                        break
+                    evicted += self._remove_entries([row])
+                self.evictions += evicted
+                if not evicted:
+                    break
+
+    def _adopt_unindexed_files(self):
+        """Index cache files written before the index existed and drop stale temp files."""
+        with self._lock:
+            indexed = {row[0] for row in self._conn.execute("SELECT path FROM entries")}
+        adopted = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    if filename.endswith(".tmp"):
+                        if time.time() - os.path.getmtime(path) > 3600:
+                            os.remove(path)
+                        continue
+                    if not filename.endswith(".cache") or path in indexed:
+                        continue
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                subfolder = os.path.relpath(dirpath, self.root).replace(os.sep, "/")
+                key = self._key(filename[:-len(".cache")], subfolder)
+                expires_at = stat.st_mtime + self.default_ttl if self.default_ttl else None
+                with self._lock:
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO entries (key, path, size, created_at, accessed_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, path, stat.st_size, stat.st_mtime, stat.st_mtime, expires_at)
+                    )
+                    if cursor.rowcount:
+                        self._total_bytes += stat.st_size
+                        self._file_count += 1
+                        adopted += 1
+        if adopted:
+            logger.info(f"Indexed {adopted} existing file cache entries")
+
+    def _janitor_loop(self):
+        try:
+            self._adopt_unindexed_files()
+        except Exception as e:
+            logger.error(f"Error indexing existing file cache entries: {e}")
+        while True:
+            try:
+                self.run_janitor_once()
+            except Exception as e:
+                logger.error(f"Error in file cache janitor: {e}")
+            self._wake.wait(self.janitor_interval)
+
+    def clear(self, keep_subfolders: Tuple[str, ...] = (STORES_SUBFOLDER,)) -> int:
+        """
+        Remove the indexed cache files and their index rows. Returns the number of files removed.
+
+        Only files in the index are deleted, so other state kept under the cache
+        directory, such as the access statistics, survives. Entries of disk-backed
+        CacheStores are kept; clearing those stores removes them.
+
+        Args:
+            keep_subfolders: Subfolders whose entries are kept
+        """
+        self._ensure_started()
+        prefixes = tuple(f"{subfolder}/" for subfolder in keep_subfolders)
+        with self._lock:
+            rows = [row for row in self._conn.execute("SELECT key, path, size FROM entries").fetchall()
+                    if not row[0].startswith(prefixes)]
+            return self._remove_entries(rows)
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        """Get file cache statistics from the running totals."""
+        self._ensure_started()
+        with self._lock:
+            return {
+                "file_count": self._file_count,
+                "total_size_bytes": self._total_bytes,
+                "total_size_mb": round(self._total_bytes / MB, 2),
+                "max_size_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# Global file-based cache
+disk_cache = DiskCache()
+
+
+class _EvictionCountingMixin:
+    """Report capacity evictions and TTL expirations of a cachetools cache."""
+
+    def popitem(self):
+        item = super().popitem()
+        if self._on_evict:
+            self._on_evict(1)
+        return item
+
+
+def _entry_size(entry: _CacheEntry) -> int:
+    return max(entry.size, 1)
+
+
+class _CountingLRUCache(_EvictionCountingMixin, LRUCache):
+    def __init__(self, maxsize, on_evict=None):
+        super().__init__(maxsize, getsizeof=_entry_size)
+        self._on_evict = on_evict
+
+
+class _CountingTTLCache(_EvictionCountingMixin, TTLCache):
+    def __init__(self, maxsize, ttl, on_evict=None):
+        super().__init__(maxsize, ttl, getsizeof=_entry_size)
+        self._on_evict = on_evict
+
+    def expire(self, *args, **kwargs):
+        # cachetools >= 5 returns the expired items, older versions return None
+        expired = super().expire(*args, **kwargs)
+        if expired and self._on_evict:
+            self._on_evict(len(expired))
+        return expired
+
+
+class MemoryBackend:
+    """
+    In-process backend built on cachetools (LRU, or TTL when a TTL is given).
+    
+    maxsize is a byte limit: entries are weighed by their estimated size.
+    """
+
+    name = "memory"
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, on_evict: Callable[[int], None] = None):
+        if ttl:
+            self._cache = _CountingTTLCache(maxsize, ttl, on_evict)
+        else:
+            self._cache = _CountingLRUCache(maxsize, on_evict)
+        # cachetools caches are not thread-safe
+        self._lock = threading.RLock()
+
+    @property
+    def maxsize(self) -> int:
+        return self._cache.maxsize
+
+    @property
+    def currsize(self) -> int:
+        return self._cache.currsize
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            return self._cache.get(key, _MISSING)
+
+    def set(self, key: str, entry: _CacheEntry) -> bool:
+        with self._lock:
+            try:
+                self._cache[key] = entry
+                return True
+            except ValueError:
+                # Larger than the whole cache
+                self._cache.pop(key, None)
+                return False
+
+    def evict(self, nbytes: int) -> int:
+        """Evict least recently used entries until at least nbytes are freed. Returns bytes freed."""
+        freed = 0
+        with self._lock:
+            if hasattr(self._cache, "expire"):
+                before = self._cache.currsize
+                self._cache.expire()
+                freed += before - self._cache.currsize
+            while freed < nbytes and len(self._cache):
+                before = self._cache.currsize
+                self._cache.popitem()
+                freed += before - self._cache.currsize
+        return freed
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._cache.pop(key, _MISSING) is not _MISSING
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            if hasattr(self._cache, "expire"):
+                self._cache.expire()
+            return len(self._cache)
+
+
+class DiskBackend:
+    """Backend storing pickled entries in the indexed file cache under stores/<name>."""
+
+    name = "disk"
+    maxsize = 0
+
+    def __init__(self, store_name: str, ttl: Optional[float] = None, on_evict: Callable[[int], None] = None):
+        self._subfolder = f"{STORES_SUBFOLDER}/{store_name}"
+        self._ttl = ttl
+        self._on_evict = on_evict
+
+    @staticmethod
+    def _file_key(key: str) -> str:
+        return hashlib.sha256(str(key).encode()).hexdigest()
+
+    def get(self, key: str) -> Any:
+        data = disk_cache.load(self._file_key(key), self._subfolder)
+        if data is None:
+            return _MISSING
+        try:
+            return pickle.loads(data)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable disk cache entry {key}: {e}")
+            self.delete(key)
+            return _MISSING
+
+    def set(self, key: str, entry: _CacheEntry) -> bool:
+        data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        # Expiry is enforced by the file cache janitor
+        disk_cache.save(self._file_key(key), data, self._subfolder, ttl=self._ttl or 0)
+        return True
+
+    def delete(self, key: str) -> bool:
+        return disk_cache.delete(self._file_key(key), self._subfolder)
+
+    def clear(self):
+        for file_key in disk_cache.keys(self._subfolder):
+            disk_cache.delete(file_key, self._subfolder)
+
+    def __len__(self) -> int:
+        return disk_cache.count(self._subfolder)
+
+
+class RedisBackend:
+    """Backend storing pickled entries in Redis, shared between worker processes."""
+
+    name = "redis"
+    maxsize = 0
+
+    def __init__(self, store_name: str, url: str = REDIS_URL, ttl: Optional[float] = None):
+        import redis  # Optional dependency, only needed when a cache is configured to use Redis
+
+        self._client = redis.Redis.from_url(url)
+        self._client.ping()
+        self._prefix = f"ocr_cache:{store_name}:"
+        self._ttl = ttl
+
+    def get(self, key: str) -> Any:
+        data = self._client.get(self._prefix + key)
+        if data is None:
+            return _MISSING
+        return pickle.loads(data)
+
+    def set(self, key: str, entry: _CacheEntry) -> bool:
+        ttl = int(self._ttl) if self._ttl else None
+        self._client.set(self._prefix + key, pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL), ex=ttl)
+        return True
+
+    def delete(self, key: str) -> bool:
+        return bool(self._client.delete(self._prefix + key))
+
+    def clear(self):
+        keys = list(self._client.scan_iter(match=self._prefix + "*"))
+        if keys:
+            self._client.delete(*keys)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._client.scan_iter(match=self._prefix + "*"))
+
+
+def _create_backend(name: str, maxsize: int, ttl: Optional[float], on_evict: Callable[[int], None],
+                    default: str = None):
+    """Create the configured backend for a named cache, falling back to memory."""
+    backend_type = os.getenv(f"{name.upper()}_CACHE_BACKEND", default or CACHE_BACKEND).lower()
+    if backend_type == "disk":
+        return DiskBackend(name, ttl, on_evict)
+    if backend_type == "redis":
+        try:
+            return RedisBackend(name, REDIS_URL, ttl)
+        except Exception as e:
+            logger.warning(f"Redis backend unavailable for cache '{name}', using memory instead: {e}")
+    return MemoryBackend(maxsize, ttl, on_evict)
+
+
+class MemoryBudget:
+    """
+    A byte budget shared by all in-memory caches.
+    
+    After each write the caches are trimmed back under the budget, each in
+    proportion to its share of the bytes in use. When process RSS grows more
+    than the headroom above its baseline, all caches are shrunk further so
+    that memory is returned before the task queue has to force garbage
+    collection. The baseline is the RSS once warm-up has loaded the OCR
+    engines, not an absolute limit that loaded models alone would exceed.
+    """
+
+    def __init__(self, limit_bytes: int = CACHE_MEMORY_BUDGET_BYTES,
+                 rss_headroom_bytes: int = CACHE_RSS_HEADROOM_BYTES,
+                 rss_check_interval: float = 5.0):
+        self.limit_bytes = limit_bytes
+        self.rss_headroom_bytes = rss_headroom_bytes
+        self.rss_check_interval = rss_check_interval
+        self._stores = []
+        self._lock = threading.Lock()
+        self._last_rss_check = 0.0
+        self.last_rss_bytes = None
+        self.rss_baseline_bytes = None
+        # Set after a relief until RSS drops back under the limit
+        self._relieved = False
+        self.budget_evicted_bytes = 0
+        self.pressure_reliefs = 0
+
+    def register(self, store: "CacheStore"):
+        if hasattr(store.backend, "currsize"):
+            self._stores.append(store)
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(store.backend.currsize for store in self._stores)
+
+    def _evict_proportionally(self, nbytes: int) -> int:
+        used = self.used_bytes
+        if nbytes <= 0 or used <= 0:
+            return 0
+        freed = 0
+        for store in self._stores:
+            share = store.backend.currsize / used
+            if share > 0:
+                freed += store.backend.evict(int(nbytes * share) + 1)
+        return freed
+
+    def _read_rss(self) -> Optional[int]:
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss
+        except Exception:
+            return None
+
+    def enforce(self):
+        """Trim the caches back under the budget, shrinking further under RSS pressure."""
+        with self._lock:
+            excess = self.used_bytes - self.limit_bytes
+            if excess > 0:
+                self.budget_evicted_bytes += self._evict_proportionally(excess)
+
+            now = time.time()
+            if now - self._last_rss_check < self.rss_check_interval:
+                return
+            self._last_rss_check = now
+
+        self.check_pressure()
+
+    def set_rss_baseline(self, rss: Optional[int] = None):
+        """Take the current RSS as the baseline, e.g. once warm-up has loaded the OCR engines."""
+        rss = rss if rss is not None else self._read_rss()
+        if rss is None:
+            return
+        with self._lock:
+            self.rss_baseline_bytes = rss
+            self._relieved = False
+        logger.info(f"Cache memory pressure baseline: RSS {rss / MB:.0f} MB")
+
+    def check_pressure(self, rss: Optional[int] = None) -> bool:
+        """
+        Shrink the caches if RSS grew more than the headroom above the baseline.
+        
+        The first reading is the baseline until set_rss_baseline() is called.
+        Memory still held after a relief is not cache memory (models loaded on
+        first use, OCR buffers), so it becomes the new baseline instead of the
+        caches being emptied again at every check.
+        
+        Args:
+            rss: Current RSS in bytes; read from the process if omitted
+            
+        Returns:
+            bool: Whether the caches were shrunk
+        """
+        rss = rss if rss is not None else self._read_rss()
+        if rss is None:
+            return False
+        with self._lock:
+            self.last_rss_bytes = rss
+            if self.rss_baseline_bytes is None:
+                self.rss_baseline_bytes = rss
+                return False
+            if rss - self.rss_baseline_bytes <= self.rss_headroom_bytes:
+                self._relieved = False
+                return False
+            if self._relieved:
+                logger.info(f"RSS stays at {rss / MB:.0f} MB after relieving cache memory, using it as the new baseline")
+                self.rss_baseline_bytes = rss
+                self._relieved = False
+                return False
+            self._relieved = True
+        self.relieve_pressure()
+        return True
+
+    def relieve_pressure(self, fraction: float = 0.5) -> int:
+        """
+        Release a fraction of the memory held by in-memory caches.
+        
+        Args:
+            fraction: Fraction of the bytes in use to evict
+            
+        Returns:
+            int: Bytes freed
+        """
+        with self._lock:
+            freed = self._evict_proportionally(int(self.used_bytes * fraction))
+            self.pressure_reliefs += 1
+            self.budget_evicted_bytes += freed
+        logger.warning(f"Memory pressure: evicted {freed / MB:.1f} MB from in-memory caches")
+        return freed
+
+    def get_stats(self) -> Dict[str, Union[int, float, None]]:
+        """Get budget statistics."""
+        return {
+            "limit_bytes": self.limit_bytes,
+            "used_bytes": self.used_bytes,
+            "used_mb": round(self.used_bytes / MB, 2),
+            "rss_baseline_bytes": self.rss_baseline_bytes,
+            "rss_headroom_bytes": self.rss_headroom_bytes,
+            "last_rss_bytes": self.last_rss_bytes,
+            "budget_evicted_bytes": self.budget_evicted_bytes,
+            "pressure_reliefs": self.pressure_reliefs,
+        }
+
+
+# Global budget shared by all in-memory caches
+memory_budget = MemoryBudget()
+
+
+class CacheStore:
+    """
+    A named cache with hit/miss/eviction counters and a pluggable backend.
+
+    Supports the mapping operations used throughout the codebase (`in`, `[]`,
+    `get`, `len`, `clear`). In-memory caches are bounded by `max_bytes`, with
+    entries weighed by `getsizeof`, and share the global memory budget.
+    Entries older than `ttl` are considered stale and
+    are kept for a further `stale_ttl` seconds, during which the `cached`
+    decorator serves them while refreshing in the background.
+    `default_backend` replaces CACHE_BACKEND for caches that should persist
+    by default; `{NAME}_CACHE_BACKEND` still takes precedence.
+    """
+
+    def __init__(self, name: str, max_bytes: int, ttl: Optional[float] = None,
+                 stale_ttl: float = 0, label: str = None,
+                 getsizeof: Callable[[Any], int] = estimate_size,
+                 budget: Optional[MemoryBudget] = None, backend=None,
+                 default_backend: str = None):
+        self.name = name
+        self.label = label or name
+        self.getsizeof = getsizeof
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl if ttl else 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+        hard_ttl = ttl + self.stale_ttl if ttl else None
+        self.backend = backend if backend is not None else _create_backend(name, max_bytes, hard_ttl, self._record_evictions, default_backend)
+        self._flight = get_single_flight(f"cache:{name}")
+        self._refreshing = set()
+        self.budget = budget
+        if budget is not None:
+            budget.register(self)
+
+    @property
+    def maxsize(self) -> int:
+        return self.backend.maxsize
+
+    def _record_evictions(self, count: int):
+        with self._stats_lock:
+            self.evictions += count
+
+    def _record(self, hit: bool, stale: bool = False):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+                if stale:
+                    self.stale_hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, key: str) -> Tuple[bool, Any, bool]:
+        """
+        Look up a key and record a hit or miss.
+
+        Returns:
+            Tuple of (found, value, fresh)
+        """
+        entry = self.backend.get(key)
+        if entry is _MISSING:
+            self._record(False)
+            return False, None, False
+        fresh = not self.ttl or time.time() - entry.created_at <= self.ttl
+        self._record(True, stale=not fresh)
+        return True, entry.value, fresh
+
+    def __contains__(self, key: str) -> bool:
+        # Only misses are counted here so the `if key in cache: cache[key]` idiom counts once
+        found = self.backend.get(key) is not _MISSING
+        if not found:
+            self._record(False)
+        return found
+
+    def __getitem__(self, key: str) -> Any:
+        entry = self.backend.get(key)
+        if entry is _MISSING:
+            self._record(False)
+            raise KeyError(key)
+        self._record(True)
+        return entry.value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        found, value, _ = self.lookup(key)
+        return value if found else default
+
+    def __setitem__(self, key: str, value: Any):
+        size = self.getsizeof(value)
+        if not self.backend.set(key, _CacheEntry(value, size=size)):
+            logger.info(f"Not caching {self.label} {key[:16]}...: {size} bytes exceeds cache limit")
+            return
+        if self.budget is not None:
+            self.budget.enforce()
+
+    def __delitem__(self, key: str):
+        if not self.backend.delete(key):
+            raise KeyError(key)
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        entry = self.backend.get(key)
+        self.backend.delete(key)
+        return default if entry is _MISSING else entry.value
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+    def clear(self):
+        self.backend.clear()
+
+    def get_stats(self) -> Dict[str, Union[int, float, str]]:
+        """Get statistics for this cache."""
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend.name,
+                "size": len(self),
+                "bytes": getattr(self.backend, "currsize", None),
+                "max_bytes": self.maxsize,
+                "ttl": self.ttl or 0,
+                "stale_ttl": self.stale_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def _populate(self, key: str, func: Callable, args: tuple, kwargs: dict) -> Any:
+        result = func(*args, **kwargs)
+        self[key] = result
+        logger.info(f"Cached {self.label}: {key[:16]}...")
+        return result
+
+    async def _populate_async(self, key: str, func: Callable, args: tuple, kwargs: dict) -> Any:
+        result = await func(*args, **kwargs)
+        self[key] = result
+        logger.info(f"Cached {self.label}: {key[:16]}...")
+        return result
+
+    def get_or_compute(self, key: str, func: Callable, *args, **kwargs) -> Any:
+        """Return the cached value for key, computing it once for concurrent callers on a miss."""
+        found, value, fresh = self.lookup(key)
+        if found:
+            logger.info(f"Cache hit for {self.label}: {key[:16]}...")
+            if not fresh:
+                self._refresh_in_background(key, func, args, kwargs)
+            return value
+        return self._flight.do_sync(key, self._populate, key, func, args, kwargs)
+
+    async def get_or_compute_async(self, key: str, func: Callable, *args, **kwargs) -> Any:
+        """Async variant of get_or_compute for coroutine functions."""
+        found, value, fresh = self.lookup(key)
+        if found:
+            logger.info(f"Cache hit for {self.label}: {key[:16]}...")
+            if not fresh:
+                self._refresh_in_background_async(key, func, args, kwargs)
+            return value
+        return await self._flight.do(key, self._populate_async, key, func, args, kwargs)
+
+    def _claim_refresh(self, key: str) -> bool:
+        with self._stats_lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _release_refresh(self, key: str):
+        with self._stats_lock:
+            self._refreshing.discard(key)
+
+    def _refresh_in_background(self, key: str, func: Callable, args: tuple, kwargs: dict):
+        if not self._claim_refresh(key):
+            return
+
+        def refresh():
+            try:
+                self._flight.do_sync(key, self._populate, key, func, args, kwargs)
+            except Exception as e:
+                logger.warning(f"Background refresh failed for {self.name} cache entry {key[:16]}...: {e}")
+            finally:
+                self._release_refresh(key)
+
+        threading.Thread(target=refresh, daemon=True, name=f"cache-refresh-{self.name}").start()
+
+    def _refresh_in_background_async(self, key: str, func: Callable, args: tuple, kwargs: dict):
+        if not self._claim_refresh(key):
+            return
+
+        async def refresh():
+            try:
+                await self._flight.do(key, self._populate_async, key, func, args, kwargs)
+            except Exception as e:
+                logger.warning(f"Background refresh failed for {self.name} cache entry {key[:16]}...: {e}")
+            finally:
+                self._release_refresh(key)
+
+        asyncio.get_running_loop().create_task(refresh())
+
+
+# Caches bounded by bytes; the in-memory ones share memory_budget
+ocr_results_cache = CacheStore("ocr_results", max_bytes=64 * MB, ttl=3600, label="OCR result", budget=memory_budget)  # 1 hour TTL
+sharepoint_files_cache = CacheStore("sharepoint_files", max_bytes=192 * MB, ttl=1800, stale_ttl=600, label="SharePoint file", budget=memory_budget)  # 30 minutes TTL, served stale for 10 more while refreshing
+llm_scores_cache = CacheStore("llm_scores", max_bytes=8 * MB, ttl=LLM_SCORE_CACHE_TTL_SECONDS, label="LLM score", budget=memory_budget, default_backend="disk")  # Persisted on disk so scores survive restarts
+preprocessing_cache = CacheStore("preprocessing", max_bytes=32 * MB, label="preprocessing result", budget=memory_budget)  # LRU cache for preprocessing results
+preprocessed_pages_cache = CacheStore("preprocessed_pages", max_bytes=256 * MB, ttl=3600, label="preprocessed page", budget=memory_budget)  # 1 hour TTL
+
+_CACHE_STORES = {
+    "ocr_results": ocr_results_cache,
+    "sharepoint_files": sharepoint_files_cache,
+    "llm_scores": llm_scores_cache,
+    "preprocessing": preprocessing_cache,
+    "preprocessed_pages": preprocessed_pages_cache,
+}
 
 
 def generate_cache_key(*args, **kwargs) -> str:
@@ -50,33 +1001,53 @@ def generate_cache_key(*args, **kwargs) -> str:
     return hashlib.sha256(key_string.encode()).hexdigest()
 
 
+def cached(store: CacheStore, key_func: Callable = None) -> Callable:
+    """
+    Decorator factory caching a sync or async function's results in a CacheStore.
+    
+    Concurrent misses for the same key run the function once, and stale entries
+    are served while being refreshed in the background.
+    
+    Args:
+        store: Cache to store results in
+        key_func: Builds the cache key from the call arguments
+            (default: hash of the function name and arguments)
+        
+    Returns:
+        Callable: Decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        def make_key(*args, **kwargs) -> str:
+            if key_func:
+                return key_func(*args, **kwargs)
+            return generate_cache_key(func.__name__, *args, **kwargs)
+
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await store.get_or_compute_async(make_key(*args, **kwargs), func, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return store.get_or_compute(make_key(*args, **kwargs), func, *args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
 def cache_ocr_result(func: Callable) -> Callable:
     """
     Decorator to cache OCR results.
     
     Args:
-        func: Function to cache
+        func: Function to cache, taking the request first; later arguments
+            only schedule the work and are left out of the cache key
         
     Returns:
         Callable: Wrapped function with caching
     """
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        cache_key = generate_cache_key(func.__name__, *args, **kwargs)
-        
-        # Check if result is in cache
-        if cache_key in ocr_results_cache:
-            logger.info(f"Cache hit for OCR result: {cache_key[:16]}...")
-            return ocr_results_cache[cache_key]
-        
-        # Execute function and cache result
-        result = func(*args, **kwargs)
-        ocr_results_cache[cache_key] = result
-        logger.info(f"Cached OCR result: {cache_key[:16]}...")
-        
-        return result
-    
-    return wrapper
+    return cached(ocr_results_cache, lambda req, *args, **kwargs: generate_cache_key(func.__name__, req))(func)
 
 
 def cache_sharepoint_file(func: Callable) -> Callable:
@@ -89,60 +1060,42 @@ def cache_sharepoint_file(func: Callable) -> Callable:
     Returns:
         Callable: Wrapped function with caching
     """
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        cache_key = generate_cache_key(func.__name__, *args, **kwargs)
-        
-        # Check if result is in cache
-        if cache_key in sharepoint_files_cache:
-            logger.info(f"Cache hit for SharePoint file: {cache_key[:16]}...")
-            return sharepoint_files_cache[cache_key]
-        
-        # Execute function and cache result
-        result = func(*args, **kwargs)
-        sharepoint_files_cache[cache_key] = result
-        logger.info(f"Cached SharePoint file: {cache_key[:16]}...")
-        
-        return result
-    
-    return wrapper
+    return cached(sharepoint_files_cache)(func)
+
+
+def _llm_score_key(*args, **kwargs) -> str:
+    # Cache key based on text content hash for LLM scoring
+    text_content = args[0] if args else kwargs.get('text', '')
+    text_hash = hashlib.sha256(text_content.encode()).hexdigest()
+    return f"llm_score_{text_hash}"
 
 
 def cache_llm_score(func: Callable) -> Callable:
     """
     Decorator to cache LLM quality scores.
     
+    Works with both sync and async scoring functions; for coroutines the
+    awaited result is cached rather than the coroutine object.
+    
     Args:
         func: Function to cache
         
     Returns:
         Callable: Wrapped function with caching
     """
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        # Create cache key based on text content hash for LLM scoring
-        text_content = args[0] if args else kwargs.get('text', '')
-        text_hash = hashlib.sha256(text_content.encode()).hexdigest()
-        cache_key = f"llm_score_{text_hash}"
-        
-        # Check if result is in cache
-        if cache_key in llm_scores_cache:
-            logger.info(f"Cache hit for LLM score: {cache_key[:16]}...")
-            return llm_scores_cache[cache_key]
-        
-        # Execute function and cache result
-        result = func(*args, **kwargs)
-        llm_scores_cache[cache_key] = result
-        logger.info(f"Cached LLM score: {cache_key[:16]}...")
-        
-        return result
-    
-    return wrapper
+    return cached(llm_scores_cache, key_func=_llm_score_key)(func)
+
+
+def _preprocessing_key(*args, **kwargs) -> str:
+    # Hash the PDF once rather than serializing the whole base64 string into the key
+    req = args[0] if args else kwargs.get('req')
+    pdf_hash = hashlib.sha256(req.pdf_data.encode()).hexdigest()
+    return generate_cache_key("preprocess", pdf_hash, req.dict(exclude={'pdf_data'}))
 
 
 def cache_preprocessing_result(func: Callable) -> Callable:
     """
-    Decorator to cache preprocessing results.
+    Decorator to cache preprocessing results, keyed by the PDF's hash and the options.
     
     Args:
         func: Function to cache
@@ -150,26 +1103,10 @@ def cache_preprocessing_result(func: Callable) -> Callable:
     Returns:
         Callable: Wrapped function with caching
     """
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        cache_key = generate_cache_key(func.__name__, *args, **kwargs)
-        
-        # Check if result is in cache
-        if cache_key in preprocessing_cache:
-            logger.info(f"Cache hit for preprocessing: {cache_key[:16]}...")
-            return preprocessing_cache[cache_key]
-        
-        # Execute function and cache result
-        result = func(*args, **kwargs)
-        preprocessing_cache[cache_key] = result
-        logger.info(f"Cached preprocessing result: {cache_key[:16]}...")
-        
-        return result
-    
-    return wrapper
+    return cached(preprocessing_cache, key_func=_preprocessing_key)(func)
 
 
-def save_file_cache(cache_key: str, data: bytes, subfolder: str = "files") -> str:
+def save_file_cache(cache_key: str, data: bytes, subfolder: str = "files", ttl: Optional[float] = None) -> str:
     """
     Save binary data to file-based cache.
     
@@ -177,18 +1114,12 @@ def save_file_cache(cache_key: str, data: bytes, subfolder: str = "files") -> st
         cache_key: Unique identifier for the cached item
         data: Binary data to cache
         subfolder: Subfolder within cache directory
+        ttl: Seconds until the entry expires (default: FILE_CACHE_TTL_SECONDS)
         
     Returns:
         str: Path to the cached file
     """
-    cache_subfolder = os.path.join(CACHE_DIR, subfolder)
-    os.makedirs(cache_subfolder, exist_ok=True)
-    
-    cache_file_path = os.path.join(cache_subfolder, f"{cache_key}.cache")
-    
-    with open(cache_file_path, 'wb') as f:
-        f.write(data)
-    
+    cache_file_path = disk_cache.save(cache_key, data, subfolder, ttl)
     logger.info(f"Saved file cache: {cache_file_path}")
     return cache_file_path
 
@@ -202,24 +1133,11 @@ def load_file_cache(cache_key: str, subfolder: str = "files") -> Optional[bytes]
         subfolder: Subfolder within cache directory
         
     Returns:
-        Optional[bytes]: Cached data if found, None otherwise
+        Optional[bytes]: Cached data if found and not expired, None otherwise
     """
-    cache_file_path = os.path.join(CACHE_DIR, subfolder, f"{cache_key}.cache")
-    
-    if not os.path.exists(cache_file_path):
-        return None
-    
-    # Check if cache file is still valid (not older than 1 hour)
-    file_age = time.time() - os.path.getmtime(cache_file_path)
-    if file_age > 3600:  # 1 hour
-        os.remove(cache_file_path)
-        logger.info(f"Removed expired cache file: {cache_file_path}")
-        return None
-    
-    with open(cache_file_path, 'rb') as f:
-        data = f.read()
-    
-    logger.info(f"Loaded file cache: {cache_file_path}")
+    data = disk_cache.load(cache_key, subfolder)
+    if data is not None:
+        logger.info(f"Loaded file cache: {subfolder}/{cache_key}")
     return data
 
 
@@ -234,34 +1152,23 @@ def clear_cache(cache_type: str = "all") -> Dict[str, int]:
         Dict[str, int]: Number of items cleared from each cache
     """
     cleared_counts = {}
+    cache_types = {
+        "ocr": ("ocr_results",),
+        "sharepoint": ("sharepoint_files",),
+        "llm": ("llm_scores",),
+        "preprocessing": ("preprocessing", "preprocessed_pages"),
+    }
     
-    if cache_type in ["ocr", "all"]:
-        count = len(ocr_results_cache)
-        ocr_results_cache.clear()
-        cleared_counts["ocr_results"] = count
-        
-    if cache_type in ["sharepoint", "all"]:
-        count = len(sharepoint_files_cache)
-        sharepoint_files_cache.clear()
-        cleared_counts["sharepoint_files"] = count
-        
-    if cache_type in ["llm", "all"]:
-        count = len(llm_scores_cache)
-        llm_scores_cache.clear()
-        cleared_counts["llm_scores"] = count
-        
-    if cache_type in ["preprocessing", "all"]:
-        count = len(preprocessing_cache)
-        preprocessing_cache.clear()
-        cleared_counts["preprocessing"] = count
+    for type_name, store_names in cache_types.items():
+        if cache_type in [type_name, "all"]:
+            for store_name in store_names:
+                store = _CACHE_STORES[store_name]
+                count = len(store)
+                store.clear()
+                cleared_counts[store_name] = count
         
     if cache_type in ["files", "all"]:
-        import shutil
-        if os.path.exists(CACHE_DIR):
-            file_count = sum(len(files) for _, _, files in os.walk(CACHE_DIR))
-            shutil.rmtree(CACHE_DIR)
-            os.makedirs(CACHE_DIR, exist_ok=True)
-            cleared_counts["file_cache"] = file_count
+        cleared_counts["file_cache"] = disk_cache.clear()
     
     logger.info(f"Cleared caches: {cleared_counts}")
     return cleared_counts
@@ -274,48 +1181,10 @@ def get_cache_stats() -> Dict[str, Dict[str, Union[int, float]]]:
     Returns:
         Dict[str, Dict[str, Union[int, float]]]: Cache statistics
     """
-    stats = {
-        "ocr_results": {
-            "size": len(ocr_results_cache),
-            "maxsize": ocr_results_cache.maxsize,
-            "ttl": getattr(ocr_results_cache, 'ttl', 0),
-            "hits": getattr(ocr_results_cache, 'hits', 0),
-            "misses": getattr(ocr_results_cache, 'misses', 0)
-        },
-        "sharepoint_files": {
-            "size": len(sharepoint_files_cache),
-            "maxsize": sharepoint_files_cache.maxsize,
-            "ttl": getattr(sharepoint_files_cache, 'ttl', 0),
-            "hits": getattr(sharepoint_files_cache, 'hits', 0),
-            "misses": getattr(sharepoint_files_cache, 'misses', 0)
-        },
-        "llm_scores": {
-            "size": len(llm_scores_cache),
-            "maxsize": llm_scores_cache.maxsize,
-            "ttl": getattr(llm_scores_cache, 'ttl', 0),
-            "hits": getattr(llm_scores_cache, 'hits', 0),
-            "misses": getattr(llm_scores_cache, 'misses', 0)
-        },
-        "preprocessing": {
-            "size": len(preprocessing_cache),
-            "maxsize": preprocessing_cache.maxsize,
-            "hits": getattr(preprocessing_cache, 'hits', 0),
-            "misses": getattr(preprocessing_cache, 'misses', 0)
-        }
-    }
+    stats = {name: store.get_stats() for name, store in _CACHE_STORES.items()}
+    stats["memory_budget"] = memory_budget.get_stats()
     
-    # Add file cache stats
-    if os.path.exists(CACHE_DIR):
-        file_count = sum(len(files) for _, _, files in os.walk(CACHE_DIR))
-        cache_size = sum(
-            os.path.getsize(os.path.join(dirpath, filename))
-            for dirpath, _, filenames in os.walk(CACHE_DIR)
-            for filename in filenames
-        )
-        stats["file_cache"] = {
-            "file_count": file_count,
-            "total_size_bytes": cache_size,
-            "total_size_mb": round(cache_size / (1024 * 1024), 2)
-        }
+    # File cache stats come from the index's running totals
+    stats["file_cache"] = disk_cache.get_stats()
     
-    return stats
\ No newline at end of file
+    return stats
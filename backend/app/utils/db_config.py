@@ -1,13 +1,31 @@
 """
 Database configuration utility for managing database connections.
-Supports both SQLite and PostgreSQL databases.
+Supports SQLite, PostgreSQL and Microsoft SQL Server databases.
+
+All modules share the engine, session factory and connection pool defined
+here. SQLite connections are configured for concurrent use (WAL journal,
+busy timeout, memory-mapped I/O), and raw_connection() hands out pooled
+DB-API connections for code that runs SQL directly.
+
+Async request handlers must not run blocking queries on the event loop. They
+use fetch_all(), which goes through the async engine when an async driver is
+installed, or run_db(), which runs a blocking function on a small thread pool
+sized to the connection pool.
 """
+import asyncio
+import functools
+import logging
 import os
 import sqlite3
-from sqlalchemy import create_engine
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
 
+logger = logging.getLogger(__name__)
+
 # Base class for SQLAlchemy models
 Base = declarative_base()
 
@@ -35,8 +53,89 @@ if DB_TYPE == 'postgres' and 'postgresql' not in DATABASE_URL:
 elif DB_TYPE == 'mssql' and 'mssql' not in DATABASE_URL:
     DATABASE_URL = f"mssql+pyodbc://{MSSQL_USER}:{MSSQL_PASSWORD}@{MSSQL_HOST}:{MSSQL_PORT}/{MSSQL_DB}?driver=ODBC+Driver+17+for+SQL+Server"
 
+# Connection pool sizing, shared by all modules in the process
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+
+# SQLite tuning: WAL lets readers proceed during writes, and busy_timeout makes
+# writers wait for the lock instead of failing with "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '30000'))
+SQLITE_WAL = os.getenv('SQLITE_WAL', 'true').lower() == 'true'
+SQLITE_MMAP_SIZE_MB = int(os.getenv('SQLITE_MMAP_SIZE_MB', '256'))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))
+
+# Threads available to run_db(); more would only wait for a pooled connection
+DB_THREADPOOL_SIZE = int(os.getenv('DB_THREADPOOL_SIZE', str(DB_POOL_SIZE)))
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith('sqlite')
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return url in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in url
+
+
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """Apply SQLite pragmas to every new pooled connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        if SQLITE_WAL:
+            cursor.execute("PRAGMA journal_mode = WAL")
+            # Safe with WAL and avoids an fsync on every commit
+            cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE_MB * 1024 * 1024}")
+        cursor.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+    except Exception as e:
+        logger.warning(f"Could not apply SQLite pragmas: {e}")
+    finally:
+        cursor.close()
+
+
+def _engine_options(url: str, for_async: bool = False) -> dict:
+    """Engine keyword arguments for the given database URL."""
+    if _is_sqlite(url):
+        options = {}
+        if not for_async:
+            options['connect_args'] = {
+                'check_same_thread': False,
+                'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+            }
+        # In-memory databases use a single shared connection and take no pool arguments
+        if not _is_memory_sqlite(url):
+            options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+        return options
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+    }
+
+
+def create_db_engine(url: str = None):
+    """
+    Create a SQLAlchemy engine with pooling and backend-specific tuning.
+    
+    Args:
+        url: Database URL (defaults to DATABASE_URL)
+        
+    Returns:
+        Engine: The configured engine
+    """
+    url = url or DATABASE_URL
+    db_engine = create_engine(url, **_engine_options(url))
+    if _is_sqlite(url):
+        event.listen(db_engine, 'connect', _configure_sqlite_connection)
+    return db_engine
+
+
 # Create SQLAlchemy engine and session factory
-engine = create_engine(DATABASE_URL)
+engine = create_db_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def get_db() -> Session:
@@ -85,6 +184,235 @@ def get_db_connection():
         db_path = DATABASE_URL.replace('sqlite:///', '')
         return sqlite3.connect(db_path)
 
+def _to_paramstyle(sql: str, paramstyle: str) -> str:
+    """Rewrite qmark (?) placeholders for drivers that use format placeholders."""
+    if paramstyle in ('format', 'pyformat'):
+        return sql.replace('%', '%%').replace('?', '%s')
+    return sql
+
+
+class RawConnection:
+    """
+    A pooled DB-API connection with a sqlite3-style execute().
+    
+    Queries are written with qmark (?) placeholders, as the SQLite code in this
+    project is; they are rewritten for drivers that use format placeholders.
+    Dialect-specific SQL (e.g. INSERT OR REPLACE) is passed through unchanged.
+    """
+    
+    def __init__(self, dbapi_connection, paramstyle: str):
+        self._connection = dbapi_connection
+        self._paramstyle = paramstyle
+    
+    def _prepare(self, sql: str) -> str:
+        return _to_paramstyle(sql, self._paramstyle)
+    
+    def execute(self, sql: str, params=()):
+        cursor = self._connection.cursor()
+        cursor.execute(self._prepare(sql), tuple(params))
+        return cursor
+    
+    def executemany(self, sql: str, seq_of_params):
+        cursor = self._connection.cursor()
+        cursor.executemany(self._prepare(sql), [tuple(params) for params in seq_of_params])
+        return cursor
+    
+    def cursor(self):
+        return self._connection.cursor()
+    
+    def commit(self):
+        self._connection.commit()
+    
+    def rollback(self):
+        self._connection.rollback()
+
+
+@contextmanager
+def raw_connection():
+    """
+    Borrow a DB-API connection from the shared pool.
+    
+    Commits when the block exits normally, rolls back on an exception, and
+    returns the connection to the pool either way.
+    
+    Yields:
+        RawConnection: Connection supporting execute(sql, params) with ? placeholders
+    """
+    connection = engine.raw_connection()
+    try:
+        yield RawConnection(connection, engine.dialect.paramstyle)
+        connection.commit()
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+
+def get_pool_stats() -> dict:
+    """
+    Get connection pool statistics for the shared engine.
+    
+    Returns:
+        dict: Pool class, size and checked-out connection counts
+    """
+    pool = engine.pool
+    stats = {'backend': engine.dialect.name, 'pool': type(pool).__name__, 'status': pool.status()}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+    with _db_executor_lock:
+        stats['threadpool'] = {
+            'size': DB_THREADPOOL_SIZE,
+            'in_flight': _db_calls_in_flight,
+            'async_engine': _async_engine is not None,
+        }
+    return stats
+
+
+_db_executor = ThreadPoolExecutor(max_workers=max(1, DB_THREADPOOL_SIZE), thread_name_prefix='db')
+_db_executor_lock = threading.Lock()
+_db_calls_in_flight = 0
+
+
+def _run_counted(fn, *args, **kwargs):
+    global _db_calls_in_flight
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        with _db_executor_lock:
+            _db_calls_in_flight -= 1
+
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Run a blocking database function on the bounded database thread pool.
+    
+    Calls beyond DB_THREADPOOL_SIZE wait in the pool's queue instead of
+    blocking the event loop or holding a thread while waiting for a connection.
+    
+    Args:
+        fn: Function that performs the blocking I/O
+        *args: Positional arguments for fn
+        **kwargs: Keyword arguments for fn
+        
+    Returns:
+        The return value of fn
+    """
+    global _db_calls_in_flight
+    with _db_executor_lock:
+        _db_calls_in_flight += 1
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(_run_counted, fn, *args, **kwargs))
+
+
+def _fetch_all_sync(sql: str, params):
+    with raw_connection() as conn:
+        cursor = conn.execute(sql, params)
+        columns = [col[0] for col in cursor.description] if cursor.description else []
+        return columns, cursor.fetchall()
+
+
+# Async drivers per backend, used by get_async_engine()
+_ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mssql': 'mssql+aioodbc',
+}
+
+_async_engine = None
+_async_sessionmaker = None
+_async_engine_failed = False
+_async_lock = threading.Lock()
+
+
+def get_async_database_url(url: str = None) -> str:
+    """
+    Map a database URL to the async driver for its backend.
+    
+    Args:
+        url: Database URL (defaults to DATABASE_URL)
+        
+    Returns:
+        str: The URL with the async driver, or None if the backend has none
+    """
+    url = url or DATABASE_URL
+    scheme, sep, rest = url.partition('://')
+    backend = scheme.split('+')[0]
+    if backend == 'postgres':
+        backend = 'postgresql'
+    driver = _ASYNC_DRIVERS.get(backend)
+    return f"{driver}{sep}{rest}" if driver else None
+
+
+def get_async_engine():
+    """
+    Get the shared async engine, creating it on first use.
+    
+    Returns:
+        AsyncEngine, or None if no async driver is installed for the backend;
+        callers then fall back to the sync engine in a worker thread
+    """
+    global _async_engine, _async_sessionmaker, _async_engine_failed
+    if _async_engine is not None or _async_engine_failed:
+        return _async_engine
+    
+    with _async_lock:
+        if _async_engine is not None or _async_engine_failed:
+            return _async_engine
+        url = get_async_database_url()
+        try:
+            if not url:
+                raise ValueError(f"no async driver for {DATABASE_URL.split(':')[0]}")
+            from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+            async_engine = create_async_engine(url, **_engine_options(url, for_async=True))
+            if _is_sqlite(url):
+                event.listen(async_engine.sync_engine, 'connect', _configure_sqlite_connection)
+            _async_sessionmaker = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+            _async_engine = async_engine
+            logger.info(f"Created async database engine ({url.split('://')[0]})")
+        except Exception as e:
+            _async_engine_failed = True
+            logger.warning(f"Async database engine unavailable, using the sync engine: {e}")
+        return _async_engine
+
+
+def get_async_session():
+    """
+    Create a new AsyncSession on the shared async engine.
+    
+    Returns:
+        AsyncSession, or None if the async engine is unavailable
+    """
+    if get_async_engine() is None:
+        return None
+    return _async_sessionmaker()
+
+
+async def fetch_all(sql: str, params=()):
+    """
+    Run a read query without blocking the event loop.
+    
+    Uses the async engine when its driver accepts ? or %s placeholders, and
+    otherwise runs the query through raw_connection() on the database thread pool.
+    
+    Args:
+        sql: Query with qmark (?) placeholders
+        params: Query parameters
+        
+    Returns:
+        tuple: (column names, list of row tuples)
+    """
+    async_engine = get_async_engine()
+    paramstyle = async_engine.dialect.paramstyle if async_engine is not None else None
+    if paramstyle in ('qmark', 'format', 'pyformat'):
+        async with async_engine.connect() as conn:
+            result = await conn.exec_driver_sql(_to_paramstyle(sql, paramstyle), tuple(params))
+            return list(result.keys()), [tuple(row) for row in result.fetchall()]
+    return await run_db(_fetch_all_sync, sql, tuple(params))
+
+
 def init_db():
     """
     Initialize the database by creating all tables.
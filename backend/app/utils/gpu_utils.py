@@ -1,20 +1,30 @@
 """
 GPU detection and configuration utilities for OCR processing.
-Supports multiple GPUs with selection and round-robin scheduling.
+Supports multiple GPUs through a device scheduler that places work on the
+least-loaded device and queues briefly when all devices are busy.
 """
 import logging
 import os
 import time
 import threading
+from contextlib import contextmanager
 from typing import Optional, Dict, List, Union, Tuple
 
 logger = logging.getLogger(__name__)
 
+# How long work waits for a busy GPU before falling back to CPU
+GPU_QUEUE_TIMEOUT_SECONDS = float(os.getenv('GPU_QUEUE_TIMEOUT_SECONDS', '30'))
+# Jobs that may run on one device at a time
+GPU_MAX_JOBS_PER_DEVICE = int(os.getenv('GPU_MAX_JOBS_PER_DEVICE', '1'))
+# Pin this worker process to one device: a device ID, or "auto" to pick by process ID
+GPU_PIN_DEVICE = os.getenv('GPU_PIN_DEVICE', '')
+# Simulated devices for testing on CPU-only machines, as total memory in MB per device (e.g. "8192,8192")
+GPU_FAKE_DEVICES = os.getenv('GPU_FAKE_DEVICES', '')
+
 # Global GPU state tracking
-_gpu_locks = {}  # Locks for each GPU device
 _gpu_usage = {}  # Track GPU usage stats
-_last_used_gpu = -1  # For round-robin scheduling
 _gpu_lock = threading.RLock()  # Global lock for GPU state updates
+_tracking_initialized = False  # Set once initialize_gpu_tracking has probed the devices
 
 def is_gpu_available() -> bool:
     """
@@ -23,6 +33,8 @@ def is_gpu_available() -> bool:
     Returns:
         bool: True if GPU is available and should be used, False otherwise
     """
+    if not isinstance(device_scheduler.backend, TorchDeviceBackend):
+        return bool(device_scheduler.device_ids())
     try:
         # Check if CUDA is available
         import torch
@@ -50,7 +62,7 @@ def get_optimal_gpu_setting(user_preference: bool = True) -> bool:
     
     Args:
         user_preference (bool): User's preference for GPU acceleration
-        
+    
     Returns:
         bool: Whether to use GPU acceleration
     """
@@ -72,7 +84,7 @@ def configure_easyocr_gpu(enable_gpu_acceleration: bool = True) -> bool:
     
     Args:
         enable_gpu_acceleration (bool): User preference for GPU acceleration
-        
+    
     Returns:
         bool: Actual GPU setting to use with EasyOCR
     """
@@ -98,70 +110,53 @@ def get_gpu_info():
             - devices: List of dictionaries with device information (id, name, memory)
     """
     try:
-        import torch
-        
+        backend = device_scheduler.backend
+        device_count = backend.device_count()
         result = {
-            "is_available": torch.cuda.is_available(),
-            "device_count": 0,
+            "is_available": device_count > 0,
+            "device_count": device_count,
             "devices": []
         }
         
-        if result["is_available"]:
-            result["device_count"] = torch.cuda.device_count()
+        # Get information for each device
+        for i in range(device_count):
+            # Get basic device info
+            device_info = {
+                "id": i,
+                "name": backend.device_name(i)
+            }
             
-            # Get information for each device
-            for i in range(result["device_count"]):
-                # Get basic device info
-                device_info = {
-                    "id": i,
-                    "name": torch.cuda.get_device_name(i)
-                }
-                
-                # Try to get memory info if available
-                try:
-                    # Get memory info using torch
-                    memory_total = torch.cuda.get_device_properties(i).total_memory / (1024 * 1024)  # MB
-                    memory_reserved = torch.cuda.memory_reserved(i) / (1024 * 1024)  # MB
-                    memory_allocated = torch.cuda.memory_allocated(i) / (1024 * 1024)  # MB
-                    
-                    device_info["memory"] = {
-                        "total": memory_total,
-                        "reserved": memory_reserved,
-                        "allocated": memory_allocated,
-                        "free": memory_total - memory_reserved
-                    }
-                    
-                    # Update global usage tracking
-                    with _gpu_lock:
-                        if i in _gpu_usage:
-                            _gpu_usage[i]["memory_used"] = memory_allocated
-                            _gpu_usage[i]["memory_total"] = memory_total
-                            # Estimate utilization based on memory usage
-                            _gpu_usage[i]["utilization"] = int((memory_allocated / memory_total) * 100) if memory_total > 0 else 0
-                
-                except Exception as e:
-                    logger.warning(f"Error getting GPU memory info for device {i}: {e}")
-                    device_info["memory"] = {
-                        "total": 0,
-                        "reserved": 0,
-                        "allocated": 0,
-                        "free": 0
-                    }
-                
-                result["devices"].append(device_info)
+            # Try to get memory info if available
+            try:
+                device_info["memory"] = backend.memory_info(i)
+                memory_total = device_info["memory"]["total"]
+                memory_allocated = device_info["memory"]["allocated"]
                 
-            logger.info(f"GPU info: {result['device_count']} devices available")
-        else:
-            logger.info("GPU info: No GPU devices available")
+                # Update global usage tracking
+                with _gpu_lock:
+                    if i in _gpu_usage:
+                        _gpu_usage[i]["memory_used"] = memory_allocated
+                        _gpu_usage[i]["memory_total"] = memory_total
+                        # Estimate utilization based on memory usage
+                        _gpu_usage[i]["utilization"] = int((memory_allocated / memory_total) * 100) if memory_total > 0 else 0
+            
+            except Exception as e:
+                logger.warning(f"Error getting GPU memory info for device {i}: {e}")
+                device_info["memory"] = {
+                    "total": 0,
+                    "reserved": 0,
+                    "allocated": 0,
+                    "free": 0
+                }
             
+            result["devices"].append(device_info)
+        
+        if device_count:
+            logger.debug(f"GPU info: {device_count} devices available")
+        else:
+            logger.debug("GPU info: No GPU devices available")
+        
         return result
-    except ImportError:
-        logger.info("PyTorch not available, cannot get GPU information")
-        return {
-            "is_available": False,
-            "device_count": 0,
-            "devices": []
-        }
     except Exception as e:
         logger.warning(f"Error getting GPU information: {e}")
         return {
@@ -174,27 +169,26 @@ def get_gpu_info():
 def initialize_gpu_tracking():
     """
     Initialize GPU tracking system.
-    Should be called at application startup.
+    Runs during background warm-up, or on first use if warm-up has not reached it yet.
     """
-    global _gpu_locks, _gpu_usage
+    global _tracking_initialized
     
     with _gpu_lock:
-        gpu_info = get_gpu_info()
-        if gpu_info["is_available"]:
-            for i in range(gpu_info["device_count"]):
-                if i not in _gpu_locks:
-                    _gpu_locks[i] = threading.RLock()
-                if i not in _gpu_usage:
-                    _gpu_usage[i] = {
-                        "in_use": False,
-                        "last_used": 0,
-                        "usage_count": 0,
-                        "total_usage_time": 0,
-                        "memory_used": 0,
-                        "memory_total": 0,
-                        "utilization": 0
-                    }
-            logger.info(f"Initialized GPU tracking for {len(_gpu_locks)} devices")
+        _tracking_initialized = True
+        device_ids = device_scheduler.device_ids()
+        for i in device_ids:
+            if i not in _gpu_usage:
+                _gpu_usage[i] = {
+                    "in_use": False,
+                    "last_used": 0,
+                    "usage_count": 0,
+                    "total_usage_time": 0,
+                    "memory_used": 0,
+                    "memory_total": 0,
+                    "utilization": 0
+                }
+        if device_ids:
+            logger.info(f"Initialized GPU tracking for {len(device_ids)} devices")
         else:
             logger.info("No GPUs available for tracking")
 
@@ -203,174 +197,387 @@ def get_gpu_usage_stats():
     Get current GPU usage statistics.
     
     Returns:
-        dict: Dictionary with GPU usage statistics
+        dict: Dictionary with GPU usage statistics and device scheduler state
     """
+    if not _tracking_initialized:
+        initialize_gpu_tracking()
+    
     # Update GPU memory info before returning stats
-    try:
-        import torch
-        if torch.cuda.is_available():
-            with _gpu_lock:
-                for i in range(torch.cuda.device_count()):
-                    if i in _gpu_usage:
-                        try:
-                            # Get memory info
-                            memory_total = torch.cuda.get_device_properties(i).total_memory / (1024 * 1024)  # MB
-                            memory_allocated = torch.cuda.memory_allocated(i) / (1024 * 1024)  # MB
-                            
-                            # Update stats
-                            _gpu_usage[i]["memory_used"] = memory_allocated
-                            _gpu_usage[i]["memory_total"] = memory_total
-                            
-                            # Estimate utilization based on memory usage and in_use flag
-                            if _gpu_usage[i]["in_use"]:
-                                # If GPU is marked as in use, set utilization to at least 50%
-                                base_utilization = 50
-                            else:
-                                base_utilization = 0
-                                
-                            # Add memory-based utilization
-                            memory_utilization = int((memory_allocated / memory_total) * 100) if memory_total > 0 else 0
-                            
-                            # Use the higher of the two values
-                            _gpu_usage[i]["utilization"] = max(base_utilization, memory_utilization)
-                            
-                        except Exception as e:
-                            logger.warning(f"Error updating GPU memory info for device {i}: {e}")
-    except Exception as e:
-        logger.warning(f"Error updating GPU memory info: {e}")
+    with _gpu_lock:
+        for i in _gpu_usage:
+            try:
+                memory = device_scheduler.backend.memory_info(i)
+                memory_total = memory["total"]
+                memory_allocated = memory["allocated"]
+                
+                # Update stats
+                _gpu_usage[i]["memory_used"] = memory_allocated
+                _gpu_usage[i]["memory_total"] = memory_total
+                
+                # Estimate utilization based on memory usage and in_use flag
+                if _gpu_usage[i]["in_use"]:
+                    # If GPU is marked as in use, set utilization to at least 50%
+                    base_utilization = 50
+                else:
+                    base_utilization = 0
+                
+                # Add memory-based utilization
+                memory_utilization = int((memory_allocated / memory_total) * 100) if memory_total > 0 else 0
+                
+                # Use the higher of the two values
+                _gpu_usage[i]["utilization"] = max(base_utilization, memory_utilization)
+            
+            except Exception as e:
+                logger.warning(f"Error updating GPU memory info for device {i}: {e}")
     
     with _gpu_lock:
         return {
-            "gpu_count": len(_gpu_locks),
-            "usage": {gpu_id: stats.copy() for gpu_id, stats in _gpu_usage.items()}
+            "gpu_count": len(_gpu_usage),
+            "usage": {gpu_id: stats.copy() for gpu_id, stats in _gpu_usage.items()},
+            "scheduler": device_scheduler.get_stats()
         }
 
-def select_gpu(preferred_gpu: Optional[int] = None) -> Tuple[bool, Optional[int]]:
+def select_gpu(preferred_gpu: Optional[int] = None, vram_mb: float = 0.0,
+               timeout: Optional[float] = None) -> Tuple[bool, Optional[int]]:
     """
-    Select a GPU for processing based on preference and availability.
+    Select a GPU for processing based on preference and load.
+    
+    Work is placed on the least-loaded device. If every device is busy, the
+    call waits up to GPU_QUEUE_TIMEOUT_SECONDS for one to become free.
     
     Args:
         preferred_gpu: Preferred GPU ID or None for auto-selection
-        
+        vram_mb: Estimated device memory the work needs
+        timeout: Seconds to wait for a busy GPU, or None for the default
+    
     Returns:
         Tuple[bool, Optional[int]]: (success, gpu_id)
             - success: Whether a GPU was successfully selected
             - gpu_id: The selected GPU ID or None if no GPU is available
     """
-    global _last_used_gpu
+    if not _tracking_initialized:
+        initialize_gpu_tracking()
     
-    # If no GPU is available, return False
-    gpu_info = get_gpu_info()
-    if not gpu_info["is_available"] or gpu_info["device_count"] == 0:
-        logger.info("No GPUs available for selection")
+    gpu_id = device_scheduler.acquire(preferred_gpu, vram_mb, timeout)
+    if gpu_id is None:
         return False, None
     
     with _gpu_lock:
-        # Initialize tracking if not already done
-        if not _gpu_locks:
-            initialize_gpu_tracking()
-        
-        # If a specific GPU is requested and it exists, try to use it
-        if preferred_gpu is not None and preferred_gpu >= 0 and preferred_gpu < gpu_info["device_count"]:
-            if _gpu_locks[preferred_gpu].acquire(blocking=False):
-                _gpu_usage[preferred_gpu]["in_use"] = True
-                _gpu_usage[preferred_gpu]["last_used"] = time.time()
-                _gpu_usage[preferred_gpu]["usage_count"] += 1
-                logger.info(f"Selected specific GPU {preferred_gpu}")
-                return True, preferred_gpu
-            else:
-                logger.info(f"Preferred GPU {preferred_gpu} is busy")
-                # Fall through to auto-selection if preferred GPU is busy
-        
-        # Auto-selection (round-robin)
-        # Start from the next GPU after the last used one
-        start_gpu = (_last_used_gpu + 1) % gpu_info["device_count"]
-        current_gpu = start_gpu
-        
-        # Try each GPU in round-robin order
-        for _ in range(gpu_info["device_count"]):
-            if _gpu_locks[current_gpu].acquire(blocking=False):
-                _gpu_usage[current_gpu]["in_use"] = True
-                _gpu_usage[current_gpu]["last_used"] = time.time()
-                _gpu_usage[current_gpu]["usage_count"] += 1
-                _last_used_gpu = current_gpu
-                logger.info(f"Auto-selected GPU {current_gpu} (round-robin)")
-                return True, current_gpu
-            
-            # Try next GPU
-            current_gpu = (current_gpu + 1) % gpu_info["device_count"]
-        
-        # If we get here, all GPUs are busy
-        logger.info("All GPUs are currently busy")
-        return False, None
+        usage = _gpu_usage.get(gpu_id)
+        if usage is not None:
+            if not usage["in_use"]:
+                usage["last_used"] = time.time()
+            usage["in_use"] = True
+            usage["usage_count"] += 1
+    logger.debug(f"Selected GPU {gpu_id}")
+    return True, gpu_id
 
-def release_gpu(gpu_id: int):
+def release_gpu(gpu_id: int, vram_mb: float = 0.0):
     """
     Release a previously selected GPU.
     
     Args:
         gpu_id: The GPU ID to release
+        vram_mb: The memory estimate passed to select_gpu
     """
     if gpu_id is None or gpu_id < 0:
         return
     
+    device_scheduler.release(gpu_id, vram_mb)
+    
     with _gpu_lock:
-        if gpu_id in _gpu_locks:
-            # Update usage statistics
-            if _gpu_usage[gpu_id]["in_use"]:
-                usage_time = time.time() - _gpu_usage[gpu_id]["last_used"]
-                _gpu_usage[gpu_id]["total_usage_time"] += usage_time
-                _gpu_usage[gpu_id]["in_use"] = False
-                logger.info(f"Released GPU {gpu_id} after {usage_time:.2f}s")
-            
-            # Release the lock
-            try:
-                _gpu_locks[gpu_id].release()
-            except RuntimeError:
-                # Lock might not be acquired
-                pass
+        usage = _gpu_usage.get(gpu_id)
+        # Update usage statistics once the device has no more jobs
+        if usage is not None and usage["in_use"] and not device_scheduler.active_jobs(gpu_id):
+            usage_time = time.time() - usage["last_used"]
+            usage["total_usage_time"] += usage_time
+            usage["in_use"] = False
+            logger.debug(f"Released GPU {gpu_id} after {usage_time:.2f}s")
 
 def configure_easyocr_gpu_with_selection(enable_gpu_acceleration: bool = True,
-                                         preferred_gpu: Optional[int] = None) -> Tuple[bool, Optional[int]]:
+                                         preferred_gpu: Optional[int] = None,
+                                         vram_mb: float = 0.0) -> Tuple[bool, Optional[int]]:
     """
     Configure EasyOCR GPU settings with automatic fallback and GPU selection.
     
+    The process-wide CUDA device is not changed; pass the returned GPU ID to
+    the reader explicitly (e.g. easyocr.Reader(..., gpu=f"cuda:{gpu_id}")).
+    Release the GPU with release_gpu(gpu_id, vram_mb) when done.
+    
     Args:
         enable_gpu_acceleration: User preference for GPU acceleration
         preferred_gpu: Preferred GPU ID or None for auto-selection
-        
+        vram_mb: Estimated device memory the work needs
+    
     Returns:
         Tuple[bool, Optional[int]]: (gpu_enabled, gpu_id)
             - gpu_enabled: Whether GPU is enabled for EasyOCR
             - gpu_id: The selected GPU ID or None if CPU is used
     """
     if not enable_gpu_acceleration:
-        logger.info("GPU acceleration disabled by user preference")
+        logger.debug("GPU acceleration disabled by user preference")
         return False, None
     
-    # Check if GPU is available at all
-    gpu_available = is_gpu_available()
-    if not gpu_available:
-        logger.info("GPU acceleration requested but not available, falling back to CPU")
+    if not device_scheduler.device_ids():
+        logger.debug("GPU acceleration requested but not available, falling back to CPU")
         return False, None
     
-    # Try to select a GPU
-    success, gpu_id = select_gpu(preferred_gpu)
+    # Try to select a GPU, queueing briefly if all are busy
+    success, gpu_id = select_gpu(preferred_gpu, vram_mb)
     if not success:
         logger.warning(
-            "GPU acceleration was requested but no GPU could be selected. "
-            "EasyOCR will use CPU processing. This may be slower but will avoid "
-            "PyTorch DataLoader pin_memory warnings."
+            "GPU acceleration was requested but no GPU became free in time. "
+            "EasyOCR will use CPU processing for this work."
         )
         return False, None
     
-    # Set CUDA device
-    try:
+    logger.debug(f"GPU acceleration enabled on GPU {gpu_id}")
+    return True, gpu_id
+
+
+class TorchDeviceBackend:
+    """CUDA devices as reported by torch."""
+
+    def device_count(self) -> int:
+        try:
+            import torch
+            return torch.cuda.device_count() if torch.cuda.is_available() else 0
+        except ImportError:
+            return 0
+
+    def device_name(self, device_id: int) -> str:
         import torch
-        torch.cuda.set_device(gpu_id)
-        logger.info(f"Set CUDA device to GPU {gpu_id}")
-    except Exception as e:
-        logger.warning(f"Error setting CUDA device: {e}")
-    
-    logger.info(f"GPU acceleration enabled on GPU {gpu_id}")
-    return True, gpu_id
\ No newline at end of file
+        return torch.cuda.get_device_name(device_id)
+
+    def torch_device(self, device_id: int) -> str:
+        """Device string to load models on."""
+        return f"cuda:{device_id}"
+
+    def memory_info(self, device_id: int) -> Dict[str, float]:
+        """
+        Total, reserved, allocated and free memory of a device in MB.
+
+        Reserved and allocated memory are this process's; free memory is the
+        driver's, so memory used by other processes on the device is not free.
+        """
+        import torch
+        memory_reserved = torch.cuda.memory_reserved(device_id) / (1024 * 1024)
+        memory_allocated = torch.cuda.memory_allocated(device_id) / (1024 * 1024)
+        try:
+            free_bytes, total_bytes = torch.cuda.mem_get_info(device_id)
+            memory_total = total_bytes / (1024 * 1024)
+            memory_free = free_bytes / (1024 * 1024)
+        except (AttributeError, RuntimeError) as e:
+            logger.debug(f"mem_get_info unavailable for GPU {device_id}, counting this process only: {e}")
+            memory_total = torch.cuda.get_device_properties(device_id).total_memory / (1024 * 1024)
+            memory_free = memory_total - memory_reserved
+        return {
+            "total": memory_total,
+            "reserved": memory_reserved,
+            "allocated": memory_allocated,
+            "free": memory_free
+        }
+
+
+class FakeDeviceBackend:
+    """
+    Simulated devices with settable memory usage, for tests and CPU-only machines.
+
+    Args:
+        memory_mb: Total memory in MB of each simulated device
+    """
+
+    def __init__(self, memory_mb: List[float]):
+        self.total = [float(mb) for mb in memory_mb]
+        self.allocated = [0.0 for _ in memory_mb]
+
+    def device_count(self) -> int:
+        return len(self.total)
+
+    def device_name(self, device_id: int) -> str:
+        return f"Fake GPU {device_id}"
+
+    def torch_device(self, device_id: int) -> str:
+        # Work scheduled on a simulated device runs on the CPU
+        return "cpu"
+
+    def memory_info(self, device_id: int) -> Dict[str, float]:
+        allocated = self.allocated[device_id]
+        return {
+            "total": self.total[device_id],
+            "reserved": allocated,
+            "allocated": allocated,
+            "free": self.total[device_id] - allocated
+        }
+
+    def set_allocated(self, device_id: int, memory_mb: float):
+        """Simulate memory in use on a device."""
+        self.allocated[device_id] = float(memory_mb)
+
+
+class DeviceScheduler:
+    """
+    Places GPU work on the least-loaded device.
+
+    A device is free when it runs fewer than max_jobs_per_device jobs and has
+    enough free memory for the job's estimate. Work that finds no free device
+    waits up to queue_timeout seconds for one instead of falling back to CPU
+    right away. Devices are passed explicitly to callers, so no thread changes
+    the process-wide CUDA device.
+    """
+
+    def __init__(self, backend=None, queue_timeout: float = GPU_QUEUE_TIMEOUT_SECONDS,
+                 max_jobs_per_device: int = GPU_MAX_JOBS_PER_DEVICE, pin_device: str = GPU_PIN_DEVICE):
+        self.backend = backend or TorchDeviceBackend()
+        self.queue_timeout = queue_timeout
+        self.max_jobs_per_device = max(1, max_jobs_per_device)
+        self.pin_device = pin_device
+        self._cond = threading.Condition()
+        self._active: Dict[int, int] = {}
+        self._reserved_mb: Dict[int, float] = {}
+        self._grants: Dict[int, int] = {}
+        self._queued = 0
+        self._cpu_fallbacks = 0
+        self._max_wait_ms = 0.0
+        self._device_ids: Optional[List[int]] = None
+
+    def device_ids(self) -> List[int]:
+        """Devices this process may use, after pinning."""
+        if self._device_ids is None:
+            count = self.backend.device_count()
+            devices = list(range(count))
+            if self.pin_device and count:
+                if self.pin_device == 'auto':
+                    pinned = os.getpid() % count
+                else:
+                    try:
+                        pinned = int(self.pin_device)
+                    except ValueError:
+                        pinned = None
+                if pinned is not None and 0 <= pinned < count:
+                    devices = [pinned]
+                    logger.info(f"Worker process {os.getpid()} pinned to GPU {pinned}")
+                else:
+                    logger.warning(f"Ignoring GPU_PIN_DEVICE={self.pin_device!r}: {count} device(s) available")
+            self._device_ids = devices
+        return self._device_ids
+
+    def _free_mb(self, device_id: int) -> float:
+        try:
+            return self.backend.memory_info(device_id)["free"]
+        except Exception as e:
+            logger.warning(f"Error getting memory info for GPU {device_id}: {e}")
+            return 0.0
+
+    def _pick(self, preferred: Optional[int], vram_mb: float) -> Optional[int]:
+        """Least-loaded device that can take the job now, or None. Caller holds the lock."""
+        candidates = []
+        for device_id in self.device_ids():
+            active = self._active.get(device_id, 0)
+            if active >= self.max_jobs_per_device:
+                continue
+            free_mb = self._free_mb(device_id) - self._reserved_mb.get(device_id, 0.0)
+            # An idle device always takes the job, so an oversized estimate cannot block forever
+            if active and vram_mb > free_mb:
+                continue
+            candidates.append((active, -free_mb, device_id))
+        if not candidates:
+            return None
+        if preferred is not None and any(device_id == preferred for _, _, device_id in candidates):
+            return preferred
+        return min(candidates)[2]
+
+    def acquire(self, preferred: Optional[int] = None, vram_mb: float = 0.0,
+                timeout: Optional[float] = None) -> Optional[int]:
+        """
+        Reserve a device for a job.
+
+        Args:
+            preferred: Device to use if it is free
+            vram_mb: Estimated device memory the job needs
+            timeout: Seconds to wait for a free device; defaults to queue_timeout
+
+        Returns:
+            The device ID, or None if no device became free in time (use CPU)
+        """
+        if not self.device_ids():
+            return None
+        timeout = self.queue_timeout if timeout is None else timeout
+        start = time.monotonic()
+        with self._cond:
+            device_id = self._pick(preferred, vram_mb)
+            if device_id is None:
+                self._queued += 1
+                try:
+                    deadline = start + timeout
+                    while device_id is None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._cpu_fallbacks += 1
+                            logger.warning(f"No GPU became free within {timeout:.1f}s, falling back to CPU")
+                            return None
+                        self._cond.wait(remaining)
+                        device_id = self._pick(preferred, vram_mb)
+                finally:
+                    self._queued -= 1
+            self._active[device_id] = self._active.get(device_id, 0) + 1
+            self._reserved_mb[device_id] = self._reserved_mb.get(device_id, 0.0) + vram_mb
+            self._grants[device_id] = self._grants.get(device_id, 0) + 1
+            self._max_wait_ms = max(self._max_wait_ms, (time.monotonic() - start) * 1000)
+        return device_id
+
+    def release(self, device_id: int, vram_mb: float = 0.0):
+        """Return a device reserved by acquire()."""
+        with self._cond:
+            if self._active.get(device_id, 0) <= 0:
+                return
+            self._active[device_id] -= 1
+            self._reserved_mb[device_id] = max(0.0, self._reserved_mb.get(device_id, 0.0) - vram_mb)
+            self._cond.notify_all()
+
+    def active_jobs(self, device_id: int) -> int:
+        """Jobs currently holding a device."""
+        with self._cond:
+            return self._active.get(device_id, 0)
+
+    @contextmanager
+    def device(self, preferred: Optional[int] = None, vram_mb: float = 0.0, timeout: Optional[float] = None):
+        """Hold a device for the duration of the block; yields None if CPU must be used."""
+        device_id = self.acquire(preferred, vram_mb, timeout)
+        try:
+            yield device_id
+        finally:
+            if device_id is not None:
+                self.release(device_id, vram_mb)
+
+    def get_stats(self) -> dict:
+        """Get queue depth and per-device load."""
+        with self._cond:
+            devices = {}
+            for device_id in self.device_ids():
+                devices[device_id] = {
+                    "active_jobs": self._active.get(device_id, 0),
+                    "reserved_mb": round(self._reserved_mb.get(device_id, 0.0), 1),
+                    "free_mb": round(self._free_mb(device_id), 1),
+                    "grants": self._grants.get(device_id, 0),
+                }
+            return {
+                "backend": type(self.backend).__name__,
+                "max_jobs_per_device": self.max_jobs_per_device,
+                "queued": self._queued,
+                "cpu_fallbacks": self._cpu_fallbacks,
+                "max_wait_ms": round(self._max_wait_ms, 1),
+                "devices": devices,
+            }
+
+
+def _create_device_backend():
+    if GPU_FAKE_DEVICES:
+        memory_mb = [float(mb) for mb in GPU_FAKE_DEVICES.split(',') if mb.strip()]
+        logger.warning(f"Using {len(memory_mb)} simulated GPU device(s) from GPU_FAKE_DEVICES")
+        return FakeDeviceBackend(memory_mb)
+    return TorchDeviceBackend()
+
+
+# Global device scheduler
+device_scheduler = DeviceScheduler(_create_device_backend())
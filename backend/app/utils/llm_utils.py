@@ -1,108 +1,515 @@
+"""
+LLM quality scoring of extracted text.
+
+All scoring goes through one LlmScoringService, which
+- reuses one pooled httpx.AsyncClient per event loop instead of a client per call;
+- limits concurrent requests and requests per minute for each provider;
+- caches scores in llm_scores_cache (on disk by default), keyed by the hash
+  of the full text together with the prompt, provider and model;
+- scores long documents on a representative excerpt: LLM_EXCERPT_WINDOWS
+  evenly spaced windows of at most LLM_EXCERPT_CHARS characters in total;
+- on providers that accept it (Gemini), scores the texts queued within
+  LLM_BATCH_WINDOW_MS of each other with one prompt.
+
+Endpoints come from GEMINI_API_ENDPOINT and OLLAMA_API_ENDPOINT, so the
+service can be pointed at a local stub server (scripts/test_llm_scoring.py).
+"""
+import asyncio
+import hashlib
+import json
+import logging
 import os
-from typing import Optional
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 
-import httpx
-from app.utils.cache_utils import cache_llm_score
+from app.utils.cache_utils import generate_cache_key, llm_scores_cache
+from app.utils.single_flight import get_single_flight
 
+logger = logging.getLogger(__name__)
 
-@cache_llm_score
-async def get_llm_quality_score(text: str, system_prompt: str) -> Optional[float]:
-    '''
-    Connects to either Gemini or Ollama based on configuration, calls the LLM with the extracted text
-    and system prompt to get a numerical quality score.
+# "gemini" or "ollama"
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "Gemini").lower()
+GEMINI_API_ENDPOINT = os.getenv(
+    "GEMINI_API_ENDPOINT", "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.0-pro:generateContent"
+)
+OLLAMA_API_ENDPOINT = os.getenv("OLLAMA_API_ENDPOINT", "http://localhost:11434/api/generate")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral")
+# Longer texts are scored on an excerpt of this many characters (0 sends the full text)
+LLM_EXCERPT_CHARS = int(os.getenv("LLM_EXCERPT_CHARS", "8000"))
+# Evenly spaced windows the excerpt is made of; the first starts at the beginning and the last ends at the end
+LLM_EXCERPT_WINDOWS = int(os.getenv("LLM_EXCERPT_WINDOWS", "4"))
+# Texts scored with one prompt on providers that support batching (1 disables batching)
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "8"))
+# How long a text waits for others to join its batch
+LLM_BATCH_WINDOW_MS = int(os.getenv("LLM_BATCH_WINDOW_MS", "200"))
+# Timeout of a single request
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+# Retries after a 429, a 5xx or a connection error
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
 
-    Args:
-        text: The extracted text from OCR.
-        system_prompt: The system prompt to be used for assessing OCR quality.
+# Separator between the windows of an excerpt
+EXCERPT_SEPARATOR = "\n[...]\n"
+# Longest wait honored from a Retry-After header, in seconds
+MAX_RETRY_AFTER = 60.0
 
-    Returns:
-        A numerical quality score (float) if successful, None otherwise.
-    '''
-    llm_provider = os.environ.get("LLM_PROVIDER", "Gemini").lower()
-
-    if llm_provider == "gemini":
-        return await _get_gemini_quality_score(text, system_prompt)
-    elif llm_provider == "ollama":
-        return await _get_ollama_quality_score(text, system_prompt)
-    else:
-        print(f"Error: Invalid LLM provider: {llm_provider}")
-        return None
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_JSON_ARRAY = re.compile(r"\[.*?\]", re.S)
 
 
-async def _get_gemini_quality_score(text: str, system_prompt: str) -> Optional[float]:
-    '''
-    Connects to the Gemini API, calls the LLM with the extracted text and system prompt to get a
-    numerical quality score.
+def representative_excerpt(text: str, max_chars: int = LLM_EXCERPT_CHARS,
+                           windows: int = LLM_EXCERPT_WINDOWS) -> str:
+    """
+    Excerpt of a long text that samples it from start to end.
+
+    The text is cut into `windows` evenly spaced windows of equal length,
+    snapped to whitespace so that no word is cut, and joined with
+    EXCERPT_SEPARATOR. Errors that only affect later pages of a document
+    are still seen, without sending the whole document.
 
     Args:
-        text: The extracted text from OCR.
-        system_prompt: The system prompt to be used for assessing OCR quality.
+        text: Full text
+        max_chars: Longest text returned unchanged, and the total length of the windows
+        windows: Number of windows
 
     Returns:
-        A numerical quality score (float) if successful, None otherwise.
-    '''
-    gemini_api_key = os.environ.get("GEMINI_API_KEY")
-    gemini_api_endpoint = os.environ.get(
-        "GEMINI_API_ENDPOINT", "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.0-pro:generateContent"
-    )  # Use a default endpoint
+        The text itself when it is short enough, otherwise the excerpt
+    """
+    text = text.strip()
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    windows = max(1, windows)
+    size = max_chars // windows
+    step = (len(text) - size) / (windows - 1) if windows > 1 else 0
+    parts = []
+    for index in range(windows):
+        start = int(index * step)
+        end = min(len(text), start + size)
+        if start > 0:
+            breaks = [pos for pos in (text.find(" ", start, end), text.find("\n", start, end)) if pos >= 0]
+            if breaks:
+                start = min(breaks) + 1
+        if end < len(text):
+            cut = max(text.rfind(" ", start, end), text.rfind("\n", start, end))
+            if cut > start:
+                end = cut
+        part = text[start:end].strip()
+        if part:
+            parts.append(part)
+    return EXCERPT_SEPARATOR.join(parts)
+
 
-    if not gemini_api_key:
-        print("Error: GEMINI_API_KEY not set")
+def parse_score(reply: str) -> Optional[float]:
+    """The score in a model reply: the reply as a number, or the first number in it."""
+    reply = reply.strip()
+    try:
+        return float(reply)
+    except ValueError:
+        pass
+    match = _NUMBER.search(reply)
+    if match is None:
+        logger.error(f"Could not convert LLM response to a score: {reply[:200]}")
         return None
+    return float(match.group())
 
-    url = f"{gemini_api_endpoint}?key={gemini_api_key}"
-    headers = {"Content-Type": "application/json"}
-    data = {
-        "contents": [
-            {
-                "parts": [
-                    {"text": system_prompt + f"\\nExtracted Text: {text}"}
-                ]
-            }
-        ]
-    }
 
+def parse_scores(reply: str, count: int) -> Optional[List[float]]:
+    """The scores in a batched reply, or None unless it holds a JSON array of `count` numbers."""
+    match = _JSON_ARRAY.search(reply)
+    if match is None:
+        return None
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, json=data, timeout=60)
-            response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-            response_json = response.json()
-
-            # Extract the quality score from the response
-            candidates = response_json.get("candidates", [])
-            if candidates:
-                content = candidates[0].get("content", {})
-                parts = content.get("parts", [])
-                if parts:
-                    text_response = parts[0].get("text", "")
-                    try:
-                        quality_score = float(text_response)
-                        return quality_score
-                    except ValueError:
-                        print(f"Error: Could not convert LLM response to float: {text_response}")
-                        return None
-                else:
-                    print("Error: No parts found in Gemini response")
-                    return None
-            else:
-                print("Error: No candidates found in Gemini response")
-            return None
-
-    except httpx.HTTPStatusError as e:
-        print(f"HTTP error: {e.response.status_code} - {e.response.text}")
+        values = json.loads(match.group())
+    except ValueError:
         return None
-    except httpx.RequestError as e:
-        print(f"Request error: {e}")
+    if not isinstance(values, list) or len(values) != count:
         return None
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+    try:
+        return [float(value) for value in values]
+    except (TypeError, ValueError):
         return None
 
 
-async def _get_ollama_quality_score(text: str, system_prompt: str) -> Optional[float]:
+class RateLimiter:
+    """
+    Spaces request starts evenly to stay under a requests-per-minute limit.
+
+    Shared by all event loops; each request reserves the next free start time
+    and sleeps until then.
+    """
+
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    async def wait(self) -> float:
+        """Wait for the next request slot and return the seconds waited."""
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        delay = start - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+
+class LlmProvider:
+    """
+    Request and response format of an LLM API.
+
+    Concurrency and rate limits are read from LLM_<NAME>_MAX_CONCURRENCY
+    and LLM_<NAME>_REQUESTS_PER_MINUTE (0: unlimited).
+    """
+    name = ""
+    supports_batching = False
+    default_max_concurrency = 4
+    default_requests_per_minute = 0
+
+    def __init__(self):
+        prefix = f"LLM_{self.name.upper()}"
+        self.max_concurrency = max(1, int(os.getenv(f"{prefix}_MAX_CONCURRENCY", str(self.default_max_concurrency))))
+        self.requests_per_minute = float(os.getenv(f"{prefix}_REQUESTS_PER_MINUTE", str(self.default_requests_per_minute)))
+
+    @property
+    def model(self) -> str:
+        """Identifies the model in cache keys; scores from other models are not reused."""
+        raise NotImplementedError
+
+    def configured(self) -> bool:
+        return True
+
+    def build_request(self, prompt: str) -> Tuple[str, dict]:
+        """URL and JSON body of a request for a prompt."""
+        raise NotImplementedError
+
+    def parse_response(self, data: dict) -> Optional[str]:
+        """The reply text in a response body, or None."""
+        raise NotImplementedError
+
+
+class GeminiProvider(LlmProvider):
+    name = "gemini"
+    supports_batching = True
+    default_requests_per_minute = 60
+
+    def __init__(self, endpoint: str = GEMINI_API_ENDPOINT):
+        super().__init__()
+        self.endpoint = endpoint
+        self.api_key = os.getenv("GEMINI_API_KEY")
+
+    @property
+    def model(self) -> str:
+        return self.endpoint
+
+    def configured(self) -> bool:
+        if not self.api_key:
+            logger.error("GEMINI_API_KEY not set")
+            return False
+        return True
+
+    def build_request(self, prompt: str) -> Tuple[str, dict]:
+        return f"{self.endpoint}?key={self.api_key}", {"contents": [{"parts": [{"text": prompt}]}]}
+
+    def parse_response(self, data: dict) -> Optional[str]:
+        candidates = data.get("candidates", [])
+        if not candidates:
+            logger.error("No candidates found in Gemini response")
+            return None
+        parts = candidates[0].get("content", {}).get("parts", [])
+        if not parts:
+            logger.error("No parts found in Gemini response")
+            return None
+        return parts[0].get("text", "")
+
+
+class OllamaProvider(LlmProvider):
+    name = "ollama"
+    # A local model serves one prompt at a time; concurrent requests only queue up
+    default_max_concurrency = 1
+
+    def __init__(self, endpoint: str = OLLAMA_API_ENDPOINT, model: str = OLLAMA_MODEL):
+        super().__init__()
+        self.endpoint = endpoint
+        self._model = model
+
+    @property
+    def model(self) -> str:
+        return f"{self.endpoint}:{self._model}"
+
+    def build_request(self, prompt: str) -> Tuple[str, dict]:
+        return self.endpoint, {"prompt": prompt, "model": self._model, "stream": False}
+
+    def parse_response(self, data: dict) -> Optional[str]:
+        return data.get("response", "")
+
+
+_PROVIDERS = {
+    "gemini": GeminiProvider,
+    "ollama": OllamaProvider,
+}
+
+
+class _LoopState:
+    """Client, concurrency limit and open batches of one event loop."""
+
+    def __init__(self, provider: LlmProvider):
+        import httpx
+
+        self.client = httpx.AsyncClient(
+            timeout=LLM_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=provider.max_concurrency,
+                                max_keepalive_connections=provider.max_concurrency),
+        )
+        self.semaphore = asyncio.Semaphore(provider.max_concurrency)
+        # system prompt -> [(text, future)] waiting to be sent together
+        self.batches: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        self.tasks = set()
+
+
+class LlmScoringService:
+    """Scores extracted text with the configured LLM provider."""
+
+    def __init__(self, provider_name: str = LLM_PROVIDER):
+        provider_class = _PROVIDERS.get(provider_name)
+        self.provider: Optional[LlmProvider] = provider_class() if provider_class else None
+        self.provider_name = provider_name
+        self.rate_limiter = RateLimiter(self.provider.requests_per_minute if self.provider else 0)
+        self._states: Dict[asyncio.AbstractEventLoop, _LoopState] = {}
+        self._lock = threading.Lock()
+        self._flight = get_single_flight("llm_scores")
+        self.scored = 0
+        self.cache_hits = 0
+        self.excerpted = 0
+        self.requests = 0
+        self.failed_requests = 0
+        self.retries = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self.chars_sent = 0
+        self.rate_limit_wait = 0.0
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._states.get(loop)
+            if state is None:
+                # Clients of closed loops cannot be closed any more; drop them
+                for other in [other for other in self._states if other.is_closed()]:
+                    del self._states[other]
+                state = self._states[loop] = _LoopState(self.provider)
+            return state
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def cache_key(self, text: str, system_prompt: str) -> str:
+        """Key of a score in llm_scores_cache."""
+        return generate_cache_key(
+            "llm_score",
+            hashlib.sha256(text.encode()).hexdigest(),
+            hashlib.sha256(system_prompt.encode()).hexdigest(),
+            self.provider_name,
+            self.provider.model if self.provider else None,
+            LLM_EXCERPT_CHARS,
+            LLM_EXCERPT_WINDOWS,
+        )
+
+    async def score(self, text: str, system_prompt: str) -> Optional[float]:
+        """
+        Get the quality score of a text, from the cache or the provider.
+
+        Args:
+            text: The extracted text from OCR
+            system_prompt: The system prompt to be used for assessing OCR quality
+
+        Returns:
+            The score, or None if the provider is not configured or did not return one
+        """
+        if self.provider is None:
+            logger.error(f"Invalid LLM provider: {self.provider_name}")
+            return None
+        if not self.provider.configured():
+            return None
+
+        key = self.cache_key(text, system_prompt)
+        found, value, _ = llm_scores_cache.lookup(key)
+        if found:
+            self._count(cache_hits=1)
+            return value
+        return await self._flight.do(key, self._score_and_cache, key, text, system_prompt)
+
+    async def score_many(self, texts: List[str], system_prompt: str) -> List[Optional[float]]:
+        """Score several texts concurrently; on batching providers they share prompts."""
+        return list(await asyncio.gather(*(self.score(text, system_prompt) for text in texts)))
+
+    async def _score_and_cache(self, key: str, text: str, system_prompt: str) -> Optional[float]:
+        excerpt = representative_excerpt(text)
+        if len(excerpt) < len(text.strip()):
+            self._count(excerpted=1)
+        state = self._state()
+        if self.provider.supports_batching and LLM_BATCH_SIZE > 1:
+            score = await self._enqueue(state, excerpt, system_prompt)
+        else:
+            score = await self._score_one(state, excerpt, system_prompt)
+        if score is not None:
+            # Failures are not cached, so the next request tries again
+            llm_scores_cache[key] = score
+            self._count(scored=1)
+        return score
+
+    async def _enqueue(self, state: _LoopState, text: str, system_prompt: str) -> Optional[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = state.batches.get(system_prompt)
+        if batch is None:
+            batch = state.batches[system_prompt] = []
+            loop.call_later(LLM_BATCH_WINDOW_MS / 1000.0, self._flush, state, system_prompt, batch)
+        batch.append((text, future))
+        if len(batch) >= LLM_BATCH_SIZE:
+            self._flush(state, system_prompt, batch)
+        return await future
+
+    def _flush(self, state: _LoopState, system_prompt: str, batch: list):
+        # The timer of a batch that was flushed when it filled up finds another batch or none
+        if state.batches.get(system_prompt) is not batch:
+            return
+        del state.batches[system_prompt]
+        task = asyncio.get_running_loop().create_task(self._run_batch(state, system_prompt, batch))
+        state.tasks.add(task)
+        task.add_done_callback(state.tasks.discard)
+
+    async def _run_batch(self, state: _LoopState, system_prompt: str, batch: list):
+        texts = [text for text, _ in batch]
+        try:
+            scores = None
+            if len(texts) > 1:
+                scores = await self._score_batch(state, texts, system_prompt)
+                if scores is None:
+                    logger.warning(f"Batched LLM reply for {len(texts)} texts was not usable, scoring them one by one")
+            if scores is None:
+                scores = await asyncio.gather(*(self._score_one(state, text, system_prompt) for text in texts))
+        except Exception as e:
+            logger.error(f"Error scoring a batch of {len(texts)} texts: {e}", exc_info=True)
+            scores = [None] * len(texts)
+        for (_, future), score in zip(batch, scores):
+            if not future.done():
+                future.set_result(score)
+
+    async def _score_one(self, state: _LoopState, text: str, system_prompt: str) -> Optional[float]:
+        reply = await self._complete(state, f"{system_prompt}\nExtracted Text: {text}")
+        return parse_score(reply) if reply is not None else None
+
+    async def _score_batch(self, state: _LoopState, texts: List[str], system_prompt: str) -> Optional[List[Optional[float]]]:
+        """Scores of several texts from one prompt, or None when the reply does not hold them."""
+        sections = "\n".join(f"Extracted Text {number}: {text}" for number, text in enumerate(texts, 1))
+        prompt = (f"{system_prompt}\n"
+                  f"Score each of the following {len(texts)} extracted texts separately. "
+                  f"Reply with only a JSON array of {len(texts)} numbers, in the order of the texts.\n"
+                  f"{sections}")
+        reply = await self._complete(state, prompt)
+        if reply is None:
+            # The request itself failed; scoring the texts one by one would fail the same way
+            return [None] * len(texts)
+        scores = parse_scores(reply, len(texts))
+        if scores is not None:
+            self._count(batches=1, batched_texts=len(texts))
+        return scores
+
+    async def _complete(self, state: _LoopState, prompt: str) -> Optional[str]:
+        """
+        Send a prompt and return the reply text.
+
+        Rate limit responses (429), server errors and connection errors are
+        retried up to LLM_MAX_RETRIES times, honoring Retry-After.
+
+        Returns:
+            The reply text, or None if the request failed
+        """
+        import httpx
+
+        url, body = self.provider.build_request(prompt)
+        error = None
+        async with state.semaphore:
+            for attempt in range(LLM_MAX_RETRIES + 1):
+                waited = await self.rate_limiter.wait()
+                self._count(requests=1, chars_sent=len(prompt), rate_limit_wait=waited)
+                delay = float(2 ** attempt)
+                try:
+                    response = await state.client.post(url, json=body)
+                except httpx.RequestError as e:
+                    error = f"Request error: {e}"
+                else:
+                    if response.status_code == 429 or response.status_code >= 500:
+                        error = f"HTTP error: {response.status_code} - {response.text[:200]}"
+                        retry_after = response.headers.get("Retry-After", "")
+                        if retry_after.replace(".", "", 1).isdigit():
+                            delay = min(float(retry_after), MAX_RETRY_AFTER)
+                    elif response.status_code >= 400:
+                        self._count(failed_requests=1)
+                        logger.error(f"HTTP error: {response.status_code} - {response.text[:200]}")
+                        return None
+                    else:
+                        try:
+                            return self.provider.parse_response(response.json())
+                        except ValueError as e:
+                            self._count(failed_requests=1)
+                            logger.error(f"Invalid JSON in {self.provider_name} response: {e}")
+                            return None
+                if attempt < LLM_MAX_RETRIES:
+                    self._count(retries=1)
+                    logger.warning(f"{error}; retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+        self._count(failed_requests=1)
+        logger.error(error)
+        return None
+
+    async def aclose(self):
+        """Close the client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._states.pop(loop, None)
+        if state is not None:
+            await state.client.aclose()
+
+    def get_stats(self) -> dict:
+        """Get request, batch and cache counters."""
+        with self._lock:
+            lookups = self.scored + self.cache_hits
+            return {
+                "provider": self.provider_name,
+                "model": self.provider.model if self.provider else None,
+                "max_concurrency": self.provider.max_concurrency if self.provider else 0,
+                "requests_per_minute": self.provider.requests_per_minute if self.provider else 0,
+                "batching": bool(self.provider and self.provider.supports_batching and LLM_BATCH_SIZE > 1),
+                "scored": self.scored,
+                "cache_hits": self.cache_hits,
+                "cache_hit_ratio": round(self.cache_hits / lookups, 3) if lookups else 0.0,
+                "excerpted": self.excerpted,
+                "requests": self.requests,
+                "failed_requests": self.failed_requests,
+                "retries": self.retries,
+                "batches": self.batches,
+                "avg_batch_size": round(self.batched_texts / self.batches, 2) if self.batches else 0.0,
+                "chars_sent": self.chars_sent,
+                "rate_limit_wait_seconds": round(self.rate_limit_wait, 2),
+            }
+
+
+# Global LLM scoring service
+llm_scoring_service = LlmScoringService()
+
+
+async def get_llm_quality_score(text: str, system_prompt: str) -> Optional[float]:
     '''
-    Connects to the Ollama API, calls the LLM with the extracted text and system prompt to get a
-    numerical quality score.
+    Connects to either Gemini or Ollama based on configuration, calls the LLM with the extracted text
+    and system prompt to get a numerical quality score.
 
     Args:
         text: The extracted text from OCR.
@@ -111,35 +518,4 @@ async def _get_ollama_quality_score(text: str, system_prompt: str) -> Optional[f
     Returns:
         A numerical quality score (float) if successful, None otherwise.
     '''
-    ollama_api_endpoint = os.environ.get("OLLAMA_API_ENDPOINT", "http://localhost:11434/api/generate")
-
-    headers = {"Content-Type": "application/json"}
-    data = {
-        "prompt": system_prompt + f"\\nExtracted Text: {text}",
-        "model": "mistral",  # You can change the model here
-        "stream": False,
-    }
-
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(ollama_api_endpoint, headers=headers, json=data, timeout=60)
-            response.raise_for_status()
-            response_json = response.json()
-            response_text = response_json.get("response", "")
-
-            try:
-                quality_score = float(response_text)
-                return quality_score
-            except ValueError:
-                print(f"Error: Could not convert LLM response to float: {response_text}")
-                return None
-
-    except httpx.HTTPStatusError as e:
-        print(f"HTTP error: {e.response.status_code} - {e.response.text}")
-        return None
-    except httpx.RequestError as e:
-        print(f"Request error: {e}")
-        return None
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return None
\ No newline at end of file
+    return await llm_scoring_service.score(text, system_prompt)
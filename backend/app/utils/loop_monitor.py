@@ -0,0 +1,103 @@
+"""
+Event loop lag monitoring.
+
+A background task sleeps for a fixed interval and measures how late it wakes
+up. The overshoot is the time the loop spent running something else without
+yielding, so a sustained lag means a handler is doing blocking work on the
+event loop and every other request is waiting behind it.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv('LOOP_LAG_INTERVAL_SECONDS', '0.25'))
+# Lag above this is counted as a stall and logged
+LOOP_LAG_WARN_MS = float(os.getenv('LOOP_LAG_WARN_MS', '200'))
+# Number of recent samples kept for percentiles
+LOOP_LAG_WINDOW = int(os.getenv('LOOP_LAG_WINDOW', '240'))
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class LoopLagMonitor:
+    """Measures scheduling lag of the asyncio event loop it is started on."""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL_SECONDS,
+                 warn_ms: float = LOOP_LAG_WARN_MS, window: int = LOOP_LAG_WINDOW):
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self._samples = deque(maxlen=max(1, window))
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.max_lag_ms = 0.0
+        self.stalls = 0
+        self.total_samples = 0
+        self._last_warning = 0.0
+
+    def start(self):
+        """Start sampling on the running event loop. Must be called from within the loop."""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"Event loop lag monitor started (interval {self.interval}s)")
+
+    def stop(self):
+        """Stop sampling."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self._record(max(0.0, (time.perf_counter() - expected) * 1000))
+
+    def _record(self, lag_ms: float):
+        with self._lock:
+            self._samples.append(lag_ms)
+            self.total_samples += 1
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            stalled = lag_ms >= self.warn_ms
+            if stalled:
+                self.stalls += 1
+            # At most one warning per 10 seconds
+            warn = stalled and time.time() - self._last_warning > 10
+            if warn:
+                self._last_warning = time.time()
+        if warn:
+            logger.warning(f"Event loop stalled for {lag_ms:.0f} ms; a request handler is blocking the loop")
+
+    def get_stats(self) -> dict:
+        """Get lag statistics in milliseconds over the recent window."""
+        with self._lock:
+            samples = sorted(self._samples)
+            current = self._samples[-1] if self._samples else 0.0
+            return {
+                'running': self._task is not None and not self._task.done(),
+                'interval_ms': self.interval * 1000,
+                'current_ms': round(current, 2),
+                'p50_ms': round(_percentile(samples, 0.5), 2),
+                'p95_ms': round(_percentile(samples, 0.95), 2),
+                'p99_ms': round(_percentile(samples, 0.99), 2),
+                'window_max_ms': round(samples[-1], 2) if samples else 0.0,
+                'max_ms': round(self.max_lag_ms, 2),
+                'stalls': self.stalls,
+                'stall_threshold_ms': self.warn_ms,
+                'samples': self.total_samples,
+            }
+
+
+# Global event loop monitor
+loop_monitor = LoopLagMonitor()
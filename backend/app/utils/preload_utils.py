@@ -11,9 +11,11 @@ import os
 import tempfile
 import json
 import base64
+import threading
+import time
 from typing import Dict, List, Optional, Tuple
-from sqlalchemy.orm import Session, sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy import func
 
 from app.models import OcrResult
 from app.utils.cache_utils import (
@@ -23,12 +25,49 @@ from app.utils.cache_utils import (
     ocr_results_cache,
     preprocessing_cache
 )
+from app.utils.access_tracker import access_tracker
 
 logger = logging.getLogger(__name__)
 
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///ocr.db')
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from app.utils.db_config import DATABASE_URL, engine, SessionLocal
+
+PROCESSED_STATUSES = ['completed', 'ocr_processed', 'text_extracted', 'OCR Done']
+
+# Rows fetched per IN query when preloading in batches (stays below SQLite's bound-parameter limit)
+PRELOAD_CHUNK_SIZE = int(os.getenv('PRELOAD_CHUNK_SIZE', '500'))
+
+# Number of hot folders whose other files are preloaded by preload_predicted
+PREDICTED_FOLDERS = int(os.getenv('PRELOAD_PREDICTED_FOLDERS', '5'))
+
+# Columns needed to fill the preload caches
+_PRELOAD_COLUMNS = (
+    OcrResult.file_id,
+    OcrResult.status,
+    OcrResult.pdf_text,
+    OcrResult.ocr_text,
+    OcrResult.metrics,
+    OcrResult.pdf_image_path,
+    OcrResult.ocr_image_path,
+)
+
+
+def parse_image_paths(raw_paths: Optional[str]) -> List[str]:
+    """
+    Parse an image path column, stored either as a JSON list or comma-separated.
+    
+    Args:
+        raw_paths: Raw column value
+        
+    Returns:
+        List of image paths
+    """
+    if not raw_paths:
+        return []
+    if raw_paths.startswith('['):
+        # JSON format
+        return json.loads(raw_paths)
+    # Comma-separated format
+    return [p.strip() for p in raw_paths.split(',') if p.strip()]
 
 
 class PreloadManager:
@@ -52,26 +91,38 @@ class PreloadManager:
             close_db = False
         
         try:
-            # Query for files with processed data
-            results = db.query(OcrResult).filter(
-                OcrResult.status.in_(['completed', 'ocr_processed', 'text_extracted', 'OCR Done'])
+            # Query for files with processed data, measuring text in SQL instead of loading it
+            results = db.query(OcrResult).with_entities(
+                OcrResult.file_id,
+                OcrResult.directory_id,
+                OcrResult.status,
+                func.coalesce(func.length(OcrResult.pdf_text), 0),
+                func.coalesce(func.length(OcrResult.ocr_text), 0),
+                func.coalesce(func.length(OcrResult.pdf_image_path), 0),
+                func.coalesce(func.length(OcrResult.ocr_image_path), 0),
+                OcrResult.metrics,
+                OcrResult.created_at,
+                OcrResult.updated_at
+            ).filter(
+                OcrResult.status.in_(PROCESSED_STATUSES)
             ).all()
             
             processed_files = []
-            for result in results:
+            for (file_id, directory_id, status, pdf_text_length, ocr_text_length,
+                 pdf_images_length, ocr_images_length, metrics, created_at, updated_at) in results:
                 file_info = {
-                    'file_id': result.file_id,
-                    'directory_id': result.directory_id,
-                    'status': result.status,
-                    'has_pdf_text': bool(result.pdf_text),
-                    'has_ocr_text': bool(result.ocr_text),
-                    'has_pdf_images': bool(result.pdf_image_path),
-                    'has_ocr_images': bool(result.ocr_image_path),
-                    'pdf_text_length': len(result.pdf_text) if result.pdf_text else 0,
-                    'ocr_text_length': len(result.ocr_text) if result.ocr_text else 0,
-                    'metrics': json.loads(result.metrics) if result.metrics else {},
-                    'created_at': result.created_at,
-                    'updated_at': result.updated_at
+                    'file_id': file_id,
+                    'directory_id': directory_id,
+                    'status': status,
+                    'has_pdf_text': pdf_text_length > 0,
+                    'has_ocr_text': ocr_text_length > 0,
+                    'has_pdf_images': pdf_images_length > 0,
+                    'has_ocr_images': ocr_images_length > 0,
+                    'pdf_text_length': pdf_text_length,
+                    'ocr_text_length': ocr_text_length,
+                    'metrics': json.loads(metrics) if metrics else {},
+                    'created_at': created_at,
+                    'updated_at': updated_at
                 }
                 processed_files.append(file_info)
             
@@ -169,12 +220,7 @@ class PreloadManager:
             # Preload PDF image paths if available
             if result.pdf_image_path:
                 try:
-                    if result.pdf_image_path.startswith('['):
-                        # JSON format
-                        pdf_paths = json.loads(result.pdf_image_path)
-                    else:
-                        # Comma-separated format
-                        pdf_paths = [p.strip() for p in result.pdf_image_path.split(',') if p.strip()]
+                    pdf_paths = parse_image_paths(result.pdf_image_path)
                     
                     cache_key = generate_cache_key("pdf_image_paths", file_id)
                     preprocessing_cache[cache_key] = pdf_paths
@@ -186,12 +232,7 @@ class PreloadManager:
             # Preload OCR image paths if available
             if result.ocr_image_path:
                 try:
-                    if result.ocr_image_path.startswith('['):
-                        # JSON format
-                        ocr_paths = json.loads(result.ocr_image_path)
-                    else:
-                        # Comma-separated format
-                        ocr_paths = [p.strip() for p in result.ocr_image_path.split(',') if p.strip()]
+                    ocr_paths = parse_image_paths(result.ocr_image_path)
                     
                     cache_key = generate_cache_key("ocr_image_paths", file_id)
                     preprocessing_cache[cache_key] = ocr_paths
@@ -244,7 +285,7 @@ class PreloadManager:
                 'has_ocr_text': bool(result.ocr_text),
                 'has_pdf_images': bool(result.pdf_image_path),
                 'has_ocr_images': bool(result.ocr_image_path),
-                'is_processed': result.status in ['completed', 'ocr_processed', 'text_extracted', 'OCR Done'],
+                'is_processed': result.status in PROCESSED_STATUSES,
                 'status': result.status
             }
             
@@ -300,52 +341,123 @@ class PreloadManager:
         logger.info(f"Completed preload for file {file_id}: {len(preloaded_data['preloaded'])} data types loaded")
         return preloaded_data
     
-    def preload_batch(self, file_ids: List[str] = None, limit: int = None) -> Dict[str, any]:
+    def _cache_row(self, row) -> Dict[str, any]:
+        """
+        Fill the preload caches from a row fetched with _PRELOAD_COLUMNS.
+        
+        Returns:
+            Per-file result listing the data types that were cached
+        """
+        file_id, status, pdf_text, ocr_text, metrics, pdf_image_path, ocr_image_path = row
+        if status not in PROCESSED_STATUSES:
+            return {'success': False, 'error': 'File not processed yet', 'status': status}
+        
+        preloaded = []
+        if pdf_text:
+            ocr_results_cache[generate_cache_key("pdf_text", file_id)] = pdf_text
+            preloaded.append('pdf_text')
+        if ocr_text:
+            ocr_results_cache[generate_cache_key("ocr_text", file_id)] = ocr_text
+            preloaded.append('ocr_text')
+        if metrics:
+            try:
+                ocr_results_cache[generate_cache_key("metrics", file_id)] = json.loads(metrics) if isinstance(metrics, str) else metrics
+                preloaded.append('metrics')
+            except Exception as e:
+                logger.warning(f"Error parsing metrics for file {file_id}: {e}")
+        for path_type, raw_paths in (('pdf_image_paths', pdf_image_path), ('ocr_image_paths', ocr_image_path)):
+            if not raw_paths:
+                continue
+            try:
+                preprocessing_cache[generate_cache_key(path_type, file_id)] = parse_image_paths(raw_paths)
+                preloaded.append(path_type)
+            except Exception as e:
+                logger.error(f"Error parsing {path_type} for file {file_id}: {e}")
+        
+        return {'success': True, 'status': status, 'preloaded': preloaded}
+    
+    def preload_batch(self, file_ids: List[str] = None, limit: int = None,
+                      time_budget: float = None, chunk_size: int = PRELOAD_CHUNK_SIZE) -> Dict[str, any]:
         """
         Preload data for multiple files.
         
+        Rows are fetched in chunked IN queries that select only the columns
+        the caches need, so preloading N files costs N / chunk_size queries.
+        
         Args:
             file_ids: List of specific file IDs to preload (optional)
-            limit: Maximum number of files to preload (optional)
+            limit: Maximum number of files to preload, most recently updated first (optional)
+            time_budget: Stop after this many seconds, leaving the rest unloaded (optional)
+            chunk_size: Number of files fetched per query
             
         Returns:
             Dictionary containing batch preload results
         """
+        start_time = time.time()
         db = SessionLocal()
         try:
             if file_ids:
                 # Preload specific files
-                target_files = file_ids
+                target_files = list(dict.fromkeys(file_ids))
                 logger.info(f"Starting batch preload for {len(target_files)} specific files")
             else:
-                # Get all processed files
-                processed_files = self.get_processed_files(db)
-                target_files = [f['file_id'] for f in processed_files]
+                # Get processed files, most recently updated first
+                query = db.query(OcrResult).with_entities(OcrResult.file_id).filter(
+                    OcrResult.status.in_(PROCESSED_STATUSES)
+                ).order_by(OcrResult.updated_at.desc())
                 if limit:
-                    target_files = target_files[:limit]
+                    query = query.limit(limit)
+                target_files = [row[0] for row in query.all()]
                 logger.info(f"Starting batch preload for {len(target_files)} processed files")
             
             results = {
                 'total_files': len(target_files),
                 'successful': 0,
                 'failed': 0,
+                'skipped': 0,
                 'results': {}
             }
             
-            for file_id in target_files:
+            for offset in range(0, len(target_files), chunk_size):
+                if time_budget is not None and time.time() - start_time > time_budget:
+                    results['skipped'] = len(target_files) - offset
+                    logger.warning(f"Batch preload time budget of {time_budget}s exhausted, skipping {results['skipped']} files")
+                    break
+                
+                chunk = target_files[offset:offset + chunk_size]
                 try:
-                    result = self.preload_file_complete(file_id, db)
+                    rows = db.query(OcrResult).with_entities(*_PRELOAD_COLUMNS).filter(
+                        OcrResult.file_id.in_(chunk)
+                    ).all()
+                except Exception as e:
+                    logger.error(f"Error fetching preload chunk at offset {offset}: {e}")
+                    for file_id in chunk:
+                        results['results'][file_id] = {'success': False, 'error': str(e)}
+                    results['failed'] += len(chunk)
+                    continue
+                
+                found = set()
+                for row in rows:
+                    file_id = row[0]
+                    found.add(file_id)
+                    try:
+                        result = self._cache_row(row)
+                    except Exception as e:
+                        logger.error(f"Error preloading file {file_id}: {e}")
+                        result = {'success': False, 'error': str(e)}
                     results['results'][file_id] = result
                     if result.get('success', False):
                         results['successful'] += 1
                     else:
                         results['failed'] += 1
-                except Exception as e:
-                    logger.error(f"Error preloading file {file_id}: {e}")
-                    results['results'][file_id] = {'success': False, 'error': str(e)}
-                    results['failed'] += 1
+                
+                for file_id in chunk:
+                    if file_id not in found:
+                        results['results'][file_id] = {'success': False, 'error': 'File not found'}
+                        results['failed'] += 1
             
-            logger.info(f"Batch preload completed: {results['successful']} successful, {results['failed']} failed")
+            results['elapsed_seconds'] = round(time.time() - start_time, 3)
+            logger.info(f"Batch preload completed in {results['elapsed_seconds']}s: {results['successful']} successful, {results['failed']} failed, {results['skipped']} skipped")
             return results
             
         except Exception as e:
@@ -354,6 +466,82 @@ class PreloadManager:
         finally:
             db.close()
     
+    def preload_batch_in_background(self, file_ids: List[str] = None, limit: int = None,
+                                    time_budget: float = None) -> threading.Thread:
+        """
+        Run preload_batch in a daemon thread.
+        
+        Args:
+            file_ids: List of specific file IDs to preload (optional)
+            limit: Maximum number of files to preload (optional)
+            time_budget: Stop after this many seconds (optional)
+            
+        Returns:
+            The started thread
+        """
+        thread = threading.Thread(
+            target=self.preload_batch,
+            kwargs={'file_ids': file_ids, 'limit': limit, 'time_budget': time_budget},
+            daemon=True,
+            name="preload-batch"
+        )
+        thread.start()
+        return thread
+    
+    def preload_predicted(self, limit: int = 20, time_budget: float = None) -> Dict[str, any]:
+        """
+        Preload the files users are most likely to open next.
+        
+        Candidates are the most frequently accessed files according to the
+        access tracker, followed by other processed files in the most
+        frequently accessed folders. Remaining slots are filled with the most
+        recently updated processed files.
+        
+        Args:
+            limit: Maximum number of files to preload
+            time_budget: Stop after this many seconds (optional)
+            
+        Returns:
+            Dictionary containing batch preload results, plus the number of predicted files
+        """
+        db = SessionLocal()
+        try:
+            candidates = [file_id for file_id, _ in access_tracker.top_files(limit)]
+            
+            # Folder co-access: files next to the ones being opened are likely next
+            for folder_id, _ in access_tracker.top_folders(PREDICTED_FOLDERS):
+                if len(candidates) >= limit:
+                    break
+                rows = db.query(OcrResult).with_entities(OcrResult.file_id).filter(
+                    OcrResult.directory_id == folder_id,
+                    OcrResult.status.in_(PROCESSED_STATUSES)
+                ).order_by(OcrResult.updated_at.desc()).limit(limit).all()
+                candidates = list(dict.fromkeys(candidates + [row[0] for row in rows]))
+            
+            candidates = candidates[:limit]
+            predicted = len(candidates)
+            
+            if len(candidates) < limit:
+                rows = db.query(OcrResult).with_entities(OcrResult.file_id).filter(
+                    OcrResult.status.in_(PROCESSED_STATUSES)
+                ).order_by(OcrResult.updated_at.desc()).limit(limit).all()
+                candidates = list(dict.fromkeys(candidates + [row[0] for row in rows]))[:limit]
+        except Exception as e:
+            logger.error(f"Error selecting predicted files for preload: {e}")
+            return {'error': str(e)}
+        finally:
+            db.close()
+        
+        access_tracker.mark_predicted(candidates[:predicted])
+        logger.info(f"Predictive preload: {predicted} predicted files, {len(candidates) - predicted} most recent")
+        
+        if not candidates:
+            return {'total_files': 0, 'successful': 0, 'failed': 0, 'skipped': 0, 'results': {}, 'predicted_files': 0}
+        
+        results = self.preload_batch(file_ids=candidates, time_budget=time_budget)
+        results['predicted_files'] = predicted
+        return results
+    
     def get_preload_stats(self) -> Dict[str, any]:
         """
         Get statistics about preloaded data.
@@ -424,6 +612,20 @@ def get_cached_text(file_id: str, text_type: str = 'auto') -> Optional[str]:
         return None
 
 
+def evict_cached_text(file_id: str):
+    """
+    Drop the cached text and metrics of a file.
+    
+    Called after every write of an OcrResult's text, so that a re-processed
+    file is not served its previous text until the cache entry expires.
+    
+    Args:
+        file_id: The file ID
+    """
+    for data_type in ("pdf_text", "ocr_text", "metrics"):
+        ocr_results_cache.pop(generate_cache_key(data_type, file_id), None)
+
+
 def get_cached_image_paths(file_id: str, image_type: str = 'auto') -> Optional[List[str]]:
     """
     Get cached image paths for a file.
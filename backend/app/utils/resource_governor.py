@@ -0,0 +1,260 @@
+"""
+Feedback-based limit on concurrent batch OCR work.
+
+Instead of sleeping between files, batches run as fast as the OCR scheduler
+lets them, and this governor sets how many batch pages the scheduler may run at
+once; a page holds its slot until it is recognized. Every
+GOVERNOR_INTERVAL_SECONDS it samples API p95 latency (recorded by the HTTP
+middleware for local handlers only), CPU, process RSS and GPU memory. Under
+pressure the limit is cut multiplicatively; otherwise it grows by one while
+batch work is waiting (AIMD). Off-hours batches use every slot, and they back
+off within a few seconds when interactive traffic slows down.
+
+Batch OCR is expected to fill idle cores, so high CPU alone is not pressure:
+the CPU signal fires only when the machine is busy and work other than this
+process's OCR (which includes Tesseract subprocesses) takes a real share of it.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+GOVERNOR_INTERVAL_SECONDS = float(os.getenv('GOVERNOR_INTERVAL_SECONDS', '2'))
+# API p95 latency above this means interactive requests are suffering
+GOVERNOR_LATENCY_TARGET_MS = float(os.getenv('GOVERNOR_LATENCY_TARGET_MS', '500'))
+# Requests older than this are not part of the p95
+GOVERNOR_LATENCY_WINDOW_SECONDS = float(os.getenv('GOVERNOR_LATENCY_WINDOW_SECONDS', '30'))
+GOVERNOR_MAX_CPU_PERCENT = float(os.getenv('GOVERNOR_MAX_CPU_PERCENT', '85'))
+# Above GOVERNOR_MAX_CPU_PERCENT, backing off only helps if other work uses at least this much
+GOVERNOR_MIN_OTHER_CPU_PERCENT = float(os.getenv('GOVERNOR_MIN_OTHER_CPU_PERCENT', '15'))
+GOVERNOR_MAX_RSS_MB = float(os.getenv('GOVERNOR_MAX_RSS_MB', '2048'))
+GOVERNOR_MAX_GPU_MEMORY_PERCENT = float(os.getenv('GOVERNOR_MAX_GPU_MEMORY_PERCENT', '90'))
+# Multiplicative decrease applied to the limit under pressure
+GOVERNOR_DECREASE_FACTOR = float(os.getenv('GOVERNOR_DECREASE_FACTOR', '0.5'))
+# Batches always keep this many slots so they cannot starve completely
+GOVERNOR_MIN_LIMIT = int(os.getenv('GOVERNOR_MIN_LIMIT', '1'))
+# Requests whose duration says nothing about local responsiveness: long-running
+# OCR and streams, and handlers that wait on SharePoint
+GOVERNOR_LATENCY_EXCLUDE = [
+    prefix.strip() for prefix in os.getenv(
+        'GOVERNOR_LATENCY_EXCLUDE',
+        '/api/ocr/pdf_ocr,/api/ocr/images,/api/ocr/batch/events,/api/ocr/batch/start,'
+        '/api/ocr/process_sharepoint_item,/api/sharepoint,/api/content/files,/api/thumbnails'
+    ).split(',') if prefix.strip()
+]
+
+# Latency samples kept between two adjustments
+LATENCY_SAMPLES = 2000
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class ResourceGovernor:
+    """AIMD controller for a concurrency limit, driven by latency and resource usage."""
+
+    def __init__(self, interval: float = GOVERNOR_INTERVAL_SECONDS,
+                 latency_target_ms: float = GOVERNOR_LATENCY_TARGET_MS,
+                 max_cpu_percent: float = GOVERNOR_MAX_CPU_PERCENT,
+                 min_other_cpu_percent: float = GOVERNOR_MIN_OTHER_CPU_PERCENT,
+                 max_rss_mb: float = GOVERNOR_MAX_RSS_MB,
+                 max_gpu_memory_percent: float = GOVERNOR_MAX_GPU_MEMORY_PERCENT):
+        self.interval = interval
+        self.latency_target_ms = latency_target_ms
+        self.max_cpu_percent = max_cpu_percent
+        self.min_other_cpu_percent = min_other_cpu_percent
+        self.max_rss_mb = max_rss_mb
+        self.max_gpu_memory_percent = max_gpu_memory_percent
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        # (monotonic time, process CPU seconds) of the previous sample
+        self._process_cpu = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._on_change: Optional[Callable[[int], None]] = None
+        self._has_demand: Callable[[], bool] = lambda: True
+        self.min_limit = GOVERNOR_MIN_LIMIT
+        self.max_limit = GOVERNOR_MIN_LIMIT
+        self.limit = GOVERNOR_MIN_LIMIT
+        self.last_sample = {}
+        self.pressure: List[str] = []
+        self.increases = 0
+        self.decreases = 0
+
+    def record_latency(self, path: str, duration_ms: float):
+        """Record the duration of an API request; excluded paths are ignored."""
+        if any(path.startswith(prefix) for prefix in GOVERNOR_LATENCY_EXCLUDE):
+            return
+        with self._lock:
+            self._latencies.append((time.monotonic(), duration_ms))
+
+    def _latency_p95(self) -> float:
+        cutoff = time.monotonic() - GOVERNOR_LATENCY_WINDOW_SECONDS
+        with self._lock:
+            while self._latencies and self._latencies[0][0] < cutoff:
+                self._latencies.popleft()
+            durations = sorted(duration for _, duration in self._latencies)
+        return _percentile(durations, 0.95)
+
+    def _process_cpu_percent(self, psutil) -> Optional[float]:
+        """CPU used by this process and its finished children since the last call, as a share of all cores."""
+        times = psutil.Process().cpu_times()
+        now = time.monotonic()
+        used = times.user + times.system + getattr(times, 'children_user', 0.0) + getattr(times, 'children_system', 0.0)
+        previous, self._process_cpu = self._process_cpu, (now, used)
+        if previous is None or now <= previous[0]:
+            return None
+        return min(100.0, (used - previous[1]) * 100.0 / ((now - previous[0]) * (psutil.cpu_count() or 1)))
+
+    def _gpu_memory_percent(self) -> Optional[float]:
+        # Only look at the GPU if an OCR engine already loaded torch
+        torch = sys.modules.get('torch')
+        if torch is None:
+            return None
+        try:
+            if not torch.cuda.is_available():
+                return None
+            return max(
+                torch.cuda.memory_reserved(i) * 100.0 / torch.cuda.get_device_properties(i).total_memory
+                for i in range(torch.cuda.device_count())
+            )
+        except Exception as e:
+            logger.debug(f"Could not read GPU memory usage: {e}")
+            return None
+
+    def sample(self) -> dict:
+        """Take one measurement of latency, CPU, RSS and GPU memory."""
+        sample = {'latency_p95_ms': round(self._latency_p95(), 1)}
+        try:
+            import psutil
+            sample['cpu_percent'] = psutil.cpu_percent(interval=None)
+            ocr_cpu = self._process_cpu_percent(psutil)
+            if ocr_cpu is not None:
+                sample['ocr_cpu_percent'] = round(ocr_cpu, 1)
+                sample['other_cpu_percent'] = round(max(0.0, sample['cpu_percent'] - ocr_cpu), 1)
+            sample['rss_mb'] = round(psutil.Process().memory_info().rss / 1024 / 1024, 1)
+        except ImportError:
+            pass
+        gpu_memory = self._gpu_memory_percent()
+        if gpu_memory is not None:
+            sample['gpu_memory_percent'] = round(gpu_memory, 1)
+        return sample
+
+    def _pressure(self, sample: dict) -> List[str]:
+        reasons = []
+        if sample['latency_p95_ms'] > self.latency_target_ms:
+            reasons.append('latency')
+        # The OCR workers' own load is what the limit is meant to use; only back off
+        # when the busy CPU is also wanted by other work
+        if (sample.get('cpu_percent', 0) > self.max_cpu_percent
+                and sample.get('other_cpu_percent', sample.get('cpu_percent', 0)) > self.min_other_cpu_percent):
+            reasons.append('cpu')
+        if sample.get('rss_mb', 0) > self.max_rss_mb:
+            reasons.append('memory')
+        if sample.get('gpu_memory_percent', 0) > self.max_gpu_memory_percent:
+            reasons.append('gpu_memory')
+        return reasons
+
+    def adjust(self) -> int:
+        """Sample once and move the limit: halve it under pressure, else add one if there is demand."""
+        sample = self.sample()
+        pressure = self._pressure(sample)
+        previous = self.limit
+        if pressure:
+            limit = max(self.min_limit, int(previous * GOVERNOR_DECREASE_FACTOR))
+        elif previous < self.max_limit and self._has_demand():
+            limit = previous + 1
+        else:
+            limit = previous
+
+        with self._lock:
+            self.last_sample = sample
+            self.pressure = pressure
+            self.limit = limit
+            if limit < previous:
+                self.decreases += 1
+            elif limit > previous:
+                self.increases += 1
+
+        if limit != previous:
+            level = logging.INFO if limit < previous else logging.DEBUG
+            logger.log(level, f"Batch OCR limit {previous} -> {limit} (pressure: {', '.join(pressure) or 'none'}, sample: {sample})")
+            if self._on_change:
+                self._on_change(limit)
+        return limit
+
+    def start(self, max_limit: int, on_change: Callable[[int], None], has_demand: Callable[[], bool] = None):
+        """
+        Start adjusting in a background thread.
+
+        Args:
+            max_limit: Highest limit, used when there is no pressure
+            on_change: Called with the new limit whenever it changes
+            has_demand: Returns whether work is waiting for a higher limit
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = self.max_limit
+        self._on_change = on_change
+        if has_demand is not None:
+            self._has_demand = has_demand
+        on_change(self.limit)
+
+        try:
+            import psutil
+            # The first calls only set the baseline for the next ones
+            psutil.cpu_percent(interval=None)
+            self._process_cpu_percent(psutil)
+        except ImportError:
+            logger.warning("psutil not available, resource governor uses API latency only")
+
+        def run():
+            while not self._stop.wait(self.interval):
+                try:
+                    self.adjust()
+                except Exception as e:
+                    logger.error(f"Error in resource governor: {e}")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, daemon=True, name="resource_governor")
+        self._thread.start()
+        logger.info(f"Resource governor started (limit {self.min_limit}-{self.max_limit}, interval {self.interval}s)")
+
+    def stop(self):
+        """Stop adjusting; the current limit stays in effect."""
+        self._stop.set()
+        self._thread = None
+
+    def get_stats(self) -> dict:
+        """Get the current limit, the last sample and the active pressure signals."""
+        with self._lock:
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'limit': self.limit,
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'pressure': list(self.pressure),
+                'last_sample': dict(self.last_sample),
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'thresholds': {
+                    'latency_p95_ms': self.latency_target_ms,
+                    'cpu_percent': self.max_cpu_percent,
+                    'other_cpu_percent': self.min_other_cpu_percent,
+                    'rss_mb': self.max_rss_mb,
+                    'gpu_memory_percent': self.max_gpu_memory_percent,
+                },
+            }
+
+
+# Global resource governor
+resource_governor = ResourceGovernor()
@@ -0,0 +1,172 @@
+"""
+In-memory snapshot of the settings table.
+
+OCR hot paths read settings such as the default engine and language for every
+page. The snapshot loads all settings once and serves reads without database
+I/O. Writes through /api/settings call invalidate(), which reloads the snapshot
+and bumps a version stamp in SETTINGS_VERSION_FILE; other worker processes
+notice the new stamp with a cheap stat() and reload on their next read.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+from app.models import Setting
+from app.utils.db_config import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Shared by all workers on the host; each write replaces it with a new stamp
+SETTINGS_VERSION_FILE = os.getenv(
+    'SETTINGS_VERSION_FILE', os.path.join(tempfile.gettempdir(), 'ocr_settings.version')
+)
+# How often readers look at the version file
+SETTINGS_VERSION_CHECK_SECONDS = float(os.getenv('SETTINGS_VERSION_CHECK_SECONDS', '2'))
+# Reload even without a new stamp, to pick up writes made outside the API
+SETTINGS_MAX_AGE_SECONDS = float(os.getenv('SETTINGS_MAX_AGE_SECONDS', '300'))
+
+
+class SettingsSnapshot:
+    """Thread-safe, versioned in-memory copy of the settings table."""
+
+    def __init__(self, session_factory=SessionLocal, version_file: Optional[str] = SETTINGS_VERSION_FILE):
+        self._session_factory = session_factory
+        self.version_file = version_file
+        self._lock = threading.Lock()
+        # key -> (value, category)
+        self._values: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        self._loaded = False
+        self.version = 0
+        self.loaded_at = 0.0
+        self._stamp = None
+        self._stat = None
+        self._last_check = 0.0
+        self.reloads = 0
+        self.reads = 0
+
+    def _read_stamp(self) -> Optional[str]:
+        if not self.version_file:
+            return None
+        try:
+            with open(self.version_file, 'r') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Could not read settings version file {self.version_file}: {e}")
+            return None
+
+    def _stat_stamp(self):
+        try:
+            stat = os.stat(self.version_file)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def reload(self):
+        """Load all settings from the database into a new snapshot."""
+        stamp = self._read_stamp()
+        db = self._session_factory()
+        try:
+            rows = db.query(Setting).with_entities(Setting.key, Setting.value, Setting.category).all()
+        finally:
+            db.close()
+
+        values = {key: (value, category) for key, value, category in rows}
+        with self._lock:
+            self._values = values
+            self._loaded = True
+            self.version += 1
+            self.loaded_at = time.time()
+            self._last_check = self.loaded_at
+            self._stamp = stamp
+            self._stat = self._stat_stamp() if self.version_file else None
+            self.reloads += 1
+        logger.info(f"Loaded settings snapshot v{self.version} ({len(values)} settings)")
+
+    def _is_stale(self, now: float) -> bool:
+        if not self._loaded or now - self.loaded_at > SETTINGS_MAX_AGE_SECONDS:
+            return True
+        if not self.version_file or now - self._last_check < SETTINGS_VERSION_CHECK_SECONDS:
+            return False
+        self._last_check = now
+        # stat() first so an unchanged file costs no read
+        stat = self._stat_stamp()
+        if stat == self._stat:
+            return False
+        return self._read_stamp() != self._stamp
+
+    def get(self, key: str, default_value: str = None, category: str = None) -> str:
+        """
+        Get a setting value from the snapshot.
+
+        Args:
+            key: Setting key
+            default_value: Returned when the setting is missing or empty
+            category: If given, the setting must belong to this category
+
+        Returns:
+            The setting value, or default_value
+        """
+        now = time.time()
+        with self._lock:
+            self.reads += 1
+            stale = self._is_stale(now)
+        if stale:
+            try:
+                self.reload()
+            except Exception as e:
+                # Keep serving the previous snapshot if the database is unavailable
+                logger.error(f"Error reloading settings snapshot: {e}")
+                with self._lock:
+                    self.loaded_at = now
+
+        with self._lock:
+            entry = self._values.get(key)
+        if entry is None:
+            return default_value
+        value, entry_category = entry
+        if category and entry_category != category:
+            return default_value
+        return value if value else default_value
+
+    def invalidate(self):
+        """
+        Reload after a settings write and notify other workers.
+
+        Call this after the write has been committed.
+        """
+        if self.version_file:
+            try:
+                tmp_path = f"{self.version_file}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    f.write(uuid.uuid4().hex)
+                os.replace(tmp_path, self.version_file)
+            except Exception as e:
+                logger.warning(f"Could not write settings version file {self.version_file}: {e}")
+        try:
+            self.reload()
+        except Exception as e:
+            logger.error(f"Error reloading settings snapshot: {e}")
+            with self._lock:
+                self._loaded = False
+
+    def get_stats(self) -> dict:
+        """Get snapshot statistics."""
+        with self._lock:
+            return {
+                'version': self.version,
+                'stamp': self._stamp,
+                'settings': len(self._values),
+                'loaded_at': self.loaded_at,
+                'reloads': self.reloads,
+                'reads': self.reads,
+            }
+
+
+# Global settings snapshot
+settings_snapshot = SettingsSnapshot()
@@ -0,0 +1,165 @@
+"""
+Request coalescing (single-flight) utilities.
+Concurrent identical requests share one in-flight computation instead of
+each downloading and rendering the same data.
+"""
+import asyncio
+import inspect
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+# Registry of named groups so their metrics can be reported together
+_groups: Dict[str, "SingleFlight"] = {}
+_groups_lock = threading.Lock()
+
+
+class _SyncCall:
+    """An in-flight call shared between threads."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into a single execution.
+
+    Async callers use do(); code running in worker threads (sync FastAPI
+    endpoints, batch jobs) uses do_sync(). Results are not cached: once the
+    in-flight call completes, the next call with the same key executes again.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._async_calls: Dict[Hashable, asyncio.Future] = {}
+        self._sync_calls: Dict[Hashable, _SyncCall] = {}
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+        self.errors = 0
+
+    async def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) once for all concurrent callers with the same key.
+
+        fn may be a coroutine function or a regular callable. The shared work runs
+        as its own task, so a caller that disconnects does not cancel it for the others.
+
+        Args:
+            key: Hashable identity of the request
+            fn: Function producing the result
+
+        Returns:
+            The result of the shared computation
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.calls += 1
+            task = self._async_calls.get(key)
+            # Tasks are bound to their loop; callers on another loop execute independently
+            if task is not None and task.get_loop() is loop:
+                self.collapsed += 1
+            else:
+                task = loop.create_task(self._run_async(fn, *args, **kwargs))
+                task.add_done_callback(lambda t, key=key: self._finish_async(key, t))
+                self._async_calls[key] = task
+                self.executions += 1
+
+        return await asyncio.shield(task)
+
+    async def _run_async(self, fn: Callable, *args, **kwargs) -> Any:
+        result = fn(*args, **kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def _finish_async(self, key: Hashable, task: asyncio.Future):
+        with self._lock:
+            if self._async_calls.get(key) is task:
+                del self._async_calls[key]
+            if not task.cancelled() and task.exception() is not None:
+                self.errors += 1
+
+    def do_sync(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Blocking variant of do() for code running in worker threads.
+
+        Args:
+            key: Hashable identity of the request
+            fn: Function producing the result
+
+        Returns:
+            The result of the shared computation
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._sync_calls.get(key)
+            leader = call is None
+            if leader:
+                call = _SyncCall()
+                self._sync_calls[key] = call
+                self.executions += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._sync_calls.pop(key, None)
+            call.event.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get coalescing statistics for this group."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "collapsed": self.collapsed,
+                "errors": self.errors,
+                "in_flight": len(self._async_calls) + len(self._sync_calls),
+                "collapse_rate": round(self.collapsed / self.calls, 3) if self.calls else 0.0,
+            }
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """
+    Get (or create) the named single-flight group.
+
+    Args:
+        name: Group name, used as the key in get_single_flight_stats()
+
+    Returns:
+        SingleFlight: The shared group instance
+    """
+    with _groups_lock:
+        group = _groups.get(name)
+        if group is None:
+            group = SingleFlight(name)
+            _groups[name] = group
+        return group
+
+
+def get_single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """Get coalescing statistics for all single-flight groups."""
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.get_stats() for group in groups}
@@ -12,6 +12,8 @@ from datetime import datetime
 from typing import Optional, Tuple
 import io
 
+from app.utils.db_config import raw_connection
+
 logger = logging.getLogger(__name__)
 
 class ThumbnailGenerator:
@@ -19,11 +21,14 @@ class ThumbnailGenerator:
     Generates and stores thumbnails during OCR processing.
     """
     
-    def __init__(self, db_path: str = "ocr.db"):
+    def __init__(self, db_path: Optional[str] = None):
+        # None uses the application's pooled database connection
         self.db_path = db_path
     
     def get_db_connection(self):
         """Get database connection."""
+        if self.db_path is None:
+            return raw_connection()
         return sqlite3.connect(self.db_path)
     
     def create_thumbnail_from_image_path(self, image_path: str, size: Tuple[int, int] = (150, 200)) -> Optional[bytes]:
@@ -4,7 +4,6 @@ from PIL import Image, ImageDraw, ImageFont
 import io
 import json
 from pathlib import Path
-import fitz  # PyMuPDF
 from datetime import datetime
 import hashlib
 
@@ -13,6 +12,10 @@ class ThumbnailManager:
         self.db_path = db_path
     
     def get_db_connection(self):
+        if self.db_path is None:
+            # Shared, pooled connection of the running application
+            from app.utils.db_config import raw_connection
+            return raw_connection()
         return sqlite3.connect(self.db_path)
     
     def create_thumbnail_from_pdf(self, pdf_path: str, size: tuple = (150, 200)) -> bytes:
@@ -21,6 +24,7 @@ class ThumbnailManager:
             if not Path(pdf_path).exists():
                 return None
                 
+            import fitz  # PyMuPDF
             pdf_document = fitz.open(pdf_path)
             page = pdf_document[0]  # First page
             
@@ -251,14 +251,17 @@ const CacheManagement = () => {
                                         <Grid item xs={6}>
                                             <Typography variant="body2" color="textSecondary">{translate('cache.ocr_results')}</Typography>
                                             <Typography variant="h6">{backendStats.ocr_results?.size || 0}</Typography>
+                                            <Typography variant="caption" color="textSecondary">{formatBytes(backendStats.ocr_results?.bytes || 0)}</Typography>
                                         </Grid>
                                         <Grid item xs={6}>
                                             <Typography variant="body2" color="textSecondary">{translate('cache.sharepoint')}</Typography>
                                             <Typography variant="h6">{backendStats.sharepoint_files?.size || 0}</Typography>
+                                            <Typography variant="caption" color="textSecondary">{formatBytes(backendStats.sharepoint_files?.bytes || 0)}</Typography>
                                         </Grid>
                                         <Grid item xs={6}>
                                             <Typography variant="body2" color="textSecondary">{translate('cache.llm_scores')}</Typography>
                                             <Typography variant="h6">{backendStats.llm_scores?.size || 0}</Typography>
+                                            <Typography variant="caption" color="textSecondary">{formatBytes(backendStats.llm_scores?.bytes || 0)}</Typography>
                                         </Grid>
                                         <Grid item xs={6}>
                                             <Typography variant="body2" color="textSecondary">{translate('cache.file_cache')}</Typography>
@@ -38,7 +38,7 @@ import {
     Visibility as ViewIcon,
     ZoomIn as ZoomIcon
 } from '@mui/icons-material';
-import { searchImages, getImageUrl, getSearchSuggestions, highlightSearchTerms, extractRelevantSnippet } from '../utils/imageSearchUtils';
+import { searchImages, getImageUrl, getSearchSuggestions, highlightSearchTerms, extractRelevantSnippet, recordSearchClick } from '../utils/imageSearchUtils';
 import { checkBackendStatus, BackendStatusIndicator } from '../utils/backendStatusUtils.jsx';
 import { useTranslate } from 'react-admin';
 import '../styles/imageHover.css';
@@ -577,6 +577,7 @@ const ImageSearchPage = () => {
                             
                             // Add click handler to open full image
                             popup.onclick = () => {
+                                recordSearchClick(result);
                                 setSelectedImage({...result, viewFullImage: true});
                             };
                             
@@ -750,7 +751,10 @@ const ImageSearchPage = () => {
                         <Tooltip title="View Image">
                             <IconButton
                                 size="small"
-                                onClick={() => setSelectedImage({...result, viewFullImage: true})}
+                                onClick={() => {
+                                    recordSearchClick(result);
+                                    setSelectedImage({...result, viewFullImage: true});
+                                }}
                                 disabled={!hasImage}
                             >
                                 <ViewIcon fontSize="small" />
@@ -763,6 +767,7 @@ const ImageSearchPage = () => {
                                 href={getPdfUrl()}
                                 target="_blank"
                                 rel="noopener noreferrer"
+                                onClick={() => recordSearchClick(result)}
                             >
                                 📄
                             </IconButton>
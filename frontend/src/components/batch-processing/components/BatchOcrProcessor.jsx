@@ -57,7 +57,13 @@ const BatchOcrProcessor = ({
     // Local state for processable files
     const [processableFiles, setProcessableFiles] = useState([]);
 
-    // Polling hook
+    // Lists shown by the status display, loaded only while their section is open
+    const visibleLists = [
+        ...(expandedSections.logs ? ['logs'] : []),
+        ...(expandedSections.results ? ['results', 'errors'] : [])
+    ];
+
+    // Progress hook
     const { startPolling, stopPolling, refreshStatus } = useBatchPolling(
         batchId,
         (status) => {
@@ -66,7 +72,8 @@ const BatchOcrProcessor = ({
                 onProcessingUpdate(status);
             }
         },
-        setError
+        setError,
+        visibleLists
     );
 
     // Control hooks
@@ -167,7 +167,14 @@ const PaginatedBatchProcessor = ({
         };
     }, []);
 
-    // Polling hook for current chunk
+    // Lists shown for the current chunk, loaded only while their section is open
+    const visibleLists = [
+        ...(expandedSections.logs ? ['logs'] : []),
+        ...(expandedSections.results || expandedSections.processedFiles ? ['results'] : []),
+        ...(expandedSections.results ? ['errors'] : [])
+    ];
+
+    // Progress hook for current chunk
     const { startPolling, stopPolling } = useBatchPolling(
         currentBatch.batchId,
         (status) => {
@@ -235,7 +242,8 @@ const PaginatedBatchProcessor = ({
                 }
             }
         },
-        setError
+        setError,
+        visibleLists
     );
 
     // Control hooks
@@ -452,7 +460,7 @@ const PaginatedBatchProcessor = ({
                             </Typography>
                             {currentBatch.status && (
                                 <Typography variant="body2" color="primary" sx={{ mt: 1 }}>
-                                    Status: {currentBatch.status.status} - {currentBatch.status.current_file?.name || 'Initializing...'}
+                                    Status: {currentBatch.status.status} - {currentBatch.status.current_file?.name || currentBatch.status.current_file || 'Initializing...'}
                                 </Typography>
                             )}
                         </Box>
@@ -623,7 +631,7 @@ const PaginatedBatchProcessor = ({
                                 logs_count: Array.isArray(currentBatch.status.logs) ? currentBatch.status.logs.length : 'not array',
                                 estimated_time_remaining: currentBatch.status.estimated_time_remaining,
                                 start_time: currentBatch.status.start_time,
-                                current_file: currentBatch.status.current_file?.name || 'None'
+                                current_file: currentBatch.status.current_file?.name || currentBatch.status.current_file || 'None'
                             }, null, 2)}
                         </Typography>
                     </AccordionDetails>
@@ -631,7 +639,7 @@ const PaginatedBatchProcessor = ({
             )}
 
             {/* Processed Files */}
-            {currentBatch.status && currentBatch.status.results && currentBatch.status.results.length > 0 && (
+            {currentBatch.status && currentBatch.status.results_count > 0 && (
                 <Accordion
                     expanded={expandedSections.processedFiles}
                     onChange={() => toggleSection('processedFiles')}
@@ -647,7 +655,7 @@ const PaginatedBatchProcessor = ({
                         <Box sx={{ maxHeight: '500px', overflow: 'auto' }}>
                             {/* Transform the results data to match what PdfResultsDisplay expects */}
                             <PdfResultsDisplay
-                                results={currentBatch.status.results
+                                results={(currentBatch.status.results || [])
                                     .filter(item => item.result && typeof item.result === 'object')
                                     .map(item => item.result)
                                 }
@@ -121,16 +121,58 @@ const RunningProcessesMonitor = ({ onProcessSelect }) => {
         }
     };
 
-    // Start polling when component mounts
+    // Apply a pushed progress message from /api/ocr/batch/events
+    const applyProgressEvent = (event) => {
+        if (!mountedRef.current) return;
+        const message = JSON.parse(event.data);
+        setRunningProcesses(prev => {
+            if (message.type === 'removed') {
+                const { [message.batch_id]: _removed, ...rest } = prev;
+                return rest;
+            }
+            // Snapshots carry every field, progress events only the changed ones
+            const base = message.type === 'progress' ? prev[message.batch_id] || {} : {};
+            return {
+                ...prev,
+                [message.batch_id]: { ...base, batch_id: message.batch_id, ...message.data }
+            };
+        });
+    };
+
+    // Subscribe to pushed progress when component mounts, polling only if the stream is unavailable
     useEffect(() => {
+        let eventSource = null;
+        
+        const startPolling = () => {
+            if (!pollingIntervalRef.current) {
+                // Poll every 3 seconds
+                pollingIntervalRef.current = setInterval(fetchRunningProcesses, 3000);
+            }
+        };
+        
         fetchRunningProcesses();
         
-        // Poll every 3 seconds
-        pollingIntervalRef.current = setInterval(fetchRunningProcesses, 3000);
+        if (typeof EventSource !== 'undefined') {
+            eventSource = new EventSource('/api/ocr/batch/events');
+            ['snapshot', 'progress', 'removed'].forEach(type => {
+                eventSource.addEventListener(type, applyProgressEvent);
+            });
+            eventSource.onerror = () => {
+                console.warn('[RunningProcessesMonitor] Progress stream unavailable, falling back to polling');
+                eventSource.close();
+                startPolling();
+            };
+        } else {
+            startPolling();
+        }
         
         return () => {
+            if (eventSource) {
+                eventSource.close();
+            }
             if (pollingIntervalRef.current) {
                 clearInterval(pollingIntervalRef.current);
+                pollingIntervalRef.current = null;
             }
         };
     }, []);
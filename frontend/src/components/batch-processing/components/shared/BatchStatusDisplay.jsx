@@ -80,6 +80,9 @@ const BatchStatusDisplay = ({
     const safeLogs = Array.isArray(batchStatus.logs) ? batchStatus.logs : [];
     const safeResults = Array.isArray(batchStatus.results) ? batchStatus.results : [];
     const safeErrors = Array.isArray(batchStatus.errors) ? batchStatus.errors : [];
+    // The status only carries the most recent results and errors; the counts cover the whole batch
+    const resultsTotal = batchStatus.results_count ?? safeResults.length;
+    const errorsTotal = batchStatus.errors_count ?? safeErrors.length;
 
     // Debug logging (moved after function definitions)
     const logDebugInfo = () => {
@@ -489,7 +492,7 @@ const BatchStatusDisplay = ({
             </Accordion>
 
             {/* Results Section */}
-            {(safeResults.length > 0 || safeErrors.length > 0) && (
+            {(resultsTotal > 0 || errorsTotal > 0) && (
                 <Accordion
                     expanded={expandedSections.results}
                     onChange={() => toggleSection('results')}
@@ -498,7 +501,7 @@ const BatchStatusDisplay = ({
                     <AccordionSummary expandIcon={<ExpandMoreIcon />}>
                         <Typography variant="h6" sx={{ display: 'flex', alignItems: 'center' }}>
                             <AssessmentIcon sx={{ mr: 1 }} />
-                            Processing Results ({safeResults.length + safeErrors.length})
+                            Processing Results ({resultsTotal + errorsTotal})
                         </Typography>
                     </AccordionSummary>
                     <AccordionDetails>
@@ -507,7 +510,7 @@ const BatchStatusDisplay = ({
                             {safeResults.length > 0 && (
                                 <Grid item xs={12} md={6}>
                                     <Typography variant="subtitle1" color="success.main" gutterBottom>
-                                        Successfully Processed ({safeResults.length})
+                                        Successfully Processed ({resultsTotal})
                                     </Typography>
                                     <Paper sx={{ maxHeight: 200, overflow: 'auto' }}>
                                         <List dense>
@@ -531,7 +534,7 @@ const BatchStatusDisplay = ({
                             {safeErrors.length > 0 && (
                                 <Grid item xs={12} md={6}>
                                     <Typography variant="subtitle1" color="error.main" gutterBottom>
-                                        Failed Processing ({safeErrors.length})
+                                        Failed Processing ({errorsTotal})
                                     </Typography>
                                     <Paper sx={{ maxHeight: 200, overflow: 'auto' }}>
                                         <List dense>
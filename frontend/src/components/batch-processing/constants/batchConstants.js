@@ -35,6 +35,12 @@ export const POLLING_INTERVALS = {
     DEFAULT: 2000                     // 2 seconds default
 };
 
+// Most recent results, errors and logs loaded for the status display (backend BATCH_RECENT_ITEMS)
+export const RECENT_BATCH_ITEMS = 50;
+
+// Progress events pushed by /api/ocr/batch/events
+export const PROGRESS_EVENT_TYPES = ['snapshot', 'progress', 'removed'];
+
 // Default OCR settings
 export const DEFAULT_OCR_SETTINGS = {
     dpi: 300,
@@ -1,113 +1,204 @@
 /**
- * Custom hook for batch status polling
+ * Custom hook for following the status of a batch
+ *
+ * Progress is pushed by the /api/ocr/batch/events/{batchId} stream, which sends
+ * only counters, the current file and the ETA. The results, errors and logs are
+ * loaded from /api/ocr/batch/items/{batchId} when their counts change, and only
+ * for the kinds listed in `lists`. Compact status polling is used only when the
+ * stream is unavailable.
  */
 import { useRef, useCallback, useEffect } from 'react';
-import { getBatchStatus, getPollingInterval } from '../utils/batchUtils';
-import { COMPLETED_STATUSES } from '../constants/batchConstants';
+import { getBatchStatus, getBatchItems, getPollingInterval } from '../utils/batchUtils';
+import { COMPLETED_STATUSES, RECENT_BATCH_ITEMS, PROGRESS_EVENT_TYPES } from '../constants/batchConstants';
 
-export const useBatchPolling = (batchId, onStatusUpdate, onError) => {
+// Changes whenever a list gains items; the log is a ring buffer, so it uses the last timestamp
+const listMarker = (status, kind) => {
+    return kind === 'logs' ? status.last_log_at : status[`${kind}_count`];
+};
+
+export const useBatchPolling = (batchId, onStatusUpdate, onError, lists = ['logs']) => {
+    const eventSourceRef = useRef(null);
     const pollingIntervalRef = useRef(null);
     const mountedRef = useRef(true);
+    // Batch being followed and its status merged from events and loaded lists
+    const activeBatchRef = useRef(null);
+    const statusRef = useRef({});
+    // Marker of each loaded list, and lists being loaded
+    const loadedListsRef = useRef({});
+    const loadingListsRef = useRef({});
+
+    // Callers pass inline callbacks; keep the latest without restarting the stream
+    const onStatusUpdateRef = useRef(onStatusUpdate);
+    const onErrorRef = useRef(onError);
+    const listsRef = useRef(lists);
+    onStatusUpdateRef.current = onStatusUpdate;
+    onErrorRef.current = onError;
+    listsRef.current = lists;
+
+    const closeStream = useCallback(() => {
+        if (eventSourceRef.current) {
+            eventSourceRef.current.close();
+            eventSourceRef.current = null;
+        }
+        if (pollingIntervalRef.current) {
+            clearInterval(pollingIntervalRef.current);
+            pollingIntervalRef.current = null;
+        }
+    }, []);
 
     // Cleanup on unmount
     useEffect(() => {
         return () => {
             mountedRef.current = false;
-            if (pollingIntervalRef.current) {
-                clearInterval(pollingIntervalRef.current);
-            }
+            closeStream();
         };
+    }, [closeStream]);
+
+    // Hand a copy of the merged status to the caller; flags the caller sets on it are kept
+    const publishStatus = useCallback(() => {
+        const status = { ...statusRef.current };
+        statusRef.current = status;
+        if (mountedRef.current && onStatusUpdateRef.current) {
+            onStatusUpdateRef.current(status);
+        }
     }, []);
 
-    // Poll batch status
-    const pollBatchStatus = useCallback(async (currentBatchId) => {
-        if (!currentBatchId || !mountedRef.current) {
+    // Load the most recent items of a list if it changed since it was last loaded
+    const loadList = useCallback(async (targetBatchId, kind) => {
+        const marker = listMarker(statusRef.current, kind);
+        if (marker === undefined || loadedListsRef.current[kind] === marker || loadingListsRef.current[kind]) {
             return;
         }
 
+        loadingListsRef.current[kind] = true;
         try {
-            console.log(`[useBatchPolling] Polling batch status for: ${currentBatchId}`);
-            const status = await getBatchStatus(currentBatchId);
-            
-            console.log(`[useBatchPolling] Received status for ${currentBatchId}:`, {
-                status: status.status,
-                processed: status.processed_count,
-                total: status.total_files,
-                current_file: status.current_file?.name || 'None',
-                estimated_time_remaining: status.estimated_time_remaining,
-                avg_time: status.processing_stats?.average_processing_time,
-                logs_count: Array.isArray(status.logs) ? status.logs.length : 'not array',
-                logs_sample: Array.isArray(status.logs) ? status.logs.slice(0, 2) : status.logs,
-                logs_type: typeof status.logs,
-                logs_raw: status.logs
-            });
-            
-            // Additional logs debugging
-            console.log(`[useBatchPolling] Logs detailed debug:`, {
-                'status.logs': status.logs,
-                'typeof status.logs': typeof status.logs,
-                'Array.isArray(status.logs)': Array.isArray(status.logs),
-                'status.logs?.length': status.logs?.length
-            });
-            
-            // Always update status for progress tracking
-            if (onStatusUpdate) {
-                onStatusUpdate(status);
-            }
-            
-            if (mountedRef.current) {
-                // Adjust polling frequency based on status
-                const currentInterval = pollingIntervalRef.current;
-                const newInterval = getPollingInterval(status.status);
-                
-                // Update polling interval if it changed significantly
-                if (currentInterval && Math.abs(newInterval - 2000) > 500) {
-                    clearInterval(currentInterval);
-                    pollingIntervalRef.current = setInterval(() => {
-                        pollBatchStatus(currentBatchId);
-                    }, newInterval);
-                }
-                
-                // Stop polling if batch is completed
-                if (COMPLETED_STATUSES.includes(status.status)) {
-                    if (pollingIntervalRef.current) {
-                        clearInterval(pollingIntervalRef.current);
-                        pollingIntervalRef.current = null;
-                    }
-                }
+            const total = kind === 'logs' ? statusRef.current.logs_count : marker;
+            const page = await getBatchItems(targetBatchId, kind, Math.max(0, (total || 0) - RECENT_BATCH_ITEMS), RECENT_BATCH_ITEMS);
+            if (!mountedRef.current || activeBatchRef.current !== targetBatchId) {
+                return;
             }
+            loadedListsRef.current[kind] = marker;
+            statusRef.current = { ...statusRef.current, [kind]: page.items };
+            publishStatus();
+        } catch (error) {
+            console.error(`[useBatchPolling] Error loading ${kind} for batch ${targetBatchId}:`, error);
+            return;
+        } finally {
+            loadingListsRef.current[kind] = false;
+        }
+
+        // Catch up with changes pushed while the page was loading
+        if (listsRef.current.includes(kind)) {
+            loadList(targetBatchId, kind);
+        }
+    }, [publishStatus]);
+
+    const loadLists = useCallback((targetBatchId) => {
+        listsRef.current.forEach(kind => loadList(targetBatchId, kind));
+    }, [loadList]);
+
+    // Merge progress fields into the status and refresh the lists that changed
+    const applyProgress = useCallback((targetBatchId, progress) => {
+        if (!mountedRef.current || activeBatchRef.current !== targetBatchId) {
+            return;
+        }
+        statusRef.current = { ...statusRef.current, batch_id: targetBatchId, ...progress };
+        publishStatus();
+        loadLists(targetBatchId);
+
+        if (COMPLETED_STATUSES.includes(statusRef.current.status)) {
+            // The server ends the stream here; closing first keeps EventSource from reconnecting
+            closeStream();
+        }
+    }, [publishStatus, loadLists, closeStream]);
+
+    // Poll compact status
+    const pollBatchStatus = useCallback(async (targetBatchId) => {
+        if (!targetBatchId || !mountedRef.current) {
+            return;
+        }
+
+        try {
+            const status = await getBatchStatus(targetBatchId, true);
+            applyProgress(targetBatchId, status);
         } catch (error) {
-            console.error(`[useBatchPolling] Error polling batch ${currentBatchId}:`, error);
-            if (mountedRef.current && onError) {
-                onError(`Error getting batch status: ${error.message}`);
+            console.error(`[useBatchPolling] Error polling batch ${targetBatchId}:`, error);
+            if (mountedRef.current && onErrorRef.current) {
+                onErrorRef.current(`Error getting batch status: ${error.message}`);
             }
         }
-    }, [onStatusUpdate, onError]);
+    }, [applyProgress]);
 
-    // Start polling
-    const startPolling = useCallback((targetBatchId, initialInterval = 2000) => {
+    // Fall back to polling compact status while the event stream is unavailable
+    const startFallbackPolling = useCallback((targetBatchId, interval) => {
         if (pollingIntervalRef.current) {
             clearInterval(pollingIntervalRef.current);
         }
-        
-        console.log(`[useBatchPolling] Starting polling for batch: ${targetBatchId} with interval: ${initialInterval}ms`);
-        
+        pollBatchStatus(targetBatchId);
         pollingIntervalRef.current = setInterval(() => {
             pollBatchStatus(targetBatchId);
-        }, initialInterval);
+        }, interval);
     }, [pollBatchStatus]);
 
-    // Stop polling
+    // Start following a batch
+    const startPolling = useCallback((targetBatchId, fallbackInterval = 2000) => {
+        closeStream();
+        activeBatchRef.current = targetBatchId;
+        statusRef.current = { batch_id: targetBatchId };
+        loadedListsRef.current = {};
+
+        if (typeof EventSource === 'undefined') {
+            startFallbackPolling(targetBatchId, fallbackInterval);
+            return;
+        }
+
+        console.log(`[useBatchPolling] Subscribing to progress of batch: ${targetBatchId}`);
+
+        const eventSource = new EventSource(`/api/ocr/batch/events/${targetBatchId}`);
+        eventSourceRef.current = eventSource;
+        PROGRESS_EVENT_TYPES.forEach(type => {
+            eventSource.addEventListener(type, (event) => {
+                const message = JSON.parse(event.data);
+                if (message.type === 'removed') {
+                    closeStream();
+                    return;
+                }
+                applyProgress(targetBatchId, message.data);
+            });
+        });
+        eventSource.onerror = () => {
+            if (eventSourceRef.current !== eventSource) {
+                return;
+            }
+            console.warn(`[useBatchPolling] Progress stream for batch ${targetBatchId} unavailable, falling back to polling`);
+            eventSource.close();
+            eventSourceRef.current = null;
+            startFallbackPolling(targetBatchId, getPollingInterval(statusRef.current.status) || fallbackInterval);
+        };
+    }, [closeStream, applyProgress, startFallbackPolling]);
+
+    // Stop following the batch
     const stopPolling = useCallback(() => {
-        if (pollingIntervalRef.current) {
-            clearInterval(pollingIntervalRef.current);
-            pollingIntervalRef.current = null;
+        closeStream();
+        activeBatchRef.current = null;
+    }, [closeStream]);
+
+    // Load lists that became visible, e.g. when their section is expanded
+    const listsKey = lists.join(',');
+    useEffect(() => {
+        if (activeBatchRef.current) {
+            loadLists(activeBatchRef.current);
         }
-    }, []);
+    }, [listsKey, loadLists]);
 
     // Manual refresh
     const refreshStatus = useCallback(() => {
         if (batchId) {
+            if (activeBatchRef.current !== batchId) {
+                activeBatchRef.current = batchId;
+                statusRef.current = { batch_id: batchId };
+                loadedListsRef.current = {};
+            }
             pollBatchStatus(batchId);
         }
     }, [batchId, pollBatchStatus]);
@@ -116,6 +207,6 @@ export const useBatchPolling = (batchId, onStatusUpdate, onError) => {
         startPolling,
         stopPolling,
         refreshStatus,
-        isPolling: !!pollingIntervalRef.current
+        isPolling: !!(eventSourceRef.current || pollingIntervalRef.current)
     };
-};
\ No newline at end of file
+};
@@ -176,11 +176,14 @@ export const startBatchProcessing = async (batchId, files, settings) => {
 /**
  * Get batch status from API
  * @param {string} batchId - Batch ID to check
+ * @param {boolean} compact - Only counters, current file and ETA, without results, errors or logs
  * @returns {Promise<Object>} Batch status
  */
-export const getBatchStatus = async (batchId) => {
+export const getBatchStatus = async (batchId, compact = false) => {
     try {
-        const response = await axios.get(`/api/ocr/batch/status/${batchId}`);
+        const response = await axios.get(`/api/ocr/batch/status/${batchId}`, {
+            params: compact ? { compact: true } : undefined
+        });
         
         // Debug logging for batch status response
         if (process.env.NODE_ENV === 'development') {
@@ -202,6 +205,26 @@ export const getBatchStatus = async (batchId) => {
     }
 };
 
+/**
+ * Get one page of a batch's results, errors or logs
+ * @param {string} batchId - Batch ID
+ * @param {string} kind - 'results', 'errors' or 'logs'
+ * @param {number} offset - Index of the first item
+ * @param {number} limit - Maximum number of items
+ * @returns {Promise<Object>} Page with items and the total count
+ */
+export const getBatchItems = async (batchId, kind, offset = 0, limit = 50) => {
+    try {
+        const response = await axios.get(`/api/ocr/batch/items/${batchId}`, {
+            params: { kind, offset, limit }
+        });
+        return response.data;
+    } catch (error) {
+        console.error(`Error getting batch ${kind} for ${batchId}:`, error);
+        throw error;
+    }
+};
+
 /**
  * Control batch processing (pause/resume/stop)
  * @param {string} batchId - Batch ID
@@ -77,6 +77,24 @@ export const getSearchSuggestions = async (partialQuery) => {
     return data.suggestions || [];
 };
 
+// Record that a search result was opened, to drive predictive preloading.
+// Fire-and-forget: failures never affect the UI.
+export const recordSearchClick = (result) => {
+    if (!result || !result.file_id) return;
+
+    const [fileId, page] = result.file_id.split('_page_');
+    fetch('/api/search/click', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            file_id: fileId,
+            folder_id: result.directory_id || null,
+            page: page ? parseInt(page, 10) : null
+        }),
+        keepalive: true
+    }).catch(() => {});
+};
+
 // Highlight search terms in text
 export const highlightSearchTerms = (text, searchTerms) => {
     if (!text || !searchTerms) return text;
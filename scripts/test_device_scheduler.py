@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Test GPU device scheduling on simulated devices.
+
+Drives DeviceScheduler with a FakeDeviceBackend, so no GPU or PyTorch is
+needed. Checks least-loaded placement, the preferred device, memory
+estimates, queueing of concurrent jobs from several threads, the CPU
+fallback after the queue timeout, and pinning a process to one device.
+
+Usage:
+    python scripts/test_device_scheduler.py
+    python scripts/test_device_scheduler.py --threads 16 --hold 0.05
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from app.utils.gpu_utils import DeviceScheduler, FakeDeviceBackend
+
+failures = []
+
+
+def check(name, ok, detail=""):
+    print(f"   {'PASS' if ok else 'FAIL'} {name}{f' ({detail})' if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+
+def test_placement():
+    print("\n1. Least-loaded placement...")
+    scheduler = DeviceScheduler(FakeDeviceBackend([8000, 8000, 4000]), queue_timeout=0, max_jobs_per_device=2)
+    placed = [scheduler.acquire() for _ in range(3)]
+    check("one job per device before any device gets a second", placed == [0, 1, 2], f"placed on {placed}")
+    # All devices run one job; the one with the most free memory takes the next
+    check("ties broken by free memory", scheduler.acquire() == 0)
+    for device_id in placed + [0]:
+        scheduler.release(device_id)
+
+    backend = FakeDeviceBackend([8000, 8000])
+    backend.set_allocated(0, 7000)
+    scheduler = DeviceScheduler(backend, queue_timeout=0, max_jobs_per_device=2)
+    check("device with less memory in use preferred", scheduler.acquire() == 1)
+
+
+def test_preferred_and_memory():
+    print("\n2. Preferred device and memory estimates...")
+    scheduler = DeviceScheduler(FakeDeviceBackend([8000, 8000, 8000]), queue_timeout=0, max_jobs_per_device=2)
+    check("free preferred device used", scheduler.acquire(preferred=2) == 2)
+
+    scheduler = DeviceScheduler(FakeDeviceBackend([4000, 2000]), queue_timeout=0, max_jobs_per_device=2)
+    first = scheduler.acquire(vram_mb=3000)
+    check("job placed on the device with room for it", first == 0, f"got {first}")
+    second = scheduler.acquire(vram_mb=3000)
+    check("idle device takes a job larger than its free memory", second == 1, f"got {second}")
+    third = scheduler.acquire(vram_mb=3000)
+    check("busy devices without room fall back to CPU", third is None, f"got {third}")
+    scheduler.release(first, 3000)
+    scheduler.release(second, 3000)
+    stats = scheduler.get_stats()["devices"]
+    check("reservations returned on release",
+          all(device["reserved_mb"] == 0 and device["active_jobs"] == 0 for device in stats.values()), str(stats))
+
+
+def test_queueing(threads, hold):
+    print(f"\n3. Queueing {threads} concurrent jobs on 2 devices...")
+    scheduler = DeviceScheduler(FakeDeviceBackend([8000, 8000]), queue_timeout=30, max_jobs_per_device=1)
+    lock = threading.Lock()
+    running = {0: 0, 1: 0}
+    peak = {0: 0, 1: 0}
+    placed = []
+    start_barrier = threading.Barrier(threads)
+
+    def job():
+        start_barrier.wait()
+        with scheduler.device() as device_id:
+            with lock:
+                placed.append(device_id)
+                if device_id is not None:
+                    running[device_id] += 1
+                    peak[device_id] = max(peak[device_id], running[device_id])
+            time.sleep(hold)
+            with lock:
+                if device_id is not None:
+                    running[device_id] -= 1
+
+    workers = [threading.Thread(target=job) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    stats = scheduler.get_stats()
+    check("every job got a device", None not in placed and len(placed) == threads, f"placed: {placed}")
+    check("at most one job per device at a time", max(peak.values()) == 1, f"peak: {peak}")
+    check("both devices used", set(placed) == {0, 1})
+    check("jobs waited in the queue", stats["max_wait_ms"] >= hold * 1000 * 0.5, f"max wait {stats['max_wait_ms']} ms")
+    check("no CPU fallbacks", stats["cpu_fallbacks"] == 0)
+    check("queue empty afterwards", stats["queued"] == 0)
+    print(f"   {threads} jobs of {hold * 1000:.0f} ms in {elapsed * 1000:.0f} ms, grants per device: "
+          f"{ {device_id: device['grants'] for device_id, device in stats['devices'].items()} }")
+
+
+def test_timeout():
+    print("\n4. CPU fallback after the queue timeout...")
+    scheduler = DeviceScheduler(FakeDeviceBackend([8000]), queue_timeout=0.2, max_jobs_per_device=1)
+    held = scheduler.acquire()
+    result = {}
+
+    def waiter():
+        start = time.perf_counter()
+        result["device"] = scheduler.acquire()
+        result["waited"] = time.perf_counter() - start
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    thread.join()
+    check("falls back to CPU when no device frees up", result["device"] is None, f"got {result['device']}")
+    check("waited for the queue timeout", 0.15 <= result["waited"] < 1.0, f"waited {result['waited'] * 1000:.0f} ms")
+    check("fallback counted", scheduler.get_stats()["cpu_fallbacks"] == 1)
+
+    def late_release():
+        time.sleep(0.1)
+        scheduler.release(held)
+
+    threading.Thread(target=late_release).start()
+    device_id = scheduler.acquire(timeout=2)
+    check("waiting job gets a device released in time", device_id == 0, f"got {device_id}")
+
+
+def test_pinning():
+    print("\n5. Pinning the process to a device...")
+    scheduler = DeviceScheduler(FakeDeviceBackend([8000, 8000, 8000]), queue_timeout=0,
+                                max_jobs_per_device=4, pin_device='1')
+    placed = {scheduler.acquire(), scheduler.acquire(preferred=0)}
+    check("pinned device only", scheduler.device_ids() == [1] and placed == {1}, f"placed on {placed}")
+
+    scheduler = DeviceScheduler(FakeDeviceBackend([8000, 8000, 8000]), pin_device='auto')
+    check("auto pins by process ID", scheduler.device_ids() == [os.getpid() % 3], str(scheduler.device_ids()))
+
+    scheduler = DeviceScheduler(FakeDeviceBackend([8000, 8000]), pin_device='7')
+    check("invalid pin ignored", scheduler.device_ids() == [0, 1], str(scheduler.device_ids()))
+
+    scheduler = DeviceScheduler(FakeDeviceBackend([]), pin_device='0')
+    check("no devices means CPU", scheduler.acquire() is None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test GPU device scheduling on simulated devices")
+    parser.add_argument('--threads', type=int, default=8, help="Concurrent jobs in the queueing test (default: 8)")
+    parser.add_argument('--hold', type=float, default=0.1, help="Seconds each job holds its device (default: 0.1)")
+    args = parser.parse_args()
+
+    print("=== Device Scheduler Test ===")
+    test_placement()
+    test_preferred_and_memory()
+    test_queueing(args.threads, args.hold)
+    test_timeout()
+    test_pinning()
+
+    print(f"\n{'All checks passed' if not failures else f'{len(failures)} check(s) failed: ' + ', '.join(failures)}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
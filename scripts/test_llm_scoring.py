@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test LLM quality scoring against a local stub server.
+
+The stub answers Gemini and Ollama requests with a score derived from the
+prompt, or with a JSON array of scores for batched Gemini prompts, and
+rejects the first request with 429 to exercise retries. The report shows
+how many requests the stub received, how many texts they carried, and the
+scoring service statistics (batches, cache hits, excerpts, retries).
+
+Usage:
+    python scripts/test_llm_scoring.py
+    python scripts/test_llm_scoring.py --provider ollama --texts 20
+    python scripts/test_llm_scoring.py --batch-size 1 --rpm 600
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+SYSTEM_PROMPT = "Evaluate the quality of the extracted text. Return a numerical score between 0 and 100."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Scores every text with its length modulo 100."""
+
+    requests = []
+    lock = threading.Lock()
+    reject_first = True
+    delay = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        with StubHandler.lock:
+            reject = StubHandler.reject_first
+            StubHandler.reject_first = False
+        if reject:
+            self._reply(429, {'error': 'rate limited'}, {'Retry-After': '0.2'})
+            return
+
+        ollama = 'prompt' in body
+        prompt = body['prompt'] if ollama else body['contents'][0]['parts'][0]['text']
+        texts = re.split(r'\nExtracted Text(?: \d+)?: ', prompt)[1:]
+        with StubHandler.lock:
+            StubHandler.requests.append(len(texts))
+        time.sleep(StubHandler.delay)
+
+        scores = [len(text) % 100 for text in texts]
+        answer = json.dumps(scores) if 'JSON array' in prompt else str(scores[0])
+        if ollama:
+            self._reply(200, {'response': answer, 'done': True})
+        else:
+            self._reply(200, {'candidates': [{'content': {'parts': [{'text': answer}]}}]})
+
+    def _reply(self, status, data, headers=None):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_texts(count, long_every):
+    """Distinct texts; every long_every-th one is a long document that is scored on an excerpt."""
+    texts = []
+    for index in range(count):
+        words = ' '.join(f"palabra{index}-{n}" for n in range(20 + index))
+        if long_every and index % long_every == 0:
+            words = ' '.join([words] * 200)
+        texts.append(words)
+    return texts
+
+
+async def run(args):
+    from app.utils.llm_utils import get_llm_quality_score, llm_scoring_service, representative_excerpt
+
+    texts = make_texts(args.texts, args.long_every)
+    expected = [len(representative_excerpt(text)) % 100 for text in texts]
+
+    start = time.perf_counter()
+    first = await asyncio.gather(*(get_llm_quality_score(text, SYSTEM_PROMPT) for text in texts))
+    first_ms = (time.perf_counter() - start) * 1000
+    requests_after_first = len(StubHandler.requests)
+
+    start = time.perf_counter()
+    second = await asyncio.gather(*(get_llm_quality_score(text, SYSTEM_PROMPT) for text in texts))
+    second_ms = (time.perf_counter() - start) * 1000
+
+    await llm_scoring_service.aclose()
+
+    print(f"Scored {len(texts)} texts in {first_ms:.0f} ms with {requests_after_first} stub requests "
+          f"(texts per request: {StubHandler.requests})")
+    print(f"Scored them again in {second_ms:.1f} ms with {len(StubHandler.requests) - requests_after_first} stub requests")
+    print(json.dumps(llm_scoring_service.get_stats(), indent=2))
+
+    ok = list(first) == expected and list(second) == expected
+    print("Scores match the stub" if ok else f"Score mismatch: expected {expected}, got {list(first)} then {list(second)}")
+    return 0 if ok else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test LLM quality scoring against a local stub server")
+    parser.add_argument('--provider', choices=['gemini', 'ollama'], default='gemini')
+    parser.add_argument('--texts', type=int, default=12, help="Texts to score (default: 12)")
+    parser.add_argument('--long-every', type=int, default=4, help="Every n-th text is a long document (default: 4)")
+    parser.add_argument('--batch-size', type=int, default=8, help="LLM_BATCH_SIZE (default: 8)")
+    parser.add_argument('--rpm', type=int, default=0, help="Requests per minute limit (default: unlimited)")
+    parser.add_argument('--delay', type=float, default=0.05, help="Stub response time in seconds (default: 0.05)")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    StubHandler.delay = args.delay
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # The service reads its configuration on import
+    os.environ.update({
+        'LLM_PROVIDER': args.provider,
+        'GEMINI_API_KEY': 'stub',
+        'GEMINI_API_ENDPOINT': f"{url}/v1beta/models/stub:generateContent",
+        'OLLAMA_API_ENDPOINT': f"{url}/api/generate",
+        'LLM_BATCH_SIZE': str(args.batch_size),
+        f"LLM_{args.provider.upper()}_REQUESTS_PER_MINUTE": str(args.rpm),
+        # Keep scores of earlier runs out of the test
+        'LLM_SCORES_CACHE_BACKEND': 'memory',
+    })
+    try:
+        return asyncio.run(run(args))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())